@@ -29,9 +29,63 @@ class Config:
     # Device polling configuration
     POLL_INTERVAL = int(os.getenv("POLL_INTERVAL", 300))  # Seconds between status checks
 
+    # Polling engine: "thread" (single polling thread) or "asyncio" (event loop for large fleets)
+    POLL_ENGINE = os.getenv("POLL_ENGINE", "thread").lower()
+    POLL_MAX_IN_FLIGHT = int(os.getenv("POLL_MAX_IN_FLIGHT", 8))  # Concurrent upstream requests
+
+    # Adaptive polling: fast after activity or while open, exponential back-off while quiet
+    POLL_ADAPTIVE = os.getenv("POLL_ADAPTIVE", "false").lower() == "true"
+    POLL_MIN_INTERVAL = int(os.getenv("POLL_MIN_INTERVAL", 15))  # Seconds
+    POLL_MAX_INTERVAL = int(os.getenv("POLL_MAX_INTERVAL", 1800))  # Seconds
+    POLL_BACKOFF_FACTOR = float(os.getenv("POLL_BACKOFF_FACTOR", 2))
+    POLL_DAILY_CALL_BUDGET = int(os.getenv("POLL_DAILY_CALL_BUDGET", 0))  # 0 means unlimited
+
+    # Devices are staggered across the interval; jitter is a fraction (0-1) of one phase slot
+    POLL_PHASE_JITTER = float(os.getenv("POLL_PHASE_JITTER", 0.1))
+
+    # Device state snapshot for warm restarts (SQLite file, empty to disable)
+    STATE_SNAPSHOT_PATH = os.getenv("STATE_SNAPSHOT_PATH", "")
+
+    # REST status cache: readings are fresh for STATUS_CACHE_TTL seconds, then served stale
+    # while refreshing in the background, up to STATUS_CACHE_MAX_STALE seconds old
+    STATUS_CACHE_TTL = int(os.getenv("STATUS_CACHE_TTL", 30))
+    STATUS_CACHE_MAX_STALE = int(os.getenv("STATUS_CACHE_MAX_STALE", 600))
+
+    # Device function specs used to validate commands locally (JSON file, empty for memory only)
+    DEVICE_SPEC_CACHE_PATH = os.getenv("DEVICE_SPEC_CACHE_PATH", "")
+    DEVICE_SPEC_TTL = int(os.getenv("DEVICE_SPEC_TTL", 7 * 24 * 3600))  # Seconds
+    # Seconds spec changes are collected before the cache file is rewritten (0: every change)
+    DEVICE_SPEC_SAVE_DELAY = float(os.getenv("DEVICE_SPEC_SAVE_DELAY", 5))
+
+    # Bulk command endpoint: devices handled concurrently and maximum devices per request
+    BULK_COMMAND_WORKERS = int(os.getenv("BULK_COMMAND_WORKERS", 8))
+    BULK_COMMAND_MAX_DEVICES = int(os.getenv("BULK_COMMAND_MAX_DEVICES", 500))
+
+    # Horizontal sharding: replicas split the fleet by holding renewable shard leases
+    SHARD_ENABLED = os.getenv("SHARD_ENABLED", "false").lower() == "true"
+    SHARD_COUNT = int(os.getenv("SHARD_COUNT", 64))
+    SHARD_LEASE_TTL = int(os.getenv("SHARD_LEASE_TTL", 30))  # Seconds
+    SHARD_LEASE_PATH = os.getenv("SHARD_LEASE_PATH", "data/shard_leases.db")
+    SHARD_HOLDER_ID = os.getenv("SHARD_HOLDER_ID", "")  # Defaults to host name and PID
+
     # Application environment (production or development)
     ENV = os.getenv("ENV", "production")
 
+    @classmethod
+    def validate(cls):
+        """
+        Validate that the enabled application features can work together.
+
+        Raises:
+            ValueError: If a feature is enabled without the settings it depends on
+        """
+        # A replica taking over a shard needs the previous owner's door states, or it
+        # re-sends the "sensor initialized" alert for every device in the shard
+        if cls.SHARD_ENABLED and not cls.STATE_SNAPSHOT_PATH:
+            raise ValueError(
+                "SHARD_ENABLED=true requires STATE_SNAPSHOT_PATH shared by all replicas"
+            )
+
 
 class TuyaConfig:
     """
@@ -46,9 +100,68 @@ class TuyaConfig:
     ACCESS_SECRET = os.getenv("TUYA_ACCESS_SECRET")
     API_ENDPOINT = os.getenv("TUYA_ENDPOINT")
 
+    # Extra projects served by the same process: comma-separated
+    # "name:access_id:secret:region[|region...]" entries, region as a code or endpoint URL
+    ACCOUNTS = os.getenv("TUYA_ACCOUNTS", "")
+
+    # JSON file caching which project and region each device was found in (empty: memory)
+    ROUTES_PATH = os.getenv("TUYA_ROUTES_PATH", "")
+
+    # Seconds before expiry at which the access token is refreshed in the background
+    TOKEN_REFRESH_MARGIN = int(os.getenv("TUYA_TOKEN_REFRESH_MARGIN", 300))
+
+    # Encrypted token file reused across restarts (empty to disable); key defaults to the secret
+    TOKEN_STORE_PATH = os.getenv("TUYA_TOKEN_STORE_PATH", "")
+    TOKEN_STORE_KEY = os.getenv("TUYA_TOKEN_STORE_KEY", "")
+
+    # Circuit breaker per API endpoint: opens on the failure or slow-call share over a window
+    BREAKER_FAILURE_RATE = float(os.getenv("TUYA_BREAKER_FAILURE_RATE", 0.5))
+    BREAKER_SLOW_CALL_RATE = float(os.getenv("TUYA_BREAKER_SLOW_CALL_RATE", 0.8))
+    BREAKER_SLOW_CALL_DURATION = float(os.getenv("TUYA_BREAKER_SLOW_CALL_DURATION", 5))  # Seconds
+    BREAKER_MIN_CALLS = int(os.getenv("TUYA_BREAKER_MIN_CALLS", 5))
+    BREAKER_WINDOW = int(os.getenv("TUYA_BREAKER_WINDOW", 60))  # Seconds
+    BREAKER_OPEN_DURATION = int(os.getenv("TUYA_BREAKER_OPEN_DURATION", 30))  # Seconds
+
+    # Per-request (connect, read) timeouts of the Tuya HTTP session, so a hung connection
+    # fails and counts against the circuit breaker instead of blocking the caller
+    CONNECT_TIMEOUT = float(os.getenv("TUYA_CONNECT_TIMEOUT", 3.05))  # Seconds
+    READ_TIMEOUT = float(os.getenv("TUYA_READ_TIMEOUT", 10))  # Seconds
+
+    # Retries of status reads: total attempts and jittered exponential backoff bounds
+    RETRY_ATTEMPTS = int(os.getenv("TUYA_RETRY_ATTEMPTS", 3))
+    RETRY_BASE_DELAY = float(os.getenv("TUYA_RETRY_BASE_DELAY", 0.2))  # Seconds
+    RETRY_MAX_DELAY = float(os.getenv("TUYA_RETRY_MAX_DELAY", 2))  # Seconds
+
+    # Client-side rate limits: "endpoint:rate[:burst]" in requests per second. Endpoints
+    # without their own entry share "default". Non-alert callers give up after MAX_WAIT seconds.
+    RATE_LIMITS = os.getenv("TUYA_RATE_LIMITS", "default:10:20")
+    RATE_LIMIT_MAX_WAIT = float(os.getenv("TUYA_RATE_LIMIT_MAX_WAIT", 10))
+
+    # Native asyncio client for the asyncio polling engine (requires aiohttp)
+    ASYNC_CLIENT = os.getenv("TUYA_ASYNC_CLIENT", "false").lower() == "true"
+    ASYNC_MAX_IN_FLIGHT = int(os.getenv("TUYA_ASYNC_MAX_IN_FLIGHT", 100))  # Also the pool size
+    ASYNC_TIMEOUT = float(os.getenv("TUYA_ASYNC_TIMEOUT", 10))  # Seconds per request
+
     # Target device identifier
     DEVICE_ID = os.getenv("DEVICE_ID")
 
+    # Additional devices to monitor from the same poller (comma-separated)
+    DEVICE_IDS = [
+        device_id.strip() for device_id in os.getenv("DEVICE_IDS", "").split(",") if device_id.strip()
+    ]
+
+    # API quota accounting: calls allowed per period (0 = unknown) and period ("month" or "day")
+    QUOTA_ALLOWANCE = int(os.getenv("TUYA_QUOTA_ALLOWANCE", 0))
+    QUOTA_PERIOD = os.getenv("TUYA_QUOTA_PERIOD", "month").lower()
+    QUOTA_PROBE_INTERVAL = int(os.getenv("TUYA_QUOTA_PROBE_INTERVAL", 900))  # Seconds
+
+    # Relative share of the remaining quota per device ("device_id:weight,...", default 1)
+    DEVICE_PRIORITIES = {
+        entry.split(":", 1)[0].strip(): float(entry.split(":", 1)[1])
+        for entry in os.getenv("DEVICE_PRIORITIES", "").split(",")
+        if ":" in entry
+    }
+
     # Pulsar WebSocket endpoint (optional - currently using HTTP polling)
     TUYA_PULSAR_ENDPOINT = os.getenv("TUYA_PULSAR_ENDPOINT")
 
@@ -60,11 +173,23 @@ class TuyaConfig:
         Raises:
             ValueError: If any required configuration value is missing
         """
-        required = ["ACCESS_ID", "ACCESS_SECRET", "API_ENDPOINT", "DEVICE_ID"]
+        required = ["ACCESS_ID", "ACCESS_SECRET", "API_ENDPOINT"]
         missing = [key for key in required if not getattr(cls, key)]
+
+        # A fleet configured through DEVICE_IDS does not need a primary DEVICE_ID
+        if not cls.DEVICE_ID and not cls.DEVICE_IDS:
+            missing.append("DEVICE_ID")
+
         if missing:
             raise ValueError(f"Missing required Tuya configuration: {', '.join(missing)}")
 
+        # The native async client only signs requests for the TUYA_ACCESS_ID project
+        if cls.ASYNC_CLIENT and cls.ACCOUNTS:
+            raise ValueError(
+                "TUYA_ASYNC_CLIENT=true cannot be combined with TUYA_ACCOUNTS; "
+                "disable the native async client to poll several Tuya projects"
+            )
+
 
 class WhatsAppConfig:
     """
@@ -82,17 +207,51 @@ class WhatsAppConfig:
     # Target WhatsApp group for notifications
     GROUP_ID = os.getenv("WA_GROUP_ID")
 
+    # Recipients per device or severity: "selector=recipient[|recipient...]" entries, where
+    # a selector is a device ID, "severity:info", "severity:alert" or "*" (default: GROUP_ID)
+    ROUTES = os.getenv("WA_ROUTES", "")
+
+    # Per-recipient pacing: messages per minute (0 = unlimited) and back-to-back burst
+    RECIPIENT_RATE = float(os.getenv("WA_RECIPIENT_RATE", "20"))
+    RECIPIENT_BURST = float(os.getenv("WA_RECIPIENT_BURST", "5"))
+
     # Customizable alert messages
     MESSAGE_DOOR_OPENED = os.getenv("WA_MESSAGE_DOOR_OPENED", "DOOR OPENED - Server room accessed")
     MESSAGE_DOOR_CLOSED = os.getenv("WA_MESSAGE_DOOR_CLOSED", "DOOR CLOSED - Server room secured")
     MESSAGE_SENSOR_INITIALIZED = os.getenv(
         "WA_MESSAGE_SENSOR_INITIALIZED", "SENSOR IS WORKING - Monitoring started"
     )
+    # Summary of a coalescing window; placeholders {count}, {first}, {last} and {state}
+    MESSAGE_DOOR_FLAPPING = os.getenv(
+        "WA_MESSAGE_DOOR_FLAPPING",
+        "DOOR FLAPPING - {count} changes from {first} to {last}, now {state}",
+    )
 
     # Optional message parameters
     IS_FORWARDED = os.getenv("WA_IS_FORWARDED", "false").lower() == "true"
     DURATION = int(os.getenv("WA_DURATION", "0"))  # 0 means don't include in payload
 
+    # Shared keep-alive session: pooled connections and separate connect/read timeouts
+    POOL_SIZE = int(os.getenv("WA_POOL_SIZE", "10"))
+    CONNECT_TIMEOUT = float(os.getenv("WA_CONNECT_TIMEOUT", "3.05"))  # Seconds
+    READ_TIMEOUT = float(os.getenv("WA_READ_TIMEOUT", "10"))  # Seconds
+
+    # Alert dispatch queue between door event detection and delivery
+    ALERT_WORKERS = int(os.getenv("ALERT_WORKERS", "2"))  # 0 delivers inline
+    ALERT_QUEUE_SIZE = int(os.getenv("ALERT_QUEUE_SIZE", "1000"))
+    # drop_oldest, drop_newest or block
+    ALERT_OVERFLOW_POLICY = os.getenv("ALERT_OVERFLOW_POLICY", "drop_oldest").lower()
+
+    # Seconds after a door alert during which further transitions of that device are
+    # folded into one summary message (0, the default, sends every transition)
+    ALERT_COALESCE_WINDOW = float(os.getenv("ALERT_COALESCE_WINDOW", "0"))
+
+    # Durable outbox: alerts survive restarts and failed sends are retried (empty to disable)
+    ALERT_OUTBOX_PATH = os.getenv("ALERT_OUTBOX_PATH", "")
+    ALERT_MAX_ATTEMPTS = int(os.getenv("ALERT_MAX_ATTEMPTS", "10"))
+    ALERT_RETRY_BASE_DELAY = float(os.getenv("ALERT_RETRY_BASE_DELAY", "2"))  # Seconds
+    ALERT_RETRY_MAX_DELAY = float(os.getenv("ALERT_RETRY_MAX_DELAY", "300"))  # Seconds
+
     @classmethod
     def validate(cls):
         """
@@ -33,6 +33,7 @@ def validate_configuration():
         bool: True if all configuration is valid, False otherwise
     """
     try:
+        Config.validate()
         TuyaConfig.validate()
         WhatsAppConfig.validate()
         logger.info("Configuration validation passed")
@@ -120,9 +121,30 @@ if __name__ == "__main__":
     if is_reloader_child or not is_debug:
         logger.info("Starting Door Sensor Monitor...")
 
+        # Deliver alerts a previous run recorded but never got through to the gateway
+        from services.whatsapp_service import replay_pending_alerts
+
+        replay_pending_alerts()
+
         # Use HTTP Polling service as the primary monitoring method
         # This is more reliable than Pulsar WebSocket for our use case
-        from services.polling_service import door_poller
+        if Config.POLL_ENGINE == "asyncio":
+            # Event-loop engine for large fleets (one coroutine per device)
+            from services.async_polling_service import async_door_poller as door_poller
+
+            if TuyaConfig.ASYNC_CLIENT:
+                # Native asyncio HTTP client instead of a thread per in-flight request
+                from services.async_tuya_service import async_tuya_service
+
+                door_poller.client = async_tuya_service
+        else:
+            from services.polling_service import door_poller
+
+        if Config.SHARD_ENABLED:
+            # Replicas split the fleet; this one only polls the shards it holds leases on
+            from services.shard_service import shard_coordinator
+
+            shard_coordinator.start(door_poller)
 
         door_poller.start()
 
@@ -2,11 +2,15 @@
 Device Routes - Tuya Device Management API Endpoints
 
 This module provides REST API endpoints for interacting with Tuya IoT devices.
-Supports querying device status and sending control commands to devices.
+Supports querying device status and sending control commands to one device
+or to many devices at once.
 """
 
-from flask import Blueprint, request
-from services.tuya_service import tuya_service
+import json
+from flask import Blueprint, Response, request, stream_with_context
+from services.tuya_pool import tuya_pool
+from services.status_cache import status_cache
+from services.bulk_command_service import bulk_command_runner
 from utils.response import success_response, error_response
 import logging
 
@@ -20,7 +24,9 @@ def get_device_status(device_id):
     Get current status of a Tuya device.
 
     Retrieves all current status values for the specified device including
-    sensor readings, battery level, and other device properties.
+    sensor readings, battery level, and other device properties. Readings are
+    served from the status cache when possible; the age of the reading is
+    returned in "meta" and in the HTTP Age header.
 
     Args:
         device_id (str): The unique identifier of the Tuya device
@@ -35,15 +41,22 @@ def get_device_status(device_id):
             "result": [
                 {"code": "doorcontact_state", "value": false},
                 {"code": "battery_percentage", "value": 85}
-            ]
+            ],
+            "meta": {"age_seconds": 4.2, "stale": false}
         }
     """
     try:
-        # Query Tuya Cloud API for device status
-        response = tuya_service.get_device_status(device_id)
+        # Serve from the status cache, reading through to Tuya Cloud when needed
+        cached = status_cache.get(device_id, tuya_pool.get_device_status)
+        response = cached.response
 
         if response.get("success"):
-            return success_response(data=response.get("result"))
+            flask_response, status_code = success_response(
+                data=response.get("result"),
+                meta={"age_seconds": round(cached.age, 1), "stale": cached.stale},
+            )
+            flask_response.headers["Age"] = str(int(cached.age))
+            return flask_response, status_code
         else:
             return error_response(
                 message=response.get("msg", "Failed to fetch status"),
@@ -95,7 +108,7 @@ def send_device_command(device_id):
         commands = data["commands"]
 
         # Send commands to device via Tuya Cloud API
-        response = tuya_service.send_command(device_id, commands)
+        response = tuya_pool.send_command(device_id, commands)
 
         if response.get("success"):
             return success_response(
@@ -109,3 +122,92 @@ def send_device_command(device_id):
     except Exception as e:
         logging.error(f"Error sending command: {e}")
         return error_response(message="Internal Server Error", status_code=500)
+
+
+def _parse_bulk_entries(data):
+    """
+    Validate a bulk command request body.
+
+    Args:
+        data (dict): Parsed JSON body
+
+    Returns:
+        tuple: (list of (device_id, commands) pairs, None) or (None, error message)
+    """
+    devices = data.get("devices") if isinstance(data, dict) else None
+    if not isinstance(devices, list) or not devices:
+        return None, "Invalid request body"
+    if len(devices) > bulk_command_runner.max_devices:
+        return None, f"Too many devices (maximum {bulk_command_runner.max_devices})"
+
+    entries = []
+    for position, entry in enumerate(devices):
+        if (
+            not isinstance(entry, dict)
+            or not isinstance(entry.get("device_id"), str)
+            or not entry["device_id"]
+            or not isinstance(entry.get("commands"), list)
+        ):
+            return None, f"Invalid entry at index {position}"
+        entries.append((entry["device_id"], entry["commands"]))
+    return entries, None
+
+
+@device_bp.route("/devices/commands", methods=["POST"])
+def send_bulk_commands():
+    """
+    Send control commands to many Tuya devices in one request.
+
+    Devices are handled concurrently; command sets for the same device are
+    sent in request order. With ?stream=true, results are streamed as
+    newline-delimited JSON as each device finishes, instead of one response
+    after the slowest device.
+
+    Request Body:
+        {
+            "devices": [
+                {"device_id": "abc", "commands": [{"code": "switch", "value": true}]},
+                {"device_id": "def", "commands": [{"code": "switch", "value": false}]}
+            ]
+        }
+
+    Returns:
+        tuple: JSON response with per-device results and HTTP status code
+
+    Example Response:
+        {
+            "status": "success",
+            "message": "Commands sent to 1/2 device(s)",
+            "result": {
+                "succeeded": 1,
+                "failed": 1,
+                "results": [
+                    {"device_id": "abc", "success": true, "result": true},
+                    {"device_id": "def", "success": false, "code": 2001,
+                     "message": "device is offline"}
+                ]
+            }
+        }
+    """
+    try:
+        entries, error = _parse_bulk_entries(request.get_json(silent=True))
+        if error:
+            return error_response(message=error, status_code=400)
+
+        if request.args.get("stream", "").lower() == "true":
+
+            def generate():
+                for index, result in bulk_command_runner.iter_results(entries):
+                    yield json.dumps({"index": index, **result}) + "\n"
+
+            return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+        results = bulk_command_runner.run(entries)
+        succeeded = sum(1 for result in results if result["success"])
+        return success_response(
+            data={"succeeded": succeeded, "failed": len(results) - succeeded, "results": results},
+            message=f"Commands sent to {succeeded}/{len(results)} device(s)",
+        )
+    except Exception as e:
+        logging.error(f"Error sending bulk commands: {e}")
+        return error_response(message="Internal Server Error", status_code=500)
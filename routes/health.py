@@ -8,6 +8,13 @@ systems to verify the service is running.
 
 from flask import Blueprint
 from utils.response import success_response
+from services.alert_dispatcher import alert_dispatcher
+from services.alert_outbox import alert_outbox
+from services.flap_coalescer import flap_coalescer
+from services.alert_router import alert_router
+from services.status_cache import status_cache
+from services.tuya_service import tuya_service
+from services.tuya_pool import tuya_pool
 
 # Create blueprint for health check endpoints
 health_bp = Blueprint("health", __name__)
@@ -20,9 +27,50 @@ def health_check():
 
     Returns a simple status response to indicate the API is operational.
     This endpoint is typically called by monitoring systems, load balancers,
-    or orchestration tools to verify service availability.
+    or orchestration tools to verify service availability. While the alert
+    outbox cannot commit to disk, alerts are only held in memory and the
+    service reports itself degraded.
 
     Returns:
-        tuple: JSON response with status "ok" and HTTP 200 status code
+        tuple: JSON response with status "ok" and HTTP 200 status code, or
+            status "degraded" and HTTP 503 status code
     """
+    outbox_error = alert_outbox.commit_error()
+    if outbox_error is not None:
+        return success_response(
+            data={"status": "degraded", "alert_outbox": outbox_error},
+            message="Alert outbox writes are failing",
+            status_code=503,
+        )
     return success_response(data={"status": "ok"}, message="Health check passed")
+
+
+@health_bp.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    Operational metrics endpoint.
+
+    Reports the alert dispatch queue depth, delivery counters and queue
+    wait times (so a backed-up notifier is visible before alerts are lost),
+    the durable outbox's retry and commit counters, folded door transitions,
+    per-recipient delivery and throttling counters,
+    the status cache hit rates, the Tuya API circuit breaker states and the
+    rate limiter wait times per priority class of the configured project,
+    and the Tuya pool members with their routed device counts.
+
+    Returns:
+        tuple: JSON response with metrics and HTTP 200 status code
+    """
+    return success_response(
+        data={
+            "alerts": alert_dispatcher.metrics(),
+            "alert_outbox": alert_outbox.metrics(),
+            "flap_coalescer": flap_coalescer.metrics(),
+            "alert_recipients": alert_router.metrics(),
+            "status_cache": status_cache.metrics(),
+            "circuit_breakers": tuya_service.breakers.metrics(),
+            "rate_limits": tuya_service.rate_limiter.metrics(),
+            "tuya_pool": tuya_pool.metrics(),
+        },
+        message="Metrics",
+    )
@@ -0,0 +1,99 @@
+"""
+Adaptive Interval - Activity-driven Poll Scheduling
+
+This module computes per-device poll intervals that follow door activity.
+Devices are polled quickly right after a transition or while a door is
+open, and back off exponentially while nothing happens, always staying
+within the configured minimum, maximum and daily call budget.
+"""
+
+import logging
+from config.Config import Config
+
+# Seconds in one day, used to turn a daily call budget into an interval floor
+SECONDS_PER_DAY = 86400
+
+
+class AdaptivePollInterval:
+    """
+    Per-device adaptive poll interval policy.
+
+    Keeps the current interval of every device and derives the next one
+    from the latest reading. The call budget is converted into a minimum
+    interval floor so the fleet as a whole cannot exceed it.
+    """
+
+    def __init__(self, min_interval, max_interval, backoff_factor=2.0, daily_call_budget=0):
+        """
+        Initialize the adaptive interval policy.
+
+        Args:
+            min_interval (float): Fastest poll interval in seconds
+            max_interval (float): Slowest poll interval in seconds
+            backoff_factor (float): Multiplier applied while a device is quiet
+            daily_call_budget (int): Maximum status calls per day, 0 for unlimited
+        """
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.backoff_factor = max(backoff_factor, 1.0)
+        self.daily_call_budget = daily_call_budget
+        self.budget_floor = 0.0  # Minimum interval imposed by the call budget
+        self.intervals = {}  # device_id -> current interval in seconds
+
+    @classmethod
+    def from_config(cls):
+        """
+        Build a policy from the POLL_* configuration values.
+
+        Returns:
+            AdaptivePollInterval: Policy configured from environment settings
+        """
+        return cls(
+            min_interval=Config.POLL_MIN_INTERVAL,
+            max_interval=Config.POLL_MAX_INTERVAL,
+            backoff_factor=Config.POLL_BACKOFF_FACTOR,
+            daily_call_budget=Config.POLL_DAILY_CALL_BUDGET,
+        )
+
+    def set_fleet_size(self, device_count):
+        """
+        Recompute the budget floor for the number of monitored devices.
+
+        Each device poll is counted as one call, which is conservative when
+        devices share batched status requests.
+
+        Args:
+            device_count (int): Number of devices sharing the budget
+        """
+        if self.daily_call_budget <= 0 or device_count <= 0:
+            self.budget_floor = 0.0
+            return
+
+        self.budget_floor = SECONDS_PER_DAY * device_count / self.daily_call_budget
+        if self.budget_floor > self.max_interval:
+            logging.warning(
+                f"Daily call budget of {self.daily_call_budget} cannot sustain {device_count} "
+                f"device(s) at POLL_MAX_INTERVAL; polling every {self.budget_floor:.0f}s instead"
+            )
+
+    def next_interval(self, device_id, door_state, changed):
+        """
+        Compute the delay before the next poll of a device.
+
+        Args:
+            device_id (str): Device that was just polled
+            door_state (bool): Latest door state (True when open, None if unknown)
+            changed (bool): Whether the latest reading was a state transition
+
+        Returns:
+            float: Seconds until the device should be polled again
+        """
+        if changed or door_state:
+            # Activity or an open door: watch closely for the next transition
+            interval = self.min_interval
+        else:
+            previous = self.intervals.get(device_id, self.min_interval)
+            interval = min(previous * self.backoff_factor, self.max_interval)
+
+        self.intervals[device_id] = interval
+        return max(interval, self.budget_floor)
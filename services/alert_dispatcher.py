@@ -0,0 +1,273 @@
+"""
+Alert Dispatcher - Asynchronous Alert Delivery
+
+This module decouples door event detection from notification delivery.
+Detected events are put on a bounded queue and delivered by a small pool
+of worker threads, so a slow WhatsApp gateway never delays the next poll.
+
+When the queue is full the configured overflow policy decides what
+happens: drop the oldest pending alert, drop the new one, or block the
+caller until there is room. A producer that must not lose its jobs, like
+the durable outbox, registers a drop handler that gets every dropped job
+back. Queue depth, queue wait and enqueue-to-delivery latency, and drops
+are exposed through metrics().
+
+A job that cannot run yet, e.g. because its recipient is being paced,
+returns Deferred and is queued again later with submit_later() instead of
+counting as a failed delivery.
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import namedtuple
+from config.Config import WhatsAppConfig
+
+# Supported behaviours when the dispatch queue is full
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+# Result of a job handed back to be run again after delay seconds
+Deferred = namedtuple("Deferred", "delay")
+
+
+class AlertDispatcher:
+    """
+    Bounded queue of alert jobs drained by a worker pool.
+
+    A job is any callable with its arguments. Workers are started lazily on
+    the first submission; with zero workers jobs run inline in the caller,
+    which restores fully synchronous delivery.
+    """
+
+    def __init__(self, workers=2, max_queue=1000, overflow="drop_oldest"):
+        """
+        Initialize the dispatcher.
+
+        Args:
+            workers (int): Delivery threads (0 delivers inline in the caller)
+            max_queue (int): Maximum pending jobs
+            overflow (str): One of OVERFLOW_POLICIES
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            logging.warning(f"Unknown alert overflow policy '{overflow}', using drop_oldest")
+            overflow = "drop_oldest"
+
+        self.workers = workers
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._threads = []
+        self._drop_handlers = {}  # Delivery function -> called with a dropped job's args
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.submitted = 0
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+        self.deferred = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    @classmethod
+    def from_config(cls):
+        """
+        Build a dispatcher from the ALERT_* configuration values.
+
+        Returns:
+            AlertDispatcher: Dispatcher configured from environment settings
+        """
+        return cls(
+            workers=WhatsAppConfig.ALERT_WORKERS,
+            max_queue=WhatsAppConfig.ALERT_QUEUE_SIZE,
+            overflow=WhatsAppConfig.ALERT_OVERFLOW_POLICY,
+        )
+
+    def _ensure_workers(self):
+        """Start the worker threads on first use."""
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(
+                    target=self._worker,
+                    name=f"alert-dispatch-{len(self._threads)}",
+                    daemon=True,
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, func, *args):
+        """
+        Queue an alert for delivery.
+
+        Args:
+            func (callable): Delivery function, e.g. send_door_opened_alert
+            *args: Arguments passed to func
+
+        Returns:
+            bool: True if the alert was queued, False if dropped. Inline
+                delivery returns whether it succeeded.
+        """
+        with self._lock:
+            self.submitted += 1
+
+        if self.workers <= 0:
+            return self._run(time.monotonic(), func, args)
+
+        self._ensure_workers()
+        job = (time.monotonic(), func, args)
+
+        if self.overflow == "block":
+            self._queue.put(job)
+            return True
+
+        try:
+            self._queue.put_nowait(job)
+            return True
+        except queue.Full:
+            pass
+
+        if self.overflow == "drop_newest":
+            self._record_drop(func, args)
+            return False
+
+        # drop_oldest: make room by discarding the longest-waiting alert
+        try:
+            _, dropped_func, dropped_args = self._queue.get_nowait()
+            self._queue.task_done()
+            self._record_drop(dropped_func, dropped_args)
+        except queue.Empty:
+            pass
+        try:
+            self._queue.put_nowait(job)
+            return True
+        except queue.Full:
+            self._record_drop(func, args)
+            return False
+
+    def submit_later(self, delay, func, *args):
+        """
+        Queue an alert after a delay, e.g. a job that returned Deferred.
+
+        Args:
+            delay (float): Seconds to wait before submitting
+            func (callable): Delivery function
+            *args: Arguments passed to func
+        """
+        timer = threading.Timer(max(0.0, delay), self.submit, (func,) + args)
+        timer.daemon = True
+        timer.start()
+
+    def on_drop(self, func, handler):
+        """
+        Register a handler for jobs of a delivery function dropped by the overflow policy.
+
+        Args:
+            func (callable): Delivery function whose jobs the handler takes back
+            handler (callable): Called with the dropped job's arguments
+        """
+        with self._lock:
+            self._drop_handlers[func] = handler
+
+    def _record_drop(self, func, args):
+        """Count and log an alert lost to queue overflow, or hand it to its drop handler."""
+        with self._lock:
+            self.dropped += 1
+            handler = self._drop_handlers.get(func)
+        if handler is not None:
+            logging.warning(
+                f"Alert queue full ({self.max_queue}), handing back {getattr(func, '__name__', func)}"
+            )
+            handler(*args)
+            return
+        logging.error(
+            f"Alert queue full ({self.max_queue}), dropped {getattr(func, '__name__', func)}"
+        )
+
+    def _run(self, enqueued_at, func, args):
+        """
+        Deliver one job and record its metrics.
+
+        Returns:
+            bool: False if delivery failed (a Deferred job is not a failure)
+        """
+        wait = time.monotonic() - enqueued_at
+        try:
+            ok = func(*args)
+        except Exception as e:
+            logging.error(f"Alert delivery raised: {e}")
+            ok = False
+        latency = time.monotonic() - enqueued_at
+
+        with self._lock:
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+            self._latency_total += latency
+            self._latency_max = max(self._latency_max, latency)
+            if isinstance(ok, Deferred):
+                self.deferred += 1
+            elif ok is False:
+                self.failed += 1
+            else:
+                self.delivered += 1
+        return ok is not False
+
+    def _worker(self):
+        """Worker thread body: deliver queued jobs forever."""
+        while True:
+            job = self._queue.get()
+            try:
+                self._run(*job)
+            finally:
+                self._queue.task_done()
+
+    def join(self, timeout=None):
+        """
+        Wait until every queued alert has been handled.
+
+        Args:
+            timeout (float, optional): Maximum seconds to wait
+
+        Returns:
+            bool: True if the queue drained in time
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def metrics(self):
+        """
+        Snapshot of dispatcher metrics.
+
+        Returns:
+            dict: Queue depth, counters, queue wait and enqueue-to-delivery
+                latency statistics in milliseconds
+        """
+        with self._lock:
+            handled = self.delivered + self.failed + self.deferred
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue": self.max_queue,
+                "workers": self.workers,
+                "overflow_policy": self.overflow,
+                "submitted": self.submitted,
+                "delivered": self.delivered,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "deferred": self.deferred,
+                "avg_wait_ms": round(self._wait_total / handled * 1000, 2) if handled else 0.0,
+                "max_wait_ms": round(self._wait_max * 1000, 2),
+                "avg_latency_ms": round(self._latency_total / handled * 1000, 2)
+                if handled
+                else 0.0,
+                "max_latency_ms": round(self._latency_max * 1000, 2),
+            }
+
+
+# Global singleton instance for application-wide use
+alert_dispatcher = AlertDispatcher.from_config()
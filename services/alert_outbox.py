@@ -0,0 +1,463 @@
+"""
+Alert Outbox - Durable At-least-once Alert Delivery
+
+This module records every alert in a SQLite database (WAL mode) before it
+is handed to the alert dispatcher, and marks it delivered only after the
+gateway accepted it. Failed deliveries are retried with jittered backoff,
+and alerts still pending when the process stopped are replayed as soon as
+it starts again, so a crash between detecting a transition and delivering
+its alert no longer loses the alert.
+
+Each alert carries an idempotency key built from device, transition and
+timestamp. A key is only queued once, and it is sent to the gateway so
+a retried delivery can be recognized there.
+
+Callers never wait on the disk: writes are appended to an in-memory batch
+that a single writer thread commits in one transaction, so recording an
+alert costs microseconds. The price is a short window, until the writer's
+next commit (normally a few milliseconds), in which a crash loses an alert
+that add() already accepted. Persistence is optional: without
+ALERT_OUTBOX_PATH the outbox is disabled.
+
+Outbox jobs the dispatcher's overflow policy drops are handed back and
+scheduled again, so a full dispatch queue delays alerts but never strands
+them as pending until the next restart.
+
+A batch that fails to commit is put back in front of the pending writes and
+retried with backoff; until a commit succeeds again, commit_error() reports
+the failure and /health turns degraded.
+"""
+
+import heapq
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from config.Config import WhatsAppConfig
+from services.alert_dispatcher import alert_dispatcher, Deferred
+from services.circuit_breaker import RetryPolicy
+
+# Delivered alerts are kept this long for deduplication and inspection (seconds)
+RETENTION = 7 * 24 * 3600
+
+# Seconds between purges of old delivered alerts
+PURGE_INTERVAL = 3600
+
+# Keys remembered in memory to reject duplicate alerts
+MAX_KNOWN_KEYS = 10000
+
+PENDING = "pending"
+DELIVERED = "delivered"
+DEAD = "dead"
+
+
+def alert_key(device_id, transition, timestamp=None):
+    """
+    Build the idempotency key of an alert.
+
+    Args:
+        device_id (str): Device that triggered the alert (None if unknown)
+        transition (str): Event name, e.g. "opened", "closed", "initialized"
+        timestamp (int, optional): Event time in milliseconds. Defaults to now.
+
+    Returns:
+        str: Key identifying this transition of this device
+    """
+    if timestamp is None:
+        timestamp = int(time.time() * 1000)
+    return f"{device_id or '-'}:{transition}:{timestamp}"
+
+
+class AlertOutbox:
+    """
+    SQLite-backed outbox feeding the alert dispatcher.
+
+    The database is only touched by the writer thread (and by start()
+    before that thread runs), so no lock is held across disk I/O.
+    """
+
+    def __init__(self, path=None, max_attempts=10, base_delay=2.0, max_delay=300.0):
+        """
+        Initialize the outbox.
+
+        Args:
+            path (str, optional): SQLite file path. None or empty disables the outbox.
+            max_attempts (int): Delivery attempts before an alert is given up
+            base_delay (float): Backoff ceiling in seconds after the first failure
+            max_delay (float): Upper bound of any retry delay in seconds
+        """
+        self.path = path or None
+        self.retry_policy = RetryPolicy(max_attempts, base_delay, max_delay)
+        self.sender = None
+        self._connection = None
+        self._ops = []  # Writes waiting for the next commit
+        self._retries = []  # Heap of (due, key, message, attempts)
+        self._known = OrderedDict()  # Recently queued keys
+        self._cond = threading.Condition()
+        self._thread = None
+        self._writing = False  # Writer holds a batch it has not committed yet
+        self._purged_at = 0.0
+        self._commit_failures = 0  # Consecutive failed commits
+        self._commit_error = None  # Error of the last commit while it keeps failing
+        self._commit_retry_at = 0.0  # Unix time before which no commit is retried
+
+        # Metrics
+        self.queued = 0
+        self.duplicates = 0
+        self.delivered = 0
+        self.retried = 0
+        self.dead = 0
+        self.replayed = 0
+        self._commits = 0
+        self._committed_ops = 0
+        self._commit_total = 0.0
+
+    @classmethod
+    def from_config(cls):
+        """
+        Build an outbox from the ALERT_OUTBOX_PATH and ALERT_* retry configuration values.
+
+        Returns:
+            AlertOutbox: Outbox for the configured database file
+        """
+        return cls(
+            WhatsAppConfig.ALERT_OUTBOX_PATH,
+            max_attempts=WhatsAppConfig.ALERT_MAX_ATTEMPTS,
+            base_delay=WhatsAppConfig.ALERT_RETRY_BASE_DELAY,
+            max_delay=WhatsAppConfig.ALERT_RETRY_MAX_DELAY,
+        )
+
+    @property
+    def enabled(self):
+        """bool: True when an outbox file is configured."""
+        return self.path is not None
+
+    def _connect(self):
+        """
+        Open the database and create the schema on first use.
+
+        Returns:
+            sqlite3.Connection: Open connection
+        """
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS alert_outbox ("
+                " key TEXT PRIMARY KEY,"
+                " message TEXT NOT NULL,"
+                " status TEXT NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " last_error TEXT)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS alert_outbox_status"
+                " ON alert_outbox (status, created_at)"
+            )
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def start(self, sender):
+        """
+        Start the writer thread and replay alerts left pending by a previous run.
+
+        Args:
+            sender (callable): Delivers one alert, called as sender(message, key);
+                returns False on failure
+
+        Returns:
+            int: Number of pending alerts replayed
+        """
+        if not self.enabled:
+            return 0
+
+        with self._cond:
+            if self._thread is not None:
+                return 0
+            self.sender = sender
+            try:
+                connection = self._connect()
+                pending = connection.execute(
+                    "SELECT key, message, attempts FROM alert_outbox"
+                    " WHERE status = ? ORDER BY created_at",
+                    (PENDING,),
+                ).fetchall()
+                recent = connection.execute(
+                    "SELECT key FROM alert_outbox ORDER BY created_at DESC LIMIT ?",
+                    (MAX_KNOWN_KEYS,),
+                ).fetchall()
+            except sqlite3.Error as e:
+                logging.error(f"Failed to open alert outbox: {e}")
+                pending, recent = [], []
+
+            for (key,) in reversed(recent):
+                self._known[key] = True
+            alert_dispatcher.on_drop(self._attempt, self._requeue)
+            self._thread = threading.Thread(target=self._writer, name="alert-outbox", daemon=True)
+            self._thread.start()
+
+        if pending:
+            logging.warning(f"Replaying {len(pending)} undelivered alerts from the outbox")
+        self.replayed += len(pending)
+        for key, message, attempts in pending:
+            self._dispatch(key, message, attempts)
+        return len(pending)
+
+    def add(self, key, message, sender):
+        """
+        Record an alert and queue it for delivery.
+
+        Args:
+            key (str): Idempotency key, see alert_key()
+            message (str): Message text
+            sender (callable): Delivers one alert, called as sender(message, key)
+
+        Returns:
+            bool: True if the alert was accepted, including a duplicate of an
+                already queued key. It is durable once the writer commits, a few
+                milliseconds later. Without a database the alert is only
+                dispatched and the dispatcher's result returned.
+        """
+        if not self.enabled:
+            return alert_dispatcher.submit(sender, message, key)
+        if self._thread is None:
+            self.start(sender)
+
+        now = time.time()
+        with self._cond:
+            if key in self._known:
+                self.duplicates += 1
+                logging.info(f"Alert {key} already queued, skipping duplicate")
+                return True
+            self._known[key] = True
+            while len(self._known) > MAX_KNOWN_KEYS:
+                self._known.popitem(last=False)
+            self.queued += 1
+            self._ops.append(("insert", key, message, now))
+            self._cond.notify()
+
+        self._dispatch(key, message, 0)
+        return True
+
+    def _dispatch(self, key, message, attempts):
+        """Hand an alert to the dispatcher; jobs it drops come back through _requeue()."""
+        alert_dispatcher.submit(self._attempt, key, message, attempts)
+
+    def _requeue(self, key, message, attempts):
+        """Schedule an alert the dispatcher dropped again, without counting an attempt."""
+        with self._cond:
+            due = time.time() + self.retry_policy.delay(0)
+            heapq.heappush(self._retries, (due, key, message, attempts))
+            self._cond.notify()
+
+    def _attempt(self, key, message, attempts):
+        """
+        Deliver one alert and record the outcome (dispatcher worker).
+
+        Returns:
+            bool or Deferred: True if the gateway accepted the alert; Deferred if
+                the sender handed it back, which does not count as an attempt
+        """
+        try:
+            result = self.sender(message, key)
+            if isinstance(result, Deferred):
+                with self._cond:
+                    heapq.heappush(
+                        self._retries, (time.time() + result.delay, key, message, attempts)
+                    )
+                    self._cond.notify()
+                return result
+            ok = result is not False
+            error = None if ok else "delivery failed"
+        except Exception as e:
+            ok, error = False, str(e)
+
+        attempts += 1
+        if not ok:
+            self._schedule(key, message, attempts, error)
+            return False
+
+        with self._cond:
+            self.delivered += 1
+            self._ops.append(("update", key, DELIVERED, attempts, time.time(), None))
+            self._cond.notify()
+        return True
+
+    def _schedule(self, key, message, attempts, error):
+        """Persist a failed attempt and schedule the next one, or give the alert up."""
+        now = time.time()
+        with self._cond:
+            if attempts >= self.retry_policy.attempts:
+                self.dead += 1
+                self._ops.append(("update", key, DEAD, attempts, now, error))
+                logging.error(f"Alert {key} given up after {attempts} attempts: {error}")
+            else:
+                self.retried += 1
+                due = now + self.retry_policy.delay(max(0, attempts - 1))
+                heapq.heappush(self._retries, (due, key, message, attempts))
+                self._ops.append(("update", key, PENDING, attempts, now, error))
+            self._cond.notify()
+
+    def _writer(self):
+        """Writer thread body: commit batched writes and release due retries."""
+        while True:
+            with self._cond:
+                while True:
+                    now = time.time()
+                    if self._ops and now >= self._commit_retry_at:
+                        break
+                    if self._retries and self._retries[0][0] <= now:
+                        break
+                    waits = [self._retries[0][0] - now] if self._retries else []
+                    if self._ops:
+                        # Failed commits are retried after their backoff
+                        waits.append(self._commit_retry_at - now)
+                    self._cond.wait(min(waits) if waits else None)
+                ops = []
+                if now >= self._commit_retry_at:
+                    ops, self._ops = self._ops, []
+                self._writing = bool(ops)
+                due = []
+                while self._retries and self._retries[0][0] <= now:
+                    due.append(heapq.heappop(self._retries))
+
+            if ops:
+                self._commit(ops)
+            for _, key, message, attempts in due:
+                self._dispatch(key, message, attempts)
+
+    def _commit(self, ops):
+        """Write a batch of changes in one transaction (writer thread)."""
+        started = time.monotonic()
+        try:
+            connection = self._connect()
+            for op in ops:
+                if op[0] == "insert":
+                    _, key, message, created_at = op
+                    connection.execute(
+                        "INSERT OR IGNORE INTO alert_outbox"
+                        " (key, message, status, attempts, created_at, updated_at)"
+                        " VALUES (?, ?, ?, 0, ?, ?)",
+                        (key, message, PENDING, created_at, created_at),
+                    )
+                else:
+                    _, key, status, attempts, updated_at, error = op
+                    connection.execute(
+                        "UPDATE alert_outbox SET status = ?, attempts = ?, updated_at = ?,"
+                        " last_error = ? WHERE key = ?",
+                        (status, attempts, updated_at, error, key),
+                    )
+            if time.time() - self._purged_at >= PURGE_INTERVAL:
+                self._purged_at = time.time()
+                connection.execute(
+                    "DELETE FROM alert_outbox WHERE status != ? AND updated_at < ?",
+                    (PENDING, self._purged_at - RETENTION),
+                )
+            connection.commit()
+        except (sqlite3.Error, OSError) as e:
+            self._rollback()
+            with self._cond:
+                # Keep the batch ahead of newer writes so inserts precede their updates
+                self._ops[:0] = ops
+                self._writing = False
+                delay = self.retry_policy.delay(self._commit_failures)
+                self._commit_failures += 1
+                self._commit_error = str(e)
+                self._commit_retry_at = time.time() + delay
+            logging.error(
+                f"Failed to write {len(ops)} alert outbox changes, retrying in {delay:.1f}s: {e}"
+            )
+            return
+
+        elapsed = time.monotonic() - started
+        with self._cond:
+            if self._commit_failures:
+                logging.info("Alert outbox writes recovered")
+            self._commit_failures = 0
+            self._commit_error = None
+            self._commit_retry_at = 0.0
+            self._writing = False
+            self._commits += 1
+            self._committed_ops += len(ops)
+            self._commit_total += elapsed
+
+    def _rollback(self):
+        """Discard the partial transaction of a failed commit (writer thread)."""
+        if self._connection is None:
+            return
+        try:
+            self._connection.rollback()
+        except sqlite3.Error as e:
+            logging.error(f"Failed to roll back alert outbox changes: {e}")
+
+    def commit_error(self):
+        """
+        Report whether recorded alerts are failing to reach the disk.
+
+        Returns:
+            str: Error of the last commit while commits keep failing, otherwise None
+        """
+        with self._cond:
+            return self._commit_error
+
+    def flush(self, timeout=5):
+        """
+        Wait until every recorded change has been committed.
+
+        Args:
+            timeout (float): Maximum seconds to wait
+
+        Returns:
+            bool: True if nothing was left uncommitted
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                if not self._ops and not self._writing:
+                    return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+
+    def metrics(self):
+        """
+        Snapshot of outbox metrics.
+
+        Returns:
+            dict: Alert counters, scheduled retries and commit statistics
+        """
+        with self._cond:
+            return {
+                "enabled": self.enabled,
+                "queued": self.queued,
+                "duplicates": self.duplicates,
+                "delivered": self.delivered,
+                "retried": self.retried,
+                "dead": self.dead,
+                "replayed": self.replayed,
+                "scheduled_retries": len(self._retries),
+                "uncommitted": len(self._ops),
+                "commit_failures": self._commit_failures,
+                "commit_error": self._commit_error,
+                "commits": self._commits,
+                "avg_batch_size": round(self._committed_ops / self._commits, 2)
+                if self._commits
+                else 0.0,
+                "avg_commit_ms": round(self._commit_total / self._commits * 1000, 3)
+                if self._commits
+                else 0.0,
+            }
+
+
+# Global singleton instance for application-wide use
+alert_outbox = AlertOutbox.from_config()
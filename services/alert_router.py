@@ -0,0 +1,239 @@
+"""
+Alert Router - Per-device and Per-severity Alert Recipients
+
+This module decides who receives an alert and paces delivery to each of
+them. A routing table maps devices and severities to WhatsApp recipients
+(groups or numbers); an alert goes to its device's recipients, or the
+default group, plus any escalation recipients of its severity. Every
+recipient gets its own copy, delivered by the dispatcher's worker pool in
+parallel with the others.
+
+Each recipient has its own token bucket and backoff state. A copy takes
+its recipient's token without waiting; if the recipient is throttled, or
+backing off after a failure, the copy is handed back as Deferred and queued
+again once the next token is due, so pacing delays alerts but never drops
+them and a throttled recipient never holds a worker another recipient's
+copy needs.
+"""
+
+import logging
+import threading
+import time
+from config.Config import WhatsAppConfig
+from services.alert_dispatcher import Deferred
+from services.circuit_breaker import RetryPolicy
+from services.rate_limiter import TokenBucket, PRIORITY_ALERT
+
+# Alert severities used as routing selectors ("severity:<name>")
+SEVERITY_INFO = "info"  # Door closed, monitoring started
+SEVERITY_ALERT = "alert"  # Door opened, door flapping
+
+# Selector of the recipients used when a device has no route of its own
+DEFAULT_ROUTE = "*"
+
+# Separates an alert's idempotency key from the recipient in a copy's key
+RECIPIENT_SEPARATOR = ">"
+
+
+def parse_routes(spec):
+    """
+    Parse the WA_ROUTES specification.
+
+    Args:
+        spec (str): Comma-separated "selector=recipient[|recipient...]" entries.
+            A selector is a device ID, "severity:<name>" or "*" for the default.
+
+    Returns:
+        dict: Selector to list of recipients
+    """
+    routes = {}
+    for entry in (spec or "").split(","):
+        selector, _, targets = entry.partition("=")
+        recipients = [target.strip() for target in targets.split("|") if target.strip()]
+        if selector.strip() and recipients:
+            routes.setdefault(selector.strip(), []).extend(recipients)
+    return routes
+
+
+def copy_key(key, recipient):
+    """
+    Build the idempotency key of one recipient's copy of an alert.
+
+    Args:
+        key (str): Alert idempotency key
+        recipient (str): Recipient of the copy
+
+    Returns:
+        str: Key unique to this alert and recipient
+    """
+    return f"{key}{RECIPIENT_SEPARATOR}{recipient}"
+
+
+def split_copy_key(key):
+    """
+    Split a copy key into the alert key and the recipient.
+
+    Args:
+        key (str): Key from copy_key(), or a plain alert key
+
+    Returns:
+        tuple: (alert key, recipient or None)
+    """
+    alert, separator, recipient = key.rpartition(RECIPIENT_SEPARATOR)
+    if not separator:
+        return key, None
+    return alert, recipient
+
+
+class AlertRouter:
+    """
+    Routing table plus thread-safe per-recipient delivery state.
+
+    State for a recipient is created on first use, so recipients only
+    reached through a route still get their own bucket and backoff.
+    """
+
+    def __init__(
+        self, routes=None, default=None, rate=20, burst=5, retry_policy=None
+    ):
+        """
+        Initialize the router.
+
+        Args:
+            routes (dict, optional): Selector to recipients, see parse_routes()
+            default (list, optional): Recipients of devices without a route of
+                their own when the routes have no "*" entry
+            rate (float): Messages per minute allowed per recipient, 0 for unlimited
+            burst (float): Messages a recipient may receive back to back
+            retry_policy (RetryPolicy, optional): Backoff after a failed delivery
+        """
+        self.routes = dict(routes or {})
+        self.default = [recipient for recipient in (default or []) if recipient]
+        self.rate = rate
+        self.burst = burst
+        self.retry_policy = retry_policy or RetryPolicy()
+        self._recipients = {}  # recipient -> delivery state
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls):
+        """
+        Build a router from the WA_ROUTES, WA_GROUP_ID and WA_RECIPIENT_* configuration values.
+
+        Returns:
+            AlertRouter: Router configured from environment settings
+        """
+        return cls(
+            parse_routes(WhatsAppConfig.ROUTES),
+            default=[WhatsAppConfig.GROUP_ID],
+            rate=WhatsAppConfig.RECIPIENT_RATE,
+            burst=WhatsAppConfig.RECIPIENT_BURST,
+            retry_policy=RetryPolicy(
+                base_delay=WhatsAppConfig.ALERT_RETRY_BASE_DELAY,
+                max_delay=WhatsAppConfig.ALERT_RETRY_MAX_DELAY,
+            ),
+        )
+
+    def recipients(self, device_id=None, severity=SEVERITY_INFO):
+        """
+        Resolve the recipients of an alert.
+
+        Args:
+            device_id (str, optional): Device that triggered the alert
+            severity (str): Alert severity
+
+        Returns:
+            list: Recipients in routing order, without duplicates
+        """
+        targets = self.routes.get(device_id) if device_id else None
+        if not targets:
+            targets = self.routes.get(DEFAULT_ROUTE) or self.default
+        escalation = self.routes.get(f"severity:{severity}") or []
+        return list(dict.fromkeys(targets + escalation))
+
+    def _state(self, recipient):
+        """Get a recipient's delivery state, creating it on first use."""
+        with self._lock:
+            state = self._recipients.get(recipient)
+            if state is None:
+                state = self._recipients[recipient] = {
+                    "bucket": TokenBucket(recipient, self.rate / 60.0, self.burst),
+                    "failures": 0,
+                    "blocked_until": 0.0,
+                    "sent": 0,
+                    "failed": 0,
+                    "throttled": 0,
+                }
+            return state
+
+    def send(self, recipient, message, key, sender):
+        """
+        Deliver one copy of an alert, paced to its recipient.
+
+        Args:
+            recipient (str): Target group or number
+            message (str): Message text
+            key (str): Idempotency key of the copy
+            sender (callable): Called as sender(message, key, recipient); returns False on failure
+
+        Returns:
+            bool or Deferred: True if delivered, False if the send failed, or
+                Deferred if the recipient is throttled or backing off; a deferred
+                copy was not attempted and should be queued again after its delay
+        """
+        state = self._state(recipient)
+        backoff = state["blocked_until"] - time.monotonic()
+        if backoff > 0:
+            return self._defer(state, recipient, backoff)
+        wait = state["bucket"].try_acquire(PRIORITY_ALERT)
+        if wait > 0:
+            return self._defer(state, recipient, wait)
+
+        try:
+            ok = sender(message, key, recipient) is not False
+        except Exception as e:
+            logging.error(f"Alert delivery to {recipient} raised: {e}")
+            ok = False
+
+        with self._lock:
+            if ok:
+                state["sent"] += 1
+                state["failures"] = 0
+                state["blocked_until"] = 0.0
+            else:
+                state["failed"] += 1
+                state["blocked_until"] = time.monotonic() + self.retry_policy.delay(
+                    state["failures"]
+                )
+                state["failures"] += 1
+        return ok
+
+    def _defer(self, state, recipient, delay):
+        """Count a copy handed back for later delivery and return its Deferred."""
+        with self._lock:
+            state["throttled"] += 1
+        logging.warning(f"Alert to {recipient} throttled, retrying in {delay:.1f}s")
+        return Deferred(delay)
+
+    def metrics(self):
+        """
+        Snapshot of per-recipient delivery state.
+
+        Returns:
+            dict: Recipient to sent, failed and throttled counters and remaining backoff
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                recipient: {
+                    "sent": state["sent"],
+                    "failed": state["failed"],
+                    "throttled": state["throttled"],
+                    "backoff_seconds": round(max(0.0, state["blocked_until"] - now), 1),
+                }
+                for recipient, state in self._recipients.items()
+            }
+
+
+# Global singleton instance for application-wide use
+alert_router = AlertRouter.from_config()
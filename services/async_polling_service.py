@@ -0,0 +1,349 @@
+"""
+Async Polling Service - Event-loop Door Sensor Monitoring
+
+This module implements an asyncio-based alternative to the threaded
+polling engine. Every monitored device gets its own lightweight polling
+coroutine on a single event loop, so one process can watch thousands of
+sensors without dedicating a thread to each of them.
+
+Upstream calls go through a small bounded thread pool (the Tuya client is
+blocking), or through the native AsyncTuyaService when one is given, are
+capped by a semaphore, and are micro-batched so concurrent device schedules
+share the Tuya multi-device status endpoint.
+"""
+
+import asyncio
+import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from services.polling_service import DoorSensorPoller
+from services.tuya_service import STATUS_BATCH_LIMIT
+from services.poll_scheduler import phase_offsets
+from services.quota_service import is_quota_error
+from config.Config import Config, WhatsAppConfig
+
+
+class _StatusBatcher:
+    """
+    Coalesces per-device status requests into batched upstream calls.
+
+    Device coroutines ask for their own status; requests arriving within a
+    short linger window (or filling a whole batch) are sent as one call.
+    """
+
+    def __init__(self, fetch_batch, linger=0.05):
+        """
+        Initialize the batcher.
+
+        Args:
+            fetch_batch (callable): Coroutine function taking a list of device
+                IDs and returning (response, statuses) like
+                DoorSensorPoller._fetch_batch
+            linger (float): Seconds to wait for more requests before flushing
+        """
+        self.fetch_batch = fetch_batch
+        self.linger = linger
+        self._pending = {}  # device_id -> future awaiting (response, status)
+        self._flush_handle = None
+        # The loop only keeps weak references to tasks; hold in-flight batches here
+        self._resolving = set()
+
+    async def status(self, device_id):
+        """
+        Request the status of one device.
+
+        Args:
+            device_id (str): Device to query
+
+        Returns:
+            tuple: (API response, status list or None if not returned)
+        """
+        loop = asyncio.get_running_loop()
+        future = self._pending.get(device_id)
+        if future is None:
+            future = loop.create_future()
+            self._pending[device_id] = future
+
+        if len(self._pending) >= STATUS_BATCH_LIMIT:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.linger, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Send all pending requests as one batch."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.ensure_future(self._resolve(batch))
+            self._resolving.add(task)
+            task.add_done_callback(self._resolving.discard)
+
+    async def close(self):
+        """Cancel the pending flush and every batch in flight, and wait for them."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for future in self._pending.values():
+            future.cancel()
+        self._pending = {}
+
+        tasks = list(self._resolving)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _resolve(self, batch):
+        """
+        Fetch one batch and hand each device its own result.
+
+        Args:
+            batch (dict): Mapping of device ID to waiting future
+        """
+        try:
+            response, statuses = await self.fetch_batch(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for device_id, future in batch.items():
+            if not future.done():
+                future.set_result((response, statuses.get(device_id)))
+
+
+class AsyncDoorSensorPoller(DoorSensorPoller):
+    """
+    Asyncio-based polling engine for large sensor fleets.
+
+    Runs one event loop in a background thread. Each device is polled by
+    its own coroutine on its own schedule, so a slow response or alert for
+    one device never delays the others. State tracking and alert handling
+    are shared with the threaded DoorSensorPoller.
+    """
+
+    def __init__(
+        self,
+        poll_interval=None,
+        device_ids=None,
+        adaptive=None,
+        max_in_flight=None,
+        alert_workers=None,
+        client=None,
+    ):
+        """
+        Initialize the async door sensor poller.
+
+        Args:
+            poll_interval (int, optional): Seconds between status checks per device.
+                Defaults to Config.POLL_INTERVAL if not specified.
+            device_ids (list, optional): Devices to monitor. Defaults to the
+                configured DEVICE_ID and DEVICE_IDS.
+            adaptive (bool, optional): Use activity-driven per-device intervals.
+                Defaults to Config.POLL_ADAPTIVE.
+            max_in_flight (int, optional): Maximum concurrent upstream requests.
+                Defaults to Config.POLL_MAX_IN_FLIGHT.
+            alert_workers (int, optional): Threads used to deliver alerts off the event
+                loop. Defaults to WhatsAppConfig.ALERT_WORKERS (at least one).
+            client (AsyncTuyaService, optional): Native async Tuya client. Without
+                one, the blocking TuyaService runs on a thread pool.
+        """
+        super().__init__(poll_interval=poll_interval, device_ids=device_ids, adaptive=adaptive)
+        self.max_in_flight = max_in_flight or Config.POLL_MAX_IN_FLIGHT
+        self.alert_workers = alert_workers or max(1, WhatsAppConfig.ALERT_WORKERS)
+        self.client = client
+        self.loop = None
+        self._stopped = None
+        self._semaphore = None
+        self._upstream_pool = None
+        self._alert_pool = None
+        self._batcher = None
+        self._tasks = {}  # device_id -> polling task
+        self._tasks_lock = None  # Serializes task restarts on the event loop
+
+    async def _fetch_batch_async(self, batch):
+        """
+        Fetch one batch of device status without blocking the event loop.
+
+        Args:
+            batch (list): Device IDs to query
+
+        Returns:
+            tuple: (API response, dict mapping device ID to its status list)
+        """
+        async with self._semaphore:
+            if self.client is None:
+                return await self.loop.run_in_executor(
+                    self._upstream_pool, self._fetch_batch, batch
+                )
+
+            if len(batch) == 1:
+                response = await self.client.get_device_status(batch[0])
+            else:
+                response = await self.client.get_devices_status(batch)
+            return response, self._split_statuses(batch, response)
+
+    async def _device_loop(self, device_id, batcher, phase=0.0):
+        """
+        Poll a single device forever on its own schedule.
+
+        Args:
+            device_id (str): Device to poll
+            batcher (_StatusBatcher): Shared request batcher
+            phase (float): Seconds to wait before the first poll
+        """
+        if phase > 0:
+            await asyncio.sleep(phase)
+
+        while self.running:
+            started = self.loop.time()
+            changed = False
+
+            try:
+                response, status = await batcher.status(device_id)
+
+                if response.get("success"):
+                    if status is not None:
+                        # Detection writes the state snapshot; keep it off the loop
+                        changed = await self.loop.run_in_executor(
+                            self._alert_pool, self._process_status, device_id, status
+                        )
+                elif is_quota_error(response):
+                    # The quota accountant stretches the next delay; no hard pause
+                    logging.error(f"⚠️  QUOTA EXHAUSTED for {device_id}: {response.get('msg')}")
+                else:
+                    logging.warning(
+                        f"Failed to get status for {device_id}: {response.get('msg', 'Unknown error')}"
+                    )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Error polling {device_id}: {e}")
+
+            delay = self._next_delay(device_id, changed)
+
+            # Subtract time already spent so the schedule does not drift
+            await asyncio.sleep(max(0.0, delay - (self.loop.time() - started)))
+
+    async def _run(self):
+        """Start one coroutine per device and wait until stop() is called."""
+        self.loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._batcher = _StatusBatcher(self._fetch_batch_async)
+        self._tasks_lock = asyncio.Lock()
+
+        self._apply_device_changes()
+        async with self._tasks_lock:
+            await self._start_tasks()
+
+        await self._stopped.wait()
+
+        async with self._tasks_lock:
+            await self._cancel_tasks()
+        await self._batcher.close()
+
+        if self.client is not None:
+            await self.client.close()
+
+    async def _cancel_tasks(self):
+        """Cancel every device coroutine and wait until they have all finished."""
+        tasks = list(self._tasks.values())
+        self._tasks = {}
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _start_tasks(self):
+        """
+        (Re)start one coroutine per device in staggered, jittered phases.
+
+        The previous coroutines are awaited first, so a device is never polled
+        by an old and a new coroutine at the same time (call with _tasks_lock held).
+        """
+        await self._cancel_tasks()
+
+        offsets = phase_offsets(
+            self.device_ids, self._phase_interval(), STATUS_BATCH_LIMIT, self.phase_jitter
+        )
+        self._tasks = {
+            device_id: asyncio.create_task(self._device_loop(device_id, self._batcher, offset))
+            for device_id, offset in offsets.items()
+        }
+
+    async def _rebalance(self):
+        """Apply a pending fleet change on the event loop and re-phase every device."""
+        async with self._tasks_lock:
+            if self._apply_device_changes() is not None and self.running:
+                await self._start_tasks()
+
+    def set_devices(self, device_ids):
+        """
+        Replace the monitored fleet.
+
+        While the engine runs, the change is applied on the event loop and
+        every device coroutine is restarted in its new phase.
+
+        Args:
+            device_ids (list): Devices to monitor from now on
+        """
+        if not (self.running and self.loop is not None):
+            super().set_devices(device_ids)
+            return
+
+        with self._devices_lock:
+            self._pending_devices = self._clean_device_ids(device_ids)
+        try:
+            asyncio.run_coroutine_threadsafe(self._rebalance(), self.loop)
+        except RuntimeError:
+            pass  # Loop already closed
+
+    def _poll_loop(self):
+        """
+        Thread target that runs the event loop until the poller stops.
+        """
+        print(
+            f"\nAsync polling started - {len(self.device_ids)} device(s), "
+            f"every {self.poll_interval} seconds, max {self.max_in_flight} in flight"
+            + (" (native async client)" if self.client is not None else "")
+        )
+        print("=" * 60)
+        sys.stdout.flush()
+
+        self._upstream_pool = ThreadPoolExecutor(
+            max_workers=self.max_in_flight, thread_name_prefix="tuya-poll"
+        )
+        self._alert_pool = ThreadPoolExecutor(
+            max_workers=self.alert_workers, thread_name_prefix="door-alert"
+        )
+        try:
+            asyncio.run(self._run())
+        except Exception as e:
+            logging.error(f"Async polling engine stopped with error: {e}")
+        finally:
+            self._upstream_pool.shutdown(wait=False)
+            self._alert_pool.shutdown(wait=False)
+
+    def stop(self):
+        """
+        Stop the async polling service.
+
+        Wakes the event loop so every device coroutine is cancelled right
+        away, then waits for the background thread to exit.
+        """
+        self.running = False
+        if self.loop is not None and self._stopped is not None:
+            try:
+                self.loop.call_soon_threadsafe(self._stopped.set)
+            except RuntimeError:
+                pass  # Loop already closed
+        super().stop()
+
+
+# Global singleton instance for application-wide use
+async_door_poller = AsyncDoorSensorPoller()
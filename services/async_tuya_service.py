@@ -0,0 +1,555 @@
+"""
+Async Tuya Service - Native asyncio Tuya Cloud API Client
+
+This module provides an asyncio counterpart of TuyaService. Requests are
+signed locally with HMAC-SHA256 (the same scheme tuya-connector uses) and
+sent over a pooled aiohttp session, so one event loop can keep hundreds of
+requests in flight without a thread per request.
+
+The client manages its own access token: it is granted once, reused from
+the optional token store, and refreshed by a background task before it
+expires, so requests only compare a timestamp. Concurrent identical reads
+share one upstream request, and a semaphore caps requests in flight.
+
+Built from the configuration, the client shares the blocking TuyaService's
+rate limiter, circuit breakers, retry policy and command validation, so
+both clients together stay within the same QPS limits and quota. It only
+serves the configured project; TUYA_ACCOUNTS is rejected in combination
+with it at startup.
+
+aiohttp is optional and only needed when this client is used
+(TUYA_ASYNC_CLIENT=true with POLL_ENGINE=asyncio).
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import time
+from tuya_connector.openapi import TuyaTokenInfo, TO_B_TOKEN_API, TO_B_REFRESH_TOKEN_API
+from config.Config import TuyaConfig
+from services.quota_service import quota_accountant, is_not_owned_error
+from services.rate_limiter import PRIORITY_API, PRIORITY_ALERT
+from services.token_manager import INLINE_REFRESH_WINDOW, REFRESH_RETRY_INTERVAL
+from services.token_manager import TOKEN_INVALID_CODE
+from services.token_store import token_store
+from services.tuya_service import (
+    tuya_service,
+    CIRCUIT_OPEN_CODE,
+    RATE_LIMITED_CODE,
+    INVALID_COMMAND_CODE,
+)
+
+try:
+    import aiohttp
+except ImportError:  # Optional dependency, only needed for the native async client
+    aiohttp = None
+
+
+def sign_request(access_id, access_secret, access_token, t, method, path, params=None, body=""):
+    """
+    Calculate the Tuya OpenAPI request signature.
+
+    The string to sign is the HTTP method, the SHA-256 of the body, an empty
+    header block and the path with its sorted query string, prefixed with
+    the client ID, access token and timestamp.
+
+    Args:
+        access_id (str): Tuya access ID (client_id)
+        access_secret (str): Tuya access secret
+        access_token (str): Current access token, empty for token requests
+        t (int): Request timestamp in milliseconds
+        method (str): HTTP method
+        path (str): API path
+        params (dict, optional): Query parameters
+        body (str): Serialized JSON body, empty for none
+
+    Returns:
+        str: Uppercase hex HMAC-SHA256 signature
+    """
+    url = path
+    if params:
+        url += "?" + "&".join(f"{key}={params[key]}" for key in sorted(params))
+
+    content_hash = hashlib.sha256(body.encode("utf-8")).hexdigest()
+    string_to_sign = f"{method}\n{content_hash}\n\n{url}"
+    message = f"{access_id}{access_token}{t}{string_to_sign}"
+    return (
+        hmac.new(access_secret.encode("utf-8"), message.encode("utf-8"), hashlib.sha256)
+        .hexdigest()
+        .upper()
+    )
+
+
+class AsyncTuyaService:
+    """
+    Asyncio client for Tuya Cloud API operations.
+
+    Offers the TuyaService device methods as coroutines. The HTTP session,
+    locks and semaphore belong to the event loop that first uses them; the
+    client must be closed on that loop.
+    """
+
+    def __init__(
+        self,
+        endpoint,
+        access_id,
+        access_secret,
+        max_in_flight=100,
+        timeout=10,
+        refresh_margin=300,
+        store=None,
+        session=None,
+        lang="en",
+        service=None,
+    ):
+        """
+        Initialize the async Tuya client.
+
+        Args:
+            endpoint (str): Tuya API endpoint URL
+            access_id (str): Tuya access ID
+            access_secret (str): Tuya access secret
+            max_in_flight (int): Maximum concurrent requests, also the connection pool size
+            timeout (float): Total seconds allowed per request
+            refresh_margin (int): Seconds before expiry to refresh the token in the background
+            store (TokenStore, optional): Persists tokens across restarts
+            session (aiohttp.ClientSession, optional): Session to use instead of
+                creating one; it is not closed by close()
+            lang (str): Language of API messages
+            service (TuyaService, optional): Blocking client whose rate limiter,
+                circuit breakers, retry policy and command validation are shared.
+                Without one, requests are only capped by max_in_flight.
+        """
+        self.endpoint = endpoint
+        self.access_id = access_id
+        self.access_secret = access_secret
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.refresh_margin = refresh_margin
+        self.store = store
+        self.lang = lang
+        self.service = service
+        self.token_info = None
+        self.grants = 0
+        self.refreshes = 0
+        self._valid_until = 0.0  # Unix time until which requests skip all token checks
+        self._refresh_at = 0.0  # Unix time at which the background refresh starts
+        self._session = session
+        self._owns_session = session is None
+        self._loop = None
+        self._token_lock = None
+        self._semaphore = None
+        self._refresh_task = None
+        self._reads = {}  # Request key -> task shared by concurrent identical reads
+
+    @classmethod
+    def from_config(cls):
+        """
+        Build a client from the Tuya configuration values.
+
+        Returns:
+            AsyncTuyaService: Client using the configured credentials
+        """
+        return cls(
+            TuyaConfig.API_ENDPOINT,
+            TuyaConfig.ACCESS_ID,
+            TuyaConfig.ACCESS_SECRET,
+            max_in_flight=TuyaConfig.ASYNC_MAX_IN_FLIGHT,
+            timeout=TuyaConfig.ASYNC_TIMEOUT,
+            refresh_margin=TuyaConfig.TOKEN_REFRESH_MARGIN,
+            store=token_store if token_store.enabled else None,
+            service=tuya_service,
+        )
+
+    def _bind(self):
+        """
+        Create the loop-bound session, lock and semaphore on first use.
+
+        Raises:
+            RuntimeError: If no session was given and aiohttp is not installed
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+
+        if self._owns_session:
+            if aiohttp is None:
+                raise RuntimeError(
+                    "aiohttp is required for the native async Tuya client (pip install aiohttp)"
+                )
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_in_flight, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        self._loop = loop
+        self._token_lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._refresh_task = None
+        self._reads = {}
+
+    async def close(self):
+        """Cancel the background refresh and close the HTTP session if this client owns it."""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+        self._loop = None
+
+    async def _send(self, method, path, params=None, body=None, access_token=""):
+        """
+        Sign and send one request.
+
+        Args:
+            method (str): HTTP method
+            path (str): API path
+            params (dict, optional): Query parameters
+            body (dict, optional): JSON body
+            access_token (str): Token to sign with, empty for token requests
+
+        Returns:
+            dict: API response; HTTP errors are returned as unsuccessful responses
+        """
+        content = json.dumps(body) if body else ""
+        t = int(time.time() * 1000)
+        headers = {
+            "client_id": self.access_id,
+            "sign": sign_request(
+                self.access_id, self.access_secret, access_token, t, method, path, params, content
+            ),
+            "sign_method": "HMAC-SHA256",
+            "access_token": access_token,
+            "t": str(t),
+            "lang": self.lang,
+        }
+        if content:
+            headers["Content-Type"] = "application/json"
+
+        async with self._semaphore:
+            async with self._session.request(
+                method,
+                self.endpoint + path,
+                params=params or None,
+                data=content or None,
+                headers=headers,
+            ) as response:
+                if response.status >= 400:
+                    logging.error(f"Tuya API HTTP error {response.status} for {method} {path}")
+                    return {
+                        "success": False,
+                        "code": response.status,
+                        "msg": f"HTTP {response.status}",
+                    }
+                return await response.json(content_type=None)
+
+    async def ensure_token(self):
+        """
+        Make sure a usable token is cached, obtaining one only if there is none.
+
+        The common case is a timestamp comparison; a token close to expiry is
+        refreshed by a background task while requests keep using it.
+
+        Returns:
+            bool: True if this call performed a token grant
+        """
+        self._bind()
+        now = time.time()
+        if now < self._valid_until:
+            if now >= self._refresh_at and self._refresh_task is None:
+                self._refresh_task = asyncio.ensure_future(self._background_refresh())
+            return False
+
+        async with self._token_lock:
+            # Another request may have obtained the token while we waited
+            if time.time() < self._valid_until:
+                return False
+
+            if self.store is not None:
+                token_info = self.store.load()
+                if token_info is not None:
+                    self._adopt(token_info, persist=False)
+                    logging.info("Reusing stored Tuya access token")
+                    return False
+
+            response = await self._send("GET", TO_B_TOKEN_API, {"grant_type": 1})
+            if not response.get("success"):
+                logging.error(f"Tuya token grant failed: {response.get('msg', 'Unknown error')}")
+                return False
+
+            self.grants += 1
+            self._adopt(TuyaTokenInfo(response))
+            return True
+
+    def _adopt(self, token_info, persist=True):
+        """
+        Start using a token and schedule its refresh.
+
+        Args:
+            token_info (TuyaTokenInfo): New token
+            persist (bool): Write the token to the store
+        """
+        self.token_info = token_info
+        expires_at = token_info.expire_time / 1000
+        self._valid_until = expires_at - INLINE_REFRESH_WINDOW
+        self._refresh_at = expires_at - self.refresh_margin
+        if persist and self.store is not None:
+            self.store.save(token_info)
+
+    def invalidate(self):
+        """Forget the current token so the next request obtains a new one."""
+        self._valid_until = 0.0
+        if self.store is not None:
+            self.store.clear()
+
+    async def _background_refresh(self):
+        """Renew the token with its refresh token, falling back to a new grant."""
+        try:
+            response = None
+            if self.token_info is not None and self.token_info.refresh_token:
+                response = await self._send(
+                    "GET", TO_B_REFRESH_TOKEN_API.format(self.token_info.refresh_token)
+                )
+            if response and response.get("success"):
+                self.refreshes += 1
+            else:
+                # Refresh token rejected or missing: request a new grant instead
+                response = await self._send("GET", TO_B_TOKEN_API, {"grant_type": 1})
+                if response.get("success"):
+                    self.grants += 1
+
+            if response.get("success"):
+                self._adopt(TuyaTokenInfo(response))
+                logging.info("Tuya access token refreshed in the background")
+                return
+
+            logging.warning(f"Tuya token refresh failed: {response.get('msg', 'no response')}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Tuya token refresh raised: {e}")
+        finally:
+            self._refresh_task = None
+
+        # Keep using the current token while it lasts and try again shortly
+        self._refresh_at = time.time() + REFRESH_RETRY_INTERVAL
+
+    async def connect(self):
+        """
+        Establish or verify connection to Tuya Cloud.
+
+        Logs connection status and any errors encountered.
+        """
+        try:
+            if await self.ensure_token():
+                logging.info("Connected to Tuya Cloud (async client)")
+        except Exception as e:
+            logging.error(f"Failed to connect to Tuya Cloud: {e}")
+
+    def is_authenticated(self):
+        """
+        Verify if a valid token is cached.
+
+        Returns:
+            bool: True if credentials are configured and the token is valid
+        """
+        if not self.access_id or self.access_id == "your_access_id":
+            return False
+        return time.time() < self._valid_until
+
+    async def _request(self, method, path, params=None, body=None):
+        """
+        Perform one authenticated request and account for it.
+
+        A request rejected for an invalid token is retried once with a new token.
+
+        Args:
+            method (str): HTTP method
+            path (str): API path
+            params (dict, optional): Query parameters
+            body (dict, optional): JSON body
+
+        Returns:
+            dict: API response
+        """
+        for attempt in range(2):
+            await self.ensure_token()
+            access_token = self.token_info.access_token if self.token_info else ""
+            response = await self._send(method, path, params, body, access_token)
+            # A 1106 for a device of another project says nothing about the quota
+            quota_accountant.observe(response, learn=not is_not_owned_error(response))
+            if response.get("code") != TOKEN_INVALID_CODE or attempt:
+                return response
+            self.invalidate()
+        return response
+
+    async def _call(
+        self, endpoint, method, path, params=None, body=None, retry=False, priority=PRIORITY_API
+    ):
+        """
+        Run a request through the shared rate limiter and the endpoint's circuit breaker.
+
+        Mirrors TuyaService._call: requests that raise or get an HTTP 5xx are
+        failures, retried with jittered backoff when retry is set.
+
+        Args:
+            endpoint (str): Endpoint name the limits and breaker are kept for
+            method (str): HTTP method
+            path (str): API path
+            params (dict, optional): Query parameters
+            body (dict, optional): JSON body
+            retry (bool): Retry failed requests (idempotent requests only)
+            priority (int): Rate limiter priority class of the caller
+
+        Returns:
+            dict: API response, or a CIRCUIT_OPEN_CODE or RATE_LIMITED_CODE
+                response if the request was not sent
+
+        Raises:
+            Exception: Whatever the last attempt raised
+        """
+        if self.service is None:
+            return await self._request(method, path, params, body)
+
+        breaker = self.service.breakers.get(endpoint)
+        attempts = self.service.retry_policy.attempts if retry else 1
+
+        for attempt in range(attempts):
+            # Sleeps on the loop while throttled; no executor thread is held
+            if not await self.service.rate_limiter.acquire_async(endpoint, priority):
+                return {
+                    "success": False,
+                    "code": RATE_LIMITED_CODE,
+                    "msg": f"Tuya API rate limit reached ({endpoint})",
+                }
+            if not breaker.allow():
+                return {
+                    "success": False,
+                    "code": CIRCUIT_OPEN_CODE,
+                    "msg": f"Tuya API unavailable ({endpoint} circuit open)",
+                }
+
+            started = time.monotonic()
+            try:
+                response = await self._request(method, path, params, body)
+            except asyncio.CancelledError:
+                # No outcome to record, but a half-open probe must not stay taken
+                breaker.release()
+                raise
+            except Exception:
+                breaker.record(False, time.monotonic() - started)
+                if attempt + 1 >= attempts:
+                    raise
+            else:
+                code = response.get("code")
+                failed = isinstance(code, int) and 500 <= code < 600
+                breaker.record(not failed, time.monotonic() - started)
+                if not failed or attempt + 1 >= attempts:
+                    return response
+
+            await asyncio.sleep(self.service.retry_policy.delay(attempt))
+
+    async def _read(self, endpoint, path, params=None, priority=PRIORITY_ALERT):
+        """
+        Perform a GET request, coalesced with identical requests in flight.
+
+        Args:
+            endpoint (str): Endpoint name for the rate limiter and circuit breaker
+            path (str): API path
+            params (dict, optional): Query parameters
+            priority (int): Rate limiter priority class of the caller
+
+        Returns:
+            dict: API response, shared by every concurrent caller
+        """
+        self._bind()
+        key = (path, tuple(sorted((params or {}).items())), priority)
+        task = self._reads.get(key)
+        if task is None:
+            task = asyncio.ensure_future(
+                self._call(endpoint, "GET", path, params, retry=True, priority=priority)
+            )
+            self._reads[key] = task
+            task.add_done_callback(lambda _: self._reads.pop(key, None))
+        # A cancelled caller must not cancel the request shared with the others
+        return await asyncio.shield(task)
+
+    async def get_device_status(self, device_id, priority=PRIORITY_ALERT):
+        """
+        Retrieve current status of a Tuya device.
+
+        Args:
+            device_id (str): The unique identifier of the device
+            priority (int): Rate limiter priority class. Defaults to PRIORITY_ALERT,
+                as the polling engine is this client's caller.
+
+        Returns:
+            dict: API response containing device status data
+        """
+        return await self._read(
+            "device_status", f"/v1.0/devices/{device_id}/status", priority=priority
+        )
+
+    async def get_devices_status(self, device_ids, priority=PRIORITY_ALERT):
+        """
+        Retrieve current status of several Tuya devices in one request.
+
+        Args:
+            device_ids (list): Device identifiers, at most STATUS_BATCH_LIMIT
+            priority (int): Rate limiter priority class. Defaults to PRIORITY_ALERT.
+
+        Returns:
+            dict: API response whose result is a list of
+                {"id": <device_id>, "status": [...]} entries
+        """
+        return await self._read(
+            "devices_status",
+            "/v1.0/iot-03/devices/status",
+            {"device_ids": ",".join(device_ids)},
+            priority=priority,
+        )
+
+    async def send_command(self, device_id, commands, priority=PRIORITY_API):
+        """
+        Send control commands to a Tuya device.
+
+        Commands are checked against the device's function specification
+        first, like TuyaService.send_command, and never retried.
+
+        Args:
+            device_id (str): The unique identifier of the device
+            commands (list): List of command dictionaries to execute
+            priority (int): Rate limiter priority class. Defaults to PRIORITY_API.
+
+        Returns:
+            dict: API response indicating command execution status
+        """
+        self._bind()
+        if self.service is not None:
+            # Spec lookups use the blocking client; keep them off the event loop
+            commands, errors = await asyncio.get_running_loop().run_in_executor(
+                None,
+                self.service.spec_index.validate,
+                device_id,
+                commands,
+                lambda spec_id: self.service.get_device_functions(spec_id, priority),
+            )
+            if errors:
+                return {
+                    "success": False,
+                    "code": INVALID_COMMAND_CODE,
+                    "msg": f"Invalid commands: {'; '.join(errors)}",
+                }
+        return await self._call(
+            "device_commands",
+            "POST",
+            f"/v1.0/devices/{device_id}/commands",
+            body={"commands": commands},
+            priority=priority,
+        )
+
+
+# Global singleton instance for application-wide use
+async_tuya_service = AsyncTuyaService.from_config()
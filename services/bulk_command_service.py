@@ -0,0 +1,138 @@
+"""
+Bulk Command Service - Concurrent Command Fan-out to Many Devices
+
+This module sends commands to many devices in one operation. Devices are
+handled concurrently on a bounded worker pool, so a building's worth of
+devices takes about as long as the slowest device rather than the sum of
+all of them. Command sets for the same device run one after another in
+request order, so a device never receives its commands out of sequence.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config.Config import Config
+from services.tuya_pool import tuya_pool
+from services.rate_limiter import PRIORITY_BULK
+
+
+class BulkCommandRunner:
+    """
+    Fans command sets out over a shared, bounded thread pool.
+
+    Bulk commands use the bulk rate limiter class, so they never delay
+    alert polls.
+    """
+
+    def __init__(self, workers=8, max_devices=500):
+        """
+        Initialize the runner.
+
+        Args:
+            workers (int): Devices handled concurrently
+            max_devices (int): Maximum command sets accepted per request
+        """
+        self.workers = workers
+        self.max_devices = max_devices
+        self._pool = None
+        self._lock = threading.Lock()  # Concurrent first requests create one pool
+
+    @classmethod
+    def from_config(cls):
+        """
+        Build a runner from the BULK_COMMAND_* configuration values.
+
+        Returns:
+            BulkCommandRunner: Runner configured from environment settings
+        """
+        return cls(workers=Config.BULK_COMMAND_WORKERS, max_devices=Config.BULK_COMMAND_MAX_DEVICES)
+
+    def _send_device(self, device_id, jobs):
+        """
+        Send every command set of one device in order.
+
+        Args:
+            device_id (str): Target device
+            jobs (list): (request index, commands) pairs in request order
+
+        Returns:
+            list: (request index, result) pairs
+        """
+        results = []
+        for index, commands in jobs:
+            try:
+                response = tuya_pool.send_command(device_id, commands, priority=PRIORITY_BULK)
+            except Exception as e:
+                logging.error(f"Error sending bulk command to {device_id}: {e}")
+                response = {"success": False, "msg": "Internal Server Error"}
+            results.append((index, self._result(device_id, response)))
+        return results
+
+    def _result(self, device_id, response):
+        """
+        Convert an API response into a per-device result.
+
+        Args:
+            device_id (str): Target device
+            response (dict): Tuya API response, or None
+
+        Returns:
+            dict: Result entry for the bulk response
+        """
+        response = response or {"success": False, "msg": "No response from Tuya Cloud"}
+        if response.get("success"):
+            return {"device_id": device_id, "success": True, "result": response.get("result")}
+        return {
+            "device_id": device_id,
+            "success": False,
+            "code": response.get("code"),
+            "message": response.get("msg", "Failed to send command"),
+        }
+
+    def iter_results(self, entries):
+        """
+        Send command sets concurrently and yield results as devices finish.
+
+        Args:
+            entries (list): (device_id, commands) pairs
+
+        Yields:
+            tuple: (index of the entry in the request, result dict)
+        """
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="bulk-command"
+                )
+
+        # Keep per-device order by giving each device a single job list
+        per_device = OrderedDict()
+        for index, (device_id, commands) in enumerate(entries):
+            per_device.setdefault(device_id, []).append((index, commands))
+
+        futures = [
+            self._pool.submit(self._send_device, device_id, jobs)
+            for device_id, jobs in per_device.items()
+        ]
+        for future in as_completed(futures):
+            yield from future.result()
+
+    def run(self, entries):
+        """
+        Send command sets concurrently and wait for all of them.
+
+        Args:
+            entries (list): (device_id, commands) pairs
+
+        Returns:
+            list: Result dicts in request order
+        """
+        results = [None] * len(entries)
+        for index, result in self.iter_results(entries):
+            results[index] = result
+        return results
+
+
+# Global singleton instance for application-wide use
+bulk_command_runner = BulkCommandRunner.from_config()
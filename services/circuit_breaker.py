@@ -0,0 +1,269 @@
+"""
+Circuit Breaker - Fail-fast Protection for Tuya API Calls
+
+This module keeps an upstream outage from stalling every caller. Each
+endpoint has a breaker that watches the failure rate and the share of
+slow calls over a sliding window. When either crosses its threshold the
+breaker opens and calls fail at once instead of waiting on the network.
+After a cool-down, a few half-open probe calls decide whether it closes
+again or stays open for another cool-down.
+
+RetryPolicy provides capped exponential backoff with full jitter for
+idempotent requests, so retries from many callers do not arrive in step.
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from config.Config import TuyaConfig
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker for one endpoint.
+
+    A call is a failure when it raises or gets no usable response; a call
+    slower than slow_call_duration counts towards the slow-call rate.
+    Business errors (device offline, quota) are successful calls.
+    """
+
+    def __init__(
+        self,
+        name,
+        failure_rate=0.5,
+        slow_call_rate=0.8,
+        slow_call_duration=5.0,
+        min_calls=5,
+        window=60,
+        open_duration=30,
+        half_open_probes=1,
+    ):
+        """
+        Initialize the breaker.
+
+        Args:
+            name (str): Endpoint name used in logs and metrics
+            failure_rate (float): Failure share (0-1) that opens the breaker
+            slow_call_rate (float): Slow-call share (0-1) that opens the breaker
+            slow_call_duration (float): Seconds after which a call is slow
+            min_calls (int): Calls needed in the window before rates are evaluated
+            window (float): Seconds of call history considered
+            open_duration (float): Seconds to fail fast before probing again
+            half_open_probes (int): Probe calls allowed while half-open
+        """
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_rate = slow_call_rate
+        self.slow_call_duration = slow_call_duration
+        self.min_calls = min_calls
+        self.window = window
+        self.open_duration = open_duration
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self.rejected = 0
+        self._calls = deque()  # (finished_at, failed, slow)
+        self._opened_at = 0.0
+        self._probes = 0  # Probe calls in flight while half-open
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Decide whether a call may go upstream.
+
+        Returns:
+            bool: False if the call should fail fast
+        """
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_duration:
+                    self.rejected += 1
+                    return False
+                self.state = HALF_OPEN
+                self._probes = 0
+                logging.info(f"Circuit {self.name} half-open, probing upstream")
+
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    self.rejected += 1
+                    return False
+                self._probes += 1
+            return True
+
+    def record(self, success, duration):
+        """
+        Record the outcome of an allowed call.
+
+        Args:
+            success (bool): Whether the call got a usable response
+            duration (float): Seconds the call took
+        """
+        slow = duration >= self.slow_call_duration
+        now = time.monotonic()
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+                if success and not slow:
+                    self.state = CLOSED
+                    self._calls.clear()
+                    logging.info(f"Circuit {self.name} closed, upstream recovered")
+                else:
+                    self._open(now)
+                return
+
+            self._calls.append((now, not success, slow))
+            while self._calls and self._calls[0][0] <= now - self.window:
+                self._calls.popleft()
+
+            if self.state == CLOSED and len(self._calls) >= self.min_calls:
+                total = len(self._calls)
+                failures = sum(1 for _, failed, _ in self._calls if failed)
+                slow_calls = sum(1 for _, _, was_slow in self._calls if was_slow)
+                if (
+                    failures / total >= self.failure_rate
+                    or slow_calls / total >= self.slow_call_rate
+                ):
+                    self._open(now)
+
+    def release(self):
+        """
+        Give back an allowed call that ended without an outcome (e.g. it was cancelled).
+
+        Nothing is recorded, but a half-open probe slot is freed so the next
+        call can probe instead of being rejected until the process restarts.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+
+    def _open(self, now):
+        """Start failing fast (lock held)."""
+        self.state = OPEN
+        self._opened_at = now
+        self._calls.clear()
+        logging.warning(
+            f"Circuit {self.name} opened, failing fast for {self.open_duration} seconds"
+        )
+
+    def metrics(self):
+        """
+        Snapshot of breaker state.
+
+        Returns:
+            dict: State, calls in the window and rejected call count
+        """
+        with self._lock:
+            return {
+                "state": self.state,
+                "window_calls": len(self._calls),
+                "rejected": self.rejected,
+            }
+
+
+class CircuitBreakerRegistry:
+    """Creates one breaker per endpoint with shared settings."""
+
+    def __init__(self, **settings):
+        """
+        Initialize the registry.
+
+        Args:
+            **settings: CircuitBreaker keyword arguments used for every endpoint
+        """
+        self.settings = settings
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls):
+        """
+        Build a registry from the TUYA_BREAKER_* configuration values.
+
+        Returns:
+            CircuitBreakerRegistry: Registry configured from environment settings
+        """
+        return cls(
+            failure_rate=TuyaConfig.BREAKER_FAILURE_RATE,
+            slow_call_rate=TuyaConfig.BREAKER_SLOW_CALL_RATE,
+            slow_call_duration=TuyaConfig.BREAKER_SLOW_CALL_DURATION,
+            min_calls=TuyaConfig.BREAKER_MIN_CALLS,
+            window=TuyaConfig.BREAKER_WINDOW,
+            open_duration=TuyaConfig.BREAKER_OPEN_DURATION,
+        )
+
+    def get(self, name):
+        """
+        Get the breaker of an endpoint, creating it on first use.
+
+        Args:
+            name (str): Endpoint name
+
+        Returns:
+            CircuitBreaker: Breaker for the endpoint
+        """
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = self._breakers[name] = CircuitBreaker(name, **self.settings)
+            return breaker
+
+    def metrics(self):
+        """
+        Snapshot of every breaker.
+
+        Returns:
+            dict: Endpoint name to breaker metrics
+        """
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {name: breaker.metrics() for name, breaker in breakers.items()}
+
+
+class RetryPolicy:
+    """Capped exponential backoff with full jitter."""
+
+    def __init__(self, attempts=3, base_delay=0.2, max_delay=2.0, rng=random):
+        """
+        Initialize the policy.
+
+        Args:
+            attempts (int): Total attempts including the first
+            base_delay (float): Backoff ceiling in seconds after the first failure
+            max_delay (float): Upper bound of any single delay in seconds
+            rng (random.Random): Source of jitter, injectable for tests
+        """
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rng = rng
+
+    @classmethod
+    def from_config(cls):
+        """
+        Build a policy from the TUYA_RETRY_* configuration values.
+
+        Returns:
+            RetryPolicy: Policy configured from environment settings
+        """
+        return cls(
+            attempts=TuyaConfig.RETRY_ATTEMPTS,
+            base_delay=TuyaConfig.RETRY_BASE_DELAY,
+            max_delay=TuyaConfig.RETRY_MAX_DELAY,
+        )
+
+    def delay(self, retry):
+        """
+        Compute the wait before a retry.
+
+        Args:
+            retry (int): Retry number, starting at 0
+
+        Returns:
+            float: Seconds to wait, uniform between 0 and the capped backoff
+        """
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * (2**retry)))
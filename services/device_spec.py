@@ -0,0 +1,335 @@
+"""
+Device Spec - Cached Device Function Index for Local Command Validation
+
+This module keeps the function specification of every device (DP code,
+type and allowed values) so commands can be validated and normalized
+locally before they are sent. A malformed command is then rejected in
+microseconds instead of after a round trip that costs quota.
+
+Specifications are fetched once per device, kept in an in-memory index and
+optionally written to a JSON file stamped with a format version and fetch
+time, so a restart does not fetch them again. Entries older than the TTL
+are fetched again on next use. Changes are written at most once per save
+delay, from a snapshot taken under the index lock, so a burst of fetches
+costs one file write and lookups never wait on disk I/O.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from config.Config import Config
+
+# Bump when the cached file format changes; older files are ignored
+SPEC_CACHE_VERSION = 1
+
+# Seconds before retrying a device whose specification could not be fetched
+UNAVAILABLE_RETRY = 300
+
+
+class FunctionSpec:
+    """Type and value constraints of one device function (DP)."""
+
+    __slots__ = ("code", "type", "values")
+
+    def __init__(self, code, dp_type, values=None):
+        """
+        Initialize the function spec.
+
+        Args:
+            code (str): DP code, e.g. "switch"
+            dp_type (str): Tuya DP type (Boolean, Integer, Enum, String, Json, ...)
+            values (dict, optional): Type constraints (min/max/step, range, maxlen)
+        """
+        self.code = code
+        self.type = dp_type
+        self.values = values or {}
+
+    @classmethod
+    def from_api(cls, function):
+        """
+        Build a spec from a Tuya function entry.
+
+        Args:
+            function (dict): Entry of the /functions result; "values" is a JSON string
+
+        Returns:
+            FunctionSpec: Parsed spec
+        """
+        values = function.get("values") or {}
+        if isinstance(values, str):
+            try:
+                values = json.loads(values)
+            except ValueError:
+                values = {}
+        return cls(function.get("code"), function.get("type", ""), values)
+
+    def normalize(self, value):
+        """
+        Validate a command value and convert it to the type Tuya expects.
+
+        Args:
+            value: Value from the command
+
+        Returns:
+            The normalized value
+
+        Raises:
+            ValueError: If the value does not fit the spec
+        """
+        dp_type = self.type.lower()
+        if dp_type in ("boolean", "bool"):
+            return self._boolean(value)
+        if dp_type in ("integer", "value"):
+            return self._integer(value)
+        if dp_type == "enum":
+            allowed = self.values.get("range") or []
+            if value not in allowed:
+                raise ValueError(f"{value!r} is not one of {', '.join(map(str, allowed))}")
+            return value
+        if dp_type == "string":
+            if not isinstance(value, str):
+                raise ValueError("expected a string")
+            maxlen = self.values.get("maxlen")
+            if maxlen is not None and len(value) > int(maxlen):
+                raise ValueError(f"longer than {maxlen} characters")
+            return value
+        # Json, Raw, Bitmap and unknown types are passed through unchecked
+        return value
+
+    def _boolean(self, value):
+        """Normalize a boolean value, accepting "true"/"false" strings."""
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.lower() in ("true", "false"):
+            return value.lower() == "true"
+        raise ValueError("expected a boolean")
+
+    def _integer(self, value):
+        """Normalize an integer value and check its range and step."""
+        if isinstance(value, bool):
+            raise ValueError("expected an integer")
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            raise ValueError("expected an integer") from None
+        if not number.is_integer():
+            raise ValueError("expected an integer")
+        number = int(number)
+
+        minimum, maximum = self.values.get("min"), self.values.get("max")
+        if minimum is not None and number < minimum:
+            raise ValueError(f"{number} is below the minimum {minimum}")
+        if maximum is not None and number > maximum:
+            raise ValueError(f"{number} is above the maximum {maximum}")
+        step = self.values.get("step") or 1
+        if (number - (minimum or 0)) % step:
+            raise ValueError(f"{number} is not a multiple of step {step}")
+        return number
+
+
+class DeviceSpecIndex:
+    """
+    Thread-safe per-device function index with an optional file cache.
+
+    The file holds the raw function lists, so the index can be rebuilt
+    without any API call after a restart.
+    """
+
+    def __init__(self, path=None, ttl=7 * 24 * 3600, save_delay=5):
+        """
+        Initialize the index.
+
+        Args:
+            path (str, optional): JSON cache file. None or empty keeps specs in memory only.
+            ttl (float): Seconds a fetched specification is trusted
+            save_delay (float): Seconds changes are collected before the file is
+                written; 0 writes after every change
+        """
+        self.path = path or None
+        self.ttl = ttl
+        self.save_delay = save_delay
+        self._index = {}  # device_id -> {code: FunctionSpec}
+        self._raw = {}  # device_id -> {"fetched_at": ..., "functions": [...]}
+        self._unavailable = {}  # device_id -> Unix time of the last failed fetch
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._dirty = False
+        self._save_timer = None
+        self._write_lock = threading.Lock()  # Keeps snapshots reaching the file in order
+
+    @classmethod
+    def from_config(cls):
+        """
+        Build an index from the DEVICE_SPEC_* configuration values.
+
+        Returns:
+            DeviceSpecIndex: Index configured from environment settings
+        """
+        return cls(
+            Config.DEVICE_SPEC_CACHE_PATH,
+            ttl=Config.DEVICE_SPEC_TTL,
+            save_delay=Config.DEVICE_SPEC_SAVE_DELAY,
+        )
+
+    def _load(self):
+        """Read the cache file on first use (lock held)."""
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as cache_file:
+                payload = json.load(cache_file)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable device spec cache: {e}")
+            return
+        if payload.get("version") != SPEC_CACHE_VERSION:
+            return
+        for device_id, entry in (payload.get("devices") or {}).items():
+            self._store(device_id, entry)
+
+    def _schedule_save(self):
+        """
+        Mark the cache file out of date (lock held).
+
+        Returns:
+            bool: True if the caller should flush() now, after releasing the lock
+        """
+        if not self.path:
+            return False
+        self._dirty = True
+        if self.save_delay <= 0:
+            return True
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+        return False
+
+    def flush(self):
+        """Write pending changes to the cache file atomically."""
+        with self._write_lock:
+            with self._lock:
+                self._save_timer = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+                # Entries are replaced, never mutated, so a shallow copy is a stable snapshot
+                snapshot = dict(self._raw)
+            self._write(snapshot)
+
+    def _write(self, devices):
+        """
+        Write a snapshot of the raw specs to the cache file atomically.
+
+        Args:
+            devices (dict): Device ID to raw spec entry
+        """
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as cache_file:
+                json.dump({"version": SPEC_CACHE_VERSION, "devices": devices}, cache_file)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logging.error(f"Failed to save device spec cache: {e}")
+
+    def _store(self, device_id, entry):
+        """Index a raw spec entry (lock held)."""
+        self._raw[device_id] = entry
+        specs = (FunctionSpec.from_api(function) for function in entry.get("functions") or [])
+        self._index[device_id] = {spec.code: spec for spec in specs if spec.code}
+
+    def get(self, device_id, fetch):
+        """
+        Get the function index of a device, fetching it if missing or expired.
+
+        Args:
+            device_id (str): Device to look up
+            fetch (callable): Returns the Tuya /functions response for a device ID
+
+        Returns:
+            dict: DP code to FunctionSpec, or None if no specification is available
+        """
+        now = time.time()
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            entry = self._raw.get(device_id)
+            if entry is not None and now - entry.get("fetched_at", 0) < self.ttl:
+                return self._index[device_id]
+            if now - self._unavailable.get(device_id, 0) < UNAVAILABLE_RETRY:
+                return self._index.get(device_id)
+
+        response = fetch(device_id)
+        result = response.get("result") if isinstance(response, dict) else None
+        if not (response and response.get("success") and isinstance(result, dict)):
+            logging.warning(f"Device spec unavailable for {device_id}, commands sent unchecked")
+            with self._lock:
+                self._unavailable[device_id] = now
+                return self._index.get(device_id)
+
+        with self._lock:
+            self._store(device_id, {"fetched_at": now, "functions": result.get("functions") or []})
+            self._unavailable.pop(device_id, None)
+            flush = self._schedule_save()
+            specs = self._index[device_id]
+        if flush:
+            self.flush()
+        return specs
+
+    def validate(self, device_id, commands, fetch):
+        """
+        Validate and normalize commands against the device's specification.
+
+        Args:
+            device_id (str): Target device
+            commands (list): Commands ({"code": ..., "value": ...})
+            fetch (callable): Returns the Tuya /functions response for a device ID
+
+        Returns:
+            tuple: (normalized commands, list of error messages). Commands are
+                returned unchanged when no specification is available.
+        """
+        if not isinstance(commands, list):
+            return commands, ["commands must be a list"]
+        if not commands:
+            return commands, []
+
+        specs = self.get(device_id, fetch)
+        if specs is None:
+            return commands, []
+
+        normalized, errors = [], []
+        for command in commands:
+            code = command.get("code") if isinstance(command, dict) else None
+            if code is None or "value" not in command:
+                errors.append(f"malformed command {command!r}")
+                continue
+            spec = specs.get(code)
+            if spec is None:
+                errors.append(f"{code}: not a function of this device")
+                continue
+            try:
+                normalized.append({"code": code, "value": spec.normalize(command["value"])})
+            except ValueError as e:
+                errors.append(f"{code}: {e}")
+        return normalized, errors
+
+    def forget(self, device_id):
+        """
+        Drop a device's specification so it is fetched again.
+
+        Args:
+            device_id (str): Device to forget
+        """
+        with self._lock:
+            self._raw.pop(device_id, None)
+            self._index.pop(device_id, None)
+            self._unavailable.pop(device_id, None)
+            flush = self._schedule_save()
+        if flush:
+            self.flush()
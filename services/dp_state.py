@@ -0,0 +1,146 @@
+"""
+DP State Engine - Per-device Data Point Tracking
+
+This module keeps the latest value of every data point (DP) reported by
+each device and diffs new status payloads against it. A payload identical
+to the previous one is recognised by its digest and skipped without a
+per-DP comparison; otherwise only the DP codes whose value changed are
+returned, so downstream handling scales with the number of changes.
+"""
+
+
+class DeviceRecord:
+    """
+    Compact state record of one device.
+
+    Uses __slots__ so large fleets do not pay for a per-instance __dict__.
+    """
+
+    __slots__ = ("values", "digest")
+
+    def __init__(self):
+        """Initialize an empty record."""
+        self.values = {}  # DP code -> latest value
+        self.digest = None  # Digest of the last applied payload
+
+
+def _payload_digest(pairs):
+    """
+    Compute a cheap digest of a status payload.
+
+    Each value's type is part of the digest: True == 1 and hash(True) ==
+    hash(1), so without it a DP changing from True to 1 (or False to 0)
+    would look unchanged.
+
+    Args:
+        pairs (tuple): (code, value) pairs in payload order
+
+    Returns:
+        int: Hash of the payload
+    """
+    typed = tuple((code, type(value), value) for code, value in pairs)
+    try:
+        return hash(typed)
+    except TypeError:
+        # Structured DP values (lists, dicts) are not hashable; fall back to their repr
+        return hash(repr(typed))
+
+
+def _differs(old, new):
+    """
+    Check whether a DP value changed, counting a change of type (True to 1) as a change.
+
+    Args:
+        old: Previous DP value
+        new: New DP value
+
+    Returns:
+        bool: True if the value or its type differs
+    """
+    return type(old) is not type(new) or old != new
+
+
+class DPStateEngine:
+    """
+    Tracks DP values per device and reports what changed.
+
+    Not locked: each device is only ever updated by one poll at a time, and
+    updates of different devices never touch the same record.
+    """
+
+    def __init__(self):
+        """Initialize an engine with no known devices."""
+        self._records = {}
+
+    def __contains__(self, device_id):
+        """Return True if the device has reported at least once."""
+        return device_id in self._records
+
+    def apply(self, device_id, result):
+        """
+        Apply a status payload and diff it against the previous one.
+
+        Args:
+            device_id (str): Device the status belongs to
+            result (list): Status entries ({"code": ..., "value": ...})
+
+        Returns:
+            dict: DP code to new value for every DP that changed (every DP on
+                the first payload of a device); empty if nothing changed
+        """
+        record = self._records.get(device_id)
+        if record is None:
+            record = self._records[device_id] = DeviceRecord()
+
+        pairs = tuple((status.get("code"), status.get("value")) for status in result)
+        digest = _payload_digest(pairs)
+        if digest == record.digest:
+            return {}
+        record.digest = digest
+
+        values = record.values
+        changes = {}
+        for code, value in pairs:
+            if code not in values or _differs(values[code], value):
+                values[code] = value
+                changes[code] = value
+        return changes
+
+    def get(self, device_id, code, default=None):
+        """
+        Get the latest known value of a DP.
+
+        Args:
+            device_id (str): Device to look up
+            code (str): DP code, e.g. "battery_percentage"
+            default: Value returned when the DP is unknown
+
+        Returns:
+            The latest DP value, or default
+        """
+        record = self._records.get(device_id)
+        if record is None:
+            return default
+        return record.values.get(code, default)
+
+    def values(self, device_id):
+        """
+        Get a copy of every known DP value of a device.
+
+        Args:
+            device_id (str): Device to look up
+
+        Returns:
+            dict: DP code to latest value
+        """
+        record = self._records.get(device_id)
+        return dict(record.values) if record else {}
+
+    def forget(self, device_id):
+        """
+        Drop the record of a device that is no longer monitored.
+
+        Args:
+            device_id (str): Device to remove
+        """
+        self._records.pop(device_id, None)
@@ -0,0 +1,145 @@
+"""
+Flap Coalescer - Per-device Folding of Rapid Door Transitions
+
+This module keeps a door that swings open and shut several times in a
+minute from sending one alert per transition. The first transition of a
+device is delivered right away and opens a coalescing window; further
+transitions inside the window are folded, and when the window ends a
+single summary with their count, first and last times and final state
+is delivered instead.
+"""
+
+import logging
+import threading
+import time
+from collections import namedtuple
+from config.Config import WhatsAppConfig
+
+# Transitions folded into one window; count includes the first, delivered transition
+FlapSummary = namedtuple("FlapSummary", "device_id count first_at last_at door_open")
+
+
+class FlapCoalescer:
+    """
+    Thread-safe per-device coalescing windows.
+
+    Each open window has a timer that delivers its summary when the window
+    ends. A window of 0 disables coalescing.
+    """
+
+    def __init__(self, window=0):
+        """
+        Initialize the coalescer.
+
+        Args:
+            window (float): Seconds after a delivered transition during which
+                further transitions of the same device are folded (0 disables)
+        """
+        self.window = window
+        self._windows = {}  # device_id -> window state
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.folded = 0
+        self.summaries = 0
+
+    @classmethod
+    def from_config(cls):
+        """
+        Build a coalescer from the ALERT_COALESCE_WINDOW configuration value.
+
+        Returns:
+            FlapCoalescer: Coalescer configured from environment settings
+        """
+        return cls(window=WhatsAppConfig.ALERT_COALESCE_WINDOW)
+
+    def record(self, device_id, door_open, send_summary):
+        """
+        Record a transition and decide whether to deliver it now.
+
+        Args:
+            device_id (str): Device that changed (None for a single-sensor setup)
+            door_open (bool): New door state
+            send_summary (callable): Called with a FlapSummary when the window
+                ends with folded transitions; the latest transition's callable is used
+
+        Returns:
+            bool: True if the transition should be delivered now, False if folded
+        """
+        if self.window <= 0:
+            return True
+
+        now = time.time()
+        with self._lock:
+            entry = self._windows.get(device_id)
+            if entry is not None:
+                entry["count"] += 1
+                entry["last_at"] = now
+                entry["door_open"] = door_open
+                entry["send"] = send_summary
+                self.folded += 1
+                return False
+
+            timer = threading.Timer(self.window, self._close, (device_id,))
+            timer.daemon = True
+            self._windows[device_id] = {
+                "count": 1,
+                "first_at": now,
+                "last_at": now,
+                "door_open": door_open,
+                "send": send_summary,
+                "timer": timer,
+            }
+        timer.start()
+        return True
+
+    def _close(self, device_id):
+        """End a device's window and deliver its summary if anything was folded."""
+        with self._lock:
+            entry = self._windows.pop(device_id, None)
+            if entry is None or entry["count"] < 2:
+                return
+            self.summaries += 1
+
+        summary = FlapSummary(
+            device_id, entry["count"], entry["first_at"], entry["last_at"], entry["door_open"]
+        )
+        try:
+            entry["send"](summary)
+        except Exception as e:
+            logging.error(f"Failed to queue flap summary for {device_id or 'door'}: {e}")
+
+    def flush(self):
+        """End every open window now, delivering pending summaries (e.g. at shutdown)."""
+        with self._lock:
+            device_ids = list(self._windows)
+            for device_id in device_ids:
+                self._windows[device_id]["timer"].cancel()
+        for device_id in device_ids:
+            self._close(device_id)
+
+    def clear(self):
+        """Discard every open window without delivering summaries."""
+        with self._lock:
+            for entry in self._windows.values():
+                entry["timer"].cancel()
+            self._windows.clear()
+
+    def metrics(self):
+        """
+        Snapshot of coalescer metrics.
+
+        Returns:
+            dict: Window length, open windows, folded transitions and summaries sent
+        """
+        with self._lock:
+            return {
+                "window_seconds": self.window,
+                "open_windows": len(self._windows),
+                "folded": self.folded,
+                "summaries": self.summaries,
+            }
+
+
+# Global singleton instance for application-wide use
+flap_coalescer = FlapCoalescer.from_config()
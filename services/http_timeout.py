@@ -0,0 +1,49 @@
+"""
+HTTP Timeout - Default Timeouts for Connector Sessions
+
+The Tuya connector sends its requests through a requests.Session without
+a timeout, so a hung connection blocks the calling thread forever. This
+module provides an adapter that supplies a default (connect, read) timeout
+and a helper that mounts it on a session.
+"""
+
+from requests.adapters import HTTPAdapter
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """
+    HTTP adapter that applies a default timeout to requests sent without one.
+
+    The Tuya connector calls its session without a timeout, so the adapter
+    mounted on that session is the only place a timeout can be set.
+    """
+
+    def __init__(self, timeout, **kwargs):
+        """
+        Initialize the adapter.
+
+        Args:
+            timeout (tuple): (connect, read) timeout in seconds
+            **kwargs: Keyword arguments for HTTPAdapter
+        """
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        """Send a request, with the default timeout unless the caller gave one."""
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def mount_timeout(session, timeout):
+    """
+    Bound every request of a session with a default timeout.
+
+    Args:
+        session (requests.Session): Session to configure
+        timeout (tuple): (connect, read) timeout in seconds
+    """
+    adapter = TimeoutHTTPAdapter(timeout)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
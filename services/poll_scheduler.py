@@ -0,0 +1,156 @@
+"""
+Poll Scheduler - Monotonic Per-device Deadlines
+
+This module provides the deadline scheduler used by the polling thread.
+Every device has one deadline on the monotonic clock, kept in a binary
+heap so the next deadline is found in O(log n) regardless of fleet size.
+Rescheduling uses lazy deletion: superseded heap entries are skipped
+when they reach the top and the heap is compacted when they pile up.
+
+phase_offsets() spreads devices across one interval, so a large fleet
+does not hit the Tuya API in a single burst every cycle.
+"""
+
+import heapq
+import itertools
+import random
+
+
+def phase_offsets(device_ids, interval, group_size=1, jitter=0.0, rng=random):
+    """
+    Assign every device a start offset within one poll interval.
+
+    Devices are split into equally sized groups of at most group_size
+    (devices polled together share one batched call) and the groups are
+    spaced evenly across the interval. Every group but the first is pushed
+    back by a random jitter of up to `jitter` of its slot, so fleets with the
+    same interval do not line up; the first group always starts right away.
+
+    Args:
+        device_ids (list): Devices to place, in polling order
+        interval (float): Seconds to spread the devices across
+        group_size (int): Maximum devices sharing one phase
+        jitter (float): Fraction of a slot (0-1) used for random jitter
+        rng (random.Random): Random source, for reproducible phases in tests
+
+    Returns:
+        dict: Device ID to offset in seconds, 0 <= offset < interval
+    """
+    if not device_ids:
+        return {}
+
+    groups = -(-len(device_ids) // max(1, group_size))
+    slot = interval / groups
+    jitter = min(max(jitter, 0.0), 1.0)
+
+    phases = [0.0] + [group * slot + rng.uniform(0, jitter * slot) for group in range(1, groups)]
+
+    # Balanced contiguous groups: sizes differ by at most one device
+    count = len(device_ids)
+    return {
+        device_id: phases[index * groups // count] for index, device_id in enumerate(device_ids)
+    }
+
+
+class DeadlineScheduler:
+    """
+    Min-heap of per-device poll deadlines.
+
+    Deadlines are time.monotonic() values, so wall-clock adjustments never
+    shift the polling schedule.
+    """
+
+    def __init__(self):
+        """Initialize an empty scheduler."""
+        self._heap = []  # (deadline, sequence, device_id)
+        self._entries = {}  # device_id -> (deadline, sequence) of its live heap entry
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        """Return the number of scheduled devices."""
+        return len(self._entries)
+
+    def __contains__(self, device_id):
+        """Return True if the device has a pending deadline."""
+        return device_id in self._entries
+
+    def schedule(self, device_id, deadline):
+        """
+        Set (or replace) the deadline of a device.
+
+        Args:
+            device_id (str): Device to schedule
+            deadline (float): Monotonic time at which the device is due
+        """
+        entry = (deadline, next(self._sequence))
+        self._entries[device_id] = entry
+        heapq.heappush(self._heap, (*entry, device_id))
+
+        # Drop superseded entries once they outnumber the live ones
+        if len(self._heap) > 2 * len(self._entries) + 16:
+            self._compact()
+
+    def deadline(self, device_id):
+        """
+        Get the pending deadline of a device.
+
+        Args:
+            device_id (str): Device to look up
+
+        Returns:
+            float: Monotonic deadline, or None if the device is not scheduled
+        """
+        entry = self._entries.get(device_id)
+        return entry[0] if entry else None
+
+    def remove(self, device_id):
+        """
+        Cancel the pending deadline of a device.
+
+        Args:
+            device_id (str): Device to unschedule
+        """
+        self._entries.pop(device_id, None)
+
+    def next_deadline(self):
+        """
+        Get the earliest pending deadline.
+
+        Returns:
+            float: Monotonic time of the next due device, or None if empty
+        """
+        self._prune()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now):
+        """
+        Remove and return every device whose deadline has passed.
+
+        Args:
+            now (float): Current monotonic time
+
+        Returns:
+            list: (device_id, deadline) pairs in deadline order
+        """
+        due = []
+        while True:
+            self._prune()
+            if not self._heap or self._heap[0][0] > now:
+                return due
+            deadline, _, device_id = heapq.heappop(self._heap)
+            del self._entries[device_id]
+            due.append((device_id, deadline))
+
+    def _prune(self):
+        """Pop superseded entries from the top of the heap."""
+        heap = self._heap
+        while heap:
+            deadline, sequence, device_id = heap[0]
+            if self._entries.get(device_id) == (deadline, sequence):
+                return
+            heapq.heappop(heap)
+
+    def _compact(self):
+        """Rebuild the heap from live entries only."""
+        self._heap = [(*entry, device_id) for device_id, entry in self._entries.items()]
+        heapq.heapify(self._heap)
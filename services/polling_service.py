@@ -11,12 +11,21 @@ import time
 import logging
 import threading
 import sys
-from services.tuya_service import tuya_service
+from services.tuya_service import STATUS_BATCH_LIMIT
+from services.tuya_pool import tuya_pool
 from services.whatsapp_service import (
     send_door_opened_alert,
     send_door_closed_alert,
     send_sensor_initialized_alert,
 )
+from services.alert_outbox import alert_key
+from services.adaptive_interval import AdaptivePollInterval
+from services.quota_service import quota_accountant, is_quota_error
+from services.poll_scheduler import DeadlineScheduler, phase_offsets
+from services.state_store import device_state_store
+from services.dp_state import DPStateEngine
+from services.status_cache import status_cache
+from services.rate_limiter import PRIORITY_ALERT
 from config.Config import TuyaConfig, Config
 
 
@@ -26,25 +35,465 @@ class DoorSensorPoller:
 
     This class periodically queries the Tuya Cloud API to check the door
     sensor status and detects state changes. It runs in a background thread
-    and sends WhatsApp alerts when the door opens or closes.
+    and queues WhatsApp alerts when the door opens or closes; the alert
+    dispatcher delivers them so a slow notifier never delays detection.
+
+    A single poller can watch a whole fleet of sensors: devices are fetched
+    in batches through the Tuya multi-device status endpoint, while state
+    tracking and alerts are kept separate for every device.
+
+    In adaptive mode every device gets its own interval: short after a
+    transition or while the door is open, backing off while it is quiet.
+
+    Devices start in staggered, jittered phases spread across the interval
+    (one batch per phase), and are re-phased whenever the fleet changes, so
+    the upstream request rate stays flat instead of bursting every cycle.
 
     This polling approach is more reliable than WebSocket in certain network
     environments and doesn't require complex encryption handling.
     """
 
-    def __init__(self, poll_interval=None):
+    def __init__(self, poll_interval=None, device_ids=None, adaptive=None, phase_jitter=None):
         """
         Initialize the door sensor poller.
 
         Args:
             poll_interval (int, optional): Seconds between status checks.
                 Defaults to Config.POLL_INTERVAL if not specified.
+            device_ids (list, optional): Devices to monitor. Defaults to
+                TuyaConfig.DEVICE_ID followed by TuyaConfig.DEVICE_IDS.
+            adaptive (bool, optional): Use activity-driven per-device intervals.
+                Defaults to Config.POLL_ADAPTIVE.
+            phase_jitter (float, optional): Fraction of a phase slot used for random
+                jitter. Defaults to Config.POLL_PHASE_JITTER.
         """
-        self.device_id = TuyaConfig.DEVICE_ID
+        if device_ids is None:
+            device_ids = [TuyaConfig.DEVICE_ID, *TuyaConfig.DEVICE_IDS]
+
+        self.device_ids = self._clean_device_ids(device_ids)
+        self.device_id = self.device_ids[0] if self.device_ids else None
         self.poll_interval = poll_interval or Config.POLL_INTERVAL
         self.running = False
         self.thread = None
-        self.last_door_state = None  # Tracks previous state to detect changes
+        self.device_states = {}  # Tracks previous state per device to detect changes
+        self.restored_devices = set()  # Devices whose state came from the snapshot
+        self.dp_states = DPStateEngine()  # Latest value of every DP per device
+
+        # Adaptive mode keeps a per-device deadline instead of one global interval
+        if adaptive is None:
+            adaptive = Config.POLL_ADAPTIVE
+        self.interval_policy = AdaptivePollInterval.from_config() if adaptive else None
+        if self.interval_policy:
+            self.interval_policy.set_fleet_size(len(self.device_ids))
+        self.scheduler = DeadlineScheduler()  # Per-device monotonic poll deadlines
+        self._cycle_deadlines = {}  # Deadlines of the devices being polled this cycle
+        self.phase_jitter = Config.POLL_PHASE_JITTER if phase_jitter is None else phase_jitter
+        self._wake_event = threading.Event()  # Set to wake the polling thread early
+        self._devices_lock = threading.Lock()
+        self._pending_devices = None  # Fleet change waiting for the polling thread
+
+        # Share the remaining API quota across the monitored devices by priority
+        quota_accountant.register_devices(self.device_ids)
+
+    @property
+    def last_door_state(self):
+        """Door state last seen on the primary device (None before the first reading)."""
+        return self.device_states.get(self.device_id)
+
+    @last_door_state.setter
+    def last_door_state(self, value):
+        self.device_states[self.device_id] = value
+
+    @staticmethod
+    def _clean_device_ids(device_ids):
+        """
+        Preserve configuration order while dropping blanks and duplicates.
+
+        Args:
+            device_ids (list): Raw device IDs
+
+        Returns:
+            list: Unique, non-empty device IDs
+        """
+        return list(dict.fromkeys(device for device in device_ids if device))
+
+    def set_devices(self, device_ids):
+        """
+        Replace the monitored fleet.
+
+        Added devices are polled from their new phase, removed devices are
+        dropped, and the whole fleet is re-phased so polls stay evenly spread.
+        While polling, the change is applied by the polling thread.
+
+        Args:
+            device_ids (list): Devices to monitor from now on
+        """
+        with self._devices_lock:
+            self._pending_devices = self._clean_device_ids(device_ids)
+
+        if self.running:
+            self._wake_event.set()
+        else:
+            self._apply_device_changes()
+
+    def _apply_device_changes(self):
+        """
+        Apply a pending set_devices() change to the poller state.
+
+        Returns:
+            tuple: (added device IDs, removed device IDs), or None if nothing was pending
+        """
+        with self._devices_lock:
+            device_ids, self._pending_devices = self._pending_devices, None
+        if device_ids is None:
+            return None
+
+        added = [device_id for device_id in device_ids if device_id not in self.device_ids]
+        removed = [device_id for device_id in self.device_ids if device_id not in device_ids]
+
+        self.device_ids = device_ids
+        self.device_id = device_ids[0] if device_ids else None
+        for device_id in removed:
+            self.scheduler.remove(device_id)
+            self.device_states.pop(device_id, None)
+            self.restored_devices.discard(device_id)
+            self.dp_states.forget(device_id)
+
+        quota_accountant.register_devices(device_ids)
+        if self.interval_policy:
+            self.interval_policy.set_fleet_size(len(device_ids))
+
+        if added or removed:
+            logging.info(f"Fleet changed: {len(added)} added, {len(removed)} removed")
+        if added:
+            # Devices taken over from elsewhere continue from their last known state
+            self._restore_states(added)
+        return added, removed
+
+    def _phase_interval(self):
+        """
+        Interval the device phases are spread across.
+
+        Returns:
+            float: The fixed cycle interval, or the adaptive minimum interval
+        """
+        if self.interval_policy:
+            return self.interval_policy.min_interval
+        return self._cycle_interval()
+
+    def _assign_phases(self, device_ids):
+        """
+        Schedule devices in staggered, jittered phases starting now.
+
+        Devices in one phase share a status batch; the first phase is due
+        immediately.
+
+        Args:
+            device_ids (list): Devices to (re)schedule
+        """
+        now = time.monotonic()
+        offsets = phase_offsets(
+            device_ids, self._phase_interval(), STATUS_BATCH_LIMIT, self.phase_jitter
+        )
+        for device_id, offset in offsets.items():
+            self.scheduler.schedule(device_id, now + offset)
+
+    def _batches(self, device_ids):
+        """
+        Split devices into batches for the status endpoint.
+
+        Args:
+            device_ids (list): Devices to split
+
+        Yields:
+            list: Up to STATUS_BATCH_LIMIT device IDs per batch
+        """
+        for index in range(0, len(device_ids), STATUS_BATCH_LIMIT):
+            yield device_ids[index : index + STATUS_BATCH_LIMIT]
+
+    def _fetch_batch(self, batch):
+        """
+        Query the status of one batch of devices.
+
+        A batch of one uses the per-device endpoint; larger batches use the
+        multi-device endpoint so the whole batch costs a single API call.
+
+        Args:
+            batch (list): Device IDs to query
+
+        Returns:
+            tuple: (API response, dict mapping device ID to its status list)
+        """
+        # Alert-driving polls go ahead of ad-hoc API reads at the rate limiter
+        if len(batch) == 1:
+            response = tuya_pool.get_device_status(batch[0], priority=PRIORITY_ALERT)
+        else:
+            response = tuya_pool.get_devices_status(batch, priority=PRIORITY_ALERT)
+        return response, self._split_statuses(batch, response)
+
+    def _split_statuses(self, batch, response):
+        """
+        Map a status response of a batch to each device's status list.
+
+        Args:
+            batch (list): Device IDs that were queried
+            response (dict): Per-device (batch of one) or multi-device API response
+
+        Returns:
+            dict: Device ID to status list, empty if the request failed
+        """
+        if not response.get("success"):
+            return {}
+        if len(batch) == 1:
+            return {batch[0]: response.get("result", [])}
+
+        statuses = {}
+        for device in response.get("result") or []:
+            statuses[device.get("id")] = device.get("status", [])
+
+        missing = [device_id for device_id in batch if device_id not in statuses]
+        if missing:
+            logging.warning(f"No status returned for devices: {', '.join(missing)}")
+
+        return statuses
+
+    def _next_delay(self, device_id, changed):
+        """
+        Compute the delay before a device should be polled again.
+
+        Args:
+            device_id (str): Device that was just polled
+            changed (bool): Whether the latest reading was a state transition
+
+        Returns:
+            float: Seconds until the next poll of the device
+        """
+        if not self.interval_policy:
+            return self._cycle_interval()
+
+        interval = self.interval_policy.next_interval(
+            device_id, self.device_states.get(device_id), changed
+        )
+        return max(interval, quota_accountant.interval_floor(device_id))
+
+    def _cycle_interval(self):
+        """
+        Compute the fixed-mode interval, stretched when the remaining quota is tight.
+
+        Returns:
+            float: Seconds between polls of the whole fleet
+        """
+        batches = -(-len(self.device_ids) // STATUS_BATCH_LIMIT)  # Calls per cycle
+        return max(self.poll_interval, quota_accountant.interval_floor(calls_per_poll=batches))
+
+    def _schedule(self, device_id, changed=False):
+        """
+        Set the next poll deadline of a device.
+
+        The deadline is measured from the previous deadline rather than from
+        the end of the poll, so request latency does not accumulate as drift.
+
+        Args:
+            device_id (str): Device that was just polled
+            changed (bool): Whether the latest reading was a state transition
+        """
+        now = time.monotonic()
+        previous = self._cycle_deadlines.pop(device_id, now)
+        self.scheduler.schedule(device_id, max(previous + self._next_delay(device_id, changed), now))
+
+    def _due_devices(self):
+        """
+        Take the devices whose deadline has passed off the scheduler.
+
+        Returns:
+            list: Devices to poll now, in deadline order
+        """
+        due = self.scheduler.pop_due(time.monotonic())
+        self._cycle_deadlines = dict(due)
+        return [device_id for device_id, _ in due]
+
+    def _sleep_time(self):
+        """
+        Compute how long the polling thread should wait before the next cycle.
+
+        Returns:
+            float: Seconds until the earliest device deadline
+        """
+        next_deadline = self.scheduler.next_deadline()
+        if next_deadline is None:
+            return self._cycle_interval()
+        return max(0.0, next_deadline - time.monotonic())
+
+    def _wait(self, timeout):
+        """
+        Wait for the next deadline, returning early on stop() or a fleet change.
+
+        Args:
+            timeout (float): Maximum seconds to wait
+
+        Returns:
+            bool: True if the polling thread was woken before the timeout
+        """
+        woken = self._wake_event.wait(timeout)
+        self._wake_event.clear()
+        return woken
+
+    def _poll_once(self, device_ids=None):
+        """
+        Poll a set of devices once.
+
+        Args:
+            device_ids (list, optional): Devices to poll. Defaults to all monitored devices.
+        """
+        if device_ids is None:
+            device_ids = self.device_ids
+
+        batches = list(self._batches(device_ids))
+        for index, batch in enumerate(batches):
+            response, statuses = self._fetch_batch(batch)
+
+            if not response.get("success"):
+                error_msg = response.get("msg", "Unknown error")
+
+                # Quota errors only slow polling down; the accountant paces the next polls
+                if is_quota_error(response):
+                    logging.error(f"⚠️  QUOTA EXHAUSTED: {error_msg}")
+                    logging.error(
+                        f"⏸️  Slowing polling to the remaining quota: {quota_accountant.summary()}"
+                    )
+                    for pending in batches[index:]:
+                        for device_id in pending:
+                            self._schedule(device_id)
+                    return
+
+                # Other errors - log and move on to the next batch
+                logging.warning(f"Failed to get device status: {error_msg}")
+                for device_id in batch:
+                    self._schedule(device_id)
+                continue
+
+            for device_id in batch:
+                changed = False
+                if device_id in statuses:
+                    changed = self._process_status(device_id, statuses[device_id])
+                self._schedule(device_id, changed)
+
+    def _process_status(self, device_id, result):
+        """
+        Detect door state changes for one device and trigger alerts.
+
+        Args:
+            device_id (str): Device the status belongs to
+            result (list): Status entries ({"code": ..., "value": ...})
+
+        Returns:
+            bool: True if the reading was a door state transition
+        """
+        # Fleet alerts name the device; single-sensor alerts stay unchanged
+        alert_device = device_id if len(self.device_ids) > 1 else None
+        last_door_state = self.device_states.get(device_id)
+        restored = device_id in self.restored_devices
+        self.restored_devices.discard(device_id)
+
+        # Every reading refreshes the REST status cache; fixed intervals keep it fresh until
+        # the next poll
+        status_cache.put(
+            device_id, result, ttl=None if self.interval_policy else self._cycle_interval()
+        )
+
+        # Diff the payload against the device's DP record; unchanged payloads stop here
+        changes = self.dp_states.apply(device_id, result)
+        if not changes:
+            return False
+        logging.debug(f"DP changes for {device_id}: {changes}")
+
+        door_state = changes.get("doorcontact_state")
+        battery = self.dp_states.get(device_id, "battery_percentage")
+
+        # Handle initial state detection (first reading after service start)
+        if last_door_state is None and door_state is not None:
+            timestamp = int(time.time() * 1000)
+            state_text = "OPENED" if door_state else "CLOSED"
+
+            print(f"\n[SENSOR INITIALIZED] First reading")
+            print(f"   Current state: Door {state_text}")
+            print(f"   Timestamp: {timestamp}")
+            print(f"   Device ID: {device_id}")
+            if battery:
+                print(f"   Battery: {battery}%")
+            sys.stdout.flush()
+
+            # Send initialization message instead of door state alert
+            send_sensor_initialized_alert(
+                alert_device, key=alert_key(device_id, "initialized", timestamp)
+            )
+
+            # Update state tracker
+            self.device_states[device_id] = door_state
+            device_state_store.save(device_id, door_state, timestamp)
+
+        # Detect actual state changes (not initial state)
+        elif door_state is not None and door_state != last_door_state:
+            timestamp = int(time.time() * 1000)
+
+            print(
+                f"\n[DOOR STATE CHANGE] Door was {'opened' if last_door_state else 'closed'}, now {'opened' if door_state else 'closed'}"
+            )
+            if restored:
+                print("   Changed while monitoring was offline (state restored from snapshot)")
+
+            if door_state:
+                # Door opened event
+                print(f"DOOR OPENED (doorcontact_state = True)")
+                print(f"   Timestamp: {timestamp}")
+                print(f"   Device ID: {device_id}")
+                if battery:
+                    print(f"   Battery: {battery}%")
+                sys.stdout.flush()
+
+                # Queue WhatsApp alert for door opened; delivery never blocks polling
+                send_door_opened_alert(
+                    alert_device, key=alert_key(device_id, "opened", timestamp)
+                )
+            else:
+                # Door closed event
+                print(f"DOOR CLOSED (doorcontact_state = False)")
+                print(f"   Timestamp: {timestamp}")
+                print(f"   Device ID: {device_id}")
+                if battery:
+                    print(f"   Battery: {battery}%")
+                sys.stdout.flush()
+
+                # Queue WhatsApp alert for door closed; delivery never blocks polling
+                send_door_closed_alert(
+                    alert_device, key=alert_key(device_id, "closed", timestamp)
+                )
+
+            # Update state tracker
+            self.device_states[device_id] = door_state
+            device_state_store.save(device_id, door_state, timestamp)
+            return True
+
+        return False
+
+    def _restore_states(self, device_ids=None):
+        """
+        Load the last known door states from the persistent snapshot.
+
+        Restored devices skip the "sensor initialized" alert when their door
+        is unchanged, and alert normally if it changed while we were down.
+
+        Args:
+            device_ids (list, optional): Devices to restore. Defaults to all monitored devices.
+        """
+        states = device_state_store.load(self.device_ids if device_ids is None else device_ids)
+        for device_id, door_state in states.items():
+            if self.device_states.get(device_id) is None:
+                self.device_states[device_id] = door_state
+                self.restored_devices.add(device_id)
+
+        if states:
+            print(f"Restored state of {len(states)} device(s) from snapshot")
 
     def _poll_loop(self):
         """
@@ -53,109 +502,38 @@ class DoorSensorPoller:
         Continuously queries the Tuya API at regular intervals to check
         door sensor status. Detects state changes and triggers alerts.
         """
-        print(f"\nPolling started - checking every {self.poll_interval} seconds")
+        if self.interval_policy:
+            print(
+                f"\nAdaptive polling started - every {self.interval_policy.min_interval}"
+                f"-{self.interval_policy.max_interval} seconds per device"
+            )
+        else:
+            print(f"\nPolling started - checking every {self.poll_interval} seconds")
         print("=" * 60)
         sys.stdout.flush()
 
+        # Spread first polls across the interval; later deadlines follow from the results
+        self._apply_device_changes()
+        self._assign_phases([d for d in self.device_ids if d not in self.scheduler])
+
         while self.running:
-            try:
-                # Query device status from Tuya Cloud API
-                response = tuya_service.get_device_status(self.device_id)
-
-                if response.get("success"):
-                    result = response.get("result", [])
-
-                    # Extract door contact state and battery level from status
-                    door_state = None
-                    battery = None
-
-                    for status in result:
-                        if status.get("code") == "doorcontact_state":
-                            door_state = status.get("value")
-                        elif status.get("code") == "battery_percentage":
-                            battery = status.get("value")
-
-                    # Handle initial state detection (first reading after service start)
-                    if self.last_door_state is None and door_state is not None:
-                        timestamp = int(time.time() * 1000)
-                        state_text = "OPENED" if door_state else "CLOSED"
-
-                        print(f"\n[SENSOR INITIALIZED] First reading")
-                        print(f"   Current state: Door {state_text}")
-                        print(f"   Timestamp: {timestamp}")
-                        print(f"   Device ID: {self.device_id}")
-                        if battery:
-                            print(f"   Battery: {battery}%")
-                        sys.stdout.flush()
-
-                        # Send initialization message instead of door state alert
-                        send_sensor_initialized_alert()
-
-                        # Update state tracker
-                        self.last_door_state = door_state
-
-                    # Detect actual state changes (not initial state)
-                    elif door_state is not None and door_state != self.last_door_state:
-                        timestamp = int(time.time() * 1000)
-
-                        print(
-                            f"\n[DOOR STATE CHANGE] Door was {'opened' if self.last_door_state else 'closed'}, now {'opened' if door_state else 'closed'}"
-                        )
-
-                        if door_state:
-                            # Door opened event
-                            print(f"DOOR OPENED (doorcontact_state = True)")
-                            print(f"   Timestamp: {timestamp}")
-                            print(f"   Device ID: {self.device_id}")
-                            if battery:
-                                print(f"   Battery: {battery}%")
-                            sys.stdout.flush()
-
-                            # Trigger WhatsApp alert for door opened
-                            send_door_opened_alert()
-                        else:
-                            # Door closed event
-                            print(f"DOOR CLOSED (doorcontact_state = False)")
-                            print(f"   Timestamp: {timestamp}")
-                            print(f"   Device ID: {self.device_id}")
-                            if battery:
-                                print(f"   Battery: {battery}%")
-                            sys.stdout.flush()
-
-                            # Trigger WhatsApp alert for door closed
-                            send_door_closed_alert()
-
-                        # Update state tracker
-                        self.last_door_state = door_state
-
-                else:
-                    error_msg = response.get("msg", "Unknown error")
-                    error_code = response.get("code", "")
-
-                    # Check for quota exhaustion or permission errors
-                    if (
-                        "quota" in error_msg.lower()
-                        or "permission" in error_msg.lower()
-                        or error_code == 1106
-                    ):
-                        # Use exponential backoff for quota errors
-                        logging.error(f"⚠️  QUOTA EXHAUSTED: {error_msg}")
-                        logging.error(f"⏸️  Pausing polling for 1 hour to preserve quota...")
-
-                        # Sleep for 1 hour instead of stopping completely
-                        time.sleep(3600)  # 3600 seconds = 1 hour
-
-                        logging.info("♻️  Resuming polling after 1 hour pause...")
-                        continue
-                    else:
-                        # Other errors - log but continue with normal interval
-                        logging.warning(f"Failed to get device status: {error_msg}")
+            if self._apply_device_changes() is not None:
+                # Rebalance the whole fleet so the new phases are evenly spaced again
+                self._assign_phases(self.device_ids)
 
+            due = self._due_devices()
+            try:
+                self._poll_once(due)
             except Exception as e:
                 logging.error(f"Error in polling loop: {e}")
+            finally:
+                # Never lose a device from the schedule because its poll failed
+                for device_id in due:
+                    if device_id not in self.scheduler:
+                        self._schedule(device_id)
 
-            # Wait before next poll to avoid overwhelming the API
-            time.sleep(self.poll_interval)
+            # Wait for the next deadline; stop() interrupts the wait immediately
+            self._wait(self._sleep_time())
 
     def start(self):
         """
@@ -171,14 +549,20 @@ class DoorSensorPoller:
         print("\n" + "=" * 60)
         print("Starting HTTP Polling Service (Pulsar Alternative)")
         print(f"API Endpoint: {TuyaConfig.API_ENDPOINT}")
-        print(f"Device ID: {self.device_id}")
+        if len(self.device_ids) > 1:
+            print(f"Devices: {len(self.device_ids)} (batches of up to {STATUS_BATCH_LIMIT})")
+        else:
+            print(f"Device ID: {self.device_id}")
         print(f"Poll Interval: {self.poll_interval} seconds")
         print("=" * 60)
         print("Monitoring door sensor via HTTP API polling...")
         print("Legend: Door Opened | Door Closed")
         print("=" * 60)
 
+        self._restore_states()
+
         self.running = True
+        self._wake_event.clear()
         # Create daemon thread so it terminates when main program exits
         self.thread = threading.Thread(target=self._poll_loop, daemon=True)
         self.thread.start()
@@ -190,10 +574,11 @@ class DoorSensorPoller:
         """
         Stop the polling service gracefully.
 
-        Sets the running flag to False and waits for the polling thread
-        to terminate within a timeout period.
+        Sets the running flag to False, wakes the polling thread from its
+        wait and waits for it to terminate within a timeout period.
         """
         self.running = False
+        self._wake_event.set()
         if self.thread:
             self.thread.join(timeout=5)
         print("HTTP Polling stopped")
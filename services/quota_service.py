@@ -0,0 +1,262 @@
+"""
+Quota Service - Tuya API Call Accounting
+
+This module keeps track of Tuya Cloud API calls against the configured
+daily or monthly allowance. It projects when the allowance will run out
+and turns the remaining calls into per-device minimum poll intervals, so
+polling slows down gracefully instead of stopping when quota gets tight.
+
+Quota errors (code 1106) only refine the estimate: the accountant marks
+the allowance as used up and polling continues at a slow probe interval
+until a call succeeds again or the quota period rolls over.
+"""
+
+import calendar
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from config.Config import TuyaConfig
+
+# Tuya error code returned when the API quota is used up
+QUOTA_ERROR_CODE = 1106
+
+
+def is_quota_error(response):
+    """
+    Check whether a Tuya API response reports quota or permission exhaustion.
+
+    Args:
+        response (dict): Tuya API response
+
+    Returns:
+        bool: True for failed responses with a quota/permission message or code 1106
+    """
+    if not response or response.get("success"):
+        return False
+    error_msg = str(response.get("msg", "")).lower()
+    return "quota" in error_msg or "permission" in error_msg or response.get("code") == QUOTA_ERROR_CODE
+
+
+def is_not_owned_error(response):
+    """
+    Check whether a Tuya API response says the device is not in the calling project.
+
+    The platform answers both quota exhaustion and requests for another
+    project's device with code 1106; only the quota error mentions the quota.
+
+    Args:
+        response (dict): Tuya API response
+
+    Returns:
+        bool: True for code 1106 responses whose message does not mention the quota
+    """
+    if not response or response.get("success"):
+        return False
+    error_msg = str(response.get("msg", "")).lower()
+    return response.get("code") == QUOTA_ERROR_CODE and "quota" not in error_msg
+
+
+class QuotaAccountant:
+    """
+    Thread-safe accountant for Tuya API calls.
+
+    Counts calls in the current quota period, projects the exhaustion time
+    from the observed burn rate and spreads the remaining calls across
+    devices in proportion to their priority weight.
+    """
+
+    def __init__(self, allowance=0, period="month", probe_interval=900, priorities=None):
+        """
+        Initialize the quota accountant.
+
+        Args:
+            allowance (int): Calls allowed per period, 0 when unknown
+            period (str): "month" or "day"
+            probe_interval (int): Seconds between polls while the quota is exhausted
+            priorities (dict, optional): Device ID to priority weight (default weight 1)
+        """
+        self.allowance = allowance
+        self.period = "day" if period == "day" else "month"
+        self.probe_interval = probe_interval
+        self.priorities = dict(priorities or {})
+        self.total_weight = 1.0
+        self.used = 0
+        self.exhausted = False
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+        self._period_end = self._next_reset(self._started_at)
+
+    @classmethod
+    def from_config(cls):
+        """
+        Build an accountant from the TUYA_QUOTA_* configuration values.
+
+        Returns:
+            QuotaAccountant: Accountant configured from environment settings
+        """
+        return cls(
+            allowance=TuyaConfig.QUOTA_ALLOWANCE,
+            period=TuyaConfig.QUOTA_PERIOD,
+            probe_interval=TuyaConfig.QUOTA_PROBE_INTERVAL,
+            priorities=TuyaConfig.DEVICE_PRIORITIES,
+        )
+
+    def _next_reset(self, now):
+        """
+        Compute when the quota period containing `now` ends.
+
+        Args:
+            now (float): Unix timestamp
+
+        Returns:
+            float: Unix timestamp of the next period start (UTC)
+        """
+        current = datetime.fromtimestamp(now, tz=timezone.utc)
+        if self.period == "day":
+            start = datetime(current.year, current.month, current.day, tzinfo=timezone.utc)
+            return start.timestamp() + 86400
+
+        days_in_month = calendar.monthrange(current.year, current.month)[1]
+        start = datetime(current.year, current.month, 1, tzinfo=timezone.utc)
+        return start.timestamp() + days_in_month * 86400
+
+    def _roll_period(self, now):
+        """Reset the counters when a new quota period has started (lock held)."""
+        if now >= self._period_end:
+            self.used = 0
+            self.exhausted = False
+            self._started_at = now
+            self._period_end = self._next_reset(now)
+            logging.info("♻️  Tuya quota period rolled over, call counters reset")
+
+    def register_devices(self, device_ids):
+        """
+        Register the polled devices so their priority weights can be normalized.
+
+        Args:
+            device_ids (list): Devices sharing the remaining quota
+        """
+        with self._lock:
+            self.total_weight = sum(self.priorities.get(d, 1.0) for d in device_ids) or 1.0
+
+    def observe(self, response, calls=1, learn=True):
+        """
+        Account for completed API calls and learn from their response.
+
+        Args:
+            response (dict): Tuya API response (None for transport failures)
+            calls (int): Number of upstream calls the response represents
+            learn (bool): Update the exhausted state from the response. Device
+                discovery probes only count their calls.
+        """
+        now = time.time()
+        with self._lock:
+            self._roll_period(now)
+            self.used += calls
+            if not learn:
+                return
+
+            if is_quota_error(response):
+                if not self.exhausted:
+                    # The platform says we are out, whatever our own count says
+                    logging.warning(
+                        f"Tuya quota exhausted after {self.used} counted call(s); "
+                        f"probing every {self.probe_interval}s until it is restored"
+                    )
+                    self.exhausted = True
+            elif response and response.get("success") and self.exhausted:
+                logging.info("♻️  Tuya quota restored, resuming normal polling")
+                self.exhausted = False
+
+    def remaining(self):
+        """
+        Estimate the calls left in the current period.
+
+        Returns:
+            int: Remaining calls, or None when the allowance is unknown
+        """
+        with self._lock:
+            self._roll_period(time.time())
+            if self.exhausted:
+                return 0
+            if self.allowance <= 0:
+                return None
+            return max(0, self.allowance - self.used)
+
+    def projected_exhaustion(self):
+        """
+        Project when the allowance runs out at the current burn rate.
+
+        Returns:
+            float: Unix timestamp of the projected exhaustion, or None if the
+                allowance is unknown or will last past the end of the period
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return None
+
+        now = time.time()
+        if remaining == 0:
+            return now
+
+        with self._lock:
+            elapsed = max(now - self._started_at, 1.0)
+            rate = self.used / elapsed
+            period_end = self._period_end
+
+        if rate <= 0:
+            return None
+        projected = now + remaining / rate
+        return projected if projected < period_end else None
+
+    def interval_floor(self, device_id=None, calls_per_poll=1):
+        """
+        Compute the minimum poll interval that keeps within the remaining quota.
+
+        Remaining calls are shared across devices by priority weight; passing
+        no device ID returns the floor for polling the whole fleet at once.
+
+        Args:
+            device_id (str, optional): Device to compute the floor for
+            calls_per_poll (float): Upstream calls one poll of the device (or fleet) costs
+
+        Returns:
+            float: Minimum seconds between polls (0 when unconstrained)
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return 0.0
+
+        seconds_left = max(self._period_end - time.time(), 1.0)
+        if remaining == 0:
+            return float(min(self.probe_interval, seconds_left))
+
+        if device_id is None:
+            share = 1.0
+        else:
+            share = self.priorities.get(device_id, 1.0) / self.total_weight
+
+        return seconds_left * calls_per_poll / (remaining * share)
+
+    def summary(self):
+        """
+        Describe the current quota usage for logs.
+
+        Returns:
+            str: Human-readable usage and projection
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return f"{self.used} call(s) this {self.period} (allowance unknown)"
+
+        text = f"{self.used}/{self.allowance} call(s) this {self.period}"
+        projected = self.projected_exhaustion()
+        if projected is not None:
+            eta = datetime.fromtimestamp(projected, tz=timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+            text += f", projected exhaustion {eta}"
+        return text
+
+
+# Global singleton instance for application-wide use
+quota_accountant = QuotaAccountant.from_config()
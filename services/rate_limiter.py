@@ -0,0 +1,305 @@
+"""
+Rate Limiter - Shared Client-side Limits for Tuya API Calls
+
+This module keeps every Tuya API consumer in the process (the poller, the
+REST routes, bulk jobs) under the platform's request rate, so requests wait
+briefly on our side instead of being rejected with 429 or quota errors.
+
+Each endpoint draws from a token bucket; endpoints without a limit of their
+own share the "default" bucket. Waiting callers are served by priority
+class, so alert-critical polls go ahead of ad-hoc API reads, and only
+non-critical callers give up after a maximum wait. Coroutines wait with
+acquire_async(), which sleeps on the event loop instead of parking a thread.
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from config.Config import TuyaConfig
+
+# Priority classes, served in this order
+PRIORITY_ALERT = 0  # Polls that drive door alerts
+PRIORITY_API = 1  # Ad-hoc REST reads and commands
+PRIORITY_BULK = 2  # Background and bulk jobs
+
+PRIORITY_NAMES = {PRIORITY_ALERT: "alert", PRIORITY_API: "api", PRIORITY_BULK: "bulk"}
+
+DEFAULT_BUCKET = "default"
+
+
+def parse_limits(spec):
+    """
+    Parse a rate limit specification.
+
+    Args:
+        spec (str): Comma-separated "endpoint:rate[:burst]" entries, rate in
+            requests per second, e.g. "default:10:20,device_commands:2"
+
+    Returns:
+        dict: Endpoint name to (rate, burst)
+    """
+    limits = {}
+    for entry in (spec or "").split(","):
+        parts = [part.strip() for part in entry.split(":")]
+        if len(parts) < 2 or not parts[0]:
+            continue
+        rate = float(parts[1])
+        burst = float(parts[2]) if len(parts) > 2 and parts[2] else max(1.0, rate)
+        limits[parts[0]] = (rate, burst)
+    return limits
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket whose waiters are served by priority.
+
+    Waiters queue on (priority, arrival); only the head of the queue may
+    take a token, so a steady stream of low-priority calls never starves
+    an alert poll. A rate of 0 disables the limit.
+    """
+
+    def __init__(self, name, rate, burst=None):
+        """
+        Initialize the bucket.
+
+        Args:
+            name (str): Bucket name used in metrics
+            rate (float): Tokens added per second, 0 for unlimited
+            burst (float, optional): Bucket capacity. Defaults to max(1, rate).
+        """
+        self.name = name
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._waiters = []  # Heap of (priority, sequence)
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._stats = {
+            priority: dict(acquired=0, waited=0, rejected=0, wait_total=0.0, wait_max=0.0)
+            for priority in PRIORITY_NAMES
+        }
+
+    def _refill(self, now):
+        """Add the tokens earned since the last update (lock held)."""
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority=PRIORITY_API, timeout=None):
+        """
+        Take one token, waiting for it if necessary.
+
+        Args:
+            priority (int): Priority class of the caller
+            timeout (float, optional): Maximum seconds to wait; None waits indefinitely
+
+        Returns:
+            float: Seconds waited, or None if the timeout expired first
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        with self._cond:
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._waiters, ticket)
+            started = time.monotonic()
+            deadline = None if timeout is None else started + timeout
+            slept = False
+
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                head = self._waiters[0] == ticket
+                if head and self._tokens >= 1:
+                    self._tokens -= 1
+                    heapq.heappop(self._waiters)
+                    self._cond.notify_all()  # Next waiter becomes head
+                    return self._record(priority, now - started if slept else 0.0)
+
+                if deadline is not None and now >= deadline:
+                    self._waiters.remove(ticket)
+                    heapq.heapify(self._waiters)
+                    self._cond.notify_all()
+                    self._stats[priority]["rejected"] += 1
+                    return None
+
+                # The head sleeps until its token is due; the rest until the head moves
+                wait = (1 - self._tokens) / self.rate if head else None
+                if deadline is not None:
+                    wait = deadline - now if wait is None else min(wait, deadline - now)
+                self._cond.wait(wait)
+                slept = True
+
+    def try_acquire(self, priority=PRIORITY_API, waited=0.0):
+        """
+        Take one token if it is available now, without waiting.
+
+        Callers already waiting in acquire() keep their turn: no token is
+        taken while the queue is not empty. A refusal is not counted as a
+        rejection; callers that give up call reject().
+
+        Args:
+            priority (int): Priority class of the caller
+            waited (float): Seconds the caller has already spent retrying, for
+                the wait statistics
+
+        Returns:
+            float: 0.0 if a token was taken, otherwise seconds until the next
+                token is due
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            if not self._waiters and self._tokens >= 1:
+                self._tokens -= 1
+                self._record(priority, waited)
+                return 0.0
+            if self._tokens >= 1:
+                # A token is there but a waiter is first in line; check back a token later
+                return 1.0 / self.rate
+            return (1 - self._tokens) / self.rate
+
+    def reject(self, priority=PRIORITY_API):
+        """
+        Count a caller of try_acquire() that gave up without a token.
+
+        Args:
+            priority (int): Priority class of the caller
+        """
+        with self._cond:
+            self._stats[priority]["rejected"] += 1
+
+    def _record(self, priority, waited):
+        """Update wait statistics for a granted token (lock held)."""
+        stats = self._stats[priority]
+        stats["acquired"] += 1
+        if waited > 0:
+            stats["waited"] += 1
+            stats["wait_total"] += waited
+            stats["wait_max"] = max(stats["wait_max"], waited)
+        return waited
+
+    def metrics(self):
+        """
+        Snapshot of bucket metrics.
+
+        Returns:
+            dict: Limit settings, queue length and per-priority wait statistics
+        """
+        with self._cond:
+            priorities = {}
+            for priority, stats in self._stats.items():
+                priorities[PRIORITY_NAMES[priority]] = {
+                    "acquired": stats["acquired"],
+                    "waited": stats["waited"],
+                    "rejected": stats["rejected"],
+                    "avg_wait_ms": round(stats["wait_total"] / stats["waited"] * 1000, 1)
+                    if stats["waited"]
+                    else 0.0,
+                    "max_wait_ms": round(stats["wait_max"] * 1000, 1),
+                }
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "queued": len(self._waiters),
+                "priorities": priorities,
+            }
+
+
+class RateLimiter:
+    """
+    Per-endpoint token buckets with a shared default bucket.
+
+    Alert-priority callers wait as long as needed; other callers give up
+    after max_wait seconds so a REST request never hangs on the limiter.
+    """
+
+    def __init__(self, limits=None, max_wait=10):
+        """
+        Initialize the limiter.
+
+        Args:
+            limits (dict, optional): Endpoint name to (rate, burst). The
+                "default" entry covers every endpoint without its own limit;
+                without one, such endpoints are unlimited.
+            max_wait (float): Seconds non-alert callers wait before giving up
+        """
+        self.max_wait = max_wait
+        self._buckets = {
+            name: TokenBucket(name, rate, burst) for name, (rate, burst) in (limits or {}).items()
+        }
+
+    @classmethod
+    def from_config(cls):
+        """
+        Build a limiter from the TUYA_RATE_LIMIT* configuration values.
+
+        Returns:
+            RateLimiter: Limiter configured from environment settings
+        """
+        return cls(parse_limits(TuyaConfig.RATE_LIMITS), max_wait=TuyaConfig.RATE_LIMIT_MAX_WAIT)
+
+    def acquire(self, endpoint, priority=PRIORITY_API):
+        """
+        Wait for permission to call an endpoint.
+
+        Args:
+            endpoint (str): Endpoint name
+            priority (int): Priority class of the caller
+
+        Returns:
+            bool: False if the caller gave up after max_wait
+        """
+        bucket = self._buckets.get(endpoint) or self._buckets.get(DEFAULT_BUCKET)
+        if bucket is None:
+            return True
+        timeout = None if priority == PRIORITY_ALERT else self.max_wait
+        return bucket.acquire(priority, timeout) is not None
+
+    async def acquire_async(self, endpoint, priority=PRIORITY_API):
+        """
+        Wait for permission to call an endpoint without blocking the event loop.
+
+        Polls the bucket with try_acquire() and sleeps until the next token is
+        due, so waiting coroutines hold no thread. Threads blocked in
+        acquire() keep their place ahead of coroutines.
+
+        Args:
+            endpoint (str): Endpoint name
+            priority (int): Priority class of the caller
+
+        Returns:
+            bool: False if the caller gave up after max_wait
+        """
+        bucket = self._buckets.get(endpoint) or self._buckets.get(DEFAULT_BUCKET)
+        if bucket is None:
+            return True
+        started = time.monotonic()
+        deadline = None if priority == PRIORITY_ALERT else started + self.max_wait
+        waited = 0.0
+        while True:
+            wait = bucket.try_acquire(priority, waited)
+            if wait <= 0:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    bucket.reject(priority)
+                    return False
+                wait = min(wait, remaining)
+            await asyncio.sleep(wait)
+            waited = time.monotonic() - started
+
+    def metrics(self):
+        """
+        Snapshot of every bucket.
+
+        Returns:
+            dict: Bucket name to bucket metrics
+        """
+        return {name: bucket.metrics() for name, bucket in self._buckets.items()}
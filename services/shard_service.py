@@ -0,0 +1,418 @@
+"""
+Shard Service - Lease-based Device Ownership Across Replicas
+
+This module lets several replicas monitor one fleet without polling (and
+alerting on) the same device twice. Devices are hashed into a fixed number
+of shards with jump consistent hashing, and every replica polls only the
+shards it holds a renewable lease on.
+
+Replicas announce themselves with a membership heartbeat and each claims a
+fair share of the shards, releasing extras when new replicas join. When a
+replica dies its leases expire and the survivors pick the shards up, so
+ownership moves within about one lease TTL. Lease storage is pluggable;
+SQLiteLeaseBackend only serves replicas on a single host.
+
+A replica taking over a shard continues its devices from the shared state
+snapshot, so sharding requires STATE_SNAPSHOT_PATH (see Config.validate).
+"""
+
+import hashlib
+import logging
+import math
+import os
+import socket
+import sqlite3
+import threading
+import time
+from config.Config import Config
+
+
+def jump_hash(key, buckets):
+    """
+    Jump consistent hash (Lamping and Veach).
+
+    Changing the bucket count only moves the minimum number of keys.
+
+    Args:
+        key (int): 64-bit key
+        buckets (int): Number of buckets
+
+    Returns:
+        int: Bucket in range(buckets)
+    """
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return bucket
+
+
+def shard_for(device_id, shard_count):
+    """
+    Map a device to its shard.
+
+    Args:
+        device_id (str): Device to place
+        shard_count (int): Total number of shards
+
+    Returns:
+        int: Shard number, stable across processes and restarts
+    """
+    digest = hashlib.sha1(device_id.encode("utf-8")).digest()
+    return jump_hash(int.from_bytes(digest[:8], "big"), shard_count)
+
+
+class LeaseBackend:
+    """
+    Interface for shard lease storage.
+
+    Implementations must make acquire() atomic across every replica: a
+    lease is granted when it is free, expired, or already held by the
+    caller. Times are Unix timestamps so they are comparable between hosts.
+    """
+
+    def acquire(self, shard, holder, ttl, now=None):
+        """
+        Acquire or renew the lease of a shard.
+
+        Args:
+            shard (int): Shard number
+            holder (str): Replica requesting the lease
+            ttl (float): Lease duration in seconds
+            now (float, optional): Current Unix time
+
+        Returns:
+            bool: True if the caller holds the lease afterwards
+        """
+        raise NotImplementedError
+
+    def release(self, shard, holder):
+        """
+        Give up a lease held by holder.
+
+        Args:
+            shard (int): Shard number
+            holder (str): Replica releasing the lease
+        """
+        raise NotImplementedError
+
+    def owners(self, now=None):
+        """
+        List live leases.
+
+        Args:
+            now (float, optional): Current Unix time
+
+        Returns:
+            dict: Shard number to holder for unexpired leases
+        """
+        raise NotImplementedError
+
+    def heartbeat(self, holder, ttl, now=None):
+        """
+        Announce that a replica is alive.
+
+        Args:
+            holder (str): Replica ID
+            ttl (float): Seconds the announcement stays valid
+            now (float, optional): Current Unix time
+        """
+        raise NotImplementedError
+
+    def leave(self, holder):
+        """
+        Withdraw a replica's membership.
+
+        Args:
+            holder (str): Replica ID
+        """
+        raise NotImplementedError
+
+    def members(self, now=None):
+        """
+        List live replicas.
+
+        Args:
+            now (float, optional): Current Unix time
+
+        Returns:
+            list: Sorted IDs of replicas with an unexpired heartbeat
+        """
+        raise NotImplementedError
+
+
+class SQLiteLeaseBackend(LeaseBackend):
+    """
+    Lease backend stored in a SQLite file.
+
+    Suitable for local testing and for replicas on a single host; every
+    lease update is a single atomic statement. The database uses WAL mode,
+    whose shared-memory index does not work over network file systems
+    (NFS, EFS, SMB), so the file must not be shared between hosts.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize the backend.
+
+        Args:
+            path (str): SQLite file path
+        """
+        self.path = path
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """
+        Open the database and create the schema on first use (lock held).
+
+        Returns:
+            sqlite3.Connection: Open connection in autocommit mode
+        """
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            connection = sqlite3.connect(
+                self.path, timeout=10, isolation_level=None, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS shard_lease ("
+                " shard INTEGER PRIMARY KEY,"
+                " holder TEXT NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS shard_member ("
+                " holder TEXT PRIMARY KEY,"
+                " expires_at REAL NOT NULL)"
+            )
+            self._connection = connection
+        return self._connection
+
+    def acquire(self, shard, holder, ttl, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            cursor = self._connect().execute(
+                "INSERT INTO shard_lease (shard, holder, expires_at) VALUES (?, ?, ?)"
+                " ON CONFLICT(shard) DO UPDATE SET"
+                " holder = excluded.holder, expires_at = excluded.expires_at"
+                " WHERE shard_lease.holder = excluded.holder OR shard_lease.expires_at <= ?",
+                (shard, holder, now + ttl, now),
+            )
+            return cursor.rowcount == 1
+
+    def release(self, shard, holder):
+        with self._lock:
+            self._connect().execute(
+                "DELETE FROM shard_lease WHERE shard = ? AND holder = ?", (shard, holder)
+            )
+
+    def owners(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT shard, holder FROM shard_lease WHERE expires_at > ?", (now,)
+            ).fetchall()
+        return dict(rows)
+
+    def heartbeat(self, holder, ttl, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self._connect().execute(
+                "INSERT INTO shard_member (holder, expires_at) VALUES (?, ?)"
+                " ON CONFLICT(holder) DO UPDATE SET expires_at = excluded.expires_at",
+                (holder, now + ttl),
+            )
+
+    def leave(self, holder):
+        with self._lock:
+            self._connect().execute("DELETE FROM shard_member WHERE holder = ?", (holder,))
+
+    def members(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT holder FROM shard_member WHERE expires_at > ? ORDER BY holder", (now,)
+            ).fetchall()
+        return [holder for (holder,) in rows]
+
+    def close(self):
+        """Close the database connection if it is open."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class ShardCoordinator:
+    """
+    Keeps this replica's share of shard leases and tells the poller which
+    devices it owns.
+
+    A background thread renews held leases every TTL/4, claims free shards
+    up to a fair share of ceil(shards / live replicas) and releases extras
+    when the share shrinks. A lease that cannot be renewed is dropped at
+    once, so a device is never polled by two replicas.
+    """
+
+    def __init__(self, backend, shard_count=64, lease_ttl=30, holder_id=None):
+        """
+        Initialize the coordinator.
+
+        Args:
+            backend (LeaseBackend): Shared lease storage
+            shard_count (int): Number of shards the fleet is split into
+            lease_ttl (float): Lease duration in seconds
+            holder_id (str, optional): Unique replica ID. Defaults to host name and PID.
+        """
+        self.backend = backend
+        self.shard_count = shard_count
+        self.lease_ttl = lease_ttl
+        self.holder_id = holder_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.owned_shards = set()
+        self.fleet = []  # Every configured device, owned or not
+        self.poller = None
+        self.running = False
+        self.thread = None
+        self._stop_event = threading.Event()
+
+    @classmethod
+    def from_config(cls):
+        """
+        Build a coordinator from the SHARD_* configuration values.
+
+        Returns:
+            ShardCoordinator: Coordinator using the SQLite lease backend
+        """
+        return cls(
+            SQLiteLeaseBackend(Config.SHARD_LEASE_PATH),
+            shard_count=Config.SHARD_COUNT,
+            lease_ttl=Config.SHARD_LEASE_TTL,
+            holder_id=Config.SHARD_HOLDER_ID or None,
+        )
+
+    def owned_devices(self):
+        """
+        Get the devices in the shards this replica holds.
+
+        Returns:
+            list: Owned device IDs in fleet order
+        """
+        return [d for d in self.fleet if shard_for(d, self.shard_count) in self.owned_shards]
+
+    def rebalance(self, now=None):
+        """
+        Run one lease round: heartbeat, renew, release extras, claim free shards.
+
+        Args:
+            now (float, optional): Current Unix time
+
+        Returns:
+            bool: True if the set of owned shards changed
+        """
+        now = time.time() if now is None else now
+        before = set(self.owned_shards)
+
+        try:
+            self.backend.heartbeat(self.holder_id, self.lease_ttl, now)
+            members = self.backend.members(now) or [self.holder_id]
+            fair_share = math.ceil(self.shard_count / len(members))
+
+            # Renew what we hold; anything we cannot renew is no longer ours
+            for shard in sorted(self.owned_shards):
+                if not self.backend.acquire(shard, self.holder_id, self.lease_ttl, now):
+                    self.owned_shards.discard(shard)
+
+            # Hand extras back so newly joined replicas can claim them
+            for shard in sorted(self.owned_shards, reverse=True)[
+                : max(0, len(self.owned_shards) - fair_share)
+            ]:
+                self.backend.release(shard, self.holder_id)
+                self.owned_shards.discard(shard)
+
+            # Claim free or expired shards up to the fair share
+            if len(self.owned_shards) < fair_share:
+                taken = self.backend.owners(now)
+                for shard in range(self.shard_count):
+                    if len(self.owned_shards) >= fair_share:
+                        break
+                    if shard in taken or shard in self.owned_shards:
+                        continue
+                    if self.backend.acquire(shard, self.holder_id, self.lease_ttl, now):
+                        self.owned_shards.add(shard)
+        except Exception as e:
+            # Without a working backend we cannot prove ownership; stop polling everything
+            logging.error(f"Shard lease round failed, dropping all shards: {e}")
+            self.owned_shards.clear()
+
+        changed = self.owned_shards != before
+        if changed:
+            logging.info(
+                f"Shard ownership changed: {len(self.owned_shards)}/{self.shard_count} shard(s), "
+                f"{len(self.owned_devices())}/{len(self.fleet)} device(s) held by {self.holder_id}"
+            )
+            if self.poller is not None:
+                self.poller.set_devices(self.owned_devices())
+        return changed
+
+    def _lease_loop(self):
+        """Background thread body: run a lease round every TTL/4."""
+        while not self._stop_event.wait(self.lease_ttl / 4):
+            self.rebalance()
+
+    def start(self, poller):
+        """
+        Take over device assignment for a poller and start renewing leases.
+
+        The poller's configured devices become the fleet; it is narrowed to
+        the owned devices before this returns, so call this before poller.start().
+
+        Args:
+            poller (DoorSensorPoller): Poller to assign devices to
+        """
+        if self.running:
+            logging.warning("Shard coordinator already running")
+            return
+
+        self.poller = poller
+        self.fleet = list(poller.device_ids)
+        poller.set_devices([])
+
+        print(f"Sharding enabled - replica {self.holder_id}, {self.shard_count} shards")
+        self.rebalance()
+
+        self.running = True
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._lease_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop renewing and release every lease so other replicas take over at once.
+        """
+        self.running = False
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+        for shard in sorted(self.owned_shards):
+            try:
+                self.backend.release(shard, self.holder_id)
+            except Exception as e:
+                logging.error(f"Failed to release shard {shard}: {e}")
+        self.owned_shards.clear()
+        try:
+            self.backend.leave(self.holder_id)
+        except Exception as e:
+            logging.error(f"Failed to leave shard membership: {e}")
+
+        if self.poller is not None:
+            self.poller.set_devices([])
+
+
+# Global singleton instance for application-wide use
+shard_coordinator = ShardCoordinator.from_config()
@@ -0,0 +1,90 @@
+"""
+Single Flight - Coalescing of Concurrent Identical Requests
+
+This module lets concurrent callers asking for the same thing share one
+execution. The first caller for a key runs the function; callers arriving
+while it is in flight wait for it and receive the same result (or the
+same exception) instead of issuing their own upstream request.
+"""
+
+import threading
+
+
+class _Call:
+    """One in-flight execution and the callers waiting on it."""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Thread-safe request coalescer keyed by an arbitrary hashable key.
+
+    Results are not cached: once the in-flight call finishes, the next
+    caller for the key starts a new one.
+    """
+
+    def __init__(self):
+        """Initialize with no calls in flight."""
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0  # Calls actually run
+        self.shared = 0  # Callers served by another caller's call
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Run func once for all concurrent callers with the same key.
+
+        Args:
+            key (hashable): Identity of the request, e.g. ("GET", path)
+            func (callable): Function performing the request
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+
+        Returns:
+            The result of func, shared by every caller of this flight
+
+        Raises:
+            Exception: Whatever func raised, re-raised in every waiting caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.shared += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self):
+        """
+        Count the calls currently running.
+
+        Returns:
+            int: Number of distinct keys in flight
+        """
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,146 @@
+"""
+State Store - Persistent Device State Snapshot
+
+This module keeps the last known door state of every monitored device in
+a small SQLite database (WAL mode). The poller loads the snapshot when it
+starts, so a restart or rollout neither re-sends the "sensor initialized"
+alert for unchanged doors nor misses a transition that happened while the
+service was down.
+
+Persistence is optional: without STATE_SNAPSHOT_PATH the store is disabled
+and every method is a cheap no-op.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from config.Config import Config
+
+
+class DeviceStateStore:
+    """
+    SQLite-backed snapshot of per-device door state.
+
+    The connection is opened lazily on first use and shared between threads
+    behind a lock; writes only happen on state transitions, so contention
+    is negligible.
+    """
+
+    def __init__(self, path=None):
+        """
+        Initialize the state store.
+
+        Args:
+            path (str, optional): SQLite file path. None or empty disables persistence.
+        """
+        self.path = path or None
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls):
+        """
+        Build a store from the STATE_SNAPSHOT_PATH configuration value.
+
+        Returns:
+            DeviceStateStore: Store for the configured snapshot file
+        """
+        return cls(Config.STATE_SNAPSHOT_PATH)
+
+    @property
+    def enabled(self):
+        """bool: True when a snapshot file is configured."""
+        return self.path is not None
+
+    def _connect(self):
+        """
+        Open the database and create the schema on first use (lock held).
+
+        Returns:
+            sqlite3.Connection: Open connection
+        """
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS device_state ("
+                " device_id TEXT PRIMARY KEY,"
+                " door_state INTEGER NOT NULL,"
+                " updated_at INTEGER NOT NULL)"
+            )
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def load(self, device_ids=None):
+        """
+        Load the last known door states.
+
+        Args:
+            device_ids (list, optional): Only return these devices
+
+        Returns:
+            dict: Device ID to door state (True when open)
+        """
+        if not self.enabled:
+            return {}
+
+        try:
+            with self._lock:
+                rows = self._connect().execute(
+                    "SELECT device_id, door_state FROM device_state"
+                ).fetchall()
+        except sqlite3.Error as e:
+            logging.error(f"Failed to load device state snapshot: {e}")
+            return {}
+
+        states = {device_id: bool(door_state) for device_id, door_state in rows}
+        if device_ids is not None:
+            wanted = set(device_ids)
+            states = {d: state for d, state in states.items() if d in wanted}
+        return states
+
+    def save(self, device_id, door_state, timestamp=None):
+        """
+        Record the latest door state of a device.
+
+        Args:
+            device_id (str): Device the state belongs to
+            door_state (bool): Door state (True when open)
+            timestamp (int, optional): Reading time in milliseconds. Defaults to now.
+        """
+        if not self.enabled:
+            return
+
+        timestamp = timestamp or int(time.time() * 1000)
+        try:
+            with self._lock:
+                connection = self._connect()
+                connection.execute(
+                    "INSERT INTO device_state (device_id, door_state, updated_at)"
+                    " VALUES (?, ?, ?)"
+                    " ON CONFLICT(device_id) DO UPDATE SET"
+                    " door_state = excluded.door_state, updated_at = excluded.updated_at",
+                    (device_id, int(bool(door_state)), timestamp),
+                )
+                connection.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Failed to save state of {device_id}: {e}")
+
+    def close(self):
+        """Close the database connection if it is open."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+# Global singleton instance for application-wide use
+device_state_store = DeviceStateStore.from_config()
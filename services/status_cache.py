@@ -0,0 +1,214 @@
+"""
+Status Cache - Read-through Device Status Cache
+
+This module keeps the latest status of every device in memory so REST
+reads do not cost an API call. The poller and the Pulsar listener write
+readings into the cache as they arrive; REST reads are served from it.
+
+Each entry has its own TTL. A read of a fresh entry is a memory lookup, a
+read of a stale entry returns the stale reading at once and refreshes it
+in the background (stale-while-revalidate), and only a missing or very old
+entry is fetched synchronously. If that fetch fails or raises, the old
+reading is still served, so reads stay fast while the upstream API is down.
+"""
+
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from config.Config import Config
+
+# Result of a cache read: Tuya-style response, age of the reading in seconds, stale flag
+CachedStatus = namedtuple("CachedStatus", ["response", "age", "stale"])
+
+
+class _Entry:
+    """Cached status of one device."""
+
+    __slots__ = ("status", "updated_at", "ttl")
+
+    def __init__(self, status, updated_at, ttl):
+        self.status = status
+        self.updated_at = updated_at
+        self.ttl = ttl
+
+
+class StatusCache:
+    """
+    Thread-safe per-device status cache with stale-while-revalidate reads.
+
+    Background refreshes run on a small thread pool, at most one per device.
+    """
+
+    def __init__(self, ttl=30, max_stale=600, refresh_workers=2):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl (float): Default seconds a reading is served without refreshing
+            max_stale (float): Seconds after which a reading is too old to serve
+                and is fetched synchronously instead
+            refresh_workers (int): Threads used for background refreshes
+        """
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.refresh_workers = refresh_workers
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._pool = None
+
+    @classmethod
+    def from_config(cls):
+        """
+        Build a cache from the STATUS_CACHE_* configuration values.
+
+        Returns:
+            StatusCache: Cache configured from environment settings
+        """
+        return cls(ttl=Config.STATUS_CACHE_TTL, max_stale=Config.STATUS_CACHE_MAX_STALE)
+
+    def put(self, device_id, status, ttl=None):
+        """
+        Store a complete status reading.
+
+        Args:
+            device_id (str): Device the status belongs to
+            status (list): Status entries ({"code": ..., "value": ...})
+            ttl (float, optional): Freshness of this entry. Defaults to the cache TTL.
+        """
+        entry = _Entry(list(status), time.monotonic(), self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[device_id] = entry
+
+    def merge(self, device_id, changes):
+        """
+        Apply a partial update (e.g. a Pulsar event) to a cached reading.
+
+        Devices without a cached reading are left alone, since a partial
+        update is not a complete status.
+
+        Args:
+            device_id (str): Device the update belongs to
+            changes (list): Changed status entries ({"code": ..., "value": ...})
+        """
+        with self._lock:
+            entry = self._entries.get(device_id)
+            if entry is None:
+                return
+            updates = {change.get("code"): change.get("value") for change in changes}
+            status = [
+                {**item, "value": updates.pop(item.get("code"))}
+                if item.get("code") in updates
+                else item
+                for item in entry.status
+            ]
+            status.extend({"code": code, "value": value} for code, value in updates.items())
+            self._entries[device_id] = _Entry(status, time.monotonic(), entry.ttl)
+
+    def get(self, device_id, loader):
+        """
+        Read a device status through the cache.
+
+        Args:
+            device_id (str): Device to read
+            loader (callable): Fetches a Tuya status response for a device ID,
+                e.g. tuya_service.get_device_status
+
+        Returns:
+            CachedStatus: Response, age of the reading in seconds and stale flag
+
+        Raises:
+            Exception: Whatever the loader raised, when no reading is cached
+        """
+        with self._lock:
+            entry = self._entries.get(device_id)
+            age = None if entry is None else time.monotonic() - entry.updated_at
+            if entry is not None and age < entry.ttl:
+                self.hits += 1
+                return CachedStatus({"success": True, "result": list(entry.status)}, age, False)
+
+            stale = entry is not None and age < self.max_stale
+            if stale:
+                self.stale_hits += 1
+            else:
+                self.misses += 1
+
+        if stale:
+            self._refresh_in_background(device_id, loader)
+            return CachedStatus({"success": True, "result": list(entry.status)}, age, True)
+
+        # Missing or too old: read through synchronously
+        try:
+            response = loader(device_id)
+        except Exception as e:
+            # Timeouts and connection errors after retries: the last reading beats an error
+            if entry is None:
+                raise
+            logging.warning(f"Status read raised for {device_id}, serving cached reading: {e}")
+            return CachedStatus({"success": True, "result": list(entry.status)}, age, True)
+
+        if response.get("success"):
+            self.put(device_id, response.get("result") or [])
+            return CachedStatus(response, 0.0, False)
+
+        # Upstream failed (e.g. circuit open): the last reading beats no reading
+        if entry is not None:
+            return CachedStatus({"success": True, "result": list(entry.status)}, age, True)
+        return CachedStatus(response, 0.0, False)
+
+    def _refresh_in_background(self, device_id, loader):
+        """Start a background refresh unless one is already running for the device."""
+        with self._lock:
+            if device_id in self._refreshing:
+                return
+            self._refreshing.add(device_id)
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.refresh_workers, thread_name_prefix="status-refresh"
+                )
+        self._pool.submit(self._refresh, device_id, loader)
+
+    def _refresh(self, device_id, loader):
+        """Fetch a fresh reading for a stale entry."""
+        try:
+            response = loader(device_id)
+            if response.get("success"):
+                self.put(device_id, response.get("result") or [])
+            else:
+                logging.warning(
+                    f"Background status refresh failed for {device_id}: {response.get('msg')}"
+                )
+        except Exception as e:
+            logging.error(f"Background status refresh raised for {device_id}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(device_id)
+
+    def clear(self):
+        """Drop every cached reading."""
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self):
+        """
+        Snapshot of cache metrics.
+
+        Returns:
+            dict: Entry count and hit/stale/miss counters
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+            }
+
+
+# Global singleton instance for application-wide use
+status_cache = StatusCache.from_config()
@@ -0,0 +1,249 @@
+"""
+Token Manager - Tuya Access Token Lifecycle
+
+This module keeps the Tuya access token off the request hot path. The
+expiry of the cached token is tracked locally, so a request only checks a
+timestamp; a background timer renews the token with its refresh token
+well before it expires. Only when there is no usable token at all does a
+request obtain one itself, and concurrent requests then share a single
+grant behind a lock. With a token store configured, a still-valid token
+from a previous run is reused instead of requesting a new grant.
+
+The background refresh calls the token endpoints without holding the lock
+and with the same timeouts as every other request, so a hung refresh
+never blocks requests or stop().
+"""
+
+import logging
+import threading
+import time
+from tuya_connector import TuyaOpenAPI
+from tuya_connector.openapi import TuyaTokenInfo, TO_B_TOKEN_API, TO_B_REFRESH_TOKEN_API
+from services.http_timeout import mount_timeout
+
+# The connector refreshes inline within this many seconds of expiry; stay clear of it
+INLINE_REFRESH_WINDOW = 60
+
+# Seconds between retries when a background refresh fails
+REFRESH_RETRY_INTERVAL = 30
+
+# Tuya error code for an invalid or revoked access token
+TOKEN_INVALID_CODE = 1010
+
+
+class TokenManager:
+    """
+    Thread-safe cache and background refresher for a TuyaOpenAPI token.
+
+    Token endpoints are called through a separate token-less client so the
+    shared client keeps signing requests with the current token until the
+    new one is swapped in with a single assignment.
+    """
+
+    def __init__(self, openapi, refresh_margin=300, store=None, timeout=None):
+        """
+        Initialize the token manager.
+
+        Args:
+            openapi (TuyaOpenAPI): Client whose token is managed
+            refresh_margin (int): Seconds before expiry to refresh in the background
+            store (TokenStore, optional): Persists tokens across restarts
+            timeout (tuple, optional): (connect, read) timeout in seconds for the
+                token endpoint calls
+        """
+        self.openapi = openapi
+        self.refresh_margin = refresh_margin
+        self.store = store
+        self.timeout = timeout
+        self._saved_token = None  # Access token last written to the store
+        self.grants = 0
+        self.refreshes = 0
+        self._valid_until = 0.0  # Unix time until which requests skip all token checks
+        self._lock = threading.Lock()
+        self._timer = None
+        self._token_client = None
+        self._stopped = False  # Set by stop(); an in-flight refresh does not re-arm
+
+    def ensure_token(self):
+        """
+        Make sure a usable token is cached, obtaining one only if there is none.
+
+        The common case is a single timestamp comparison without locking.
+
+        Returns:
+            bool: True if this call performed a token grant
+        """
+        if time.time() < self._valid_until:
+            return False
+
+        with self._lock:
+            # Another thread may have obtained the token while we waited
+            if time.time() < self._valid_until:
+                return False
+            if self.openapi.is_connect() and not self._expired():
+                self._track_expiry()
+                return False
+
+            if self._restore():
+                return False
+
+            response = self.openapi.connect()
+            if response is not None and not response.get("success"):
+                logging.error(f"Tuya token grant failed: {response.get('msg', 'Unknown error')}")
+                return False
+
+            self.grants += 1
+            self._track_expiry()
+            return True
+
+    def invalidate(self):
+        """
+        Forget the cached expiry so the next request re-validates the token.
+
+        The stored copy is deleted too, since the platform rejected it.
+        """
+        self._valid_until = 0.0
+        if self.store is not None:
+            self.store.clear()
+            self._saved_token = None
+
+    def _restore(self):
+        """
+        Adopt a still-valid token from the store (lock held).
+
+        Returns:
+            bool: True if a stored token is now in use
+        """
+        if self.store is None:
+            return False
+
+        token_info = self.store.load()
+        if token_info is None:
+            return False
+
+        self.openapi.token_info = token_info
+        self._saved_token = token_info.access_token
+        self._track_expiry()
+        logging.info("Reusing stored Tuya access token")
+        return True
+
+    def stop(self):
+        """Cancel the pending background refresh."""
+        with self._lock:
+            self._stopped = True
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def _expires_at(self):
+        """
+        Read the expiry of the current token.
+
+        Returns:
+            float: Unix time the token expires, or None if unknown
+        """
+        expire_ms = getattr(self.openapi.token_info, "expire_time", None)
+        if isinstance(expire_ms, (int, float)) and not isinstance(expire_ms, bool) and expire_ms:
+            return expire_ms / 1000
+        return None
+
+    def _expired(self):
+        """Return True if the current token is inside the connector's refresh window."""
+        expires_at = self._expires_at()
+        return expires_at is not None and time.time() >= expires_at - INLINE_REFRESH_WINDOW
+
+    def _track_expiry(self):
+        """Cache the token expiry and schedule the next background refresh (lock held)."""
+        expires_at = self._expires_at()
+        if expires_at is None or not self.openapi.is_connect():
+            # Unknown expiry: fall back to checking the connection on every request
+            self._valid_until = 0.0
+            return
+
+        self._valid_until = expires_at - INLINE_REFRESH_WINDOW
+        self._persist()
+        self._schedule_refresh(max(0.0, expires_at - self.refresh_margin - time.time()))
+
+    def _persist(self):
+        """Write the current token to the store if it changed (lock held)."""
+        token_info = self.openapi.token_info
+        if self.store is None or token_info.access_token == self._saved_token:
+            return
+        self.store.save(token_info)
+        self._saved_token = token_info.access_token
+
+    def _schedule_refresh(self, delay):
+        """Start the background refresh timer (lock held)."""
+        self._stopped = False
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _token_request(self, path, params=None):
+        """
+        Call a token endpoint without signing with the current token.
+
+        Args:
+            path (str): Token API path
+            params (dict, optional): Query parameters
+
+        Returns:
+            dict: API response
+        """
+        if self._token_client is None:
+            self._token_client = TuyaOpenAPI(
+                self.openapi.endpoint, self.openapi.access_id, self.openapi.access_secret
+            )
+            if self.timeout is not None:
+                mount_timeout(self._token_client.session, self.timeout)
+        return self._token_client.get(path, params)
+
+    def _background_refresh(self):
+        """
+        Renew the token with its refresh token, falling back to a new grant.
+
+        The token endpoints are called without the lock; it is only taken to
+        swap in the new token and re-arm the timer.
+        """
+        with self._lock:
+            self._timer = None
+            token_info = self.openapi.token_info
+
+        refreshed = granted = False
+        try:
+            response = None
+            if token_info is not None and token_info.refresh_token:
+                response = self._token_request(
+                    TO_B_REFRESH_TOKEN_API.format(token_info.refresh_token)
+                )
+            if response and response.get("success"):
+                refreshed = True
+            else:
+                # Refresh token rejected or missing: request a new grant instead
+                response = self._token_request(TO_B_TOKEN_API, {"grant_type": 1})
+                granted = bool(response and response.get("success"))
+
+            if response and response.get("success"):
+                new_token = TuyaTokenInfo(response)
+                with self._lock:
+                    self.refreshes += refreshed
+                    self.grants += granted
+                    self.openapi.token_info = new_token
+                    if self._stopped:
+                        return
+                    self._track_expiry()
+                logging.info("Tuya access token refreshed in the background")
+                return
+
+            logging.warning(
+                f"Tuya token refresh failed: {(response or {}).get('msg', 'no response')}"
+            )
+        except Exception as e:
+            logging.error(f"Tuya token refresh raised: {e}")
+
+        # Keep using the current token while it lasts and try again shortly
+        with self._lock:
+            if not self._stopped:
+                self._schedule_refresh(REFRESH_RETRY_INTERVAL)
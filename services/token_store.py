@@ -0,0 +1,194 @@
+"""
+Token Store - Encrypted Tuya Token Persistence
+
+This module saves the Tuya access token to disk so a restart can reuse a
+still-valid token instead of spending an API call and a round trip on a
+new grant. The file is encrypted with AES-GCM (pycryptodome, installed
+with tuya-connector-python) and bound to the configured access ID and
+endpoint, so a token is never reused for different credentials.
+
+Persistence is optional: without TUYA_TOKEN_STORE_PATH the store is
+disabled and every method is a cheap no-op.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import time
+from Crypto.Cipher import AES
+from tuya_connector.openapi import TuyaTokenInfo
+from config.Config import TuyaConfig
+
+# Stored tokens this close to expiry are not worth restoring (seconds)
+MIN_REMAINING_LIFETIME = 120
+
+FILE_VERSION = 1
+
+
+def _b64(raw):
+    """Encode bytes as base64 text."""
+    return base64.b64encode(raw).decode("ascii")
+
+
+class TokenStore:
+    """
+    Encrypted file holding the latest Tuya token.
+
+    Writes go to a temporary file that replaces the old one atomically, so
+    replicas sharing a volume never read a half-written token.
+    """
+
+    def __init__(self, path=None, secret=None, access_id=None, endpoint=None):
+        """
+        Initialize the token store.
+
+        Args:
+            path (str, optional): Token file path. None or empty disables persistence.
+            secret (str, optional): Passphrase the encryption key is derived from.
+            access_id (str, optional): Tuya access ID the token belongs to
+            endpoint (str, optional): Tuya API endpoint the token belongs to
+        """
+        self.path = path or None
+        self.access_id = access_id or ""
+        self.endpoint = endpoint or ""
+        self._key = hashlib.sha256(f"{secret or ''}:{self.access_id}".encode("utf-8")).digest()
+
+    @classmethod
+    def from_config(cls):
+        """
+        Build a store from the TUYA_TOKEN_STORE_* configuration values.
+
+        The key defaults to one derived from the access secret, which anyone
+        able to use the token already has.
+
+        Returns:
+            TokenStore: Store for the configured token file
+        """
+        return cls(
+            TuyaConfig.TOKEN_STORE_PATH,
+            secret=TuyaConfig.TOKEN_STORE_KEY or TuyaConfig.ACCESS_SECRET,
+            access_id=TuyaConfig.ACCESS_ID,
+            endpoint=TuyaConfig.API_ENDPOINT,
+        )
+
+    @property
+    def enabled(self):
+        """bool: True when a token file is configured."""
+        return self.path is not None
+
+    def _encrypt(self, plaintext):
+        """
+        Encrypt and authenticate a payload.
+
+        Args:
+            plaintext (bytes): Data to protect
+
+        Returns:
+            dict: JSON-serializable envelope
+        """
+        cipher = AES.new(self._key, AES.MODE_GCM)
+        data, tag = cipher.encrypt_and_digest(plaintext)
+        return {
+            "v": FILE_VERSION,
+            "nonce": _b64(cipher.nonce),
+            "tag": _b64(tag),
+            "data": _b64(data),
+        }
+
+    def _decrypt(self, envelope):
+        """
+        Verify and decrypt an envelope.
+
+        Args:
+            envelope (dict): Envelope written by _encrypt
+
+        Returns:
+            bytes: Decrypted payload
+
+        Raises:
+            ValueError: If the envelope was tampered with or the key is wrong
+        """
+        if envelope.get("v") != FILE_VERSION:
+            raise ValueError(f"unsupported token file version {envelope.get('v')}")
+        cipher = AES.new(self._key, AES.MODE_GCM, nonce=base64.b64decode(envelope["nonce"]))
+        return cipher.decrypt_and_verify(
+            base64.b64decode(envelope["data"]), base64.b64decode(envelope["tag"])
+        )
+
+    def load(self):
+        """
+        Load the stored token if it is still usable.
+
+        Returns:
+            TuyaTokenInfo: Stored token, or None if missing, invalid, for other
+                credentials, or about to expire
+        """
+        if not self.enabled or not os.path.exists(self.path):
+            return None
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as token_file:
+                payload = json.loads(self._decrypt(json.load(token_file)))
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Ignoring unreadable Tuya token file: {e}")
+            return None
+
+        if payload.get("access_id") != self.access_id or payload.get("endpoint") != self.endpoint:
+            return None
+        if payload.get("expire_time", 0) / 1000 - time.time() < MIN_REMAINING_LIFETIME:
+            return None
+
+        token_info = TuyaTokenInfo({"result": {}})
+        token_info.access_token = payload.get("access_token", "")
+        token_info.refresh_token = payload.get("refresh_token", "")
+        token_info.expire_time = payload["expire_time"]
+        token_info.uid = payload.get("uid", "")
+        return token_info if token_info.access_token else None
+
+    def save(self, token_info):
+        """
+        Persist a token.
+
+        Args:
+            token_info (TuyaTokenInfo): Token to store
+        """
+        if not self.enabled or token_info is None:
+            return
+
+        payload = {
+            "access_id": self.access_id,
+            "endpoint": self.endpoint,
+            "access_token": token_info.access_token,
+            "refresh_token": token_info.refresh_token,
+            "expire_time": token_info.expire_time,
+            "uid": token_info.uid,
+        }
+        envelope = self._encrypt(json.dumps(payload).encode("utf-8"))
+
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as token_file:
+                json.dump(envelope, token_file)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logging.error(f"Failed to save Tuya token: {e}")
+
+    def clear(self):
+        """Delete the stored token, e.g. after the platform rejected it."""
+        if self.enabled:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logging.error(f"Failed to delete Tuya token file: {e}")
+
+
+# Global singleton instance for application-wide use
+token_store = TokenStore.from_config()
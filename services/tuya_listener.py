@@ -13,6 +13,8 @@ import json
 from tuya_connector import TuyaOpenPulsar, TuyaCloudPulsarTopic
 from config.Config import TuyaConfig
 from services.whatsapp_service import send_door_opened_alert, send_door_closed_alert
+from services.alert_outbox import alert_key
+from services.status_cache import status_cache
 
 
 class TuyaListener:
@@ -122,6 +124,9 @@ class TuyaListener:
                 logging.debug("No device ID found in message")
                 return
 
+            # Keep the REST status cache current for every reporting device
+            status_cache.merge(device_id, status_list)
+
             # Filter messages to only process our target device
             if device_id != TuyaConfig.DEVICE_ID:
                 logging.debug(f"Ignored message from different device: {device_id}")
@@ -138,7 +143,8 @@ class TuyaListener:
 
                 if code == "doorcontact_state":
                     # Extract timestamp from various possible fields
-                    status_timestamp = status.get("time") or status.get("t") or timestamp or "N/A"
+                    event_time = status.get("time") or status.get("t") or timestamp
+                    status_timestamp = event_time or "N/A"
 
                     if value:
                         # Door opened event
@@ -149,8 +155,8 @@ class TuyaListener:
                         logging.info(f"   Timestamp: {status_timestamp}")
                         logging.info(f"   Device ID: {device_id}")
 
-                        # Trigger WhatsApp notification
-                        send_door_opened_alert()
+                        # Queue WhatsApp notification; delivery never blocks the listener
+                        send_door_opened_alert(key=alert_key(device_id, "opened", event_time))
                     else:
                         # Door closed event
                         print(f"DOOR CLOSED (doorcontact_state = False)")
@@ -160,8 +166,8 @@ class TuyaListener:
                         logging.info(f"   Timestamp: {status_timestamp}")
                         logging.info(f"   Device ID: {device_id}")
 
-                        # Trigger WhatsApp notification
-                        send_door_closed_alert()
+                        # Queue WhatsApp notification; delivery never blocks the listener
+                        send_door_closed_alert(key=alert_key(device_id, "closed", event_time))
 
                 elif code == "battery_percentage":
                     # Log battery level updates
@@ -0,0 +1,433 @@
+"""
+Tuya Pool - Multi-region, Multi-account TuyaService Routing
+
+This module lets one process serve devices that live in several Tuya
+projects and data centers. The pool holds one TuyaService per account and
+region, each with its own token cache, connection pool, rate limits and
+circuit breakers, so a slow region never holds up the others.
+
+Which member owns a device is discovered once, by asking every member in
+parallel for the device's status, and remembered in a routing table that
+is optionally written to a JSON file. Without TUYA_ACCOUNTS the pool only
+holds the configured project and calls go straight through to it.
+
+Each account member has a quota accountant of its own, so one project's
+allowance is never charged for another's calls. The platform answers both
+"device not in this project" and "quota used up" with code 1106; only the
+former makes the pool forget a route, and discovery probes never mark a
+project's quota as exhausted.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+from config.Config import TuyaConfig
+from services.quota_service import QuotaAccountant, is_not_owned_error
+from services.rate_limiter import PRIORITY_API
+from services.token_store import TokenStore
+from services.tuya_service import TuyaService, tuya_service
+
+# Tuya OpenAPI endpoints by data center code
+REGION_ENDPOINTS = {
+    "cn": "https://openapi.tuyacn.com",  # China
+    "us": "https://openapi.tuyaus.com",  # Western America
+    "us-e": "https://openapi-ueaz.tuyaus.com",  # Eastern America
+    "eu": "https://openapi.tuyaeu.com",  # Central Europe
+    "eu-w": "https://openapi-weaz.tuyaeu.com",  # Western Europe
+    "in": "https://openapi.tuyain.com",  # India
+    "sg": "https://openapi-sg.iotbing.com",  # Singapore
+}
+
+# Key of the member built from TUYA_ACCESS_ID / TUYA_ENDPOINT
+DEFAULT_MEMBER = "default"
+
+# Bump when the routes file format changes; older files are ignored
+ROUTES_VERSION = 1
+
+# Seconds before trying again to find a device no member could read
+DISCOVERY_RETRY = 300
+
+
+def parse_accounts(spec):
+    """
+    Parse the TUYA_ACCOUNTS specification.
+
+    Args:
+        spec (str): Comma-separated "name:access_id:secret:region[|region...]"
+            entries; a region is a REGION_ENDPOINTS code or an endpoint URL
+
+    Returns:
+        dict: Member key ("name/region") to (endpoint, access_id, secret)
+    """
+    members = {}
+    for entry in (spec or "").split(","):
+        parts = [part.strip() for part in entry.split(":", 3)]
+        if len(parts) < 4 or not all(parts):
+            continue
+        name, access_id, secret, regions = parts
+        for region in filter(None, (region.strip() for region in regions.split("|"))):
+            endpoint = REGION_ENDPOINTS.get(region.lower(), region)
+            if not endpoint.startswith("http"):
+                logging.warning(f"Ignoring unknown Tuya region {region!r} of account {name}")
+                continue
+            label = region.lower() if endpoint != region else urlparse(region).netloc
+            members[f"{name}/{label}"] = (endpoint, access_id, secret)
+    return members
+
+
+class TuyaServicePool:
+    """
+    TuyaService members keyed by account and region, with device routing.
+
+    Members are created on first use. Devices whose owner is unknown fall
+    back to the default member until discovery finds them elsewhere.
+    """
+
+    def __init__(self, default=None, accounts=None, routes_path=None, workers=8):
+        """
+        Initialize the pool.
+
+        Args:
+            default (TuyaService, optional): Member for the configured project
+            accounts (dict, optional): Member key to (endpoint, access_id, secret)
+            routes_path (str, optional): JSON routes file. None or empty keeps routes in memory.
+            workers (int): Threads used to query members in parallel
+        """
+        self.accounts = dict(accounts or {})
+        self.routes_path = routes_path or None
+        self.workers = workers
+        self._members = {}
+        if default is not None:
+            self._members[DEFAULT_MEMBER] = default
+        self._routes = {}  # device_id -> member key
+        self._unrouted = {}  # device_id -> Unix time of the last failed discovery
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._pool = None
+
+    @classmethod
+    def from_config(cls):
+        """
+        Build a pool from the TUYA_ACCOUNTS and TUYA_ROUTES_PATH configuration values.
+
+        Returns:
+            TuyaServicePool: Pool around the configured project
+        """
+        return cls(
+            default=tuya_service,
+            accounts=parse_accounts(TuyaConfig.ACCOUNTS),
+            routes_path=TuyaConfig.ROUTES_PATH,
+        )
+
+    @property
+    def keys(self):
+        """list: Every member key, the default member first."""
+        keys = [DEFAULT_MEMBER] if DEFAULT_MEMBER in self._members else []
+        return keys + list(self.accounts)
+
+    def _build(self, key):
+        """
+        Create the TuyaService of an account member.
+
+        Args:
+            key (str): Member key from the accounts
+
+        Returns:
+            TuyaService: New member with its own quota accountant and its own
+                token store, if one is configured
+        """
+        endpoint, access_id, secret = self.accounts[key]
+        store = None
+        if TuyaConfig.TOKEN_STORE_PATH:
+            base, extension = os.path.splitext(TuyaConfig.TOKEN_STORE_PATH)
+            store = TokenStore(
+                f"{base}.{key.replace('/', '-')}{extension}",
+                secret=TuyaConfig.TOKEN_STORE_KEY or secret,
+                access_id=access_id,
+                endpoint=endpoint,
+            )
+        return TuyaService(
+            endpoint, access_id, secret, store=store, accountant=QuotaAccountant.from_config()
+        )
+
+    def member(self, key):
+        """
+        Get a member, creating it on first use.
+
+        Args:
+            key (str): Member key
+
+        Returns:
+            TuyaService: The member
+        """
+        with self._lock:
+            service = self._members.get(key)
+        if service is None:
+            service = self._build(key)
+            with self._lock:
+                service = self._members.setdefault(key, service)
+        return service
+
+    def _load(self):
+        """Read the routes file on first use (lock held)."""
+        self._loaded = True
+        if not self.routes_path or not os.path.exists(self.routes_path):
+            return
+        try:
+            with open(self.routes_path, "r", encoding="utf-8") as routes_file:
+                payload = json.load(routes_file)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable Tuya routes file: {e}")
+            return
+        if payload.get("version") != ROUTES_VERSION:
+            return
+        known = set(self.keys)
+        for device_id, key in (payload.get("routes") or {}).items():
+            if key in known:
+                self._routes[device_id] = key
+
+    def _save(self):
+        """Write the routing table to the routes file atomically (lock held)."""
+        if not self.routes_path:
+            return
+        temp_path = f"{self.routes_path}.{os.getpid()}.tmp"
+        try:
+            directory = os.path.dirname(self.routes_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as routes_file:
+                json.dump({"version": ROUTES_VERSION, "routes": self._routes}, routes_file)
+            os.replace(temp_path, self.routes_path)
+        except OSError as e:
+            logging.error(f"Failed to save Tuya routes: {e}")
+
+    def _route(self, device_id):
+        """
+        Look up the member key of a device.
+
+        Args:
+            device_id (str): Device to route
+
+        Returns:
+            tuple: (member key or None, whether discovery should run)
+        """
+        if not self.accounts:
+            return DEFAULT_MEMBER, False
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            key = self._routes.get(device_id)
+            if key is not None:
+                return key, False
+            retry = time.time() - self._unrouted.get(device_id, 0) >= DISCOVERY_RETRY
+            return None, retry
+
+    def _remember(self, device_id, key):
+        """Store a discovered route, or None to forget it."""
+        with self._lock:
+            if key is None:
+                self._routes.pop(device_id, None)
+            else:
+                self._routes[device_id] = key
+                self._unrouted.pop(device_id, None)
+            self._save()
+
+    def _executor(self):
+        """Create the shared worker pool on first use."""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="tuya-pool"
+            )
+        return self._pool
+
+    def discover(self, device_id, priority=PRIORITY_API):
+        """
+        Find the member owning a device by querying every member in parallel.
+
+        Args:
+            device_id (str): Device to find
+            priority (int): Rate limiter priority class of the caller
+
+        Returns:
+            tuple: (member key, status response). The key is None and the
+                response the default member's when no member could read the device.
+        """
+        futures = {
+            self._executor().submit(self._probe, key, device_id, priority): key
+            for key in self.keys
+        }
+        responses = {}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                responses[key] = future.result()
+            except Exception as e:
+                logging.error(f"Error probing Tuya member {key} for {device_id}: {e}")
+                continue
+            if responses[key] and responses[key].get("success"):
+                logging.info(f"Device {device_id} routed to Tuya member {key}")
+                self._remember(device_id, key)
+                return key, responses[key]
+
+        with self._lock:
+            self._unrouted[device_id] = time.time()
+        logging.warning(f"No Tuya member can read device {device_id}")
+        fallback = responses.get(DEFAULT_MEMBER) or next(iter(responses.values()), None)
+        return None, fallback
+
+    def _probe(self, key, device_id, priority):
+        """Read a device's status through one member."""
+        return self.member(key).get_device_status(device_id, priority=priority, probe=True)
+
+    def service_for(self, device_id, priority=PRIORITY_API):
+        """
+        Get the member that serves a device, discovering it if needed.
+
+        Args:
+            device_id (str): Device to serve
+            priority (int): Rate limiter priority class used for discovery
+
+        Returns:
+            TuyaService: Owning member, or the default member if none is known
+        """
+        key, discover = self._route(device_id)
+        if key is None and discover:
+            key, _ = self.discover(device_id, priority)
+        return self.member(key or self.keys[0])
+
+    def _checked(self, device_id, key, response):
+        """Forget a route the member no longer has access to (not on quota errors)."""
+        if key is not None and is_not_owned_error(response):
+            logging.warning(f"Device {device_id} left Tuya member {key}, rediscovering")
+            self._remember(device_id, None)
+        return response
+
+    def get_device_status(self, device_id, priority=PRIORITY_API):
+        """
+        Retrieve the current status of a device through its member.
+
+        Args:
+            device_id (str): The unique identifier of the device
+            priority (int): Rate limiter priority class. Defaults to PRIORITY_API.
+
+        Returns:
+            dict: API response containing device status data
+        """
+        key, discover = self._route(device_id)
+        if key is None and discover:
+            # Discovery already read the status
+            _, response = self.discover(device_id, priority)
+            return response
+        key = key or self.keys[0]
+        response = self.member(key).get_device_status(device_id, priority=priority)
+        return self._checked(device_id, key if self.accounts else None, response)
+
+    def get_devices_status(self, device_ids, priority=PRIORITY_API):
+        """
+        Retrieve the status of several devices, one batch per member in parallel.
+
+        Args:
+            device_ids (list): Device identifiers, at most STATUS_BATCH_LIMIT
+            priority (int): Rate limiter priority class. Defaults to PRIORITY_API.
+
+        Returns:
+            dict: API response whose result lists {"id", "status"} entries of
+                every member that answered; the first failure if none did
+        """
+        if not self.accounts:
+            return self.member(DEFAULT_MEMBER).get_devices_status(device_ids, priority=priority)
+
+        groups, results, failures = {}, [], []
+        for device_id in device_ids:
+            key, discover = self._route(device_id)
+            if key is None and discover:
+                key, response = self.discover(device_id, priority)
+                if key is not None:
+                    results.append({"id": device_id, "status": response.get("result") or []})
+                    continue
+            groups.setdefault(key or self.keys[0], []).append(device_id)
+
+        futures = {
+            self._executor().submit(
+                self.member(key).get_devices_status, batch, priority=priority
+            ): key
+            for key, batch in groups.items()
+        }
+        for future in as_completed(futures):
+            try:
+                response = future.result()
+            except Exception as e:
+                logging.error(f"Error reading batch from Tuya member {futures[future]}: {e}")
+                continue
+            if response and response.get("success"):
+                results.extend(response.get("result") or [])
+            else:
+                failures.append(response)
+
+        if results or not failures:
+            return {"success": True, "result": results}
+        return failures[0]
+
+    def get_device_functions(self, device_id, priority=PRIORITY_API):
+        """
+        Retrieve the command functions of a device through its member.
+
+        Args:
+            device_id (str): The unique identifier of the device
+            priority (int): Rate limiter priority class. Defaults to PRIORITY_API.
+
+        Returns:
+            dict: API response whose result holds the device's "functions" list
+        """
+        return self.service_for(device_id, priority).get_device_functions(
+            device_id, priority=priority
+        )
+
+    def send_command(self, device_id, commands, priority=PRIORITY_API):
+        """
+        Send control commands to a device through its member.
+
+        Args:
+            device_id (str): The unique identifier of the device
+            commands (list): List of command dictionaries to execute
+            priority (int): Rate limiter priority class. Defaults to PRIORITY_API.
+
+        Returns:
+            dict: API response indicating command execution status
+        """
+        return self.service_for(device_id, priority).send_command(
+            device_id, commands, priority=priority
+        )
+
+    def metrics(self):
+        """
+        Snapshot of the pool.
+
+        Returns:
+            dict: Members with their endpoint and routed device count
+        """
+        with self._lock:
+            counts = {}
+            for key in self._routes.values():
+                counts[key] = counts.get(key, 0) + 1
+            created = set(self._members)
+            unrouted = len(self._unrouted)
+        members = {}
+        for key in self.keys:
+            endpoint = (
+                self.accounts[key][0] if key in self.accounts else TuyaConfig.API_ENDPOINT
+            )
+            members[key] = {
+                "endpoint": endpoint,
+                "connected": key in created,
+                "devices": counts.get(key, 0),
+            }
+        return {"members": members, "unrouted": unrouted}
+
+
+# Global singleton instance for application-wide use
+tuya_pool = TuyaServicePool.from_config()
@@ -3,12 +3,42 @@ Tuya Service - Tuya Cloud API Integration
 
 This module provides a service layer for interacting with the Tuya Cloud API.
 It handles authentication, connection management, and device operations such as
-querying status and sending commands to IoT devices.
+querying status and sending commands to IoT devices. Every call is reported to
+the quota accountant so polling can pace itself against the API allowance.
+The access token is cached and refreshed in the background by a TokenManager,
+so requests never wait on token work while a valid token exists. Concurrent
+identical status reads share one upstream request. A circuit breaker per
+endpoint fails fast during an outage, and status reads are retried with
+jittered backoff. Every request has connect and read timeouts, so a hung
+connection becomes a failure the breaker sees. A shared rate limiter paces
+every call, serving alert polls before ad-hoc reads. Commands are validated
+against each device's cached function specification before they are sent.
 """
 
 from tuya_connector import TuyaOpenAPI
 from config.Config import TuyaConfig
+from services.quota_service import quota_accountant, is_not_owned_error
+from services.http_timeout import mount_timeout
+from services.token_manager import TokenManager, TOKEN_INVALID_CODE
+from services.token_store import token_store
+from services.single_flight import SingleFlight
+from services.circuit_breaker import CircuitBreakerRegistry, RetryPolicy
+from services.rate_limiter import RateLimiter, PRIORITY_API
+from services.device_spec import DeviceSpecIndex
 import logging
+import time
+
+# Maximum number of device IDs accepted by the batch status endpoint
+STATUS_BATCH_LIMIT = 20
+
+# Response code returned without calling upstream while an endpoint's circuit is open
+CIRCUIT_OPEN_CODE = 503
+
+# Response code returned without calling upstream when the rate limiter wait ran out
+RATE_LIMITED_CODE = 429
+
+# Response code returned without calling upstream for commands that fail local validation
+INVALID_COMMAND_CODE = 400
 
 
 class TuyaService:
@@ -19,34 +49,89 @@ class TuyaService:
     with IoT devices through the Tuya OpenAPI.
     """
 
-    def __init__(self):
+    def __init__(
+        self, endpoint=None, access_id=None, access_secret=None, store=None, accountant=None
+    ):
         """
         Initialize Tuya service with API credentials.
 
-        Creates a TuyaOpenAPI instance and establishes initial connection
-        using credentials from configuration.
+        Creates a TuyaOpenAPI instance and establishes initial connection.
+        Without explicit credentials the configured project is used, with the
+        configured token store.
+
+        Args:
+            endpoint (str, optional): Tuya API endpoint of the project's region
+            access_id (str, optional): Tuya access ID
+            access_secret (str, optional): Tuya access secret
+            store (TokenStore, optional): Token store for explicit credentials
+            accountant (QuotaAccountant, optional): Quota of this project. Defaults
+                to the configured project's accountant.
         """
-        self.openapi = TuyaOpenAPI(
-            TuyaConfig.API_ENDPOINT,
-            TuyaConfig.ACCESS_ID,
-            TuyaConfig.ACCESS_SECRET,
+        if endpoint is None:
+            endpoint, access_id, access_secret = (
+                TuyaConfig.API_ENDPOINT,
+                TuyaConfig.ACCESS_ID,
+                TuyaConfig.ACCESS_SECRET,
+            )
+            store = token_store
+        # Each instance has its own HTTP session, so its own connection pool
+        self.openapi = TuyaOpenAPI(endpoint, access_id, access_secret)
+        # Bounded requests: a hung upstream raises Timeout instead of blocking forever
+        timeout = (TuyaConfig.CONNECT_TIMEOUT, TuyaConfig.READ_TIMEOUT)
+        mount_timeout(self.openapi.session, timeout)
+        # Another account's calls count against that account's allowance
+        self.accountant = accountant
+        # Reuses a still-valid token from the optional encrypted store before granting
+        self.token_manager = TokenManager(
+            self.openapi,
+            refresh_margin=TuyaConfig.TOKEN_REFRESH_MARGIN,
+            store=store if store is not None and store.enabled else None,
+            timeout=timeout,
         )
+        # Concurrent identical reads (poller, REST clients) share one upstream call
+        self.single_flight = SingleFlight()
+        # Per-endpoint fail-fast protection; only idempotent reads are retried
+        self.breakers = CircuitBreakerRegistry.from_config()
+        self.retry_policy = RetryPolicy.from_config()
+        # Client-side QPS limits shared by the poller, the routes and bulk jobs
+        self.rate_limiter = RateLimiter.from_config()
+        # Function specs per device, fetched once and used to check commands locally
+        self.spec_index = DeviceSpecIndex.from_config()
         self.connect()
 
     def connect(self):
         """
         Establish or verify connection to Tuya Cloud.
 
-        Attempts to connect to Tuya Cloud if not already connected.
+        Returns immediately while the cached token is valid; otherwise obtains
+        a token once, shared by every thread waiting for it.
         Logs connection status and any errors encountered.
         """
         try:
-            if not self.openapi.is_connect():
-                self.openapi.connect()
+            if self.token_manager.ensure_token():
                 logging.info("Connected to Tuya Cloud")
         except Exception as e:
             logging.error(f"Failed to connect to Tuya Cloud: {e}")
 
+    def _observe(self, response, probe=False):
+        """
+        Account for a completed API call.
+
+        Args:
+            response (dict): Tuya API response
+            probe (bool): The call only checked whether this project owns a
+                device; it is counted, but its response says nothing about the quota
+        """
+        accountant = self.accountant or quota_accountant
+        # A 1106 for a device of another project says nothing about the quota either
+        if probe or is_not_owned_error(response):
+            accountant.observe(response, learn=False)
+        else:
+            accountant.observe(response)
+        if response and response.get("code") == TOKEN_INVALID_CODE:
+            # The connector re-granted inline; re-validate the cached token
+            self.token_manager.invalidate()
+
     def is_authenticated(self):
         """
         Verify if the current credentials are valid.
@@ -64,7 +149,118 @@ class TuyaService:
         # Verify active connection with valid token
         return self.openapi.is_connect()
 
-    def get_device_status(self, device_id):
+    def _call(self, endpoint, func, *args, retry=False, priority=PRIORITY_API):
+        """
+        Run an upstream call through the rate limiter and the endpoint's circuit breaker.
+
+        Calls that raise or return no response are failures; with retry they
+        are repeated with jittered exponential backoff while the breaker allows.
+
+        Args:
+            endpoint (str): Endpoint name the limits and breaker are kept for
+            func (callable): Performs the upstream call
+            *args: Arguments for func
+            retry (bool): Retry failed calls (idempotent requests only)
+            priority (int): Rate limiter priority class of the caller
+
+        Returns:
+            dict: API response, or a CIRCUIT_OPEN_CODE or RATE_LIMITED_CODE
+                response if the call was not sent
+
+        Raises:
+            Exception: Whatever the last attempt raised
+        """
+        breaker = self.breakers.get(endpoint)
+        attempts = self.retry_policy.attempts if retry else 1
+
+        for attempt in range(attempts):
+            if not self.rate_limiter.acquire(endpoint, priority):
+                return {
+                    "success": False,
+                    "code": RATE_LIMITED_CODE,
+                    "msg": f"Tuya API rate limit reached ({endpoint})",
+                }
+            if not breaker.allow():
+                return {
+                    "success": False,
+                    "code": CIRCUIT_OPEN_CODE,
+                    "msg": f"Tuya API unavailable ({endpoint} circuit open)",
+                }
+
+            started = time.monotonic()
+            try:
+                response = func(*args)
+            except Exception:
+                breaker.record(False, time.monotonic() - started)
+                if attempt + 1 >= attempts:
+                    raise
+            else:
+                breaker.record(response is not None, time.monotonic() - started)
+                if response is not None or attempt + 1 >= attempts:
+                    return response
+
+            time.sleep(self.retry_policy.delay(attempt))
+
+    def _read(self, endpoint, path, params=None, priority=PRIORITY_API, probe=False):
+        """
+        Perform a GET request, coalesced with identical requests in flight.
+
+        Only callers of the same priority class share a request, so an alert
+        poll never waits in the rate limiter at a REST read's priority or
+        inherits its rate-limited response.
+
+        Args:
+            endpoint (str): Endpoint name for the rate limiter and circuit breaker
+            path (str): API path
+            params (dict, optional): Query parameters
+            priority (int): Rate limiter priority class of the caller
+            probe (bool): Device discovery probe, see _observe()
+
+        Returns:
+            dict: API response, shared by every concurrent caller
+        """
+        key = ("GET", path, tuple(sorted((params or {}).items())), priority, probe)
+        return self.single_flight.do(
+            key, self._call, endpoint, self._get, path, params, probe, retry=True, priority=priority
+        )
+
+    def _get(self, path, params=None, probe=False):
+        """
+        Perform one upstream GET request and account for it.
+
+        Args:
+            path (str): API path
+            params (dict, optional): Query parameters
+            probe (bool): Device discovery probe, see _observe()
+
+        Returns:
+            dict: API response
+        """
+        self.connect()
+        if params is None:
+            response = self.openapi.get(path)
+        else:
+            response = self.openapi.get(path, params)
+        self._observe(response, probe)
+        return response
+
+    def _post(self, path, body):
+        """
+        Perform one upstream POST request and account for it.
+
+        Args:
+            path (str): API path
+            body (dict): JSON body
+
+        Returns:
+            dict: API response
+        """
+        self.connect()
+        response = self.openapi.post(path, body)
+        self._observe(response)
+        return response
+
+    def get_device_status(self, device_id, priority=PRIORITY_API, probe=False):
         """
         Retrieve current status of a Tuya device.
 
@@ -73,31 +269,89 @@ class TuyaService:
 
         Args:
             device_id (str): The unique identifier of the device
+            priority (int): Rate limiter priority class. Defaults to PRIORITY_API.
+            probe (bool): Only checking whether this project owns the device;
+                the response is not used to update the quota state
 
         Returns:
             dict: API response containing device status data
         """
-        self.connect()
-        response = self.openapi.get(f"/v1.0/devices/{device_id}/status")
-        return response
+        return self._read(
+            "device_status", f"/v1.0/devices/{device_id}/status", priority=priority, probe=probe
+        )
+
+    def get_devices_status(self, device_ids, priority=PRIORITY_API):
+        """
+        Retrieve current status of several Tuya devices in one request.
+
+        Uses the Tuya batch status endpoint so that a whole group of
+        sensors costs a single API call instead of one call per device.
+
+        Args:
+            device_ids (list): Device identifiers, at most STATUS_BATCH_LIMIT
+            priority (int): Rate limiter priority class. Defaults to PRIORITY_API.
+
+        Returns:
+            dict: API response whose result is a list of
+                {"id": <device_id>, "status": [...]} entries
+        """
+        return self._read(
+            "devices_status",
+            "/v1.0/iot-03/devices/status",
+            {"device_ids": ",".join(device_ids)},
+            priority=priority,
+        )
 
-    def send_command(self, device_id, commands):
+    def get_device_functions(self, device_id, priority=PRIORITY_API):
+        """
+        Retrieve the command functions (DP codes, types and ranges) of a device.
+
+        Args:
+            device_id (str): The unique identifier of the device
+            priority (int): Rate limiter priority class. Defaults to PRIORITY_API.
+
+        Returns:
+            dict: API response whose result holds the device's "functions" list
+        """
+        return self._read(
+            "device_functions", f"/v1.0/devices/{device_id}/functions", priority=priority
+        )
+
+    def send_command(self, device_id, commands, priority=PRIORITY_API):
         """
         Send control commands to a Tuya device.
 
         Sends one or more commands to control device behavior through
-        the Tuya Cloud API.
+        the Tuya Cloud API. Commands are checked and normalized against the
+        device's function specification first; invalid commands are rejected
+        with INVALID_COMMAND_CODE without calling upstream.
 
         Args:
             device_id (str): The unique identifier of the device
             commands (list): List of command dictionaries to execute
+            priority (int): Rate limiter priority class. Defaults to PRIORITY_API.
 
         Returns:
             dict: API response indicating command execution status
         """
-        self.connect()
-        response = self.openapi.post(f"/v1.0/devices/{device_id}/commands", {"commands": commands})
-        return response
+        commands, errors = self.spec_index.validate(
+            device_id, commands, lambda spec_id: self.get_device_functions(spec_id, priority)
+        )
+        if errors:
+            return {
+                "success": False,
+                "code": INVALID_COMMAND_CODE,
+                "msg": f"Invalid commands: {'; '.join(errors)}",
+            }
+
+        # Commands are not idempotent, so they are never retried
+        return self._call(
+            "device_commands",
+            self._post,
+            f"/v1.0/devices/{device_id}/commands",
+            {"commands": commands},
+            priority=priority,
+        )
 
 
 # Global singleton instance for application-wide use
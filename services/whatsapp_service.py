@@ -4,36 +4,144 @@ WhatsApp Service - Notification Integration
 This module handles sending WhatsApp notifications through the WhatsApp
 Business API when door sensor events are detected. It provides functions
 to send custom messages and predefined alerts for door state changes.
+
+The send_*_alert helpers only put the message on the alert dispatcher's
+outbox and return at once; its worker pool delivers, so a slow gateway
+never holds up the poller or the Pulsar listener that detected the event.
+With ALERT_OUTBOX_PATH set, alerts are first recorded in the durable
+outbox, which retries failed sends and replays them after a restart.
+Door transitions of a device that follow an alert within the coalescing
+window are folded into one summary message. Every alert is copied to the
+recipients the alert router picks for its device and severity, and each
+copy is paced and retried per recipient; a copy its recipient cannot take
+yet is queued again later rather than dropped.
+Messages go through one shared keep-alive session, so an alert reuses an
+open connection to the gateway instead of paying for a new TCP connection
+and TLS handshake every time.
 """
 
+import threading
+import time
 import requests
 import logging
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
-from config.Config import WhatsAppConfig
+from config.Config import TuyaConfig, WhatsAppConfig
+from services.alert_dispatcher import alert_dispatcher, Deferred
+from services.alert_outbox import alert_outbox, alert_key
+from services.flap_coalescer import flap_coalescer
+from services.alert_router import (
+    alert_router,
+    copy_key,
+    split_copy_key,
+    SEVERITY_ALERT,
+    SEVERITY_INFO,
+)
+
+
+class WhatsAppClient:
+    """
+    Thread-safe holder of the pooled HTTP session used for the WhatsApp API.
+
+    The session is created on first use with the configured credentials,
+    and keeps up to pool_size connections open so concurrent alert workers
+    do not open connections of their own.
+    """
+
+    def __init__(self, pool_size=10, connect_timeout=3.05, read_timeout=10):
+        """
+        Initialize the client.
+
+        Args:
+            pool_size (int): Keep-alive connections kept open to the gateway
+            connect_timeout (float): Seconds to wait for a connection
+            read_timeout (float): Seconds to wait for the gateway's response
+        """
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self._session = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls):
+        """
+        Build a client from the WA_POOL_SIZE and WA_*_TIMEOUT configuration values.
+
+        Returns:
+            WhatsAppClient: Client configured from environment settings
+        """
+        return cls(
+            pool_size=WhatsAppConfig.POOL_SIZE,
+            connect_timeout=WhatsAppConfig.CONNECT_TIMEOUT,
+            read_timeout=WhatsAppConfig.READ_TIMEOUT,
+        )
 
+    @property
+    def session(self):
+        """requests.Session: Shared session, created on first use."""
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.auth = HTTPBasicAuth(WhatsAppConfig.API_USER, WhatsAppConfig.API_PASSWORD)
+                self._session = session
+            return self._session
 
-def send_whatsapp_message(message: str) -> bool:
+    def post(self, url, **kwargs):
+        """
+        Send a POST request over the shared session.
+
+        Args:
+            url (str): Request URL
+            **kwargs: Keyword arguments for requests.Session.post
+
+        Returns:
+            requests.Response: Gateway response
+        """
+        return self.session.post(url, **kwargs)
+
+    def close(self):
+        """Close the pooled connections; the next request opens a new session."""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+# Global singleton instance for application-wide use
+whatsapp_client = WhatsAppClient.from_config()
+
+
+def send_whatsapp_message(
+    message: str, idempotency_key: str = None, recipient: str = None
+) -> bool:
     """
     Send a WhatsApp message via the WhatsApp Business API.
 
     Sends a text message to a configured WhatsApp group when door sensor
     state changes are detected. Uses HTTP Basic Authentication to access
-    the WhatsApp API endpoint.
+    the WhatsApp API endpoint over the shared keep-alive session.
 
     Args:
         message (str): The message text to send. Typically, door status
             messages like "DOOR ID OPEN" (server door opened) or
             "DOOR IS CLOSES" (server door closed).
+        idempotency_key (str, optional): Sent as the Idempotency-Key header so the
+            gateway can recognize a retried alert
+        recipient (str, optional): Group or number to send to. Defaults to WA_GROUP_ID.
 
     Returns:
         bool: True if message was sent successfully, False if an error occurred
     """
     url = WhatsAppConfig.API_URL
-    auth = HTTPBasicAuth(WhatsAppConfig.API_USER, WhatsAppConfig.API_PASSWORD)
     headers = {"Content-Type": "application/json"}
+    if idempotency_key:
+        headers["Idempotency-Key"] = idempotency_key
 
     # Prepare API payload with message details
-    payload = {"phone": WhatsAppConfig.GROUP_ID, "message": message}
+    payload = {"phone": recipient or WhatsAppConfig.GROUP_ID, "message": message}
 
     # Add optional parameters if configured
     if WhatsAppConfig.IS_FORWARDED:
@@ -46,15 +154,14 @@ def send_whatsapp_message(message: str) -> bool:
     try:
         logging.info(f"Sending WhatsApp message: '{message}'")
         logging.debug(f"   URL: {url}")
-        logging.debug(f"   Group: {WhatsAppConfig.GROUP_ID}")
+        logging.debug(f"   Group: {payload['phone']}")
 
-        # Send POST request to WhatsApp API
-        response = requests.post(
+        # Send POST request to WhatsApp API; (connect, read) timeouts prevent hanging
+        response = whatsapp_client.post(
             url,
             json=payload,
             headers=headers,
-            auth=auth,
-            timeout=10,  # 10 second timeout to prevent hanging
+            timeout=whatsapp_client.timeout,
         )
         response.raise_for_status()
 
@@ -68,43 +175,204 @@ def send_whatsapp_message(message: str) -> bool:
         return False
 
 
-def send_door_opened_alert() -> bool:
+def _with_device(message: str, device_id: str = None) -> str:
+    """
+    Append the originating device to an alert message.
+
+    Single-sensor deployments keep the configured message untouched, while
+    fleet deployments pass the device ID so alerts can be told apart.
+
+    Args:
+        message (str): The configured alert message
+        device_id (str, optional): Device that triggered the alert
+
+    Returns:
+        str: The message, suffixed with the device ID when one is given
+    """
+    if not device_id:
+        return message
+    return f"{message} [{device_id}]"
+
+
+def _send_copy(message: str, key: str, recipient: str) -> bool:
+    """Send one recipient's copy, passing its idempotency key to the gateway."""
+    return send_whatsapp_message(message, idempotency_key=key, recipient=recipient)
+
+
+def _deliver(message: str, key: str) -> bool:
+    """
+    Deliver one queued copy of an alert through the alert router.
+
+    Args:
+        message (str): The message text to send
+        key (str): Copy key naming the recipient; outbox entries recorded
+            before recipient routing carry a plain alert key
+
+    Returns:
+        bool or Deferred: True if delivered, False if failed, Deferred if the
+            recipient cannot take the copy yet
+    """
+    _, recipient = split_copy_key(key)
+    if recipient is None:
+        return send_whatsapp_message(message, idempotency_key=key)
+    return alert_router.send(recipient, message, key, _send_copy)
+
+
+def _dispatch_copy(message: str, key: str):
+    """
+    Deliver a copy queued without the durable outbox (dispatcher job).
+
+    A copy the router deferred is submitted again once its recipient can
+    take it, so pacing delays the alert instead of losing it.
+
+    Args:
+        message (str): The message text to send
+        key (str): Copy key naming the recipient
+
+    Returns:
+        bool or Deferred: Result of _deliver()
+    """
+    result = _deliver(message, key)
+    if isinstance(result, Deferred):
+        alert_dispatcher.submit_later(result.delay, _dispatch_copy, message, key)
+    return result
+
+
+def _enqueue(
+    message: str, key: str = None, device_id: str = None, severity: str = SEVERITY_INFO
+) -> bool:
+    """
+    Put one copy of a message per recipient on the alert outbox.
+
+    Args:
+        message (str): The message text to send
+        key (str, optional): Idempotency key from alert_key(); generated when omitted
+        device_id (str, optional): Device the recipients are routed by
+        severity (str): Alert severity the escalation recipients are routed by
+
+    Returns:
+        bool: True if every copy was queued, False if the outbox dropped one.
+            With ALERT_WORKERS=0 copies are delivered inline and the delivery result returned.
+    """
+    key = key or alert_key(device_id, "message")
+    # Single-sensor alerts name no device but still follow that device's route
+    recipients = alert_router.recipients(device_id or TuyaConfig.DEVICE_ID, severity)
+    if not recipients:
+        logging.error("No WhatsApp recipient configured for alert, check WA_GROUP_ID")
+        return False
+
+    queued = True
+    for recipient in recipients:
+        if alert_outbox.enabled:
+            queued &= alert_outbox.add(copy_key(key, recipient), message, _deliver)
+        else:
+            queued &= alert_dispatcher.submit(_dispatch_copy, message, copy_key(key, recipient))
+    return queued
+
+
+def replay_pending_alerts() -> int:
+    """
+    Deliver alerts a previous run recorded in the durable outbox but never sent.
+
+    Returns:
+        int: Number of alerts replayed (0 without ALERT_OUTBOX_PATH)
+    """
+    return alert_outbox.start(_deliver)
+
+
+def _door_alert(message: str, door_open: bool, device_id: str = None, key: str = None) -> bool:
+    """
+    Queue a door alert unless it falls inside the device's coalescing window.
+
+    Args:
+        message (str): The configured alert message
+        door_open (bool): New door state
+        device_id (str, optional): Device that changed, included in the message
+        key (str, optional): Idempotency key of the event, see alert_key()
+
+    Returns:
+        bool: True if the alert was queued or folded into a summary
+    """
+    if not flap_coalescer.record(device_id, door_open, send_flap_summary):
+        return True
+    severity = SEVERITY_ALERT if door_open else SEVERITY_INFO
+    return _enqueue(_with_device(message, device_id), key, device_id, severity)
+
+
+def send_flap_summary(summary) -> bool:
+    """
+    Queue the summary of door transitions folded by the flap coalescer.
+
+    Args:
+        summary (FlapSummary): Transition count, first and last times and final state
+
+    Returns:
+        bool: True if the summary was queued, False if the outbox dropped it
+    """
+    message = WhatsAppConfig.MESSAGE_DOOR_FLAPPING.format(
+        count=summary.count,
+        first=time.strftime("%H:%M:%S", time.localtime(summary.first_at)),
+        last=time.strftime("%H:%M:%S", time.localtime(summary.last_at)),
+        state="OPEN" if summary.door_open else "CLOSED",
+    )
+    key = alert_key(summary.device_id, "flapping", int(summary.last_at * 1000))
+    message = _with_device(message, summary.device_id)
+    return _enqueue(message, key, summary.device_id, SEVERITY_ALERT)
+
+
+def send_door_opened_alert(device_id: str = None, key: str = None) -> bool:
     """
     Send WhatsApp alert when door is opened.
 
-    Sends a configurable message (from WA_MESSAGE_DOOR_OPENED environment
+    Queues a configurable message (from WA_MESSAGE_DOOR_OPENED environment
     variable) when the door sensor detects an open state. The message can
     be customized via environment configuration to suit different use cases.
+    Transitions inside the device's coalescing window are folded into a summary.
+
+    Args:
+        device_id (str, optional): Device that opened, included in the message
+        key (str, optional): Idempotency key of the event, see alert_key()
 
     Returns:
-        bool: True if alert was sent successfully, False otherwise
+        bool: True if the alert was queued or folded, False if the outbox dropped it
     """
-    return send_whatsapp_message(WhatsAppConfig.MESSAGE_DOOR_OPENED)
+    return _door_alert(WhatsAppConfig.MESSAGE_DOOR_OPENED, True, device_id, key)
 
 
-def send_door_closed_alert() -> bool:
+def send_door_closed_alert(device_id: str = None, key: str = None) -> bool:
     """
     Send WhatsApp alert when door is closed.
 
-    Sends a configurable message (from WA_MESSAGE_DOOR_CLOSED environment
+    Queues a configurable message (from WA_MESSAGE_DOOR_CLOSED environment
     variable) when the door sensor detects a closed state. The message can
     be customized via environment configuration to suit different use cases.
+    Transitions inside the device's coalescing window are folded into a summary.
+
+    Args:
+        device_id (str, optional): Device that closed, included in the message
+        key (str, optional): Idempotency key of the event, see alert_key()
 
     Returns:
-        bool: True if alert was sent successfully, False otherwise
+        bool: True if the alert was queued or folded, False if the outbox dropped it
     """
-    return send_whatsapp_message(WhatsAppConfig.MESSAGE_DOOR_CLOSED)
+    return _door_alert(WhatsAppConfig.MESSAGE_DOOR_CLOSED, False, device_id, key)
 
 
-def send_sensor_initialized_alert() -> bool:
+def send_sensor_initialized_alert(device_id: str = None, key: str = None) -> bool:
     """
     Send WhatsApp alert when sensor monitoring is initialized.
 
-    Sends a configurable message (from WA_MESSAGE_SENSOR_INITIALIZED environment
+    Queues a configurable message (from WA_MESSAGE_SENSOR_INITIALIZED environment
     variable) when the monitoring service first starts and detects the initial
     sensor state. This prevents false alarms from server restarts.
 
+    Args:
+        device_id (str, optional): Device that was initialized, included in the message
+        key (str, optional): Idempotency key of the event, see alert_key()
+
     Returns:
-        bool: True if alert was sent successfully, False otherwise
+        bool: True if the alert was queued, False if the outbox dropped it
     """
-    return send_whatsapp_message(WhatsAppConfig.MESSAGE_SENSOR_INITIALIZED)
+    return _enqueue(
+        _with_device(WhatsAppConfig.MESSAGE_SENSOR_INITIALIZED, device_id), key, device_id
+    )
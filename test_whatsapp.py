@@ -23,6 +23,10 @@ from services.whatsapp_service import (
     send_door_opened_alert,
     send_door_closed_alert,
 )
+from services.alert_dispatcher import alert_dispatcher
+
+# Deliver alerts inline so every test reports the gateway's answer
+alert_dispatcher.workers = 0
 
 print(f"API URL: {WhatsAppConfig.API_URL}")
 print(f"Username: {WhatsAppConfig.API_USER}")
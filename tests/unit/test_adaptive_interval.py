@@ -0,0 +1,89 @@
+"""
+Unit tests for services/adaptive_interval.py module.
+
+Tests the activity-driven per-device poll interval policy.
+"""
+
+from unittest.mock import patch
+
+
+class TestAdaptivePollInterval:
+    """Test cases for AdaptivePollInterval.next_interval."""
+
+    def test_transition_uses_min_interval(self):
+        """Test that a state transition resets the interval to the minimum."""
+        from services.adaptive_interval import AdaptivePollInterval
+
+        policy = AdaptivePollInterval(min_interval=10, max_interval=600)
+        policy.intervals["dev_a"] = 320
+
+        assert policy.next_interval("dev_a", door_state=False, changed=True) == 10
+
+    def test_open_door_uses_min_interval(self):
+        """Test that an open door keeps being polled at the minimum interval."""
+        from services.adaptive_interval import AdaptivePollInterval
+
+        policy = AdaptivePollInterval(min_interval=10, max_interval=600)
+        policy.intervals["dev_a"] = 320
+
+        assert policy.next_interval("dev_a", door_state=True, changed=False) == 10
+
+    def test_quiet_device_backs_off_exponentially(self):
+        """Test that a quiet closed door backs off by the factor up to the maximum."""
+        from services.adaptive_interval import AdaptivePollInterval
+
+        policy = AdaptivePollInterval(min_interval=10, max_interval=60, backoff_factor=2)
+
+        intervals = [policy.next_interval("dev_a", False, False) for _ in range(4)]
+
+        assert intervals == [20, 40, 60, 60]
+
+    def test_devices_back_off_independently(self):
+        """Test that each device keeps its own interval."""
+        from services.adaptive_interval import AdaptivePollInterval
+
+        policy = AdaptivePollInterval(min_interval=10, max_interval=600, backoff_factor=2)
+        policy.next_interval("dev_a", False, False)
+        policy.next_interval("dev_a", False, False)
+
+        assert policy.next_interval("dev_b", False, False) == 20
+
+    def test_budget_floor_limits_fast_polling(self):
+        """Test that the daily call budget imposes a minimum interval."""
+        from services.adaptive_interval import AdaptivePollInterval
+
+        policy = AdaptivePollInterval(min_interval=10, max_interval=3600, daily_call_budget=8640)
+        policy.set_fleet_size(2)
+
+        assert policy.budget_floor == 20
+        assert policy.next_interval("dev_a", True, True) == 20
+
+    def test_unlimited_budget_has_no_floor(self):
+        """Test that a zero budget leaves the interval unconstrained."""
+        from services.adaptive_interval import AdaptivePollInterval
+
+        policy = AdaptivePollInterval(min_interval=10, max_interval=600, daily_call_budget=0)
+        policy.set_fleet_size(1000)
+
+        assert policy.budget_floor == 0
+
+    @patch("services.adaptive_interval.logging")
+    def test_budget_above_max_interval_warns(self, mock_logging):
+        """Test that an unsustainable budget is reported and wins over the maximum."""
+        from services.adaptive_interval import AdaptivePollInterval
+
+        policy = AdaptivePollInterval(min_interval=10, max_interval=60, daily_call_budget=100)
+        policy.set_fleet_size(1)
+
+        mock_logging.warning.assert_called_once()
+        assert policy.next_interval("dev_a", False, False) == 864
+
+    def test_from_config(self, mock_env_vars):
+        """Test that the policy is built from POLL_* configuration."""
+        from services.adaptive_interval import AdaptivePollInterval
+        from config.Config import Config
+
+        policy = AdaptivePollInterval.from_config()
+
+        assert policy.min_interval == Config.POLL_MIN_INTERVAL
+        assert policy.max_interval == Config.POLL_MAX_INTERVAL
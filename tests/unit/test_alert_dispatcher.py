@@ -0,0 +1,181 @@
+"""
+Unit tests for services/alert_dispatcher.py module.
+
+Tests the bounded alert dispatch queue and its overflow policies.
+"""
+
+import threading
+from unittest.mock import Mock, patch
+
+
+class TestAlertDispatcherInit:
+    """Test cases for AlertDispatcher initialization."""
+
+    def test_from_config(self, mock_env_vars, monkeypatch):
+        """Test that the dispatcher reads the ALERT_* settings."""
+        from services.alert_dispatcher import AlertDispatcher
+        from config.Config import WhatsAppConfig
+
+        monkeypatch.setattr(WhatsAppConfig, "ALERT_WORKERS", 3)
+        monkeypatch.setattr(WhatsAppConfig, "ALERT_QUEUE_SIZE", 50)
+        monkeypatch.setattr(WhatsAppConfig, "ALERT_OVERFLOW_POLICY", "drop_newest")
+
+        dispatcher = AlertDispatcher.from_config()
+
+        assert dispatcher.workers == 3
+        assert dispatcher.max_queue == 50
+        assert dispatcher.overflow == "drop_newest"
+
+    @patch("services.alert_dispatcher.logging")
+    def test_unknown_policy_falls_back(self, mock_logging, mock_env_vars):
+        """Test that an unknown overflow policy falls back to drop_oldest."""
+        from services.alert_dispatcher import AlertDispatcher
+
+        dispatcher = AlertDispatcher(overflow="explode")
+
+        assert dispatcher.overflow == "drop_oldest"
+        mock_logging.warning.assert_called_once()
+
+
+class TestAlertDispatcherDelivery:
+    """Test cases for alert delivery."""
+
+    def test_inline_delivery_without_workers(self, mock_env_vars):
+        """Test that zero workers delivers in the calling thread."""
+        from services.alert_dispatcher import AlertDispatcher
+
+        dispatcher = AlertDispatcher(workers=0)
+        send = Mock(return_value=True)
+
+        assert dispatcher.submit(send, "dev_a") is True
+        send.assert_called_once_with("dev_a")
+        assert dispatcher.metrics()["delivered"] == 1
+
+    def test_inline_delivery_reports_failure(self, mock_env_vars):
+        """Test that inline delivery returns False when sending failed."""
+        from services.alert_dispatcher import AlertDispatcher
+
+        dispatcher = AlertDispatcher(workers=0)
+
+        assert dispatcher.submit(Mock(return_value=False)) is False
+        metrics = dispatcher.metrics()
+        assert metrics["failed"] == 1
+        assert "avg_latency_ms" in metrics
+
+    def test_workers_deliver_queued_alerts(self, mock_env_vars):
+        """Test that worker threads drain the queue."""
+        from services.alert_dispatcher import AlertDispatcher
+
+        dispatcher = AlertDispatcher(workers=2, max_queue=10)
+        send = Mock(return_value=True)
+
+        for index in range(5):
+            dispatcher.submit(send, index)
+
+        assert dispatcher.join(timeout=2) is True
+        assert send.call_count == 5
+        metrics = dispatcher.metrics()
+        assert metrics["delivered"] == 5
+        assert metrics["queue_depth"] == 0
+
+    def test_slow_notifier_does_not_block_submit(self, mock_env_vars):
+        """Test that submit returns while a delivery is still in progress."""
+        from services.alert_dispatcher import AlertDispatcher
+
+        release = threading.Event()
+        dispatcher = AlertDispatcher(workers=1, max_queue=10)
+
+        dispatcher.submit(release.wait, 5)
+        assert dispatcher.submit(Mock(), None) is True
+
+        release.set()
+        assert dispatcher.join(timeout=2) is True
+
+    @patch("services.alert_dispatcher.logging")
+    def test_failures_are_counted(self, mock_logging, mock_env_vars):
+        """Test that False results and exceptions count as failed deliveries."""
+        from services.alert_dispatcher import AlertDispatcher
+
+        dispatcher = AlertDispatcher(workers=0)
+
+        dispatcher.submit(Mock(return_value=False))
+        dispatcher.submit(Mock(side_effect=RuntimeError("gateway down")))
+
+        assert dispatcher.metrics()["failed"] == 2
+        mock_logging.error.assert_called_once()
+
+
+class TestAlertDispatcherOverflow:
+    """Test cases for overflow policies."""
+
+    def _blocked_dispatcher(self, overflow):
+        """Build a dispatcher whose single worker is stuck on a first job."""
+        from services.alert_dispatcher import AlertDispatcher
+
+        release = threading.Event()
+        started = threading.Event()
+
+        def blocker():
+            started.set()
+            release.wait(5)
+
+        dispatcher = AlertDispatcher(workers=1, max_queue=1, overflow=overflow)
+        dispatcher.submit(blocker)
+        started.wait(2)
+        return dispatcher, release
+
+    @patch("services.alert_dispatcher.logging")
+    def test_drop_newest_rejects_new_alert(self, mock_logging, mock_env_vars):
+        """Test that drop_newest keeps the queued alert and rejects the new one."""
+        dispatcher, release = self._blocked_dispatcher("drop_newest")
+        queued, rejected = Mock(), Mock()
+
+        assert dispatcher.submit(queued) is True
+        assert dispatcher.submit(rejected) is False
+
+        release.set()
+        dispatcher.join(timeout=2)
+        queued.assert_called_once()
+        rejected.assert_not_called()
+        assert dispatcher.metrics()["dropped"] == 1
+
+    @patch("services.alert_dispatcher.logging")
+    def test_drop_oldest_replaces_queued_alert(self, mock_logging, mock_env_vars):
+        """Test that drop_oldest discards the queued alert for the new one."""
+        dispatcher, release = self._blocked_dispatcher("drop_oldest")
+        stale, fresh = Mock(), Mock()
+
+        assert dispatcher.submit(stale) is True
+        assert dispatcher.submit(fresh) is True
+
+        release.set()
+        dispatcher.join(timeout=2)
+        stale.assert_not_called()
+        fresh.assert_called_once()
+        assert dispatcher.metrics()["dropped"] == 1
+
+
+class TestAlertDispatcherMetrics:
+    """Test cases for dispatcher metrics."""
+
+    def test_metrics_track_wait_time(self, mock_env_vars):
+        """Test that wait time statistics are reported in milliseconds."""
+        from services.alert_dispatcher import AlertDispatcher
+
+        dispatcher = AlertDispatcher(workers=0)
+        dispatcher.submit(Mock())
+
+        metrics = dispatcher.metrics()
+        assert metrics["submitted"] == 1
+        assert metrics["avg_wait_ms"] >= 0
+        assert metrics["max_wait_ms"] >= metrics["avg_wait_ms"]
+
+
+class TestAlertDispatcherSingleton:
+    """Test cases for alert_dispatcher singleton instance."""
+
+    def test_alert_dispatcher_singleton_exists(self, mock_env_vars):
+        """Test that alert_dispatcher is an AlertDispatcher instance."""
+        from services.alert_dispatcher import alert_dispatcher, AlertDispatcher
+
+        assert isinstance(alert_dispatcher, AlertDispatcher)
@@ -0,0 +1,207 @@
+"""
+Unit tests for services/alert_outbox.py module.
+
+Tests durable recording, retries, deduplication and replay of alerts.
+"""
+
+import sqlite3
+import time
+import pytest
+from unittest.mock import Mock
+
+
+@pytest.fixture(autouse=True)
+def inline_alert_dispatch(monkeypatch):
+    """Deliver dispatched alerts inline so outcomes can be asserted synchronously."""
+    from services.alert_dispatcher import alert_dispatcher
+
+    monkeypatch.setattr(alert_dispatcher, "workers", 0)
+
+
+def _rows(path):
+    """Read (key, status, attempts) of every stored alert."""
+    with sqlite3.connect(path) as connection:
+        return connection.execute(
+            "SELECT key, status, attempts FROM alert_outbox ORDER BY created_at"
+        ).fetchall()
+
+
+class TestAlertKey:
+    """Test cases for alert_key."""
+
+    def test_key_combines_device_transition_and_time(self):
+        """Test that the key identifies one transition of one device."""
+        from services.alert_outbox import alert_key
+
+        assert alert_key("dev_a", "opened", 1700000000000) == "dev_a:opened:1700000000000"
+        assert alert_key(None, "closed", 5) == "-:closed:5"
+
+
+class TestAlertOutbox:
+    """Test cases for AlertOutbox."""
+
+    def test_disabled_outbox_only_dispatches(self):
+        """Test that without a path alerts go straight to the dispatcher."""
+        from services.alert_outbox import AlertOutbox
+
+        outbox = AlertOutbox()
+        sender = Mock(return_value=True)
+
+        assert outbox.enabled is False
+        assert outbox.add("k1", "hello", sender) is True
+        sender.assert_called_once_with("hello", "k1")
+        assert outbox.start(sender) == 0
+
+    def test_delivered_alert_is_recorded(self, tmp_path):
+        """Test that a delivered alert is stored with its idempotency key."""
+        from services.alert_outbox import AlertOutbox
+
+        path = str(tmp_path / "outbox.db")
+        outbox = AlertOutbox(path)
+        sender = Mock(return_value=True)
+
+        assert outbox.add("dev_a:opened:1", "DOOR OPENED", sender) is True
+        assert outbox.flush()
+
+        sender.assert_called_once_with("DOOR OPENED", "dev_a:opened:1")
+        assert _rows(path) == [("dev_a:opened:1", "delivered", 1)]
+        assert outbox.metrics()["delivered"] == 1
+
+    def test_duplicate_key_is_skipped(self, tmp_path):
+        """Test that the same transition is only queued once."""
+        from services.alert_outbox import AlertOutbox
+
+        outbox = AlertOutbox(str(tmp_path / "outbox.db"))
+        sender = Mock(return_value=True)
+
+        outbox.add("dev_a:opened:1", "DOOR OPENED", sender)
+        assert outbox.add("dev_a:opened:1", "DOOR OPENED", sender) is True
+
+        sender.assert_called_once()
+        assert outbox.metrics()["duplicates"] == 1
+
+    def test_failed_alert_is_retried(self, tmp_path):
+        """Test that a failed send is scheduled again and delivered later."""
+        from services.alert_outbox import AlertOutbox
+
+        path = str(tmp_path / "outbox.db")
+        outbox = AlertOutbox(path, base_delay=0.01, max_delay=0.01)
+        sender = Mock(side_effect=[False, True])
+
+        outbox.add("k1", "hello", sender)
+
+        for _ in range(200):
+            if sender.call_count == 2 and outbox.flush():
+                break
+            time.sleep(0.01)
+        assert sender.call_count == 2
+        assert _rows(path) == [("k1", "delivered", 2)]
+        assert outbox.metrics()["retried"] == 1
+
+    def test_alert_given_up_after_max_attempts(self, tmp_path):
+        """Test that an alert failing every attempt is marked dead."""
+        from services.alert_outbox import AlertOutbox
+
+        path = str(tmp_path / "outbox.db")
+        outbox = AlertOutbox(path, max_attempts=1)
+
+        outbox.add("k1", "hello", Mock(side_effect=RuntimeError("gateway down")))
+        assert outbox.flush()
+
+        assert _rows(path) == [("k1", "dead", 1)]
+        assert outbox.metrics()["dead"] == 1
+
+    def test_pending_alerts_replayed_at_start(self, tmp_path):
+        """Test that alerts left pending by a previous run are delivered on start."""
+        from services.alert_outbox import AlertOutbox
+
+        path = str(tmp_path / "outbox.db")
+        crashed = AlertOutbox(path, base_delay=60, max_delay=60)
+        crashed.add("k1", "hello", Mock(return_value=False))
+        assert crashed.flush()
+        assert _rows(path) == [("k1", "pending", 1)]
+
+        restarted = AlertOutbox(path)
+        sender = Mock(return_value=True)
+
+        assert restarted.start(sender) == 1
+        assert restarted.flush()
+        sender.assert_called_once_with("hello", "k1")
+        assert _rows(path) == [("k1", "delivered", 2)]
+        # Keys of the previous run are still recognized as duplicates
+        assert restarted.add("k1", "hello", sender) is True
+        sender.assert_called_once()
+
+    def test_deferred_alert_does_not_use_attempts(self, tmp_path):
+        """Test that a copy handed back by the sender is retried without counting an attempt."""
+        from services.alert_dispatcher import Deferred
+        from services.alert_outbox import AlertOutbox
+
+        path = str(tmp_path / "outbox.db")
+        outbox = AlertOutbox(path, max_attempts=1)
+        sender = Mock(side_effect=[Deferred(0.01), Deferred(0.01), True])
+
+        outbox.add("k1", "hello", sender)
+
+        for _ in range(200):
+            if sender.call_count == 3 and outbox.flush():
+                break
+            time.sleep(0.01)
+        assert _rows(path) == [("k1", "delivered", 1)]
+        assert outbox.metrics()["dead"] == 0
+
+    def test_alert_evicted_from_dispatch_queue_is_retried(self, tmp_path, monkeypatch):
+        """Test that an outbox job dropped by drop_oldest is scheduled again, not stranded."""
+        import threading
+        import services.alert_outbox as alert_outbox_module
+        from services.alert_dispatcher import AlertDispatcher
+        from services.alert_outbox import AlertOutbox
+
+        dispatcher = AlertDispatcher(workers=1, max_queue=1, overflow="drop_oldest")
+        monkeypatch.setattr(alert_outbox_module, "alert_dispatcher", dispatcher)
+        release, started = threading.Event(), threading.Event()
+        dispatcher.submit(lambda: started.set() or release.wait(5))
+        started.wait(2)
+
+        path = str(tmp_path / "outbox.db")
+        outbox = AlertOutbox(path, base_delay=0.01, max_delay=0.01)
+        sender = Mock(return_value=True)
+        outbox.add("k1", "first", sender)
+        outbox.add("k2", "second", sender)  # Evicts k1 from the full queue
+        release.set()
+
+        for _ in range(300):
+            if sender.call_count == 2 and outbox.flush():
+                break
+            time.sleep(0.01)
+        assert sorted(call[0][1] for call in sender.call_args_list) == ["k1", "k2"]
+        assert _rows(path) == [("k1", "delivered", 1), ("k2", "delivered", 1)]
+
+    def test_failed_commit_is_retried_and_reported(self, tmp_path):
+        """Test that writes of a failed commit are kept, retried and reported until they land."""
+        import threading
+        from services.alert_outbox import AlertOutbox
+
+        path = str(tmp_path / "outbox.db")
+        outbox = AlertOutbox(path, base_delay=0.01, max_delay=0.01)
+        sender = Mock(return_value=True)
+        outbox.start(sender)
+        connect, disk_full = outbox._connect, threading.Event()
+        disk_full.set()
+
+        def failing_connect():
+            if disk_full.is_set():
+                raise sqlite3.OperationalError("database or disk is full")
+            return connect()
+
+        outbox._connect = failing_connect
+        outbox.add("k1", "first", sender)
+
+        assert outbox.flush(timeout=0.2) is False
+        assert outbox.commit_error() == "database or disk is full"
+        assert outbox.metrics()["uncommitted"] == 2
+
+        disk_full.clear()
+        assert outbox.flush()
+        assert outbox.commit_error() is None
+        assert _rows(path) == [("k1", "delivered", 1)]
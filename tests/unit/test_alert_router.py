@@ -0,0 +1,102 @@
+"""
+Unit tests for services/alert_router.py module.
+
+Tests the recipient routing table and per-recipient pacing and backoff.
+"""
+
+from unittest.mock import Mock
+
+
+class TestParseRoutes:
+    """Test cases for parse_routes and copy keys."""
+
+    def test_parse_routes(self):
+        """Test that selectors map to their recipient lists."""
+        from services.alert_router import parse_routes
+
+        routes = parse_routes("dev_a=g1@g.us|628111, severity:alert=628999, *=g0@g.us, bad")
+
+        assert routes == {
+            "dev_a": ["g1@g.us", "628111"],
+            "severity:alert": ["628999"],
+            "*": ["g0@g.us"],
+        }
+
+    def test_copy_key_round_trip(self):
+        """Test that a copy key splits back into alert key and recipient."""
+        from services.alert_router import copy_key, split_copy_key
+
+        key = copy_key("dev_a:opened:1", "g1@g.us")
+
+        assert split_copy_key(key) == ("dev_a:opened:1", "g1@g.us")
+        assert split_copy_key("dev_a:opened:1") == ("dev_a:opened:1", None)
+
+
+class TestAlertRouter:
+    """Test cases for AlertRouter."""
+
+    def _router(self, **kwargs):
+        from services.alert_router import AlertRouter, parse_routes
+
+        routes = parse_routes("dev_a=g1|628111,severity:alert=628999|g1")
+        return AlertRouter(routes, default=["g0"], **kwargs)
+
+    def test_recipients_by_device_and_severity(self):
+        """Test that escalation recipients are added without duplicates."""
+        router = self._router()
+
+        assert router.recipients("dev_a", "info") == ["g1", "628111"]
+        assert router.recipients("dev_a", "alert") == ["g1", "628111", "628999"]
+        assert router.recipients("dev_b", "info") == ["g0"]
+        assert router.recipients(None, "alert") == ["g0", "628999", "g1"]
+
+    def test_throttled_recipient_does_not_affect_others(self):
+        """Test that each recipient has its own token bucket."""
+        from services.alert_dispatcher import Deferred
+
+        router = self._router(rate=1, burst=1)
+        sender = Mock(return_value=True)
+
+        assert router.send("g1", "m1", "k1>g1", sender) is True
+        deferred = router.send("g1", "m2", "k2>g1", sender)
+        assert isinstance(deferred, Deferred) and 59 < deferred.delay <= 60
+        assert router.send("628111", "m2", "k2>628111", sender) is True
+
+        assert sender.call_count == 2
+        assert router.metrics()["g1"]["throttled"] == 1
+
+    def test_failed_recipient_backs_off(self):
+        """Test that a failing recipient is skipped until its backoff ends."""
+        from services.alert_dispatcher import Deferred
+        from services.circuit_breaker import RetryPolicy
+
+        rng = Mock()
+        rng.uniform.return_value = 60
+        router = self._router(rate=0, retry_policy=RetryPolicy(rng=rng))
+        sender = Mock(return_value=False)
+
+        assert router.send("g1", "m1", "k1>g1", sender) is False
+        deferred = router.send("g1", "m1", "k1>g1", sender)
+        assert isinstance(deferred, Deferred) and 0 < deferred.delay <= 60
+        assert router.send("g0", "m1", "k1>g0", Mock(return_value=True)) is True
+
+        sender.assert_called_once_with("m1", "k1>g1", "g1")
+        metrics = router.metrics()
+        assert metrics["g1"]["failed"] == 1
+        assert metrics["g1"]["backoff_seconds"] > 0
+
+    def test_throttled_copy_does_not_block(self):
+        """Test that a copy over the burst is deferred to its next token without waiting."""
+        import time
+        from services.alert_dispatcher import Deferred
+
+        router = self._router(rate=6, burst=1)
+        sender = Mock(return_value=True)
+        assert router.send("g1", "m1", "k1>g1", sender) is True
+
+        started = time.monotonic()
+        deferred = router.send("g1", "m2", "k2>g1", sender)
+
+        assert time.monotonic() - started < 0.5
+        assert isinstance(deferred, Deferred) and 9 < deferred.delay <= 10
+        sender.assert_called_once()
@@ -0,0 +1,336 @@
+"""
+Unit tests for services/async_polling_service.py module.
+
+Tests the asyncio-based polling engine for large sensor fleets.
+"""
+
+import asyncio
+import time
+import pytest
+from unittest.mock import Mock, patch, AsyncMock
+
+
+@pytest.fixture(autouse=True)
+def inline_alerts(monkeypatch):
+    """Deliver queued alerts inline so tests can assert on them immediately."""
+    from services.alert_dispatcher import alert_dispatcher
+
+    monkeypatch.setattr(alert_dispatcher, "workers", 0)
+
+
+class TestAsyncDoorSensorPollerInit:
+    """Test cases for AsyncDoorSensorPoller initialization."""
+
+    @patch("services.async_polling_service.Config")
+    def test_init_default_max_in_flight(self, mock_config, mock_env_vars):
+        """Test that max_in_flight defaults to Config.POLL_MAX_IN_FLIGHT."""
+        mock_config.POLL_MAX_IN_FLIGHT = 16
+
+        from services.async_polling_service import AsyncDoorSensorPoller
+
+        poller = AsyncDoorSensorPoller(poll_interval=5, device_ids=["dev_a"])
+
+        assert poller.max_in_flight == 16
+
+    def test_init_custom_values(self, mock_env_vars):
+        """Test that custom interval, devices and concurrency are stored."""
+        from services.async_polling_service import AsyncDoorSensorPoller
+
+        poller = AsyncDoorSensorPoller(
+            poll_interval=7, device_ids=["dev_a", "dev_b"], max_in_flight=3
+        )
+
+        assert poller.poll_interval == 7
+        assert poller.device_ids == ["dev_a", "dev_b"]
+        assert poller.max_in_flight == 3
+        assert poller.running is False
+
+    @patch("services.async_polling_service.WhatsAppConfig")
+    def test_alert_workers_from_config(self, mock_whatsapp_config, mock_env_vars):
+        """Test that the alert pool size follows ALERT_WORKERS, with at least one thread."""
+        from services.async_polling_service import AsyncDoorSensorPoller
+
+        mock_whatsapp_config.ALERT_WORKERS = 6
+        assert AsyncDoorSensorPoller(device_ids=["dev_a"]).alert_workers == 6
+
+        mock_whatsapp_config.ALERT_WORKERS = 0
+        assert AsyncDoorSensorPoller(device_ids=["dev_a"]).alert_workers == 1
+
+
+class TestStatusBatcher:
+    """Test cases for the _StatusBatcher request coalescer."""
+
+    def test_concurrent_requests_share_one_batch(self, mock_env_vars):
+        """Test that requests within the linger window become one upstream call."""
+        from services.async_polling_service import _StatusBatcher
+
+        fetch = AsyncMock(
+            return_value=({"success": True}, {"dev_a": ["a"], "dev_b": ["b"]})
+        )
+
+        async def scenario():
+            batcher = _StatusBatcher(fetch, linger=0.01)
+            return await asyncio.gather(batcher.status("dev_a"), batcher.status("dev_b"))
+
+        results = asyncio.run(scenario())
+
+        fetch.assert_awaited_once_with(["dev_a", "dev_b"])
+        assert results == [({"success": True}, ["a"]), ({"success": True}, ["b"])]
+
+    def test_full_batch_flushes_immediately(self, mock_env_vars):
+        """Test that reaching STATUS_BATCH_LIMIT flushes without waiting."""
+        from services.async_polling_service import _StatusBatcher, STATUS_BATCH_LIMIT
+
+        fetch = AsyncMock(return_value=({"success": True}, {}))
+        device_ids = [f"dev_{index}" for index in range(STATUS_BATCH_LIMIT)]
+
+        async def scenario():
+            batcher = _StatusBatcher(fetch, linger=60)
+            return await asyncio.wait_for(
+                asyncio.gather(*(batcher.status(d) for d in device_ids)), timeout=1
+            )
+
+        results = asyncio.run(scenario())
+
+        assert fetch.await_count == 1
+        assert all(status is None for _, status in results)
+
+    def test_in_flight_batches_are_held_and_cancelled_on_close(self, mock_env_vars):
+        """Test that the batcher keeps its batch tasks alive and cancels them on close."""
+        import gc
+        from services.async_polling_service import _StatusBatcher
+
+        cancelled = []
+
+        async def slow_fetch(batch):
+            try:
+                await asyncio.sleep(3600)
+            except asyncio.CancelledError:
+                cancelled.extend(batch)
+                raise
+
+        async def scenario():
+            batcher = _StatusBatcher(slow_fetch, linger=0)
+            waiter = asyncio.ensure_future(batcher.status("dev_a"))
+            await asyncio.sleep(0.01)
+            gc.collect()
+            held = len(batcher._resolving)
+            await batcher.close()
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+            return held, len(batcher._resolving)
+
+        assert asyncio.run(scenario()) == (1, 0)
+        assert cancelled == ["dev_a"]
+
+    def test_fetch_error_propagates_to_waiters(self, mock_env_vars):
+        """Test that an upstream exception is raised in every waiting device."""
+        from services.async_polling_service import _StatusBatcher
+
+        fetch = AsyncMock(side_effect=RuntimeError("boom"))
+
+        async def scenario():
+            batcher = _StatusBatcher(fetch, linger=0.01)
+            return await asyncio.gather(batcher.status("dev_a"), return_exceptions=True)
+
+        results = asyncio.run(scenario())
+
+        assert isinstance(results[0], RuntimeError)
+
+
+class TestAsyncDoorSensorPollerEngine:
+    """Test cases for the event loop engine."""
+
+    @patch("services.polling_service.tuya_pool")
+    @patch("services.polling_service.send_door_opened_alert")
+    def test_engine_detects_changes_per_device(
+        self, mock_alert, mock_tuya_service, mock_env_vars
+    ):
+        """Test that the engine batches devices and alerts on the changed one."""
+        from services.rate_limiter import PRIORITY_ALERT
+
+        mock_tuya_service.get_devices_status.return_value = {
+            "success": True,
+            "result": [
+                {"id": "dev_a", "status": [{"code": "doorcontact_state", "value": False}]},
+                {"id": "dev_b", "status": [{"code": "doorcontact_state", "value": True}]},
+            ],
+        }
+
+        from services.async_polling_service import AsyncDoorSensorPoller
+
+        poller = AsyncDoorSensorPoller(poll_interval=60, device_ids=["dev_a", "dev_b"])
+        poller.device_states = {"dev_a": False, "dev_b": False}
+        poller.start()
+
+        deadline = time.monotonic() + 2
+        while poller.device_states.get("dev_b") is not True and time.monotonic() < deadline:
+            time.sleep(0.01)
+        poller.stop()
+
+        mock_tuya_service.get_devices_status.assert_called_once_with(
+            ["dev_a", "dev_b"], priority=PRIORITY_ALERT
+        )
+        mock_alert.assert_called_once()
+        assert mock_alert.call_args[0] == ("dev_b",)
+        assert mock_alert.call_args[1]["key"].startswith("dev_b:opened:")
+
+    @patch("services.polling_service.tuya_pool")
+    def test_stop_returns_quickly(self, mock_tuya_service, mock_env_vars):
+        """Test that stop() cancels sleeping device coroutines immediately."""
+        mock_tuya_service.get_device_status.return_value = {"success": True, "result": []}
+
+        from services.async_polling_service import AsyncDoorSensorPoller
+
+        poller = AsyncDoorSensorPoller(poll_interval=3600, device_ids=["dev_a"])
+        poller.start()
+        time.sleep(0.2)
+
+        started = time.monotonic()
+        poller.stop()
+
+        assert time.monotonic() - started < 1
+        assert not poller.thread.is_alive()
+
+    @patch("services.polling_service.quota_accountant")
+    @patch("services.polling_service.tuya_pool")
+    @patch("services.async_polling_service.logging")
+    def test_quota_error_backs_off_device(
+        self, mock_logging, mock_tuya_service, mock_quota, mock_env_vars
+    ):
+        """Test that a quota error delays the device by the accountant's floor."""
+        mock_tuya_service.get_device_status.return_value = {
+            "success": False,
+            "msg": "Your quota is used up",
+            "code": 1106,
+        }
+
+        mock_quota.interval_floor.return_value = 900
+
+        from services.async_polling_service import AsyncDoorSensorPoller
+
+        poller = AsyncDoorSensorPoller(poll_interval=1, device_ids=["dev_a"], adaptive=False)
+        sleeps = []
+
+        async def fake_sleep(delay):
+            sleeps.append(delay)
+            poller.running = False
+
+        async def scenario():
+            from concurrent.futures import ThreadPoolExecutor
+            from services.async_polling_service import _StatusBatcher
+
+            poller.loop = asyncio.get_running_loop()
+            poller._semaphore = asyncio.Semaphore(1)
+            poller._upstream_pool = ThreadPoolExecutor(max_workers=1)
+            poller.running = True
+            with patch("services.async_polling_service.asyncio.sleep", fake_sleep):
+                await poller._device_loop("dev_a", _StatusBatcher(poller._fetch_batch_async))
+            poller._upstream_pool.shutdown()
+
+        asyncio.run(scenario())
+
+        assert sleeps and 899 < sleeps[0] <= 900
+        mock_logging.error.assert_called()
+
+
+class TestAsyncDoorSensorPollerPhases:
+    """Test cases for staggered device coroutines."""
+
+    def test_device_loop_waits_for_its_phase(self, mock_env_vars):
+        """Test that a device coroutine sleeps its phase offset before the first poll."""
+        from services.async_polling_service import AsyncDoorSensorPoller
+
+        poller = AsyncDoorSensorPoller(poll_interval=60, device_ids=["dev_a"])
+        batcher = Mock()
+        sleeps = []
+
+        async def fake_sleep(delay):
+            sleeps.append(delay)
+            poller.running = False
+
+        async def scenario():
+            poller.running = True
+            with patch("services.async_polling_service.asyncio.sleep", fake_sleep):
+                await poller._device_loop("dev_a", batcher, phase=12.5)
+
+        asyncio.run(scenario())
+
+        assert sleeps == [12.5]
+        batcher.status.assert_not_called()
+
+    def test_restart_waits_for_cancelled_coroutines(self, mock_env_vars):
+        """Test that new device coroutines start only after the old ones have finished."""
+        from services.async_polling_service import AsyncDoorSensorPoller
+
+        poller = AsyncDoorSensorPoller(poll_interval=60, device_ids=["dev_a"])
+        events = []
+
+        async def fake_device_loop(device_id, batcher, phase=0.0):
+            events.append(("start", device_id))
+            try:
+                await asyncio.sleep(3600)
+            except asyncio.CancelledError:
+                # Cleanup that itself yields to the loop
+                await asyncio.sleep(0)
+                events.append(("stop", device_id))
+                raise
+
+        async def scenario():
+            poller.running = True
+            poller._tasks_lock = asyncio.Lock()
+            poller._device_loop = fake_device_loop
+            await poller._start_tasks()
+            await asyncio.sleep(0)
+            await poller._start_tasks()
+            await asyncio.sleep(0)
+            await poller._cancel_tasks()
+
+        asyncio.run(scenario())
+
+        assert events == [
+            ("start", "dev_a"),
+            ("stop", "dev_a"),
+            ("start", "dev_a"),
+            ("stop", "dev_a"),
+        ]
+
+
+class TestAsyncDoorSensorPollerNativeClient:
+    """Test cases for polling through the native async Tuya client."""
+
+    def test_fetch_batch_uses_client(self, mock_env_vars):
+        """Test that batches are fetched with the async client instead of the thread pool."""
+        from services.async_polling_service import AsyncDoorSensorPoller
+
+        client = Mock()
+        client.get_devices_status = AsyncMock(
+            return_value={
+                "success": True,
+                "result": [{"id": "dev_a", "status": ["a"]}, {"id": "dev_b", "status": ["b"]}],
+            }
+        )
+        poller = AsyncDoorSensorPoller(
+            poll_interval=60, device_ids=["dev_a", "dev_b"], client=client
+        )
+
+        async def scenario():
+            poller.loop = asyncio.get_running_loop()
+            poller._semaphore = asyncio.Semaphore(1)
+            return await poller._fetch_batch_async(["dev_a", "dev_b"])
+
+        response, statuses = asyncio.run(scenario())
+
+        client.get_devices_status.assert_awaited_once_with(["dev_a", "dev_b"])
+        assert statuses == {"dev_a": ["a"], "dev_b": ["b"]}
+        assert poller._upstream_pool is None
+
+
+class TestAsyncDoorPollerSingleton:
+    """Test cases for async_door_poller singleton instance."""
+
+    def test_async_door_poller_singleton_exists(self, mock_env_vars):
+        """Test that async_door_poller is an AsyncDoorSensorPoller instance."""
+        from services.async_polling_service import async_door_poller, AsyncDoorSensorPoller
+
+        assert isinstance(async_door_poller, AsyncDoorSensorPoller)
@@ -0,0 +1,332 @@
+"""
+Unit tests for services/async_tuya_service.py module.
+
+Tests request signing, token handling and request coalescing of the
+native asyncio Tuya client.
+"""
+
+import asyncio
+import json
+import time
+import pytest
+from unittest.mock import Mock, patch
+
+
+class _FakeResponse:
+    """Minimal aiohttp response used as an async context manager."""
+
+    def __init__(self, payload, status=200):
+        self.payload = payload
+        self.status = status
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def json(self, content_type=None):
+        return self.payload
+
+
+class _FakeSession:
+    """Records requests and answers them from a handler function."""
+
+    def __init__(self, handler, delay=0.0):
+        self.handler = handler
+        self.delay = delay
+        self.requests = []
+
+    def request(self, method, url, params=None, data=None, headers=None):
+        self.requests.append(
+            {"method": method, "url": url, "params": params, "data": data, "headers": headers}
+        )
+        payload = self.handler(method, url, params)
+        session = self
+
+        class _Delayed(_FakeResponse):
+            async def __aenter__(self):
+                await asyncio.sleep(session.delay)
+                return self
+
+        if isinstance(payload, _FakeResponse):
+            return payload
+        return _Delayed(payload)
+
+
+def _token_response(access_token="tok", expire=7200):
+    """Build a token grant response."""
+    return {
+        "success": True,
+        "t": int(time.time() * 1000),
+        "result": {"access_token": access_token, "refresh_token": "ref", "expire_time": expire},
+    }
+
+
+def _handler(status_payload=None):
+    """Answer token requests with a grant and everything else with status_payload."""
+
+    def handle(method, url, params):
+        if "/v1.0/token" in url:
+            return _token_response()
+        return status_payload or {"success": True, "result": []}
+
+    return handle
+
+
+def _client(session, **kwargs):
+    """Build a client using a fake session."""
+    from services.async_tuya_service import AsyncTuyaService
+
+    return AsyncTuyaService(
+        "https://openapi.example.com", "client_id", "secret", session=session, **kwargs
+    )
+
+
+class TestSignRequest:
+    """Test cases for sign_request."""
+
+    def test_matches_tuya_connector_signature(self):
+        """Test that signatures match the blocking tuya-connector client."""
+        from tuya_connector import TuyaOpenAPI
+        from services.async_tuya_service import sign_request
+
+        openapi = TuyaOpenAPI("https://openapi.example.com", "client_id", "secret")
+        openapi.token_info = Mock(access_token="tok")
+        body = {"commands": [{"code": "switch", "value": True}]}
+
+        with patch("tuya_connector.openapi.time.time", return_value=1700000000.0):
+            expected, t = openapi._calculate_sign("POST", "/v1.0/devices/d/commands", None, body)
+
+        assert expected == sign_request(
+            "client_id",
+            "secret",
+            "tok",
+            t,
+            "POST",
+            "/v1.0/devices/d/commands",
+            None,
+            json.dumps(body),
+        )
+
+    def test_query_parameters_are_sorted(self):
+        """Test that parameter order does not change the signature."""
+        from services.async_tuya_service import sign_request
+
+        first = sign_request("id", "s", "", 1, "GET", "/p", {"b": 2, "a": 1})
+        second = sign_request("id", "s", "", 1, "GET", "/p", {"a": 1, "b": 2})
+
+        assert first == second
+
+
+class TestAsyncTuyaServiceTokens:
+    """Test cases for token handling."""
+
+    def test_first_request_grants_token_once(self, mock_env_vars):
+        """Test that concurrent first requests share one token grant."""
+        session = _FakeSession(_handler(), delay=0.01)
+        client = _client(session)
+
+        async def scenario():
+            await asyncio.gather(*(client.send_command(f"dev_{i}", []) for i in range(5)))
+
+        asyncio.run(scenario())
+
+        token_calls = [r for r in session.requests if "/v1.0/token" in r["url"]]
+        assert len(token_calls) == 1
+        assert client.grants == 1
+        commands = [r for r in session.requests if "/commands" in r["url"]]
+        assert all(r["headers"]["access_token"] == "tok" for r in commands)
+
+    def test_invalid_token_is_regranted_and_retried(self, mock_env_vars):
+        """Test that a 1010 response triggers one new grant and one retry."""
+        responses = [{"success": False, "code": 1010, "msg": "token invalid"}, {"success": True}]
+
+        def handle(method, url, params):
+            if "/v1.0/token" in url:
+                return _token_response()
+            return responses.pop(0)
+
+        session = _FakeSession(handle)
+        client = _client(session)
+
+        result = asyncio.run(client.send_command("dev_a", []))
+
+        assert result == {"success": True}
+        assert client.grants == 2
+
+    def test_token_near_expiry_refreshed_in_background(self, mock_env_vars):
+        """Test that a token inside the refresh margin is renewed without blocking."""
+        session = _FakeSession(_handler())
+        client = _client(session, refresh_margin=300)
+
+        async def scenario():
+            await client.ensure_token()
+            client._refresh_at = 0.0  # Pretend the refresh margin was reached
+            await client.send_command("dev_a", [])
+            await asyncio.sleep(0.01)
+
+        asyncio.run(scenario())
+
+        assert client.refreshes == 1
+        assert any("/v1.0/token/ref" in r["url"] for r in session.requests)
+
+    def test_stored_token_is_reused(self, mock_env_vars):
+        """Test that a valid stored token avoids a grant."""
+        from tuya_connector.openapi import TuyaTokenInfo
+
+        stored = TuyaTokenInfo(_token_response("stored"))
+        store = Mock()
+        store.load.return_value = stored
+        session = _FakeSession(_handler())
+        client = _client(session, store=store)
+
+        asyncio.run(client.send_command("dev_a", []))
+
+        assert client.grants == 0
+        assert session.requests[0]["headers"]["access_token"] == "stored"
+
+    def test_http_error_returned_as_failure(self, mock_env_vars):
+        """Test that an HTTP error status becomes an unsuccessful response."""
+
+        def handle(method, url, params):
+            if "/v1.0/token" in url:
+                return _token_response()
+            return _FakeResponse({}, status=503)
+
+        client = _client(_FakeSession(handle))
+
+        result = asyncio.run(client.get_device_status("dev_a"))
+
+        assert result["success"] is False
+        assert result["code"] == 503
+
+
+class TestAsyncTuyaServiceReads:
+    """Test cases for device reads."""
+
+    @patch("services.async_tuya_service.quota_accountant")
+    def test_identical_reads_are_coalesced(self, mock_quota, mock_env_vars):
+        """Test that concurrent identical reads share one upstream request."""
+        session = _FakeSession(_handler({"success": True, "result": [{"code": "x"}]}), delay=0.01)
+        client = _client(session)
+
+        async def scenario():
+            await client.ensure_token()
+            return await asyncio.gather(*(client.get_device_status("dev_a") for _ in range(3)))
+
+        results = asyncio.run(scenario())
+
+        status_calls = [r for r in session.requests if r["url"].endswith("/dev_a/status")]
+        assert len(status_calls) == 1
+        assert all(result["result"] == [{"code": "x"}] for result in results)
+        mock_quota.observe.assert_called_once()
+
+    def test_batch_status_uses_multi_device_endpoint(self, mock_env_vars):
+        """Test that several devices are read with one batch request."""
+        session = _FakeSession(_handler())
+        client = _client(session)
+
+        asyncio.run(client.get_devices_status(["dev_a", "dev_b"]))
+
+        request = session.requests[-1]
+        assert request["url"].endswith("/v1.0/iot-03/devices/status")
+        assert request["params"] == {"device_ids": "dev_a,dev_b"}
+
+    def test_missing_aiohttp_raises_clear_error(self, mock_env_vars):
+        """Test that using the client without aiohttp or a session fails clearly."""
+        from services.async_tuya_service import AsyncTuyaService
+
+        client = AsyncTuyaService("https://openapi.example.com", "id", "secret")
+
+        with patch("services.async_tuya_service.aiohttp", None):
+            with pytest.raises(RuntimeError, match="aiohttp"):
+                asyncio.run(client.get_device_status("dev_a"))
+
+
+def _shared_service(limits=None, max_wait=0, min_calls=5):
+    """Build a stand-in TuyaService holding the guards the async client shares."""
+    from services.circuit_breaker import CircuitBreakerRegistry, RetryPolicy
+    from services.rate_limiter import RateLimiter
+
+    service = Mock()
+    service.rate_limiter = RateLimiter(limits, max_wait=max_wait)
+    service.breakers = CircuitBreakerRegistry(min_calls=min_calls)
+    service.retry_policy = RetryPolicy(attempts=1)
+    service.spec_index.validate.side_effect = lambda device_id, commands, fetch: (commands, [])
+    return service
+
+
+class TestAsyncTuyaServiceSharedGuards:
+    """Test cases for the rate limiter, breakers and validation shared with TuyaService."""
+
+    def test_shared_rate_limit_applies(self, mock_env_vars):
+        """Test that a token taken by the blocking client is not available to the async one."""
+        from services.rate_limiter import PRIORITY_API
+        from services.tuya_service import RATE_LIMITED_CODE
+
+        session = _FakeSession(_handler())
+        service = _shared_service({"default": (0.001, 1)})
+        client = _client(session, service=service)
+        service.rate_limiter.acquire("devices_status")
+
+        result = asyncio.run(client.get_devices_status(["dev_a"], priority=PRIORITY_API))
+
+        assert result["code"] == RATE_LIMITED_CODE
+        assert not [r for r in session.requests if "/devices/status" in r["url"]]
+
+    def test_shared_breaker_opens_on_server_errors(self, mock_env_vars):
+        """Test that HTTP 5xx responses count against the shared circuit breaker."""
+        from services.tuya_service import CIRCUIT_OPEN_CODE
+
+        def handle(method, url, params):
+            if "/v1.0/token" in url:
+                return _token_response()
+            return _FakeResponse({}, status=503)
+
+        service = _shared_service(min_calls=1)
+        client = _client(_FakeSession(handle), service=service)
+
+        async def scenario():
+            await client.get_device_status("dev_a")
+            return await client.get_device_status("dev_a")
+
+        assert asyncio.run(scenario())["code"] == CIRCUIT_OPEN_CODE
+        assert service.breakers.metrics()["device_status"]["state"] == "open"
+
+    def test_invalid_command_rejected_locally(self, mock_env_vars):
+        """Test that commands failing the shared spec validation are never sent."""
+        from services.tuya_service import INVALID_COMMAND_CODE
+
+        session = _FakeSession(_handler())
+        service = _shared_service()
+        service.spec_index.validate.side_effect = None
+        service.spec_index.validate.return_value = ([], ["switch: unknown code"])
+        client = _client(session, service=service)
+
+        result = asyncio.run(client.send_command("dev_a", [{"code": "switch", "value": 1}]))
+
+        assert result["code"] == INVALID_COMMAND_CODE
+        assert not [r for r in session.requests if r["method"] == "POST"]
+
+    def test_cancelled_probe_frees_half_open_breaker(self, mock_env_vars):
+        """Test that a half-open probe cancelled mid-request does not wedge the breaker."""
+        from services.circuit_breaker import HALF_OPEN
+
+        session = _FakeSession(_handler(), delay=1)
+        service = _shared_service()
+        breaker = service.breakers.get("device_status")
+        breaker.state = HALF_OPEN
+        client = _client(session, service=service)
+
+        async def scenario():
+            task = asyncio.ensure_future(client.get_device_status("dev_a"))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(scenario())
+
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow() is True
@@ -0,0 +1,132 @@
+"""
+Unit tests for services/bulk_command_service.py module.
+
+Tests concurrent command fan-out with per-device ordering.
+"""
+
+import threading
+import time
+from unittest.mock import patch
+
+
+class TestBulkCommandRunner:
+    """Test cases for BulkCommandRunner."""
+
+    @patch("services.bulk_command_service.tuya_pool")
+    def test_results_in_request_order(self, mock_tuya_service, mock_env_vars):
+        """Test that results line up with the request entries."""
+        mock_tuya_service.send_command.side_effect = lambda device_id, commands, priority: (
+            {"success": True, "result": True}
+            if device_id != "dev_b"
+            else {"success": False, "code": 2001, "msg": "device is offline"}
+        )
+
+        from services.bulk_command_service import BulkCommandRunner
+
+        results = BulkCommandRunner(workers=4).run(
+            [("dev_a", [{"code": "switch", "value": True}]), ("dev_b", []), ("dev_c", [])]
+        )
+
+        assert [result["device_id"] for result in results] == ["dev_a", "dev_b", "dev_c"]
+        assert results[0] == {"device_id": "dev_a", "success": True, "result": True}
+        assert results[1] == {
+            "device_id": "dev_b",
+            "success": False,
+            "code": 2001,
+            "message": "device is offline",
+        }
+
+    @patch("services.bulk_command_service.tuya_pool")
+    def test_devices_run_concurrently(self, mock_tuya_service, mock_env_vars):
+        """Test that total time is close to the slowest device, not the sum."""
+        mock_tuya_service.send_command.side_effect = lambda *args, **kwargs: (
+            time.sleep(0.1) or {"success": True}
+        )
+
+        from services.bulk_command_service import BulkCommandRunner
+
+        started = time.monotonic()
+        BulkCommandRunner(workers=8).run([(f"dev_{i}", []) for i in range(8)])
+
+        assert time.monotonic() - started < 0.5
+
+    @patch("services.bulk_command_service.tuya_pool")
+    def test_same_device_commands_keep_order(self, mock_tuya_service, mock_env_vars):
+        """Test that command sets for one device are sent sequentially in order."""
+        sent = []
+        active = set()
+        overlap = threading.Event()
+
+        def send(device_id, commands, priority):
+            if device_id in active:
+                overlap.set()
+            active.add(device_id)
+            time.sleep(0.02)
+            sent.append((device_id, commands[0]["value"]))
+            active.discard(device_id)
+            return {"success": True}
+
+        mock_tuya_service.send_command.side_effect = send
+
+        from services.bulk_command_service import BulkCommandRunner
+
+        BulkCommandRunner(workers=4).run(
+            [("dev_a", [{"code": "step", "value": step}]) for step in range(5)]
+        )
+
+        assert [value for _, value in sent] == [0, 1, 2, 3, 4]
+        assert not overlap.is_set()
+
+    @patch("services.bulk_command_service.tuya_pool")
+    def test_exception_becomes_failed_result(self, mock_tuya_service, mock_env_vars):
+        """Test that one failing device does not fail the whole request."""
+        mock_tuya_service.send_command.side_effect = RuntimeError("boom")
+
+        from services.bulk_command_service import BulkCommandRunner
+
+        results = BulkCommandRunner(workers=2).run([("dev_a", [])])
+
+        assert results[0]["success"] is False
+        assert results[0]["message"] == "Internal Server Error"
+
+    @patch("services.bulk_command_service.tuya_pool")
+    def test_bulk_priority_used(self, mock_tuya_service, mock_env_vars):
+        """Test that bulk commands use the bulk rate limiter class."""
+        mock_tuya_service.send_command.return_value = {"success": True}
+
+        from services.bulk_command_service import BulkCommandRunner
+        from services.rate_limiter import PRIORITY_BULK
+
+        BulkCommandRunner(workers=1).run([("dev_a", [])])
+
+        mock_tuya_service.send_command.assert_called_once_with("dev_a", [], priority=PRIORITY_BULK)
+
+    @patch("services.bulk_command_service.ThreadPoolExecutor")
+    @patch("services.bulk_command_service.tuya_pool")
+    def test_concurrent_requests_share_one_pool(
+        self, mock_tuya_service, mock_executor, mock_env_vars
+    ):
+        """Test that simultaneous first requests create a single worker pool."""
+        from concurrent.futures import Future
+        from services.bulk_command_service import BulkCommandRunner
+
+        def slow_pool(**kwargs):
+            time.sleep(0.05)
+            return mock_executor.return_value
+
+        def submit(func, *args):
+            future = Future()
+            future.set_result([])
+            return future
+
+        mock_executor.side_effect = slow_pool
+        mock_executor.return_value.submit.side_effect = submit
+        runner = BulkCommandRunner(workers=2)
+
+        threads = [threading.Thread(target=runner.run, args=([("dev_a", [])],)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=2)
+
+        mock_executor.assert_called_once()
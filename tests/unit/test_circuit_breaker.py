@@ -0,0 +1,136 @@
+"""
+Unit tests for services/circuit_breaker.py module.
+
+Tests breaker state transitions and jittered retry delays.
+"""
+
+import random
+from unittest.mock import patch
+
+
+class TestCircuitBreaker:
+    """Test cases for CircuitBreaker."""
+
+    def test_stays_closed_below_min_calls(self):
+        """Test that a few failures do not open the breaker."""
+        from services.circuit_breaker import CircuitBreaker
+
+        breaker = CircuitBreaker("status", min_calls=5)
+        for _ in range(4):
+            breaker.record(False, 0.1)
+
+        assert breaker.state == "closed"
+        assert breaker.allow() is True
+
+    def test_opens_on_failure_rate(self):
+        """Test that reaching the failure rate opens the breaker and rejects calls."""
+        from services.circuit_breaker import CircuitBreaker
+
+        breaker = CircuitBreaker("status", failure_rate=0.5, min_calls=4)
+        breaker.record(True, 0.1)
+        breaker.record(True, 0.1)
+        breaker.record(False, 0.1)
+        breaker.record(False, 0.1)
+
+        assert breaker.state == "open"
+        assert breaker.allow() is False
+        assert breaker.metrics()["rejected"] == 1
+
+    def test_opens_on_slow_calls(self):
+        """Test that successful but slow calls open the breaker."""
+        from services.circuit_breaker import CircuitBreaker
+
+        breaker = CircuitBreaker("status", slow_call_duration=1.0, slow_call_rate=0.5, min_calls=2)
+        breaker.record(True, 3.0)
+        breaker.record(True, 4.0)
+
+        assert breaker.state == "open"
+
+    def test_old_calls_leave_the_window(self):
+        """Test that failures older than the window no longer count."""
+        from services.circuit_breaker import CircuitBreaker
+
+        breaker = CircuitBreaker("status", min_calls=3, window=60)
+        with patch("services.circuit_breaker.time.monotonic", return_value=0.0):
+            breaker.record(False, 0.1)
+            breaker.record(False, 0.1)
+        with patch("services.circuit_breaker.time.monotonic", return_value=100.0):
+            breaker.record(True, 0.1)
+
+        assert breaker.state == "closed"
+        assert breaker.metrics()["window_calls"] == 1
+
+    @patch("services.circuit_breaker.time.monotonic")
+    def test_half_open_probe_closes_on_success(self, mock_monotonic):
+        """Test that one probe is allowed after the cool-down and success closes the breaker."""
+        from services.circuit_breaker import CircuitBreaker
+
+        mock_monotonic.return_value = 0.0
+        breaker = CircuitBreaker("status", min_calls=1, open_duration=30)
+        breaker.record(False, 0.1)
+
+        mock_monotonic.return_value = 31.0
+        assert breaker.allow() is True
+        assert breaker.state == "half_open"
+        assert breaker.allow() is False  # Only one probe at a time
+
+        breaker.record(True, 0.1)
+
+        assert breaker.state == "closed"
+        assert breaker.allow() is True
+
+    @patch("services.circuit_breaker.time.monotonic")
+    def test_half_open_probe_failure_reopens(self, mock_monotonic):
+        """Test that a failed probe starts a new cool-down."""
+        from services.circuit_breaker import CircuitBreaker
+
+        mock_monotonic.return_value = 0.0
+        breaker = CircuitBreaker("status", min_calls=1, open_duration=30)
+        breaker.record(False, 0.1)
+
+        mock_monotonic.return_value = 31.0
+        breaker.allow()
+        breaker.record(False, 0.1)
+
+        assert breaker.state == "open"
+        mock_monotonic.return_value = 40.0
+        assert breaker.allow() is False
+
+
+class TestCircuitBreakerRegistry:
+    """Test cases for CircuitBreakerRegistry."""
+
+    def test_one_breaker_per_endpoint(self):
+        """Test that endpoints get independent breakers."""
+        from services.circuit_breaker import CircuitBreakerRegistry
+
+        registry = CircuitBreakerRegistry(min_calls=1)
+        registry.get("status").record(False, 0.1)
+
+        assert registry.get("status") is registry.get("status")
+        assert registry.metrics() == {
+            "status": {"state": "open", "window_calls": 0, "rejected": 0}
+        }
+        assert registry.get("commands").allow() is True
+
+
+class TestRetryPolicy:
+    """Test cases for RetryPolicy."""
+
+    def test_delays_are_capped_and_jittered(self):
+        """Test that delays stay within the capped exponential bound."""
+        from services.circuit_breaker import RetryPolicy
+
+        policy = RetryPolicy(attempts=5, base_delay=0.5, max_delay=2.0, rng=random.Random(7))
+        delays = [policy.delay(retry) for retry in range(6)]
+
+        assert 0 <= delays[0] <= 0.5
+        assert 0 <= delays[1] <= 1.0
+        assert all(0 <= delay <= 2.0 for delay in delays)
+        assert len(set(delays)) == len(delays)
+
+    def test_at_least_one_attempt(self):
+        """Test that the attempt count never drops below one."""
+        from services.circuit_breaker import RetryPolicy
+
+        assert RetryPolicy(attempts=0).attempts == 1
@@ -103,6 +103,18 @@ class TestConfig:
 
         assert Config.ENV == "test"
 
+    def test_validate_requires_state_snapshot_for_sharding(self, mock_env_vars, monkeypatch):
+        """Test that sharding without a state snapshot is refused."""
+        from config.Config import Config
+
+        monkeypatch.setattr(Config, "SHARD_ENABLED", True)
+        monkeypatch.setattr(Config, "STATE_SNAPSHOT_PATH", "")
+        with pytest.raises(ValueError, match="STATE_SNAPSHOT_PATH"):
+            Config.validate()
+
+        monkeypatch.setattr(Config, "STATE_SNAPSHOT_PATH", "/data/device_state.db")
+        Config.validate()
+
 
 class TestTuyaConfig:
     """Test cases for TuyaConfig class."""
@@ -131,6 +143,42 @@ class TestTuyaConfig:
 
         assert TuyaConfig.DEVICE_ID == "test_device_id"
 
+    def test_device_ids_default_empty(self, mock_env_vars):
+        """Test that DEVICE_IDS is empty when not configured."""
+        from config.Config import TuyaConfig
+
+        assert TuyaConfig.DEVICE_IDS == []
+
+    def test_device_ids_parsed_from_comma_list(self, monkeypatch):
+        """Test that DEVICE_IDS is split on commas and stripped."""
+        monkeypatch.setenv("DEVICE_IDS", "dev_a, dev_b,,dev_c ")
+
+        import importlib
+        import config.Config
+
+        importlib.reload(config.Config)
+
+        assert config.Config.TuyaConfig.DEVICE_IDS == ["dev_a", "dev_b", "dev_c"]
+
+    def test_validate_accepts_device_ids_without_device_id(self, mock_env_vars, monkeypatch):
+        """Test that a fleet configured via DEVICE_IDS passes validation."""
+        from config.Config import TuyaConfig
+
+        monkeypatch.setattr(TuyaConfig, "DEVICE_ID", None)
+        monkeypatch.setattr(TuyaConfig, "DEVICE_IDS", ["dev_a"])
+
+        TuyaConfig.validate()
+
+    def test_validate_rejects_async_client_with_accounts(self, mock_env_vars, monkeypatch):
+        """Test that the native async client cannot be combined with several projects."""
+        from config.Config import TuyaConfig
+
+        monkeypatch.setattr(TuyaConfig, "ASYNC_CLIENT", True)
+        monkeypatch.setattr(TuyaConfig, "ACCOUNTS", "proj:id:secret:eu")
+
+        with pytest.raises(ValueError, match="TUYA_ACCOUNTS"):
+            TuyaConfig.validate()
+
     def test_pulsar_endpoint_loaded(self, mock_env_vars):
         """Test that Pulsar endpoint is loaded from environment."""
         from config.Config import TuyaConfig
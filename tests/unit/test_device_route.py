@@ -9,10 +9,20 @@ import json
 from unittest.mock import Mock, patch
 
 
+@pytest.fixture(autouse=True)
+def empty_status_cache():
+    """Start every test with an empty status cache so readings do not leak between tests."""
+    from services.status_cache import status_cache
+
+    status_cache.clear()
+    yield
+    status_cache.clear()
+
+
 class TestGetDeviceStatus:
     """Test cases for GET /devices/<device_id>/status endpoint."""
 
-    @patch("routes.device.tuya_service")
+    @patch("routes.device.tuya_pool")
     def test_get_device_status_success(self, mock_tuya_service, flask_test_client):
         """Test successful device status retrieval."""
         mock_tuya_service.get_device_status.return_value = {
@@ -32,7 +42,7 @@ class TestGetDeviceStatus:
         assert data["status"] == "success"
         assert len(data["result"]) == 2
 
-    @patch("routes.device.tuya_service")
+    @patch("routes.device.tuya_pool")
     def test_get_device_status_calls_service_with_device_id(
         self, mock_tuya_service, flask_test_client
     ):
@@ -48,7 +58,7 @@ class TestGetDeviceStatus:
 
         mock_tuya_service.get_device_status.assert_called_once_with(device_id)
 
-    @patch("routes.device.tuya_service")
+    @patch("routes.device.tuya_pool")
     def test_get_device_status_api_failure(self, mock_tuya_service, flask_test_client):
         """Test handling of API failure response."""
         mock_tuya_service.get_device_status.return_value = {
@@ -65,7 +75,7 @@ class TestGetDeviceStatus:
         assert data["status"] == "error"
         assert data["message"] == "Device not found"
 
-    @patch("routes.device.tuya_service")
+    @patch("routes.device.tuya_pool")
     def test_get_device_status_exception(self, mock_tuya_service, flask_test_client):
         """Test handling of unexpected exceptions."""
         mock_tuya_service.get_device_status.side_effect = Exception("Connection error")
@@ -77,7 +87,7 @@ class TestGetDeviceStatus:
         assert data["status"] == "error"
         assert data["message"] == "Internal Server Error"
 
-    @patch("routes.device.tuya_service")
+    @patch("routes.device.tuya_pool")
     def test_get_device_status_door_open(self, mock_tuya_service, flask_test_client):
         """Test device status when door is open."""
         mock_tuya_service.get_device_status.return_value = {
@@ -93,7 +103,7 @@ class TestGetDeviceStatus:
 
         assert data["result"][0]["value"] is True  # Door is open
 
-    @patch("routes.device.tuya_service")
+    @patch("routes.device.tuya_pool")
     def test_get_device_status_door_closed(self, mock_tuya_service, flask_test_client):
         """Test device status when door is closed."""
         mock_tuya_service.get_device_status.return_value = {
@@ -106,7 +116,7 @@ class TestGetDeviceStatus:
 
         assert data["result"][0]["value"] is False  # Door is closed
 
-    @patch("routes.device.tuya_service")
+    @patch("routes.device.tuya_pool")
     def test_get_device_status_missing_msg(self, mock_tuya_service, flask_test_client):
         """Test handling when API response is missing msg field."""
         mock_tuya_service.get_device_status.return_value = {
@@ -120,7 +130,7 @@ class TestGetDeviceStatus:
 
         assert data["message"] == "Failed to fetch status"
 
-    @patch("routes.device.tuya_service")
+    @patch("routes.device.tuya_pool")
     def test_get_device_status_missing_code(self, mock_tuya_service, flask_test_client):
         """Test handling when API response is missing code field."""
         mock_tuya_service.get_device_status.return_value = {
@@ -134,10 +144,51 @@ class TestGetDeviceStatus:
         assert response.status_code == 500
 
 
+class TestGetDeviceStatusCache:
+    """Test cases for serving device status from the status cache."""
+
+    @patch("routes.device.tuya_pool")
+    def test_fresh_reading_served_without_api_call(self, mock_tuya_service, flask_test_client):
+        """Test that a cached reading is returned with its age and no API call."""
+        from services.status_cache import status_cache
+
+        status_cache.put("test_device_123", [{"code": "doorcontact_state", "value": True}])
+
+        response = flask_test_client.get("/devices/test_device_123/status")
+
+        assert response.status_code == 200
+        data = json.loads(response.get_data(as_text=True))
+        assert data["result"] == [{"code": "doorcontact_state", "value": True}]
+        assert data["meta"]["stale"] is False
+        assert data["meta"]["age_seconds"] >= 0
+        assert response.headers["Age"] == "0"
+        mock_tuya_service.get_device_status.assert_not_called()
+
+    @patch("routes.device.tuya_pool")
+    def test_second_read_hits_cache(self, mock_tuya_service, flask_test_client):
+        """Test that a read-through result is cached for the next request."""
+        mock_tuya_service.get_device_status.return_value = {"success": True, "result": []}
+
+        flask_test_client.get("/devices/test_device_123/status")
+        flask_test_client.get("/devices/test_device_123/status")
+
+        mock_tuya_service.get_device_status.assert_called_once_with("test_device_123")
+
+    @patch("routes.device.tuya_pool")
+    def test_failure_not_cached(self, mock_tuya_service, flask_test_client):
+        """Test that a failed read is retried on the next request."""
+        mock_tuya_service.get_device_status.return_value = {"success": False, "msg": "offline"}
+
+        flask_test_client.get("/devices/test_device_123/status")
+        flask_test_client.get("/devices/test_device_123/status")
+
+        assert mock_tuya_service.get_device_status.call_count == 2
+
+
 class TestSendDeviceCommand:
     """Test cases for POST /devices/<device_id>/commands endpoint."""
 
-    @patch("routes.device.tuya_service")
+    @patch("routes.device.tuya_pool")
     def test_send_device_command_success(self, mock_tuya_service, flask_test_client):
         """Test successful command sending."""
         mock_tuya_service.send_command.return_value = {
@@ -158,7 +209,7 @@ class TestSendDeviceCommand:
         assert data["status"] == "success"
         assert data["message"] == "Command sent successfully"
 
-    @patch("routes.device.tuya_service")
+    @patch("routes.device.tuya_pool")
     def test_send_device_command_calls_service(self, mock_tuya_service, flask_test_client):
         """Test that service is called with correct parameters."""
         mock_tuya_service.send_command.return_value = {"success": True, "result": {}}
@@ -198,7 +249,7 @@ class TestSendDeviceCommand:
         assert data["status"] == "error"
         assert data["message"] == "Invalid request body"
 
-    @patch("routes.device.tuya_service")
+    @patch("routes.device.tuya_pool")
     def test_send_device_command_api_failure(self, mock_tuya_service, flask_test_client):
         """Test handling of API failure response."""
         mock_tuya_service.send_command.return_value = {
@@ -220,7 +271,7 @@ class TestSendDeviceCommand:
         assert data["status"] == "error"
         assert data["message"] == "Command failed"
 
-    @patch("routes.device.tuya_service")
+    @patch("routes.device.tuya_pool")
     def test_send_device_command_exception(self, mock_tuya_service, flask_test_client):
         """Test handling of unexpected exceptions."""
         mock_tuya_service.send_command.side_effect = Exception("Network error")
@@ -237,7 +288,7 @@ class TestSendDeviceCommand:
         assert data["status"] == "error"
         assert data["message"] == "Internal Server Error"
 
-    @patch("routes.device.tuya_service")
+    @patch("routes.device.tuya_pool")
     def test_send_device_command_multiple_commands(self, mock_tuya_service, flask_test_client):
         """Test sending multiple commands at once."""
         mock_tuya_service.send_command.return_value = {"success": True, "result": {}}
@@ -256,7 +307,7 @@ class TestSendDeviceCommand:
         assert response.status_code == 200
         mock_tuya_service.send_command.assert_called_once_with("test_device", commands)
 
-    @patch("routes.device.tuya_service")
+    @patch("routes.device.tuya_pool")
     def test_send_device_command_empty_commands(self, mock_tuya_service, flask_test_client):
         """Test sending empty commands list."""
         mock_tuya_service.send_command.return_value = {"success": True, "result": {}}
@@ -270,7 +321,7 @@ class TestSendDeviceCommand:
         # Should still be valid even with empty list
         assert response.status_code == 200
 
-    @patch("routes.device.tuya_service")
+    @patch("routes.device.tuya_pool")
     def test_send_device_command_missing_msg(self, mock_tuya_service, flask_test_client):
         """Test handling when API response is missing msg field."""
         mock_tuya_service.send_command.return_value = {
@@ -289,7 +340,7 @@ class TestSendDeviceCommand:
         data = json.loads(response.get_data(as_text=True))
         assert data["message"] == "Failed to send command"
 
-    @patch("routes.device.tuya_service")
+    @patch("routes.device.tuya_pool")
     def test_send_device_command_missing_code(self, mock_tuya_service, flask_test_client):
         """Test handling when API response is missing code field."""
         mock_tuya_service.send_command.return_value = {
@@ -306,3 +357,78 @@ class TestSendDeviceCommand:
         )
 
         assert response.status_code == 500
+
+
+class TestSendBulkCommands:
+    """Test cases for POST /devices/commands endpoint."""
+
+    @patch("services.bulk_command_service.tuya_pool")
+    def test_bulk_commands_success(self, mock_tuya_service, flask_test_client):
+        """Test that per-device results and counts are returned."""
+        mock_tuya_service.send_command.side_effect = lambda device_id, commands, priority: (
+            {"success": device_id == "dev_a", "result": True, "msg": "device is offline"}
+        )
+
+        response = flask_test_client.post(
+            "/devices/commands",
+            json={
+                "devices": [
+                    {"device_id": "dev_a", "commands": [{"code": "switch", "value": True}]},
+                    {"device_id": "dev_b", "commands": [{"code": "switch", "value": True}]},
+                ]
+            },
+        )
+
+        assert response.status_code == 200
+        data = json.loads(response.get_data(as_text=True))
+        assert data["result"]["succeeded"] == 1
+        assert data["result"]["failed"] == 1
+        assert data["result"]["results"][1]["message"] == "device is offline"
+        assert data["message"] == "Commands sent to 1/2 device(s)"
+
+    @patch("services.bulk_command_service.tuya_pool")
+    def test_bulk_commands_stream(self, mock_tuya_service, flask_test_client):
+        """Test that streamed results arrive as one JSON line per device."""
+        mock_tuya_service.send_command.return_value = {"success": True, "result": True}
+
+        response = flask_test_client.post(
+            "/devices/commands?stream=true",
+            json={"devices": [{"device_id": f"dev_{i}", "commands": []} for i in range(3)]},
+        )
+
+        assert response.mimetype == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert sorted(line["index"] for line in lines) == [0, 1, 2]
+        assert all(line["success"] for line in lines)
+
+    @pytest.mark.parametrize(
+        "body",
+        [
+            None,
+            {},
+            {"devices": []},
+            {"devices": [{"device_id": "dev_a"}]},
+            {"devices": [{"device_id": "", "commands": []}]},
+            {"devices": ["dev_a"]},
+        ],
+    )
+    def test_bulk_commands_invalid_body(self, body, flask_test_client):
+        """Test that malformed bodies are rejected with 400."""
+        response = flask_test_client.post("/devices/commands", json=body)
+
+        assert response.status_code == 400
+
+    def test_bulk_commands_too_many_devices(self, flask_test_client, monkeypatch):
+        """Test that requests above the device limit are rejected."""
+        from services.bulk_command_service import bulk_command_runner
+
+        monkeypatch.setattr(bulk_command_runner, "max_devices", 2)
+
+        response = flask_test_client.post(
+            "/devices/commands",
+            json={"devices": [{"device_id": f"dev_{i}", "commands": []} for i in range(3)]},
+        )
+
+        assert response.status_code == 400
+        data = json.loads(response.get_data(as_text=True))
+        assert "maximum 2" in data["message"]
@@ -0,0 +1,170 @@
+"""
+Unit tests for services/device_spec.py module.
+
+Tests function spec parsing, command normalization and the cached index.
+"""
+
+import json
+import pytest
+from unittest.mock import Mock
+
+FUNCTIONS = [
+    {"code": "switch", "type": "Boolean", "values": "{}"},
+    {
+        "code": "bright_value",
+        "type": "Integer",
+        "values": '{"min": 10, "max": 1000, "scale": 0, "step": 10}',
+    },
+    {"code": "work_mode", "type": "Enum", "values": '{"range": ["white", "colour"]}'},
+    {"code": "label", "type": "String", "values": '{"maxlen": 5}'},
+    {"code": "colour_data", "type": "Json", "values": "{}"},
+]
+
+
+def _fetch(functions=FUNCTIONS):
+    """Build a fetch function returning a successful /functions response."""
+    return Mock(return_value={"success": True, "result": {"functions": functions}})
+
+
+class TestFunctionSpec:
+    """Test cases for FunctionSpec.normalize."""
+
+    def _spec(self, code):
+        from services.device_spec import FunctionSpec
+
+        return FunctionSpec.from_api(next(f for f in FUNCTIONS if f["code"] == code))
+
+    def test_boolean_accepts_strings(self):
+        """Test that boolean strings are converted."""
+        spec = self._spec("switch")
+
+        assert spec.normalize(True) is True
+        assert spec.normalize("false") is False
+        with pytest.raises(ValueError):
+            spec.normalize(1)
+
+    def test_integer_range_and_step(self):
+        """Test that integers are converted and checked against min, max and step."""
+        spec = self._spec("bright_value")
+
+        assert spec.normalize("500") == 500
+        assert spec.normalize(20.0) == 20
+        for bad in (5, 1010, 15, 20.5, True, "bright"):
+            with pytest.raises(ValueError):
+                spec.normalize(bad)
+
+    def test_enum_and_string(self):
+        """Test that enum values and string lengths are enforced."""
+        assert self._spec("work_mode").normalize("white") == "white"
+        with pytest.raises(ValueError):
+            self._spec("work_mode").normalize("scene")
+        with pytest.raises(ValueError):
+            self._spec("label").normalize("too long")
+
+    def test_json_passed_through(self):
+        """Test that types without local checks are passed through unchanged."""
+        assert self._spec("colour_data").normalize({"h": 1}) == {"h": 1}
+
+
+class TestDeviceSpecIndex:
+    """Test cases for DeviceSpecIndex."""
+
+    def test_validate_normalizes_commands(self):
+        """Test that valid commands come back normalized without errors."""
+        from services.device_spec import DeviceSpecIndex
+
+        index = DeviceSpecIndex()
+        commands, errors = index.validate(
+            "dev_a",
+            [{"code": "switch", "value": "true"}, {"code": "bright_value", "value": "100"}],
+            _fetch(),
+        )
+
+        assert errors == []
+        assert commands == [
+            {"code": "switch", "value": True},
+            {"code": "bright_value", "value": 100},
+        ]
+
+    def test_validate_reports_every_error(self):
+        """Test that unknown codes, bad values and malformed entries are all reported."""
+        from services.device_spec import DeviceSpecIndex
+
+        _, errors = DeviceSpecIndex().validate(
+            "dev_a",
+            [{"code": "unknown", "value": 1}, {"code": "switch", "value": 3}, {"code": "switch"}],
+            _fetch(),
+        )
+
+        assert len(errors) == 3
+        assert errors[0].startswith("unknown:")
+
+    def test_spec_fetched_once(self):
+        """Test that the specification is fetched once per device."""
+        from services.device_spec import DeviceSpecIndex
+
+        index = DeviceSpecIndex()
+        fetch = _fetch()
+        for _ in range(3):
+            index.validate("dev_a", [{"code": "switch", "value": True}], fetch)
+
+        fetch.assert_called_once_with("dev_a")
+
+    def test_unavailable_spec_skips_validation(self):
+        """Test that commands pass unchecked when the spec cannot be fetched."""
+        from services.device_spec import DeviceSpecIndex
+
+        index = DeviceSpecIndex()
+        fetch = Mock(return_value={"success": False, "msg": "permission deny"})
+        commands = [{"code": "anything", "value": 1}]
+
+        assert index.validate("dev_a", commands, fetch) == (commands, [])
+        index.validate("dev_a", commands, fetch)
+
+        fetch.assert_called_once()
+
+    def test_file_cache_survives_restart(self, tmp_path):
+        """Test that a new index reads specs from the cache file without fetching."""
+        from services.device_spec import DeviceSpecIndex, SPEC_CACHE_VERSION
+
+        path = str(tmp_path / "specs.json")
+        DeviceSpecIndex(path, save_delay=0).get("dev_a", _fetch())
+        fetch = _fetch()
+
+        specs = DeviceSpecIndex(path).get("dev_a", fetch)
+
+        fetch.assert_not_called()
+        assert "bright_value" in specs
+        with open(path, encoding="utf-8") as cache_file:
+            assert json.load(cache_file)["version"] == SPEC_CACHE_VERSION
+
+    def test_file_writes_are_batched(self, tmp_path):
+        """Test that fetches within the save delay are written to the file together."""
+        from services.device_spec import DeviceSpecIndex
+
+        path = tmp_path / "specs.json"
+        index = DeviceSpecIndex(str(path), save_delay=60)
+        index.get("dev_a", _fetch())
+        index.get("dev_b", _fetch())
+
+        assert not path.exists()
+        assert index._save_timer is not None
+
+        index._save_timer.cancel()
+        index.flush()
+
+        assert sorted(json.loads(path.read_text())["devices"]) == ["dev_a", "dev_b"]
+        assert index._save_timer is None
+
+    def test_expired_or_other_version_refetched(self, tmp_path):
+        """Test that stale entries and files of another version are fetched again."""
+        from services.device_spec import DeviceSpecIndex
+
+        path = tmp_path / "specs.json"
+        path.write_text(json.dumps({"version": 0, "devices": {"dev_a": {"fetched_at": 1e12}}}))
+        fetch = _fetch()
+
+        DeviceSpecIndex(str(path)).get("dev_a", fetch)
+        DeviceSpecIndex(str(path), ttl=0).get("dev_a", fetch)
+
+        assert fetch.call_count == 2
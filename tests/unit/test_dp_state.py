@@ -0,0 +1,126 @@
+"""
+Unit tests for services/dp_state.py module.
+
+Tests per-device DP records and payload diffing.
+"""
+
+import pytest
+
+
+def _payload(door=False, battery=85, **extra):
+    """Build a status payload with the given DP values."""
+    result = [
+        {"code": "doorcontact_state", "value": door},
+        {"code": "battery_percentage", "value": battery},
+    ]
+    result.extend({"code": code, "value": value} for code, value in extra.items())
+    return result
+
+
+class TestDeviceRecord:
+    """Test cases for DeviceRecord."""
+
+    def test_record_uses_slots(self):
+        """Test that records carry no per-instance __dict__."""
+        from services.dp_state import DeviceRecord
+
+        record = DeviceRecord()
+
+        assert not hasattr(record, "__dict__")
+        with pytest.raises(AttributeError):
+            record.extra = 1
+
+
+class TestDPStateEngine:
+    """Test cases for DPStateEngine.apply and lookups."""
+
+    def test_first_payload_reports_every_dp(self):
+        """Test that the first payload of a device reports all its DPs."""
+        from services.dp_state import DPStateEngine
+
+        engine = DPStateEngine()
+
+        changes = engine.apply("dev_a", _payload(door=True, battery=90))
+
+        assert changes == {"doorcontact_state": True, "battery_percentage": 90}
+        assert "dev_a" in engine
+
+    def test_identical_payload_is_skipped(self):
+        """Test that an unchanged payload reports no changes."""
+        from services.dp_state import DPStateEngine
+
+        engine = DPStateEngine()
+        engine.apply("dev_a", _payload())
+
+        assert engine.apply("dev_a", _payload()) == {}
+
+    def test_only_changed_dps_are_reported(self):
+        """Test that the diff contains just the DPs whose value changed."""
+        from services.dp_state import DPStateEngine
+
+        engine = DPStateEngine()
+        engine.apply("dev_a", _payload(door=False, battery=85))
+
+        changes = engine.apply("dev_a", _payload(door=False, battery=84))
+
+        assert changes == {"battery_percentage": 84}
+        assert engine.get("dev_a", "doorcontact_state") is False
+
+    def test_other_dps_are_kept(self):
+        """Test that DPs besides door and battery are tracked too."""
+        from services.dp_state import DPStateEngine
+
+        engine = DPStateEngine()
+        engine.apply("dev_a", _payload(temper_alarm=False))
+
+        changes = engine.apply("dev_a", _payload(temper_alarm=True))
+
+        assert changes == {"temper_alarm": True}
+        assert engine.values("dev_a")["temper_alarm"] is True
+
+    def test_unhashable_values_are_supported(self):
+        """Test that structured DP values fall back to a repr digest."""
+        from services.dp_state import DPStateEngine
+
+        engine = DPStateEngine()
+        engine.apply("dev_a", _payload(schedule=[1, 2]))
+
+        assert engine.apply("dev_a", _payload(schedule=[1, 2])) == {}
+        assert engine.apply("dev_a", _payload(schedule=[1, 3])) == {"schedule": [1, 3]}
+
+    def test_bool_and_int_values_are_distinct(self):
+        """Test that a DP changing between True/False and 1/0 is reported."""
+        from services.dp_state import DPStateEngine
+
+        engine = DPStateEngine()
+        engine.apply("dev_a", _payload(door=True, battery=1))
+
+        assert engine.apply("dev_a", _payload(door=1, battery=1)) == {"doorcontact_state": 1}
+        assert engine.apply("dev_a", _payload(door=1, battery=True)) == {
+            "battery_percentage": True
+        }
+        assert engine.apply("dev_a", _payload(door=0, battery=True)) == {"doorcontact_state": 0}
+        assert engine.apply("dev_a", _payload(door=False, battery=True)) == {
+            "doorcontact_state": False
+        }
+
+    def test_devices_are_independent(self):
+        """Test that each device is diffed against its own record."""
+        from services.dp_state import DPStateEngine
+
+        engine = DPStateEngine()
+        engine.apply("dev_a", _payload(door=True))
+
+        assert engine.apply("dev_b", _payload(door=True))["doorcontact_state"] is True
+
+    def test_get_and_forget(self):
+        """Test lookups of unknown devices and removal of records."""
+        from services.dp_state import DPStateEngine
+
+        engine = DPStateEngine()
+        engine.apply("dev_a", _payload())
+
+        assert engine.get("dev_x", "battery_percentage", 0) == 0
+        engine.forget("dev_a")
+        assert "dev_a" not in engine
+        assert engine.values("dev_a") == {}
@@ -0,0 +1,70 @@
+"""
+Unit tests for services/flap_coalescer.py module.
+
+Tests per-device coalescing windows and their summaries.
+"""
+
+import time
+from unittest.mock import Mock
+
+
+class TestFlapCoalescer:
+    """Test cases for FlapCoalescer."""
+
+    def test_zero_window_never_folds(self):
+        """Test that a window of 0 delivers every transition."""
+        from services.flap_coalescer import FlapCoalescer
+
+        coalescer = FlapCoalescer(window=0)
+
+        assert coalescer.record("dev_a", True, Mock()) is True
+        assert coalescer.record("dev_a", False, Mock()) is True
+
+    def test_folds_transitions_and_summarizes(self):
+        """Test that folded transitions produce one summary when the window ends."""
+        from services.flap_coalescer import FlapCoalescer
+
+        coalescer = FlapCoalescer(window=60)
+        send = Mock()
+
+        assert coalescer.record("dev_a", True, send) is True
+        assert coalescer.record("dev_a", False, send) is False
+        assert coalescer.record("dev_a", True, send) is False
+        coalescer.flush()
+
+        summary = send.call_args[0][0]
+        assert (summary.device_id, summary.count, summary.door_open) == ("dev_a", 3, True)
+        assert summary.first_at <= summary.last_at
+        assert coalescer.metrics()["folded"] == 2
+        assert coalescer.metrics()["summaries"] == 1
+
+    def test_window_without_folded_transitions_sends_nothing(self):
+        """Test that a lone transition does not produce a summary."""
+        from services.flap_coalescer import FlapCoalescer
+
+        coalescer = FlapCoalescer(window=0.01)
+        send = Mock()
+
+        coalescer.record("dev_a", True, send)
+        time.sleep(0.1)
+
+        send.assert_not_called()
+        assert coalescer.metrics()["open_windows"] == 0
+        # The next transition opens a new window and is delivered
+        assert coalescer.record("dev_a", False, send) is True
+
+    def test_timer_delivers_summary(self):
+        """Test that the window timer sends the summary without a flush."""
+        from services.flap_coalescer import FlapCoalescer
+
+        coalescer = FlapCoalescer(window=0.05)
+        send = Mock()
+
+        coalescer.record(None, True, send)
+        coalescer.record(None, False, send)
+        for _ in range(100):
+            if send.called:
+                break
+            time.sleep(0.01)
+
+        assert send.call_args[0][0].count == 2
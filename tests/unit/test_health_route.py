@@ -4,7 +4,6 @@ Unit tests for routes/health.py module.
 Tests health check endpoint functionality.
 """
 
-import pytest
 import json
 
 
@@ -49,6 +48,17 @@ class TestHealthRoute:
         assert "result" in data
         assert "status" in data["result"]
 
+    def test_health_check_degraded_while_outbox_fails(self, flask_test_client, monkeypatch):
+        """Test that failing alert outbox writes turn the health check degraded."""
+        from services.alert_outbox import alert_outbox
+
+        monkeypatch.setattr(alert_outbox, "commit_error", lambda: "disk I/O error")
+        response = flask_test_client.get("/health")
+        data = json.loads(response.get_data(as_text=True))
+
+        assert response.status_code == 503
+        assert data["result"] == {"status": "degraded", "alert_outbox": "disk I/O error"}
+
     def test_health_check_method_not_allowed(self, flask_test_client):
         """Test that only GET method is allowed for health check."""
         response = flask_test_client.post("/health")
@@ -67,3 +77,31 @@ class TestHealthRoute:
         data2 = json.loads(response2.get_data(as_text=True))
 
         assert data1 == data2
+
+
+class TestMetricsRoute:
+    """Test cases for the metrics endpoint."""
+
+    def test_metrics_reports_alert_queue(self, flask_test_client):
+        """Test that metrics include the alert dispatch queue."""
+        response = flask_test_client.get("/metrics")
+        data = json.loads(response.get_data(as_text=True))
+
+        assert response.status_code == 200
+        assert "queue_depth" in data["result"]["alerts"]
+        assert "avg_wait_ms" in data["result"]["alerts"]
+
+    def test_metrics_reports_status_cache(self, flask_test_client):
+        """Test that metrics include status cache counters."""
+        response = flask_test_client.get("/metrics")
+        data = json.loads(response.get_data(as_text=True))
+
+        assert "stale_hits" in data["result"]["status_cache"]
+
+    def test_metrics_reports_circuit_breakers(self, flask_test_client):
+        """Test that metrics include the Tuya API circuit breakers."""
+        response = flask_test_client.get("/metrics")
+        data = json.loads(response.get_data(as_text=True))
+
+        assert isinstance(data["result"]["circuit_breakers"], dict)
+        assert "default" in data["result"]["rate_limits"]
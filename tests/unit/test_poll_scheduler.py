@@ -0,0 +1,118 @@
+"""
+Unit tests for services/poll_scheduler.py module.
+
+Tests the heap-based per-device deadline scheduler.
+"""
+
+
+
+class TestDeadlineScheduler:
+    """Test cases for DeadlineScheduler."""
+
+    def test_next_deadline_is_earliest(self):
+        """Test that next_deadline returns the smallest pending deadline."""
+        from services.poll_scheduler import DeadlineScheduler
+
+        scheduler = DeadlineScheduler()
+        scheduler.schedule("dev_a", 30)
+        scheduler.schedule("dev_b", 10)
+        scheduler.schedule("dev_c", 20)
+
+        assert scheduler.next_deadline() == 10
+        assert len(scheduler) == 3
+
+    def test_empty_scheduler(self):
+        """Test that an empty scheduler has no deadline and nothing due."""
+        from services.poll_scheduler import DeadlineScheduler
+
+        scheduler = DeadlineScheduler()
+
+        assert scheduler.next_deadline() is None
+        assert scheduler.pop_due(100) == []
+
+    def test_pop_due_returns_passed_deadlines_in_order(self):
+        """Test that pop_due removes only devices whose deadline has passed."""
+        from services.poll_scheduler import DeadlineScheduler
+
+        scheduler = DeadlineScheduler()
+        scheduler.schedule("dev_a", 5)
+        scheduler.schedule("dev_b", 1)
+        scheduler.schedule("dev_c", 50)
+
+        assert scheduler.pop_due(10) == [("dev_b", 1), ("dev_a", 5)]
+        assert "dev_a" not in scheduler
+        assert "dev_c" in scheduler
+        assert scheduler.next_deadline() == 50
+
+    def test_reschedule_replaces_previous_deadline(self):
+        """Test that rescheduling supersedes the old heap entry."""
+        from services.poll_scheduler import DeadlineScheduler
+
+        scheduler = DeadlineScheduler()
+        scheduler.schedule("dev_a", 5)
+        scheduler.schedule("dev_a", 40)
+
+        assert scheduler.deadline("dev_a") == 40
+        assert scheduler.pop_due(10) == []
+        assert scheduler.next_deadline() == 40
+
+    def test_remove_cancels_deadline(self):
+        """Test that removed devices are never returned."""
+        from services.poll_scheduler import DeadlineScheduler
+
+        scheduler = DeadlineScheduler()
+        scheduler.schedule("dev_a", 5)
+        scheduler.remove("dev_a")
+
+        assert scheduler.deadline("dev_a") is None
+        assert scheduler.pop_due(10) == []
+
+    def test_compaction_bounds_heap_size(self):
+        """Test that repeated rescheduling does not grow the heap without bound."""
+        from services.poll_scheduler import DeadlineScheduler
+
+        scheduler = DeadlineScheduler()
+        for deadline in range(1000):
+            scheduler.schedule("dev_a", deadline)
+
+        assert len(scheduler._heap) <= 2 * len(scheduler) + 17
+        assert scheduler.next_deadline() == 999
+
+
+class TestPhaseOffsets:
+    """Test cases for phase_offsets."""
+
+    def test_devices_spread_evenly(self):
+        """Test that devices are spaced evenly across the interval without jitter."""
+        from services.poll_scheduler import phase_offsets
+
+        offsets = phase_offsets(["a", "b", "c", "d"], 100, group_size=1)
+
+        assert offsets == {"a": 0.0, "b": 25.0, "c": 50.0, "d": 75.0}
+
+    def test_groups_share_a_phase(self):
+        """Test that devices are grouped into balanced phases of at most group_size."""
+        from collections import Counter
+        from services.poll_scheduler import phase_offsets
+
+        device_ids = [f"dev_{index}" for index in range(45)]
+        offsets = phase_offsets(device_ids, 300, group_size=20)
+
+        assert sorted(Counter(offsets.values()).items()) == [(0.0, 15), (100.0, 15), (200.0, 15)]
+
+    def test_jitter_is_bounded(self):
+        """Test that jitter stays within its fraction of a slot and spares the first phase."""
+        import random
+        from services.poll_scheduler import phase_offsets
+
+        offsets = phase_offsets(["a", "b", "c"], 90, jitter=0.5, rng=random.Random(7))
+
+        assert offsets["a"] == 0.0
+        assert 30 <= offsets["b"] < 45
+        assert 60 <= offsets["c"] < 75
+
+    def test_empty_fleet(self):
+        """Test that no devices produce no offsets."""
+        from services.poll_scheduler import phase_offsets
+
+        assert phase_offsets([], 60) == {}
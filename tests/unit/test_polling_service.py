@@ -11,6 +11,14 @@ import sys
 from io import StringIO
 
 
+@pytest.fixture(autouse=True)
+def inline_alerts(monkeypatch):
+    """Deliver queued alerts inline so tests can assert on them immediately."""
+    from services.alert_dispatcher import alert_dispatcher
+
+    monkeypatch.setattr(alert_dispatcher, "workers", 0)
+
+
 class TestDoorSensorPollerInit:
     """Test cases for DoorSensorPoller initialization."""
 
@@ -77,13 +85,15 @@ class TestDoorSensorPollerInit:
 class TestDoorSensorPollerPollLoop:
     """Test cases for DoorSensorPoller._poll_loop method."""
 
-    @patch("services.polling_service.tuya_service")
-    @patch("services.polling_service.time.sleep")
+    @patch("services.polling_service.tuya_pool")
+    @patch("services.polling_service.DoorSensorPoller._wait")
     @patch("services.polling_service.TuyaConfig")
     def test_poll_loop_queries_tuya_service(
-        self, mock_tuya_config, mock_sleep, mock_tuya_service, mock_env_vars
+        self, mock_tuya_config, mock_wait, mock_tuya_service, mock_env_vars
     ):
         """Test that poll loop queries tuya_service for device status."""
+        from services.rate_limiter import PRIORITY_ALERT
+
         mock_tuya_config.DEVICE_ID = "test_device"
         mock_tuya_service.get_device_status.return_value = {
             "success": True,
@@ -99,19 +109,21 @@ class TestDoorSensorPollerPollLoop:
         def stop_after_one(*args):
             poller.running = False
 
-        mock_sleep.side_effect = stop_after_one
+        mock_wait.side_effect = stop_after_one
 
         poller._poll_loop()
 
-        mock_tuya_service.get_device_status.assert_called_with("test_device")
+        mock_tuya_service.get_device_status.assert_called_with(
+            "test_device", priority=PRIORITY_ALERT
+        )
 
-    @patch("services.polling_service.tuya_service")
-    @patch("services.polling_service.time.sleep")
+    @patch("services.polling_service.tuya_pool")
+    @patch("services.polling_service.DoorSensorPoller._wait")
     @patch("services.polling_service.TuyaConfig")
     def test_poll_loop_sleeps_between_polls(
-        self, mock_tuya_config, mock_sleep, mock_tuya_service, mock_env_vars
+        self, mock_tuya_config, mock_wait, mock_tuya_service, mock_env_vars
     ):
-        """Test that poll loop sleeps for poll_interval between iterations."""
+        """Test that poll loop waits until the next deadline, one poll_interval later."""
         mock_tuya_service.get_device_status.return_value = {
             "success": True,
             "result": [],
@@ -125,18 +137,18 @@ class TestDoorSensorPollerPollLoop:
         def stop_after_one(*args):
             poller.running = False
 
-        mock_sleep.side_effect = stop_after_one
+        mock_wait.side_effect = stop_after_one
 
         poller._poll_loop()
 
-        mock_sleep.assert_called_with(3)
+        assert mock_wait.call_args[0][0] == pytest.approx(3, abs=0.1)
 
-    @patch("services.polling_service.tuya_service")
+    @patch("services.polling_service.tuya_pool")
     @patch("services.polling_service.send_door_opened_alert")
-    @patch("services.polling_service.time.sleep")
+    @patch("services.polling_service.DoorSensorPoller._wait")
     @patch("services.polling_service.TuyaConfig")
     def test_poll_loop_detects_door_opened(
-        self, mock_tuya_config, mock_sleep, mock_alert, mock_tuya_service, mock_env_vars
+        self, mock_tuya_config, mock_wait, mock_alert, mock_tuya_service, mock_env_vars
     ):
         """Test that poll loop detects door opened event."""
         mock_tuya_service.get_device_status.return_value = {
@@ -153,18 +165,18 @@ class TestDoorSensorPollerPollLoop:
         def stop_after_one(*args):
             poller.running = False
 
-        mock_sleep.side_effect = stop_after_one
+        mock_wait.side_effect = stop_after_one
 
         poller._poll_loop()
 
         mock_alert.assert_called_once()
 
-    @patch("services.polling_service.tuya_service")
+    @patch("services.polling_service.tuya_pool")
     @patch("services.polling_service.send_door_closed_alert")
-    @patch("services.polling_service.time.sleep")
+    @patch("services.polling_service.DoorSensorPoller._wait")
     @patch("services.polling_service.TuyaConfig")
     def test_poll_loop_detects_door_closed(
-        self, mock_tuya_config, mock_sleep, mock_alert, mock_tuya_service, mock_env_vars
+        self, mock_tuya_config, mock_wait, mock_alert, mock_tuya_service, mock_env_vars
     ):
         """Test that poll loop detects door closed event."""
         mock_tuya_service.get_device_status.return_value = {
@@ -181,18 +193,18 @@ class TestDoorSensorPollerPollLoop:
         def stop_after_one(*args):
             poller.running = False
 
-        mock_sleep.side_effect = stop_after_one
+        mock_wait.side_effect = stop_after_one
 
         poller._poll_loop()
 
         mock_alert.assert_called_once()
 
-    @patch("services.polling_service.tuya_service")
+    @patch("services.polling_service.tuya_pool")
     @patch("services.polling_service.send_door_opened_alert")
-    @patch("services.polling_service.time.sleep")
+    @patch("services.polling_service.DoorSensorPoller._wait")
     @patch("services.polling_service.TuyaConfig")
     def test_poll_loop_no_alert_on_same_state(
-        self, mock_tuya_config, mock_sleep, mock_alert, mock_tuya_service, mock_env_vars
+        self, mock_tuya_config, mock_wait, mock_alert, mock_tuya_service, mock_env_vars
     ):
         """Test that no alert is sent when state doesn't change."""
         mock_tuya_service.get_device_status.return_value = {
@@ -209,17 +221,17 @@ class TestDoorSensorPollerPollLoop:
         def stop_after_one(*args):
             poller.running = False
 
-        mock_sleep.side_effect = stop_after_one
+        mock_wait.side_effect = stop_after_one
 
         poller._poll_loop()
 
         mock_alert.assert_not_called()
 
-    @patch("services.polling_service.tuya_service")
-    @patch("services.polling_service.time.sleep")
+    @patch("services.polling_service.tuya_pool")
+    @patch("services.polling_service.DoorSensorPoller._wait")
     @patch("services.polling_service.TuyaConfig")
     def test_poll_loop_sets_initial_state(
-        self, mock_tuya_config, mock_sleep, mock_tuya_service, mock_env_vars
+        self, mock_tuya_config, mock_wait, mock_tuya_service, mock_env_vars
     ):
         """Test that poll loop sets initial state when last_door_state is None."""
         mock_tuya_service.get_device_status.return_value = {
@@ -236,17 +248,17 @@ class TestDoorSensorPollerPollLoop:
         def stop_after_one(*args):
             poller.running = False
 
-        mock_sleep.side_effect = stop_after_one
+        mock_wait.side_effect = stop_after_one
 
         poller._poll_loop()
 
         assert poller.last_door_state is False
 
-    @patch("services.polling_service.tuya_service")
-    @patch("services.polling_service.time.sleep")
+    @patch("services.polling_service.tuya_pool")
+    @patch("services.polling_service.DoorSensorPoller._wait")
     @patch("services.polling_service.TuyaConfig")
     def test_poll_loop_extracts_battery_percentage(
-        self, mock_tuya_config, mock_sleep, mock_tuya_service, mock_env_vars
+        self, mock_tuya_config, mock_wait, mock_tuya_service, mock_env_vars
     ):
         """Test that poll loop extracts battery percentage from status."""
         mock_tuya_service.get_device_status.return_value = {
@@ -265,20 +277,20 @@ class TestDoorSensorPollerPollLoop:
         def stop_after_one(*args):
             poller.running = False
 
-        mock_sleep.side_effect = stop_after_one
+        mock_wait.side_effect = stop_after_one
 
         # Should not raise any exception
         poller._poll_loop()
 
-    @patch("services.polling_service.tuya_service")
-    @patch("services.polling_service.time.sleep")
+    @patch("services.polling_service.tuya_pool")
+    @patch("services.polling_service.DoorSensorPoller._wait")
     @patch("services.polling_service.logging")
     @patch("services.polling_service.TuyaConfig")
     def test_poll_loop_handles_api_failure(
         self,
         mock_tuya_config,
         mock_logging,
-        mock_sleep,
+        mock_wait,
         mock_tuya_service,
         mock_env_vars,
     ):
@@ -296,104 +308,106 @@ class TestDoorSensorPollerPollLoop:
         def stop_after_one(*args):
             poller.running = False
 
-        mock_sleep.side_effect = stop_after_one
+        mock_wait.side_effect = stop_after_one
 
         # Should not raise exception
         poller._poll_loop()
 
         mock_logging.warning.assert_called()
 
-    @patch("services.polling_service.tuya_service")
-    @patch("services.polling_service.time.sleep")
+    @patch("services.polling_service.quota_accountant")
+    @patch("services.polling_service.tuya_pool")
+    @patch("services.polling_service.DoorSensorPoller._wait")
     @patch("services.polling_service.logging")
     @patch("services.polling_service.TuyaConfig")
     def test_poll_loop_handles_quota_exhaustion(
         self,
         mock_tuya_config,
         mock_logging,
-        mock_sleep,
+        mock_wait,
         mock_tuya_service,
+        mock_quota,
         mock_env_vars,
     ):
-        """Test that poll loop pauses for 1 hour when quota is exhausted."""
+        """Test that quota exhaustion slows polling to the accountant's floor."""
         mock_tuya_service.get_device_status.return_value = {
             "success": False,
             "msg": "No permissions. Your quota of Trial Edition is used up.",
             "code": 1106,
         }
+        mock_quota.interval_floor.return_value = 900
 
         from services.polling_service import DoorSensorPoller
 
         poller = DoorSensorPoller(poll_interval=1)
         poller.running = True
 
-        call_count = [0]
-
-        def stop_after_quota_pause(*args):
-            call_count[0] += 1
-            if call_count[0] >= 2:  # After quota pause sleep
-                poller.running = False
+        def stop_after_one(*args):
+            poller.running = False
 
-        mock_sleep.side_effect = stop_after_quota_pause
+        mock_wait.side_effect = stop_after_one
 
         poller._poll_loop()
 
         # Check that error was logged
         assert any("QUOTA EXHAUSTED" in str(call) for call in mock_logging.error.call_args_list)
 
-        # Check that we paused for 1 hour (3600 seconds)
-        assert call(3600) in mock_sleep.call_args_list
-
-        # Check that resume message was logged
-        assert any("Resuming" in str(call) for call in mock_logging.info.call_args_list)
+        # No hard one-hour pause: the loop waits for the quota-derived interval
+        mock_wait.assert_called_once()
+        assert mock_wait.call_args[0][0] == pytest.approx(900, abs=0.1)
 
-    @patch("services.polling_service.tuya_service")
-    @patch("services.polling_service.time.sleep")
+    @patch("services.polling_service.quota_accountant")
+    @patch("services.polling_service.tuya_pool")
+    @patch("services.polling_service.DoorSensorPoller._wait")
     @patch("services.polling_service.logging")
     @patch("services.polling_service.TuyaConfig")
     def test_poll_loop_handles_permission_error(
         self,
         mock_tuya_config,
         mock_logging,
-        mock_sleep,
+        mock_wait,
         mock_tuya_service,
+        mock_quota,
         mock_env_vars,
     ):
-        """Test that poll loop handles permission errors with pause."""
+        """Test that permission errors keep the loop running."""
         mock_tuya_service.get_device_status.return_value = {
             "success": False,
             "msg": "No permission to access",
         }
+        mock_quota.interval_floor.return_value = 0
 
         from services.polling_service import DoorSensorPoller
 
-        poller = DoorSensorPoller(poll_interval=1)
+        poller = DoorSensorPoller(poll_interval=0.01)
         poller.running = True
 
         call_count = [0]
 
-        def stop_after_pause(*args):
+        def stop_after_two(timeout):
             call_count[0] += 1
+            time.sleep(timeout)
             if call_count[0] >= 2:
                 poller.running = False
 
-        mock_sleep.side_effect = stop_after_pause
+        mock_wait.side_effect = stop_after_two
 
         poller._poll_loop()
 
-        # Should pause for 1 hour
-        assert call(3600) in mock_sleep.call_args_list
+        # Polling continues at the normal interval
+        assert mock_tuya_service.get_device_status.call_count == 2
+        assert all(c[0][0] < 1 for c in mock_wait.call_args_list)
 
-    @patch("services.polling_service.tuya_service")
+    @patch("services.polling_service.tuya_pool")
     @patch("services.polling_service.send_door_opened_alert")
-    @patch("services.polling_service.time.sleep")
+    @patch("services.polling_service.DoorSensorPoller._wait")
     @patch("services.polling_service.TuyaConfig")
     @patch("sys.stdout", new_callable=StringIO)
     def test_poll_loop_prints_battery_on_door_opened(
         self,
         mock_stdout,
         mock_tuya_config,
-        mock_sleep,
+        mock_wait,
         mock_alert,
         mock_tuya_service,
         mock_env_vars,
@@ -416,7 +430,7 @@ class TestDoorSensorPollerPollLoop:
         def stop_after_one(*args):
             poller.running = False
 
-        mock_sleep.side_effect = stop_after_one
+        mock_wait.side_effect = stop_after_one
 
         poller._poll_loop()
 
@@ -424,16 +438,16 @@ class TestDoorSensorPollerPollLoop:
         assert "Battery: 75%" in output
         assert "DOOR OPENED" in output
 
-    @patch("services.polling_service.tuya_service")
+    @patch("services.polling_service.tuya_pool")
     @patch("services.polling_service.send_door_closed_alert")
-    @patch("services.polling_service.time.sleep")
+    @patch("services.polling_service.DoorSensorPoller._wait")
     @patch("services.polling_service.TuyaConfig")
     @patch("sys.stdout", new_callable=StringIO)
     def test_poll_loop_prints_battery_on_door_closed(
         self,
         mock_stdout,
         mock_tuya_config,
-        mock_sleep,
+        mock_wait,
         mock_alert,
         mock_tuya_service,
         mock_env_vars,
@@ -456,7 +470,7 @@ class TestDoorSensorPollerPollLoop:
         def stop_after_one(*args):
             poller.running = False
 
-        mock_sleep.side_effect = stop_after_one
+        mock_wait.side_effect = stop_after_one
 
         poller._poll_loop()
 
@@ -464,15 +478,15 @@ class TestDoorSensorPollerPollLoop:
         assert "Battery: 80%" in output
         assert "DOOR CLOSED" in output
 
-    @patch("services.polling_service.tuya_service")
-    @patch("services.polling_service.time.sleep")
+    @patch("services.polling_service.tuya_pool")
+    @patch("services.polling_service.DoorSensorPoller._wait")
     @patch("services.polling_service.logging")
     @patch("services.polling_service.TuyaConfig")
     def test_poll_loop_handles_exception(
         self,
         mock_tuya_config,
         mock_logging,
-        mock_sleep,
+        mock_wait,
         mock_tuya_service,
         mock_env_vars,
     ):
@@ -487,7 +501,7 @@ class TestDoorSensorPollerPollLoop:
         def stop_after_one(*args):
             poller.running = False
 
-        mock_sleep.side_effect = stop_after_one
+        mock_wait.side_effect = stop_after_one
 
         # Should not raise exception
         poller._poll_loop()
@@ -495,6 +509,467 @@ class TestDoorSensorPollerPollLoop:
         mock_logging.error.assert_called()
 
 
+class TestDoorSensorPollerFleet:
+    """Test cases for polling several devices from one DoorSensorPoller."""
+
+    @patch("services.polling_service.TuyaConfig")
+    def test_poller_init_custom_device_ids(self, mock_tuya_config, mock_env_vars):
+        """Test that an explicit device list is deduplicated in order."""
+        from services.polling_service import DoorSensorPoller
+
+        poller = DoorSensorPoller(device_ids=["dev_a", "dev_b", "dev_a", ""])
+
+        assert poller.device_ids == ["dev_a", "dev_b"]
+        assert poller.device_id == "dev_a"
+
+    @patch("services.polling_service.TuyaConfig")
+    def test_poller_init_combines_config_devices(self, mock_tuya_config, mock_env_vars):
+        """Test that DEVICE_ID is followed by the extra DEVICE_IDS entries."""
+        mock_tuya_config.DEVICE_ID = "primary"
+        mock_tuya_config.DEVICE_IDS = ["extra_1", "primary", "extra_2"]
+
+        from services.polling_service import DoorSensorPoller
+
+        poller = DoorSensorPoller()
+
+        assert poller.device_ids == ["primary", "extra_1", "extra_2"]
+
+    @patch("services.polling_service.tuya_pool")
+    @patch("services.polling_service.TuyaConfig")
+    def test_poll_once_uses_batch_endpoint(
+        self, mock_tuya_config, mock_tuya_service, mock_env_vars
+    ):
+        """Test that several devices are fetched with one batch call."""
+        from services.rate_limiter import PRIORITY_ALERT
+
+        mock_tuya_service.get_devices_status.return_value = {
+            "success": True,
+            "result": [
+                {"id": "dev_a", "status": [{"code": "doorcontact_state", "value": False}]},
+                {"id": "dev_b", "status": [{"code": "doorcontact_state", "value": True}]},
+            ],
+        }
+
+        from services.polling_service import DoorSensorPoller
+
+        poller = DoorSensorPoller(device_ids=["dev_a", "dev_b"])
+
+        poller._poll_once()
+
+        mock_tuya_service.get_devices_status.assert_called_once_with(
+            ["dev_a", "dev_b"], priority=PRIORITY_ALERT
+        )
+        mock_tuya_service.get_device_status.assert_not_called()
+        assert poller.device_states == {"dev_a": False, "dev_b": True}
+
+    @patch("services.polling_service.tuya_pool")
+    @patch("services.polling_service.TuyaConfig")
+    def test_poll_once_splits_into_batch_limit(
+        self, mock_tuya_config, mock_tuya_service, mock_env_vars
+    ):
+        """Test that large fleets are split into batches of STATUS_BATCH_LIMIT."""
+        from services.rate_limiter import PRIORITY_ALERT
+
+        mock_tuya_service.get_devices_status.return_value = {"success": True, "result": []}
+        mock_tuya_service.get_device_status.return_value = {"success": True, "result": []}
+
+        from services.polling_service import DoorSensorPoller, STATUS_BATCH_LIMIT
+
+        device_ids = [f"dev_{index}" for index in range(STATUS_BATCH_LIMIT * 2 + 1)]
+        poller = DoorSensorPoller(device_ids=device_ids)
+        poller._poll_once()
+
+        batches = [c.args[0] for c in mock_tuya_service.get_devices_status.call_args_list]
+        assert batches == [device_ids[:STATUS_BATCH_LIMIT], device_ids[STATUS_BATCH_LIMIT:-1]]
+        mock_tuya_service.get_device_status.assert_called_once_with(
+            device_ids[-1], priority=PRIORITY_ALERT
+        )
+
+    @patch("services.polling_service.tuya_pool")
+    @patch("services.polling_service.send_door_opened_alert")
+    @patch("services.polling_service.TuyaConfig")
+    def test_poll_once_alerts_per_device(
+        self, mock_tuya_config, mock_alert, mock_tuya_service, mock_env_vars
+    ):
+        """Test that only the device whose state changed is alerted, by name."""
+        mock_tuya_service.get_devices_status.return_value = {
+            "success": True,
+            "result": [
+                {"id": "dev_a", "status": [{"code": "doorcontact_state", "value": False}]},
+                {"id": "dev_b", "status": [{"code": "doorcontact_state", "value": True}]},
+            ],
+        }
+
+        from services.polling_service import DoorSensorPoller
+
+        poller = DoorSensorPoller(device_ids=["dev_a", "dev_b"])
+        poller.device_states = {"dev_a": False, "dev_b": False}
+        poller._poll_once()
+
+        mock_alert.assert_called_once()
+        assert mock_alert.call_args[0] == ("dev_b",)
+        assert mock_alert.call_args[1]["key"].startswith("dev_b:opened:")
+
+    @patch("services.polling_service.tuya_pool")
+    @patch("services.polling_service.logging")
+    @patch("services.polling_service.TuyaConfig")
+    def test_poll_once_warns_on_missing_device(
+        self, mock_tuya_config, mock_logging, mock_tuya_service, mock_env_vars
+    ):
+        """Test that devices absent from a batch response are reported."""
+        mock_tuya_service.get_devices_status.return_value = {
+            "success": True,
+            "result": [
+                {"id": "dev_a", "status": [{"code": "doorcontact_state", "value": False}]},
+            ],
+        }
+
+        from services.polling_service import DoorSensorPoller
+
+        poller = DoorSensorPoller(device_ids=["dev_a", "dev_b"])
+        poller._poll_once()
+
+        assert "dev_b" not in poller.device_states
+        assert any("dev_b" in str(c) for c in mock_logging.warning.call_args_list)
+
+
+class TestDoorSensorPollerDPDiff:
+    """Test cases for DP diffing in status processing."""
+
+    @patch("services.polling_service.device_state_store")
+    @patch("services.polling_service.send_door_closed_alert")
+    @patch("services.polling_service.send_door_opened_alert")
+    @patch("services.polling_service.TuyaConfig")
+    def test_unchanged_payload_is_skipped(
+        self, mock_tuya_config, mock_opened, mock_closed, mock_store, mock_env_vars
+    ):
+        """Test that a repeated payload does no state handling at all."""
+        from services.polling_service import DoorSensorPoller
+
+        poller = DoorSensorPoller(device_ids=["dev_a"])
+        poller.device_states = {"dev_a": False}
+        payload = [{"code": "doorcontact_state", "value": True}]
+
+        assert poller._process_status("dev_a", payload) is True
+        assert poller._process_status("dev_a", list(payload)) is False
+
+        mock_opened.assert_called_once()
+        mock_store.save.assert_called_once()
+
+    @patch("services.polling_service.status_cache")
+    @patch("services.polling_service.device_state_store")
+    @patch("services.polling_service.TuyaConfig")
+    def test_unchanged_payload_still_refreshes_status_cache(
+        self, mock_tuya_config, mock_store, mock_cache, mock_env_vars
+    ):
+        """Test that every reading is written to the status cache, changed or not."""
+        from services.polling_service import DoorSensorPoller
+
+        poller = DoorSensorPoller(poll_interval=60, device_ids=["dev_a"], adaptive=False)
+        payload = [{"code": "doorcontact_state", "value": True}]
+
+        poller._process_status("dev_a", payload)
+        poller._process_status("dev_a", list(payload))
+
+        assert mock_cache.put.call_count == 2
+        mock_cache.put.assert_called_with("dev_a", payload, ttl=poller._cycle_interval())
+
+    @patch("services.polling_service.send_door_opened_alert")
+    @patch("services.polling_service.TuyaConfig")
+    def test_battery_change_alone_is_not_a_transition(
+        self, mock_tuya_config, mock_opened, mock_env_vars
+    ):
+        """Test that non-door DP changes are recorded without alerting."""
+        from services.polling_service import DoorSensorPoller
+
+        poller = DoorSensorPoller(device_ids=["dev_a"])
+        poller.device_states = {"dev_a": False}
+        door = {"code": "doorcontact_state", "value": False}
+        poller._process_status("dev_a", [door, {"code": "battery_percentage", "value": 80}])
+
+        changed = poller._process_status(
+            "dev_a", [door, {"code": "battery_percentage", "value": 79}]
+        )
+
+        assert changed is False
+        assert poller.dp_states.get("dev_a", "battery_percentage") == 79
+        mock_opened.assert_not_called()
+
+
+class TestDoorSensorPollerAdaptive:
+    """Test cases for adaptive per-device polling in DoorSensorPoller."""
+
+    @patch("services.polling_service.TuyaConfig")
+    def test_fixed_mode_has_no_policy(self, mock_tuya_config, mock_env_vars):
+        """Test that fixed mode schedules every device poll_interval apart."""
+        from services.polling_service import DoorSensorPoller
+
+        poller = DoorSensorPoller(poll_interval=30, device_ids=["dev_a"], adaptive=False)
+
+        assert poller.interval_policy is None
+        assert poller._next_delay("dev_a", changed=True) == 30
+
+    @patch("services.polling_service.tuya_pool")
+    @patch("services.polling_service.TuyaConfig")
+    def test_adaptive_polls_only_due_devices(
+        self, mock_tuya_config, mock_tuya_service, mock_env_vars
+    ):
+        """Test that only devices past their deadline are polled."""
+        from services.polling_service import DoorSensorPoller
+
+        poller = DoorSensorPoller(device_ids=["dev_a", "dev_b"], adaptive=True)
+        now = time.monotonic()
+        poller.scheduler.schedule("dev_a", now - 1)
+        poller.scheduler.schedule("dev_b", now + 100)
+
+        assert poller._due_devices() == ["dev_a"]
+        assert 99 < poller._sleep_time() <= 100
+
+    @patch("services.polling_service.tuya_pool")
+    @patch("services.polling_service.send_door_opened_alert")
+    @patch("services.polling_service.TuyaConfig")
+    def test_adaptive_schedules_open_door_quickly(
+        self, mock_tuya_config, mock_alert, mock_tuya_service, mock_env_vars
+    ):
+        """Test that an opened door is scheduled at the minimum interval."""
+        mock_tuya_service.get_device_status.return_value = {
+            "success": True,
+            "result": [{"code": "doorcontact_state", "value": True}],
+        }
+
+        from services.polling_service import DoorSensorPoller
+
+        poller = DoorSensorPoller(device_ids=["dev_a"], adaptive=True)
+        poller.interval_policy.min_interval = 5
+        poller.interval_policy.intervals["dev_a"] = 600
+        poller.last_door_state = False
+
+        before = time.monotonic()
+        poller._poll_once(["dev_a"])
+
+        assert poller.scheduler.deadline("dev_a") - before == pytest.approx(5, abs=0.5)
+
+    @patch("services.polling_service.tuya_pool")
+    @patch("services.polling_service.TuyaConfig")
+    def test_adaptive_backs_off_quiet_device(
+        self, mock_tuya_config, mock_tuya_service, mock_env_vars
+    ):
+        """Test that an unchanged closed door is scheduled further out."""
+        mock_tuya_service.get_device_status.return_value = {
+            "success": True,
+            "result": [{"code": "doorcontact_state", "value": False}],
+        }
+
+        from services.polling_service import DoorSensorPoller
+
+        poller = DoorSensorPoller(device_ids=["dev_a"], adaptive=True)
+        poller.interval_policy.min_interval = 5
+        poller.interval_policy.backoff_factor = 2
+        poller.interval_policy.max_interval = 1000
+        poller.interval_policy.intervals["dev_a"] = 40
+        poller.last_door_state = False
+
+        before = time.monotonic()
+        poller._poll_once(["dev_a"])
+
+        assert poller.scheduler.deadline("dev_a") - before == pytest.approx(80, abs=0.5)
+
+
+class TestDoorSensorPollerScheduling:
+    """Test cases for deadline-based scheduling and shutdown."""
+
+    @patch("services.polling_service.TuyaConfig")
+    def test_next_deadline_follows_previous_deadline(self, mock_tuya_config, mock_env_vars):
+        """Test that deadlines advance from the previous deadline, not from poll completion."""
+        from services.polling_service import DoorSensorPoller
+
+        poller = DoorSensorPoller(poll_interval=10, device_ids=["dev_a"], adaptive=False)
+        start = time.monotonic() - 0.5  # Poll started half a second late
+        poller.scheduler.schedule("dev_a", start)
+
+        poller._due_devices()
+        poller._schedule("dev_a")
+
+        assert poller.scheduler.deadline("dev_a") == pytest.approx(start + 10)
+
+    @patch("services.polling_service.tuya_pool")
+    @patch("services.polling_service.TuyaConfig")
+    def test_failed_poll_keeps_device_scheduled(
+        self, mock_tuya_config, mock_tuya_service, mock_env_vars
+    ):
+        """Test that an exception during a poll does not drop the device."""
+        mock_tuya_service.get_device_status.side_effect = Exception("Network error")
+
+        from services.polling_service import DoorSensorPoller
+
+        poller = DoorSensorPoller(poll_interval=10, device_ids=["dev_a"], adaptive=False)
+        poller.running = True
+
+        def stop(timeout):
+            poller.running = False
+
+        with patch.object(poller, "_wait", side_effect=stop):
+            poller._poll_loop()
+
+        assert "dev_a" in poller.scheduler
+
+    @patch("services.polling_service.tuya_pool")
+    @patch("services.polling_service.TuyaConfig")
+    def test_stop_interrupts_long_wait(self, mock_tuya_config, mock_tuya_service, mock_env_vars):
+        """Test that stop() ends a thread waiting on a long interval within milliseconds."""
+        mock_tuya_service.get_device_status.return_value = {"success": True, "result": []}
+
+        from services.polling_service import DoorSensorPoller
+
+        poller = DoorSensorPoller(poll_interval=3600, device_ids=["dev_a"], adaptive=False)
+        poller.start()
+        time.sleep(0.1)
+
+        started = time.monotonic()
+        poller.stop()
+
+        assert time.monotonic() - started < 0.5
+        assert not poller.thread.is_alive()
+
+
+class TestDoorSensorPollerPhases:
+    """Test cases for staggered poll phases and fleet rebalancing."""
+
+    @patch("services.polling_service.TuyaConfig")
+    def test_first_polls_are_staggered(self, mock_tuya_config, mock_env_vars):
+        """Test that a fleet larger than one batch starts in evenly spaced phases."""
+        from services.polling_service import DoorSensorPoller, STATUS_BATCH_LIMIT
+
+        device_ids = [f"dev_{index}" for index in range(STATUS_BATCH_LIMIT * 2)]
+        poller = DoorSensorPoller(
+            poll_interval=60, device_ids=device_ids, adaptive=False, phase_jitter=0
+        )
+        before = time.monotonic()
+        poller._assign_phases(device_ids)
+
+        first = poller.scheduler.deadline(device_ids[0]) - before
+        second = poller.scheduler.deadline(device_ids[-1]) - before
+        assert first == pytest.approx(0, abs=0.5)
+        assert second == pytest.approx(30, abs=0.5)
+
+    @patch("services.polling_service.quota_accountant")
+    @patch("services.polling_service.TuyaConfig")
+    def test_set_devices_when_stopped(self, mock_tuya_config, mock_quota, mock_env_vars):
+        """Test that a fleet change applies immediately while not polling."""
+        from services.polling_service import DoorSensorPoller
+
+        poller = DoorSensorPoller(device_ids=["dev_a", "dev_b"])
+        poller.device_states = {"dev_a": True, "dev_b": False}
+        poller.scheduler.schedule("dev_a", 10)
+
+        poller.set_devices(["dev_b", "dev_c", "dev_c"])
+
+        assert poller.device_ids == ["dev_b", "dev_c"]
+        assert poller.device_id == "dev_b"
+        assert "dev_a" not in poller.device_states
+        assert "dev_a" not in poller.scheduler
+        mock_quota.register_devices.assert_called_with(["dev_b", "dev_c"])
+
+    @patch("services.polling_service.tuya_pool")
+    @patch("services.polling_service.TuyaConfig")
+    def test_set_devices_rebalances_running_poller(
+        self, mock_tuya_config, mock_tuya_service, mock_env_vars
+    ):
+        """Test that the polling thread picks up added devices and re-phases the fleet."""
+        mock_tuya_service.get_device_status.return_value = {"success": True, "result": []}
+        mock_tuya_service.get_devices_status.return_value = {"success": True, "result": []}
+
+        from services.polling_service import DoorSensorPoller
+
+        poller = DoorSensorPoller(poll_interval=3600, device_ids=["dev_a"], adaptive=False)
+        poller.start()
+        time.sleep(0.1)
+
+        poller.set_devices(["dev_a", "dev_b"])
+        deadline = time.monotonic() + 2
+        while "dev_b" not in poller.scheduler and time.monotonic() < deadline:
+            time.sleep(0.01)
+        poller.stop()
+
+        assert poller.device_ids == ["dev_a", "dev_b"]
+        assert "dev_b" in poller.scheduler
+
+
+class TestDoorSensorPollerWarmRestart:
+    """Test cases for restoring device state from the snapshot."""
+
+    @patch("services.polling_service.device_state_store")
+    @patch("services.polling_service.TuyaConfig")
+    def test_restore_states_loads_snapshot(self, mock_tuya_config, mock_store, mock_env_vars):
+        """Test that snapshot states are loaded for monitored devices."""
+        mock_store.load.return_value = {"dev_a": True}
+
+        from services.polling_service import DoorSensorPoller
+
+        poller = DoorSensorPoller(device_ids=["dev_a", "dev_b"])
+        poller._restore_states()
+
+        mock_store.load.assert_called_once_with(["dev_a", "dev_b"])
+        assert poller.device_states == {"dev_a": True}
+        assert poller.restored_devices == {"dev_a"}
+
+    @patch("services.polling_service.device_state_store")
+    @patch("services.polling_service.send_sensor_initialized_alert")
+    @patch("services.polling_service.send_door_opened_alert")
+    @patch("services.polling_service.TuyaConfig")
+    def test_unchanged_restored_state_sends_no_alert(
+        self, mock_tuya_config, mock_opened, mock_init, mock_store, mock_env_vars
+    ):
+        """Test that an unchanged door after restart sends no init alert."""
+        mock_store.load.return_value = {"dev_a": True}
+
+        from services.polling_service import DoorSensorPoller
+
+        poller = DoorSensorPoller(device_ids=["dev_a"])
+        poller._restore_states()
+        changed = poller._process_status("dev_a", [{"code": "doorcontact_state", "value": True}])
+
+        assert changed is False
+        mock_init.assert_not_called()
+        mock_opened.assert_not_called()
+
+    @patch("services.polling_service.device_state_store")
+    @patch("services.polling_service.send_sensor_initialized_alert")
+    @patch("services.polling_service.send_door_opened_alert")
+    @patch("services.polling_service.TuyaConfig")
+    def test_transition_during_restart_alerts(
+        self, mock_tuya_config, mock_opened, mock_init, mock_store, mock_env_vars
+    ):
+        """Test that a door that opened while the service was down is alerted."""
+        mock_store.load.return_value = {"dev_a": False}
+
+        from services.polling_service import DoorSensorPoller
+
+        poller = DoorSensorPoller(device_ids=["dev_a"])
+        poller._restore_states()
+        poller._process_status("dev_a", [{"code": "doorcontact_state", "value": True}])
+
+        mock_init.assert_not_called()
+        mock_opened.assert_called_once()
+        mock_store.save.assert_called_once()
+        assert mock_store.save.call_args[0][:2] == ("dev_a", True)
+
+    @patch("services.polling_service.device_state_store")
+    @patch("services.polling_service.TuyaConfig")
+    def test_added_devices_restore_state(self, mock_tuya_config, mock_store, mock_env_vars):
+        """Test that devices handed over by set_devices resume from the snapshot."""
+        mock_store.load.return_value = {"dev_b": True}
+
+        from services.polling_service import DoorSensorPoller
+
+        poller = DoorSensorPoller(device_ids=["dev_a"])
+        poller.set_devices(["dev_a", "dev_b"])
+
+        mock_store.load.assert_called_once_with(["dev_b"])
+        assert poller.device_states["dev_b"] is True
+        assert "dev_b" in poller.restored_devices
+
+
 class TestDoorSensorPollerStart:
     """Test cases for DoorSensorPoller.start method."""
 
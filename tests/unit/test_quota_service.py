@@ -0,0 +1,160 @@
+"""
+Unit tests for services/quota_service.py module.
+
+Tests Tuya API call accounting and quota-driven poll intervals.
+"""
+
+import pytest
+import time
+
+
+class TestIsQuotaError:
+    """Test cases for is_quota_error helper."""
+
+    def test_detects_quota_code(self):
+        """Test that code 1106 is a quota error."""
+        from services.quota_service import is_quota_error
+
+        assert is_quota_error({"success": False, "code": 1106, "msg": "x"}) is True
+
+    def test_detects_quota_message(self):
+        """Test that quota and permission messages are quota errors."""
+        from services.quota_service import is_quota_error
+
+        assert is_quota_error({"success": False, "msg": "Your quota is used up"}) is True
+        assert is_quota_error({"success": False, "msg": "No permission"}) is True
+
+    def test_ignores_success_and_other_errors(self):
+        """Test that successful and unrelated responses are not quota errors."""
+        from services.quota_service import is_quota_error
+
+        assert is_quota_error({"success": True}) is False
+        assert is_quota_error({"success": False, "msg": "device offline"}) is False
+        assert is_quota_error(None) is False
+
+
+class TestIsNotOwnedError:
+    """Test cases for is_not_owned_error helper."""
+
+    def test_tells_ownership_from_quota(self):
+        """Test that only a 1106 without a quota message means another project's device."""
+        from services.quota_service import is_not_owned_error
+
+        assert is_not_owned_error({"success": False, "code": 1106, "msg": "permission deny"})
+        assert not is_not_owned_error(
+            {"success": False, "code": 1106, "msg": "Your quota of Trial Edition is used up."}
+        )
+        assert not is_not_owned_error({"success": False, "msg": "permission deny"})
+        assert not is_not_owned_error(None)
+
+
+class TestQuotaAccountant:
+    """Test cases for QuotaAccountant."""
+
+    def test_counts_calls(self):
+        """Test that observed calls reduce the remaining allowance."""
+        from services.quota_service import QuotaAccountant
+
+        accountant = QuotaAccountant(allowance=100)
+        accountant.observe({"success": True})
+        accountant.observe({"success": True}, calls=2)
+
+        assert accountant.used == 3
+        assert accountant.remaining() == 97
+
+    def test_unknown_allowance(self):
+        """Test that an unknown allowance imposes no floor."""
+        from services.quota_service import QuotaAccountant
+
+        accountant = QuotaAccountant(allowance=0)
+        accountant.observe({"success": True})
+
+        assert accountant.remaining() is None
+        assert accountant.interval_floor("dev_a") == 0
+        assert accountant.projected_exhaustion() is None
+
+    def test_quota_error_marks_exhausted(self):
+        """Test that a 1106 response drops the estimate to zero remaining calls."""
+        from services.quota_service import QuotaAccountant
+
+        accountant = QuotaAccountant(allowance=1000, probe_interval=600)
+        accountant.observe({"success": False, "code": 1106, "msg": "quota used up"})
+
+        assert accountant.exhausted is True
+        assert accountant.remaining() == 0
+        assert accountant.interval_floor("dev_a") == 600
+
+    def test_success_after_exhaustion_restores(self):
+        """Test that a successful probe clears the exhausted flag."""
+        from services.quota_service import QuotaAccountant
+
+        accountant = QuotaAccountant(allowance=0)
+        accountant.observe({"success": False, "code": 1106, "msg": "quota used up"})
+        accountant.observe({"success": True})
+
+        assert accountant.exhausted is False
+
+    def test_floor_spreads_remaining_by_priority(self):
+        """Test that higher-priority devices get a proportionally shorter floor."""
+        from services.quota_service import QuotaAccountant
+
+        accountant = QuotaAccountant(allowance=1000, priorities={"dev_a": 3})
+        accountant.register_devices(["dev_a", "dev_b"])
+
+        floor_a = accountant.interval_floor("dev_a")
+        floor_b = accountant.interval_floor("dev_b")
+
+        assert floor_b == pytest.approx(floor_a * 3)
+
+    def test_fleet_floor_uses_calls_per_poll(self):
+        """Test that the fleet floor scales with calls per cycle."""
+        from services.quota_service import QuotaAccountant
+
+        accountant = QuotaAccountant(allowance=1000)
+
+        assert accountant.interval_floor(calls_per_poll=2) == pytest.approx(
+            accountant.interval_floor(calls_per_poll=1) * 2, rel=1e-3
+        )
+
+    def test_projected_exhaustion_from_burn_rate(self):
+        """Test that a fast burn rate projects exhaustion before period end."""
+        from services.quota_service import QuotaAccountant
+
+        accountant = QuotaAccountant(allowance=100, period="month")
+        accountant._started_at = time.time() - 60
+        accountant.observe({"success": True}, calls=50)
+
+        projected = accountant.projected_exhaustion()
+
+        assert projected is not None
+        assert projected - time.time() == pytest.approx(60, abs=5)
+
+    def test_period_rollover_resets_counters(self):
+        """Test that counters reset once the quota period ends."""
+        from services.quota_service import QuotaAccountant
+
+        accountant = QuotaAccountant(allowance=10, period="day")
+        accountant.observe({"success": False, "code": 1106, "msg": "quota"})
+        accountant._period_end = time.time() - 1
+
+        assert accountant.remaining() == 10
+        assert accountant.exhausted is False
+
+    def test_summary_mentions_usage(self):
+        """Test that the summary reports usage against the allowance."""
+        from services.quota_service import QuotaAccountant
+
+        accountant = QuotaAccountant(allowance=100, period="day")
+        accountant.observe({"success": True})
+
+        assert "1/100" in accountant.summary()
+
+    def test_from_config(self, mock_env_vars):
+        """Test that the accountant is built from TUYA_QUOTA_* configuration."""
+        from services.quota_service import QuotaAccountant
+        from config.Config import TuyaConfig
+
+        accountant = QuotaAccountant.from_config()
+
+        assert accountant.allowance == TuyaConfig.QUOTA_ALLOWANCE
+        assert accountant.probe_interval == TuyaConfig.QUOTA_PROBE_INTERVAL
@@ -0,0 +1,150 @@
+"""
+Unit tests for services/rate_limiter.py module.
+
+Tests token buckets, priority ordering and limit parsing.
+"""
+
+import threading
+import time
+import pytest
+
+
+class TestParseLimits:
+    """Test cases for parse_limits."""
+
+    def test_parses_rate_and_burst(self):
+        """Test that entries with and without a burst are parsed."""
+        from services.rate_limiter import parse_limits
+
+        limits = parse_limits("default:10:20, device_commands:2 ,broken,")
+
+        assert limits == {"default": (10.0, 20.0), "device_commands": (2.0, 2.0)}
+
+    def test_empty_spec(self):
+        """Test that an empty specification means no limits."""
+        from services.rate_limiter import parse_limits
+
+        assert parse_limits("") == {}
+
+
+class TestTokenBucket:
+    """Test cases for TokenBucket."""
+
+    def test_burst_is_granted_without_waiting(self):
+        """Test that calls within the burst do not wait."""
+        from services.rate_limiter import TokenBucket
+
+        bucket = TokenBucket("default", rate=1, burst=3)
+
+        assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+
+    def test_waits_for_refill(self):
+        """Test that an empty bucket delays the caller until a token is due."""
+        from services.rate_limiter import TokenBucket
+
+        bucket = TokenBucket("default", rate=20, burst=1)
+        bucket.acquire()
+
+        waited = bucket.acquire()
+
+        assert 0.03 <= waited <= 0.5
+        assert bucket.metrics()["priorities"]["api"]["waited"] == 1
+
+    def test_timeout_rejects(self):
+        """Test that a caller gives up when its timeout expires."""
+        from services.rate_limiter import TokenBucket
+
+        bucket = TokenBucket("default", rate=0.1, burst=1)
+        bucket.acquire()
+
+        assert bucket.acquire(timeout=0.05) is None
+        assert bucket.metrics()["priorities"]["api"]["rejected"] == 1
+        assert bucket.metrics()["queued"] == 0
+
+    def test_try_acquire_reports_wait_without_blocking(self):
+        """Test that try_acquire takes a free token or returns the time to the next one."""
+        from services.rate_limiter import TokenBucket, PRIORITY_ALERT
+
+        bucket = TokenBucket("default", rate=0.5, burst=1)
+
+        assert bucket.try_acquire(PRIORITY_ALERT) == 0.0
+        assert bucket.try_acquire(PRIORITY_ALERT) == pytest.approx(2.0, abs=0.05)
+        assert bucket.metrics()["priorities"]["alert"]["acquired"] == 1
+
+    def test_zero_rate_is_unlimited(self):
+        """Test that a rate of 0 disables limiting."""
+        from services.rate_limiter import TokenBucket
+
+        bucket = TokenBucket("default", rate=0)
+
+        assert all(bucket.acquire(timeout=0) == 0.0 for _ in range(100))
+
+    def test_alert_priority_served_first(self):
+        """Test that a later alert caller overtakes a waiting API caller."""
+        from services.rate_limiter import TokenBucket, PRIORITY_ALERT, PRIORITY_BULK
+
+        bucket = TokenBucket("default", rate=10, burst=1)
+        bucket.acquire()
+        order = []
+
+        def take(priority, label):
+            bucket.acquire(priority)
+            order.append(label)
+
+        low = threading.Thread(target=take, args=(PRIORITY_BULK, "bulk"))
+        low.start()
+        time.sleep(0.01)
+        high = threading.Thread(target=take, args=(PRIORITY_ALERT, "alert"))
+        high.start()
+        low.join(timeout=2)
+        high.join(timeout=2)
+
+        assert order == ["alert", "bulk"]
+
+
+class TestRateLimiter:
+    """Test cases for RateLimiter."""
+
+    def test_unconfigured_endpoint_uses_default_bucket(self):
+        """Test that endpoints without a limit share the default bucket."""
+        from services.rate_limiter import RateLimiter
+
+        limiter = RateLimiter({"default": (0.1, 1)}, max_wait=0.01)
+
+        assert limiter.acquire("device_status") is True
+        assert limiter.acquire("devices_status") is False
+
+    def test_endpoint_bucket_is_separate(self):
+        """Test that an endpoint with its own limit does not use the default budget."""
+        from services.rate_limiter import RateLimiter
+
+        limiter = RateLimiter({"default": (0.1, 1), "device_commands": (0.1, 1)}, max_wait=0.01)
+
+        assert limiter.acquire("device_status") is True
+        assert limiter.acquire("device_commands") is True
+
+    def test_acquire_async_waits_on_the_loop(self):
+        """Test that coroutines wait for a token by sleeping and give up after max_wait."""
+        import asyncio
+        from services.rate_limiter import RateLimiter, PRIORITY_ALERT
+
+        limiter = RateLimiter({"default": (20, 1)}, max_wait=0.01)
+
+        async def scenario():
+            first = await limiter.acquire_async("device_status", PRIORITY_ALERT)
+            second = await limiter.acquire_async("device_status", PRIORITY_ALERT)
+            third = await limiter.acquire_async("device_status")
+            return first, second, third
+
+        assert asyncio.run(scenario()) == (True, True, False)
+        stats = limiter.metrics()["default"]["priorities"]
+        assert stats["alert"]["acquired"] == 2
+        assert stats["alert"]["waited"] == 1
+        assert stats["api"]["rejected"] == 1
+
+    def test_no_limits_always_allows(self):
+        """Test that a limiter without buckets never blocks."""
+        from services.rate_limiter import RateLimiter
+
+        assert RateLimiter().acquire("device_status") is True
+        assert RateLimiter().metrics() == {}
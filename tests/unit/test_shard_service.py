@@ -0,0 +1,183 @@
+"""
+Unit tests for services/shard_service.py module.
+
+Tests consistent device placement, SQLite leases and shard coordination.
+"""
+
+import pytest
+from unittest.mock import Mock
+
+
+@pytest.fixture
+def lease_backend(tmp_path):
+    """Provide a SQLite lease backend in a temporary directory."""
+    from services.shard_service import SQLiteLeaseBackend
+
+    backend = SQLiteLeaseBackend(str(tmp_path / "leases.db"))
+    yield backend
+    backend.close()
+
+
+class TestShardPlacement:
+    """Test cases for jump_hash and shard_for."""
+
+    def test_shard_for_is_stable_and_in_range(self):
+        """Test that devices always map to the same valid shard."""
+        from services.shard_service import shard_for
+
+        shards = [shard_for(f"dev_{index}", 16) for index in range(200)]
+
+        assert shards == [shard_for(f"dev_{index}", 16) for index in range(200)]
+        assert all(0 <= shard < 16 for shard in shards)
+        assert len(set(shards)) == 16
+
+    def test_growing_shard_count_moves_few_devices(self):
+        """Test that adding a shard only moves devices into the new shard."""
+        from services.shard_service import shard_for
+
+        device_ids = [f"dev_{index}" for index in range(1000)]
+        moved = [d for d in device_ids if shard_for(d, 10) != shard_for(d, 11)]
+
+        assert all(shard_for(d, 11) == 10 for d in moved)
+        assert len(moved) < 200
+
+
+class TestSQLiteLeaseBackend:
+    """Test cases for SQLiteLeaseBackend."""
+
+    def test_lease_is_exclusive_until_expiry(self, lease_backend):
+        """Test that a held lease blocks others until it expires."""
+        assert lease_backend.acquire(0, "a", ttl=30, now=100) is True
+        assert lease_backend.acquire(0, "b", ttl=30, now=110) is False
+        assert lease_backend.acquire(0, "a", ttl=30, now=120) is True  # Renewal
+        assert lease_backend.acquire(0, "b", ttl=30, now=151) is True  # Expired
+
+        assert lease_backend.owners(now=151) == {0: "b"}
+
+    def test_release_frees_lease(self, lease_backend):
+        """Test that only the holder can release its lease."""
+        lease_backend.acquire(3, "a", ttl=30, now=100)
+
+        lease_backend.release(3, "b")
+        assert lease_backend.owners(now=100) == {3: "a"}
+
+        lease_backend.release(3, "a")
+        assert lease_backend.owners(now=100) == {}
+
+    def test_members_expire(self, lease_backend):
+        """Test that membership heartbeats expire and can be withdrawn."""
+        lease_backend.heartbeat("b", ttl=30, now=100)
+        lease_backend.heartbeat("a", ttl=10, now=100)
+
+        assert lease_backend.members(now=105) == ["a", "b"]
+        assert lease_backend.members(now=115) == ["b"]
+
+        lease_backend.leave("b")
+        assert lease_backend.members(now=115) == []
+
+
+class TestShardCoordinator:
+    """Test cases for ShardCoordinator lease rounds."""
+
+    def _coordinator(self, backend, holder, fleet):
+        """Build a coordinator attached to a mock poller."""
+        from services.shard_service import ShardCoordinator
+
+        coordinator = ShardCoordinator(backend, shard_count=8, lease_ttl=30, holder_id=holder)
+        coordinator.poller = Mock()
+        coordinator.fleet = fleet
+        return coordinator
+
+    def test_single_replica_owns_everything(self, lease_backend):
+        """Test that a lone replica claims every shard and polls the whole fleet."""
+        fleet = [f"dev_{index}" for index in range(40)]
+        coordinator = self._coordinator(lease_backend, "a", fleet)
+
+        assert coordinator.rebalance(now=100) is True
+
+        assert coordinator.owned_shards == set(range(8))
+        coordinator.poller.set_devices.assert_called_once_with(fleet)
+
+    def test_replicas_split_shards_without_overlap(self, lease_backend):
+        """Test that a joining replica gets a fair share and no device is owned twice."""
+        fleet = [f"dev_{index}" for index in range(40)]
+        first = self._coordinator(lease_backend, "a", fleet)
+        second = self._coordinator(lease_backend, "b", fleet)
+
+        first.rebalance(now=100)
+        second.rebalance(now=101)  # Joins; everything is still taken
+        first.rebalance(now=102)  # Sees two members and releases its extras
+        second.rebalance(now=103)  # Claims the released shards
+
+        assert len(first.owned_shards) == 4
+        assert len(second.owned_shards) == 4
+        assert not first.owned_shards & second.owned_shards
+        assert sorted(first.owned_devices() + second.owned_devices()) == sorted(fleet)
+
+    def test_dead_replica_shards_move_after_ttl(self, lease_backend):
+        """Test that the survivor takes over a dead replica's shards once its leases expire."""
+        fleet = [f"dev_{index}" for index in range(40)]
+        first = self._coordinator(lease_backend, "a", fleet)
+        second = self._coordinator(lease_backend, "b", fleet)
+        for now in (100, 101, 102, 103):
+            (first if now % 2 == 0 else second).rebalance(now=now)
+
+        # "a" stops renewing; one TTL later "b" owns everything
+        second.rebalance(now=120)
+        assert len(second.owned_shards) == 4
+        second.rebalance(now=133)
+
+        assert second.owned_shards == set(range(8))
+
+    def test_lost_lease_is_dropped(self, lease_backend):
+        """Test that a shard taken over elsewhere stops being polled here."""
+        coordinator = self._coordinator(lease_backend, "a", ["dev_a"])
+        coordinator.rebalance(now=100)
+
+        # Lease expired and was claimed by another replica in the meantime
+        lease_backend.acquire(0, "b", ttl=30, now=200)
+        coordinator.rebalance(now=200)
+
+        assert 0 not in coordinator.owned_shards
+
+    def test_backend_failure_drops_everything(self):
+        """Test that an unreachable backend stops all polling rather than risk duplicates."""
+        from services.shard_service import ShardCoordinator
+
+        backend = Mock()
+        backend.heartbeat.side_effect = RuntimeError("database is locked")
+        coordinator = ShardCoordinator(backend, shard_count=4, holder_id="a")
+        coordinator.poller = Mock()
+        coordinator.fleet = ["dev_a"]
+        coordinator.owned_shards = {0, 1}
+
+        coordinator.rebalance(now=100)
+
+        assert coordinator.owned_shards == set()
+        coordinator.poller.set_devices.assert_called_once_with([])
+
+    def test_start_and_stop(self, lease_backend):
+        """Test that start narrows the poller and stop releases every lease."""
+        from services.shard_service import ShardCoordinator
+
+        poller = Mock()
+        poller.device_ids = ["dev_a", "dev_b"]
+        coordinator = ShardCoordinator(lease_backend, shard_count=4, lease_ttl=30, holder_id="a")
+
+        coordinator.start(poller)
+        coordinator.stop()
+
+        assert coordinator.fleet == ["dev_a", "dev_b"]
+        assert lease_backend.owners() == {}
+        assert lease_backend.members() == []
+        poller.set_devices.assert_called_with([])
+
+
+class TestShardCoordinatorSingleton:
+    """Test cases for shard_coordinator singleton instance."""
+
+    def test_shard_coordinator_singleton_exists(self, mock_env_vars):
+        """Test that shard_coordinator is a ShardCoordinator instance."""
+        from services.shard_service import shard_coordinator, ShardCoordinator
+
+        assert isinstance(shard_coordinator, ShardCoordinator)
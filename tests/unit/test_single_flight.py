@@ -0,0 +1,89 @@
+"""
+Unit tests for services/single_flight.py module.
+
+Tests coalescing of concurrent identical calls.
+"""
+
+import threading
+import time
+from unittest.mock import Mock
+
+
+def _run_concurrently(count, target):
+    """Start count threads on target and wait for all of them."""
+    results = [None] * count
+
+    def runner(index):
+        try:
+            results[index] = target()
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=runner, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestSingleFlight:
+    """Test cases for SingleFlight.do."""
+
+    def test_concurrent_callers_share_one_call(self):
+        """Test that identical concurrent calls run the function once."""
+        from services.single_flight import SingleFlight
+
+        flight = SingleFlight()
+        response = {"success": True}
+
+        def slow_fetch():
+            time.sleep(0.1)
+            return response
+
+        fetch = Mock(side_effect=slow_fetch)
+        results = _run_concurrently(8, lambda: flight.do(("GET", "/status"), fetch))
+
+        fetch.assert_called_once()
+        assert all(result is response for result in results)
+        assert flight.executed == 1
+        assert flight.shared == 7
+
+    def test_different_keys_run_separately(self):
+        """Test that calls with different keys are not coalesced."""
+        from services.single_flight import SingleFlight
+
+        flight = SingleFlight()
+        fetch = Mock(side_effect=lambda key: key)
+
+        results = [flight.do("a", fetch, "a"), flight.do("b", fetch, "b")]
+
+        assert results == ["a", "b"]
+        assert fetch.call_count == 2
+
+    def test_sequential_calls_are_not_cached(self):
+        """Test that a finished flight does not serve later callers."""
+        from services.single_flight import SingleFlight
+
+        flight = SingleFlight()
+        fetch = Mock(side_effect=[1, 2])
+
+        assert flight.do("key", fetch) == 1
+        assert flight.do("key", fetch) == 2
+        assert flight.in_flight() == 0
+
+    def test_exception_reaches_every_waiter(self):
+        """Test that an error in the shared call is raised in all callers."""
+        from services.single_flight import SingleFlight
+
+        flight = SingleFlight()
+
+        def failing_fetch():
+            time.sleep(0.1)
+            raise RuntimeError("upstream down")
+
+        results = _run_concurrently(4, lambda: flight.do("key", failing_fetch))
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert flight.executed == 1
+        assert flight.in_flight() == 0
@@ -0,0 +1,83 @@
+"""
+Unit tests for services/state_store.py module.
+
+Tests the SQLite device state snapshot used for warm restarts.
+"""
+
+import sqlite3
+from unittest.mock import patch
+
+
+class TestDeviceStateStore:
+    """Test cases for DeviceStateStore."""
+
+    def test_disabled_store_is_noop(self):
+        """Test that a store without a path loads nothing and ignores saves."""
+        from services.state_store import DeviceStateStore
+
+        store = DeviceStateStore(None)
+        store.save("dev_a", True)
+
+        assert store.enabled is False
+        assert store.load() == {}
+
+    def test_save_and_load_roundtrip(self, tmp_path):
+        """Test that saved states are loaded back as booleans."""
+        from services.state_store import DeviceStateStore
+
+        store = DeviceStateStore(str(tmp_path / "state.db"))
+        store.save("dev_a", True)
+        store.save("dev_b", False)
+
+        assert store.load() == {"dev_a": True, "dev_b": False}
+
+    def test_save_overwrites_previous_state(self, tmp_path):
+        """Test that the latest state of a device replaces the older one."""
+        from services.state_store import DeviceStateStore
+
+        store = DeviceStateStore(str(tmp_path / "state.db"))
+        store.save("dev_a", True)
+        store.save("dev_a", False)
+
+        assert store.load() == {"dev_a": False}
+
+    def test_snapshot_survives_new_instance(self, tmp_path):
+        """Test that a new store instance (a restart) sees the saved states."""
+        from services.state_store import DeviceStateStore
+
+        path = str(tmp_path / "nested" / "state.db")
+        DeviceStateStore(path).save("dev_a", True)
+
+        assert DeviceStateStore(path).load() == {"dev_a": True}
+
+    def test_load_filters_devices(self, tmp_path):
+        """Test that load can be restricted to the monitored devices."""
+        from services.state_store import DeviceStateStore
+
+        store = DeviceStateStore(str(tmp_path / "state.db"))
+        store.save("dev_a", True)
+        store.save("dev_b", True)
+
+        assert store.load(["dev_b", "dev_c"]) == {"dev_b": True}
+
+    def test_uses_wal_journal(self, tmp_path):
+        """Test that the snapshot database runs in WAL mode."""
+        from services.state_store import DeviceStateStore
+
+        path = str(tmp_path / "state.db")
+        store = DeviceStateStore(path)
+        store.save("dev_a", True)
+
+        mode = sqlite3.connect(path).execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == "wal"
+
+    @patch("services.state_store.logging")
+    def test_load_error_returns_empty(self, mock_logging, tmp_path):
+        """Test that a corrupt snapshot is logged and ignored."""
+        from services.state_store import DeviceStateStore
+
+        path = tmp_path / "state.db"
+        path.write_bytes(b"not a database" * 100)
+
+        assert DeviceStateStore(str(path)).load() == {}
+        mock_logging.error.assert_called()
@@ -0,0 +1,221 @@
+"""
+Unit tests for services/status_cache.py module.
+
+Tests read-through caching, stale-while-revalidate and partial updates.
+"""
+
+import threading
+import pytest
+from unittest.mock import Mock, patch
+
+STATUS = [
+    {"code": "doorcontact_state", "value": False},
+    {"code": "battery_percentage", "value": 85},
+]
+
+
+def _ok(result=STATUS):
+    """Build a successful Tuya status response."""
+    return {"success": True, "result": list(result)}
+
+
+class TestStatusCacheReads:
+    """Test cases for StatusCache.get."""
+
+    def test_miss_reads_through_and_caches(self):
+        """Test that a missing entry is loaded synchronously and then served from memory."""
+        from services.status_cache import StatusCache
+
+        cache = StatusCache(ttl=30)
+        loader = Mock(return_value=_ok())
+
+        first = cache.get("dev_a", loader)
+        second = cache.get("dev_a", loader)
+
+        loader.assert_called_once_with("dev_a")
+        assert first.response["result"] == STATUS
+        assert second.response == {"success": True, "result": STATUS}
+        assert second.stale is False
+        assert cache.metrics()["hits"] == 1
+        assert cache.metrics()["misses"] == 1
+
+    def test_failed_read_is_not_cached(self):
+        """Test that an error response is returned but not stored."""
+        from services.status_cache import StatusCache
+
+        cache = StatusCache()
+        loader = Mock(return_value={"success": False, "msg": "offline"})
+
+        result = cache.get("dev_a", loader)
+
+        assert result.response["success"] is False
+        assert "dev_a" not in cache._entries
+
+    @patch("services.status_cache.time")
+    def test_stale_entry_served_while_refreshing(self, mock_time):
+        """Test that a stale reading is returned at once and refreshed in the background."""
+        from services.status_cache import StatusCache
+
+        mock_time.monotonic.return_value = 100.0
+        cache = StatusCache(ttl=10, max_stale=600)
+        cache.put("dev_a", STATUS)
+        mock_time.monotonic.return_value = 125.0
+
+        refreshed = threading.Event()
+        new_status = [{"code": "doorcontact_state", "value": True}]
+
+        def loader(device_id):
+            refreshed.set()
+            return _ok(new_status)
+
+        result = cache.get("dev_a", loader)
+
+        assert result.stale is True
+        assert result.age == 25.0
+        assert result.response["result"] == STATUS
+        assert refreshed.wait(timeout=2)
+        cache._pool.shutdown(wait=True)
+        assert cache._entries["dev_a"].status == new_status
+        assert cache.metrics()["stale_hits"] == 1
+
+    @patch("services.status_cache.time")
+    def test_one_background_refresh_per_device(self, mock_time):
+        """Test that concurrent stale reads share a single refresh."""
+        from services.status_cache import StatusCache
+
+        mock_time.monotonic.return_value = 100.0
+        cache = StatusCache(ttl=10, max_stale=600)
+        cache.put("dev_a", STATUS)
+        mock_time.monotonic.return_value = 150.0
+
+        release = threading.Event()
+        calls = []
+
+        def loader(device_id):
+            calls.append(device_id)
+            release.wait(timeout=2)
+            return _ok()
+
+        cache.get("dev_a", loader)
+        cache.get("dev_a", loader)
+        release.set()
+        cache._pool.shutdown(wait=True)
+
+        assert calls == ["dev_a"]
+
+    @patch("services.status_cache.time")
+    def test_too_old_entry_read_synchronously(self, mock_time):
+        """Test that an entry past max_stale is fetched before responding."""
+        from services.status_cache import StatusCache
+
+        mock_time.monotonic.return_value = 100.0
+        cache = StatusCache(ttl=10, max_stale=60)
+        cache.put("dev_a", STATUS)
+        mock_time.monotonic.return_value = 200.0
+        loader = Mock(return_value=_ok([]))
+
+        result = cache.get("dev_a", loader)
+
+        loader.assert_called_once_with("dev_a")
+        assert result.stale is False
+        assert result.response["result"] == []
+
+    @patch("services.status_cache.time")
+    def test_failed_read_falls_back_to_old_entry(self, mock_time):
+        """Test that an upstream failure serves the last reading instead of an error."""
+        from services.status_cache import StatusCache
+
+        mock_time.monotonic.return_value = 100.0
+        cache = StatusCache(ttl=10, max_stale=60)
+        cache.put("dev_a", STATUS)
+        mock_time.monotonic.return_value = 500.0
+        loader = Mock(return_value={"success": False, "code": 503, "msg": "circuit open"})
+
+        result = cache.get("dev_a", loader)
+
+        assert result.response == {"success": True, "result": STATUS}
+        assert result.stale is True
+        assert result.age == 400.0
+
+    @patch("services.status_cache.time")
+    def test_raising_read_falls_back_to_old_entry(self, mock_time):
+        """Test that a loader exception serves the last reading, or propagates without one."""
+        from services.status_cache import StatusCache
+
+        mock_time.monotonic.return_value = 100.0
+        cache = StatusCache(ttl=10, max_stale=60)
+        cache.put("dev_a", STATUS)
+        mock_time.monotonic.return_value = 500.0
+        loader = Mock(side_effect=TimeoutError("read timed out"))
+
+        result = cache.get("dev_a", loader)
+
+        assert result.response == {"success": True, "result": STATUS}
+        assert result.stale is True
+        with pytest.raises(TimeoutError):
+            cache.get("dev_b", loader)
+
+    @patch("services.status_cache.time")
+    def test_per_entry_ttl(self, mock_time):
+        """Test that an explicit TTL overrides the cache default."""
+        from services.status_cache import StatusCache
+
+        mock_time.monotonic.return_value = 100.0
+        cache = StatusCache(ttl=10)
+        cache.put("dev_a", STATUS, ttl=120)
+        mock_time.monotonic.return_value = 190.0
+        loader = Mock()
+
+        result = cache.get("dev_a", loader)
+
+        assert result.stale is False
+        loader.assert_not_called()
+
+
+class TestStatusCacheMerge:
+    """Test cases for StatusCache.merge."""
+
+    def test_merge_updates_and_adds_codes(self):
+        """Test that partial updates replace known codes and append new ones."""
+        from services.status_cache import StatusCache
+
+        cache = StatusCache()
+        cache.put("dev_a", STATUS)
+
+        cache.merge(
+            "dev_a",
+            [{"code": "doorcontact_state", "value": True}, {"code": "temper_alarm", "value": 1}],
+        )
+
+        assert cache._entries["dev_a"].status == [
+            {"code": "doorcontact_state", "value": True},
+            {"code": "battery_percentage", "value": 85},
+            {"code": "temper_alarm", "value": 1},
+        ]
+
+    def test_merge_ignores_uncached_device(self):
+        """Test that a partial update does not create an incomplete entry."""
+        from services.status_cache import StatusCache
+
+        cache = StatusCache()
+
+        cache.merge("dev_a", [{"code": "doorcontact_state", "value": True}])
+
+        assert cache.metrics()["entries"] == 0
+
+
+class TestStatusCacheConfig:
+    """Test cases for StatusCache.from_config."""
+
+    @patch("services.status_cache.Config")
+    def test_from_config_uses_settings(self, mock_config):
+        """Test that from_config reads the STATUS_CACHE_* settings."""
+        from services.status_cache import StatusCache
+
+        mock_config.STATUS_CACHE_TTL = 5
+        mock_config.STATUS_CACHE_MAX_STALE = 50
+
+        cache = StatusCache.from_config()
+
+        assert cache.ttl == 5
+        assert cache.max_stale == 50
@@ -0,0 +1,287 @@
+"""
+Unit tests for services/token_manager.py module.
+
+Tests token caching, single-flight grants and background refresh.
+"""
+
+import requests
+import threading
+import time
+import pytest
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+
+def _token(access_token="tok", refresh_token="ref", expire_in=7200):
+    """Build a token info object expiring in expire_in seconds."""
+    return SimpleNamespace(
+        access_token=access_token,
+        refresh_token=refresh_token,
+        expire_time=int((time.time() + expire_in) * 1000),
+    )
+
+
+def _openapi(expire_in=7200, grant_delay=0):
+    """Build a fake TuyaOpenAPI whose connect() grants a token."""
+    openapi = Mock()
+    openapi.token_info = None
+    openapi.is_connect.side_effect = lambda: openapi.token_info is not None
+
+    def connect():
+        time.sleep(grant_delay)
+        openapi.token_info = _token(expire_in=expire_in)
+        return {"success": True}
+
+    openapi.connect.side_effect = connect
+    return openapi
+
+
+@pytest.fixture
+def manager_factory():
+    """Create token managers and cancel their refresh timers afterwards."""
+    from services.token_manager import TokenManager
+
+    managers = []
+
+    def factory(openapi, **kwargs):
+        manager = TokenManager(openapi, **kwargs)
+        managers.append(manager)
+        return manager
+
+    yield factory
+    for manager in managers:
+        manager.stop()
+
+
+class TestTokenManagerCache:
+    """Test cases for the cached token fast path."""
+
+    def test_first_call_grants_token(self, manager_factory):
+        """Test that the first call obtains a token and reports the grant."""
+        openapi = _openapi()
+        manager = manager_factory(openapi)
+
+        assert manager.ensure_token() is True
+        assert manager.grants == 1
+
+    def test_valid_token_skips_all_checks(self, manager_factory):
+        """Test that later calls only compare a timestamp."""
+        openapi = _openapi()
+        manager = manager_factory(openapi)
+        manager.ensure_token()
+        openapi.is_connect.reset_mock()
+
+        for _ in range(100):
+            assert manager.ensure_token() is False
+
+        openapi.is_connect.assert_not_called()
+        openapi.connect.assert_called_once()
+
+    def test_concurrent_callers_share_one_grant(self, manager_factory):
+        """Test that simultaneous requests without a token trigger a single grant."""
+        openapi = _openapi(grant_delay=0.05)
+        manager = manager_factory(openapi)
+
+        threads = [threading.Thread(target=manager.ensure_token) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        openapi.connect.assert_called_once()
+
+    def test_unknown_expiry_checks_connection_each_time(self, manager_factory):
+        """Test that tokens without a numeric expiry fall back to is_connect()."""
+        openapi = Mock()
+        openapi.is_connect.return_value = True
+        manager = manager_factory(openapi)
+
+        manager.ensure_token()
+        manager.ensure_token()
+
+        assert openapi.is_connect.call_count >= 2
+        openapi.connect.assert_not_called()
+
+    @patch("services.token_manager.logging")
+    def test_failed_grant_is_reported(self, mock_logging, manager_factory):
+        """Test that an unsuccessful grant response is logged and not counted."""
+        openapi = Mock()
+        openapi.is_connect.return_value = False
+        openapi.connect.return_value = {"success": False, "msg": "sign invalid"}
+        manager = manager_factory(openapi)
+
+        assert manager.ensure_token() is False
+        assert manager.grants == 0
+        mock_logging.error.assert_called_once()
+
+    def test_invalidate_forces_revalidation(self, manager_factory):
+        """Test that invalidate() sends the next call down the slow path."""
+        openapi = _openapi()
+        manager = manager_factory(openapi)
+        manager.ensure_token()
+        openapi.is_connect.reset_mock()
+
+        manager.invalidate()
+        manager.ensure_token()
+
+        openapi.is_connect.assert_called()
+        openapi.connect.assert_called_once()
+
+
+class TestTokenManagerBackgroundRefresh:
+    """Test cases for the background refresh timer."""
+
+    def test_refresh_is_scheduled_before_expiry(self, manager_factory):
+        """Test that the refresh timer fires refresh_margin seconds before expiry."""
+        openapi = _openapi(expire_in=7200)
+        manager = manager_factory(openapi, refresh_margin=300)
+
+        with patch.object(manager, "_schedule_refresh") as mock_schedule:
+            manager.ensure_token()
+
+        delay = mock_schedule.call_args.args[0]
+        assert delay == pytest.approx(6900, abs=2)
+
+    def test_refresh_swaps_token(self, manager_factory):
+        """Test that a successful refresh replaces the token without a grant."""
+        openapi = _openapi()
+        manager = manager_factory(openapi)
+        manager.ensure_token()
+        response = {
+            "success": True,
+            "t": int(time.time() * 1000),
+            "result": {"access_token": "new", "refresh_token": "ref2", "expire_time": 7200},
+        }
+
+        with patch.object(manager, "_token_request", return_value=response) as mock_request:
+            manager._background_refresh()
+
+        mock_request.assert_called_once_with("/v1.0/token/ref")
+        assert openapi.token_info.access_token == "new"
+        assert manager.refreshes == 1
+        openapi.connect.assert_called_once()
+
+    def test_rejected_refresh_falls_back_to_grant(self, manager_factory):
+        """Test that a rejected refresh token is replaced by a new grant."""
+        openapi = _openapi()
+        manager = manager_factory(openapi)
+        manager.ensure_token()
+        granted = {
+            "success": True,
+            "t": int(time.time() * 1000),
+            "result": {"access_token": "granted", "refresh_token": "r", "expire_time": 7200},
+        }
+
+        with patch.object(
+            manager, "_token_request", side_effect=[{"success": False}, granted]
+        ) as mock_request:
+            manager._background_refresh()
+
+        assert mock_request.call_args.args == ("/v1.0/token", {"grant_type": 1})
+        assert openapi.token_info.access_token == "granted"
+
+    @patch("services.token_manager.logging")
+    def test_failed_refresh_retries(self, mock_logging, manager_factory):
+        """Test that a failed refresh keeps the token and retries later."""
+        from services.token_manager import REFRESH_RETRY_INTERVAL
+
+        openapi = _openapi()
+        manager = manager_factory(openapi)
+        manager.ensure_token()
+        token = openapi.token_info
+
+        with patch.object(manager, "_token_request", side_effect=Exception("timeout")):
+            with patch.object(manager, "_schedule_refresh") as mock_schedule:
+                manager._background_refresh()
+
+        assert openapi.token_info is token
+        mock_schedule.assert_called_once_with(REFRESH_RETRY_INTERVAL)
+
+    def test_refresh_does_not_hold_lock(self, manager_factory):
+        """Test that callers and stop() are not blocked by a refresh in flight."""
+        openapi = _openapi()
+        manager = manager_factory(openapi)
+        manager.ensure_token()
+        started, release = threading.Event(), threading.Event()
+
+        def hung_request(path, params=None):
+            started.set()
+            release.wait(5)
+            return {"success": False}
+
+        with patch.object(manager, "_token_request", side_effect=hung_request):
+            refresh = threading.Thread(target=manager._background_refresh)
+            refresh.start()
+            assert started.wait(1)
+
+            assert manager._lock.acquire(timeout=1)
+            manager._lock.release()
+            manager.stop()
+
+            release.set()
+            refresh.join(5)
+
+        # The refresh finished after stop() and did not re-arm the timer
+        assert manager._timer is None
+
+    def test_token_client_has_timeouts(self, manager_factory):
+        """Test that the token endpoint client gets the (connect, read) timeout adapter."""
+        from services.http_timeout import TimeoutHTTPAdapter
+
+        openapi = _openapi()
+        openapi.endpoint, openapi.access_id, openapi.access_secret = (
+            "https://openapi.example.com",
+            "id",
+            "secret",
+        )
+        manager = manager_factory(openapi, timeout=(3.05, 10))
+
+        with patch("services.token_manager.TuyaOpenAPI") as mock_openapi:
+            mock_openapi.return_value.session = requests.Session()
+            mock_openapi.return_value.get.return_value = {"success": True}
+            manager._token_request("/v1.0/token", {"grant_type": 1})
+
+        adapter = mock_openapi.return_value.session.get_adapter("https://openapi.example.com")
+        assert isinstance(adapter, TimeoutHTTPAdapter)
+        assert adapter.timeout == (3.05, 10)
+
+
+class TestTokenManagerStore:
+    """Test cases for reusing tokens from the token store."""
+
+    def test_stored_token_skips_grant(self, manager_factory):
+        """Test that a valid stored token is used without calling connect()."""
+        openapi = _openapi()
+        store = Mock()
+        store.load.return_value = _token(access_token="stored")
+        manager = manager_factory(openapi, store=store)
+
+        assert manager.ensure_token() is False
+
+        openapi.connect.assert_not_called()
+        assert openapi.token_info.access_token == "stored"
+        store.save.assert_not_called()
+
+    def test_new_grant_is_saved(self, manager_factory):
+        """Test that a fresh grant is written to the store once."""
+        openapi = _openapi()
+        store = Mock()
+        store.load.return_value = None
+        manager = manager_factory(openapi, store=store)
+
+        manager.ensure_token()
+        manager.invalidate()
+        store.save.reset_mock()
+        manager.ensure_token()
+
+        openapi.connect.assert_called_once()
+        store.save.assert_called_once_with(openapi.token_info)
+
+    def test_invalidate_clears_store(self, manager_factory):
+        """Test that a rejected token is removed from the store."""
+        store = Mock()
+        manager = manager_factory(_openapi(), store=store)
+
+        manager.invalidate()
+
+        store.clear.assert_called_once()
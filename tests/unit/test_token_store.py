@@ -0,0 +1,115 @@
+"""
+Unit tests for services/token_store.py module.
+
+Tests the encrypted Tuya token file.
+"""
+
+import json
+import os
+import time
+import pytest
+from types import SimpleNamespace
+
+
+def _token(access_token="tok", expire_in=7200):
+    """Build a token info object expiring in expire_in seconds."""
+    return SimpleNamespace(
+        access_token=access_token,
+        refresh_token="ref",
+        expire_time=int((time.time() + expire_in) * 1000),
+        uid="uid",
+    )
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    """Provide a token file path in a temporary directory."""
+    return str(tmp_path / "token.json")
+
+
+class TestTokenStore:
+    """Test cases for TokenStore."""
+
+    def test_disabled_store_is_noop(self):
+        """Test that a store without a path never touches disk."""
+        from services.token_store import TokenStore
+
+        store = TokenStore()
+        store.save(_token())
+
+        assert store.enabled is False
+        assert store.load() is None
+
+    def test_round_trip(self, store_path):
+        """Test that a saved token is restored with all its fields."""
+        from services.token_store import TokenStore
+
+        token = _token()
+        TokenStore(store_path, secret="s", access_id="id", endpoint="e").save(token)
+
+        restored = TokenStore(store_path, secret="s", access_id="id", endpoint="e").load()
+
+        assert restored.access_token == "tok"
+        assert restored.refresh_token == "ref"
+        assert restored.expire_time == token.expire_time
+        assert restored.uid == "uid"
+
+    def test_file_is_encrypted_and_private(self, store_path):
+        """Test that the token is not stored in clear text and is owner-only."""
+        from services.token_store import TokenStore
+
+        TokenStore(store_path, secret="s", access_id="id", endpoint="e").save(_token("secret-tok"))
+
+        with open(store_path, encoding="utf-8") as token_file:
+            assert "secret-tok" not in token_file.read()
+        assert os.stat(store_path).st_mode & 0o077 == 0
+
+    def test_wrong_key_is_ignored(self, store_path):
+        """Test that a file encrypted with another key is not loaded."""
+        from services.token_store import TokenStore
+
+        TokenStore(store_path, secret="s", access_id="id", endpoint="e").save(_token())
+
+        assert TokenStore(store_path, secret="other", access_id="id", endpoint="e").load() is None
+
+    def test_tampered_file_is_ignored(self, store_path):
+        """Test that a modified file fails authentication."""
+        from services.token_store import TokenStore
+
+        store = TokenStore(store_path, secret="s", access_id="id", endpoint="e")
+        store.save(_token())
+        with open(store_path, encoding="utf-8") as token_file:
+            envelope = json.load(token_file)
+        envelope["data"] = envelope["data"][::-1]
+        with open(store_path, "w", encoding="utf-8") as token_file:
+            json.dump(envelope, token_file)
+
+        assert store.load() is None
+
+    def test_other_endpoint_is_ignored(self, store_path):
+        """Test that a token for a different endpoint is not reused."""
+        from services.token_store import TokenStore
+
+        TokenStore(store_path, secret="s", access_id="id", endpoint="eu").save(_token())
+
+        assert TokenStore(store_path, secret="s", access_id="id", endpoint="us").load() is None
+
+    def test_nearly_expired_token_is_ignored(self, store_path):
+        """Test that a token about to expire is not restored."""
+        from services.token_store import TokenStore
+
+        store = TokenStore(store_path, secret="s", access_id="id", endpoint="e")
+        store.save(_token(expire_in=30))
+
+        assert store.load() is None
+
+    def test_clear_removes_file(self, store_path):
+        """Test that clear() deletes the token file and tolerates a missing one."""
+        from services.token_store import TokenStore
+
+        store = TokenStore(store_path, secret="s", access_id="id", endpoint="e")
+        store.save(_token())
+        store.clear()
+        store.clear()
+
+        assert not os.path.exists(store_path)
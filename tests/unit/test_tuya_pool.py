@@ -0,0 +1,226 @@
+"""
+Unit tests for services/tuya_pool.py module.
+
+Tests account parsing, device discovery, routing and batch fan-out.
+"""
+
+import json
+from unittest.mock import Mock, patch
+
+OK = {"success": True, "result": [{"code": "doorcontact_state", "value": False}]}
+DENIED = {"success": False, "code": 1106, "msg": "permission deny"}
+QUOTA = {
+    "success": False,
+    "code": 1106,
+    "msg": "No permissions. Your quota of Trial Edition is used up.",
+}
+
+
+def _member(status=DENIED, batch=None):
+    """Build a mock TuyaService member."""
+    member = Mock()
+    member.get_device_status.return_value = status
+    member.get_devices_status.return_value = batch or {"success": True, "result": []}
+    member.send_command.return_value = {"success": True, "result": True}
+    return member
+
+
+def _pool(members, path=None):
+    """Build a pool whose account members are the given mocks."""
+    from services.tuya_pool import TuyaServicePool
+
+    default = members.pop("default")
+    pool = TuyaServicePool(
+        default=default,
+        accounts={key: ("https://example", "id", "secret") for key in members},
+        routes_path=path,
+    )
+    pool._members.update(members)
+    return pool
+
+
+class TestParseAccounts:
+    """Test cases for parse_accounts."""
+
+    def test_region_codes_and_urls(self):
+        """Test that each account region becomes one member."""
+        from services.tuya_pool import parse_accounts
+
+        members = parse_accounts("eu_proj:id1:sec1:eu|us, lab:id2:sec2:https://openapi.tuyain.com")
+
+        assert members == {
+            "eu_proj/eu": ("https://openapi.tuyaeu.com", "id1", "sec1"),
+            "eu_proj/us": ("https://openapi.tuyaus.com", "id1", "sec1"),
+            "lab/openapi.tuyain.com": ("https://openapi.tuyain.com", "id2", "sec2"),
+        }
+
+    def test_ignores_malformed_entries(self):
+        """Test that incomplete entries and unknown regions are skipped."""
+        from services.tuya_pool import parse_accounts
+
+        assert parse_accounts("") == {}
+        assert parse_accounts("proj:id:secret, proj:id:secret:mars") == {}
+
+
+class TestTuyaServicePool:
+    """Test cases for TuyaServicePool."""
+
+    def test_single_project_passes_through(self):
+        """Test that without accounts calls go straight to the default member."""
+        from services.tuya_pool import TuyaServicePool
+
+        default = _member(OK)
+        pool = TuyaServicePool(default=default)
+
+        assert pool.get_device_status("dev1") is OK
+        pool.get_devices_status(["dev1", "dev2"])
+
+        default.get_device_status.assert_called_once_with("dev1", priority=1)
+        default.get_devices_status.assert_called_once_with(["dev1", "dev2"], priority=1)
+
+    def test_discovers_once_and_routes(self):
+        """Test that the owning member is found once and used afterwards."""
+        default, eu = _member(DENIED), _member(OK)
+        pool = _pool({"default": default, "proj/eu": eu})
+
+        assert pool.get_device_status("dev1") is OK
+        assert pool.get_device_status("dev1") is OK
+
+        assert default.get_device_status.call_count == 1
+        assert eu.get_device_status.call_count == 2
+        assert pool.metrics()["members"]["proj/eu"]["devices"] == 1
+
+    def test_unknown_device_falls_back_to_default(self):
+        """Test that a device no member can read is served by the default member."""
+        default, eu = _member(DENIED), _member(DENIED)
+        pool = _pool({"default": default, "proj/eu": eu})
+
+        assert pool.get_device_status("dev1") is DENIED
+        pool.get_device_status("dev1")
+
+        # Discovery is not repeated within DISCOVERY_RETRY
+        assert eu.get_device_status.call_count == 1
+        assert default.get_device_status.call_count == 2
+        assert pool.metrics()["unrouted"] == 1
+
+    def test_denied_route_is_forgotten(self):
+        """Test that a permission error drops the route for rediscovery."""
+        default, eu = _member(DENIED), _member(OK)
+        pool = _pool({"default": default, "proj/eu": eu})
+        pool.get_device_status("dev1")
+
+        eu.get_device_status.return_value = DENIED
+        pool.get_device_status("dev1")
+
+        assert "dev1" not in pool._routes
+
+    def test_send_command_uses_owner(self):
+        """Test that commands go to the member owning the device."""
+        default, eu = _member(DENIED), _member(OK)
+        pool = _pool({"default": default, "proj/eu": eu})
+
+        pool.send_command("dev1", [{"code": "switch", "value": True}])
+
+        eu.send_command.assert_called_once_with(
+            "dev1", [{"code": "switch", "value": True}], priority=1
+        )
+        default.send_command.assert_not_called()
+
+    def test_batch_groups_by_member(self):
+        """Test that a batch is split per member and the results merged."""
+        default = _member(
+            batch={"success": True, "result": [{"id": "dev1", "status": []}]},
+        )
+        eu = _member(batch={"success": True, "result": [{"id": "dev2", "status": []}]})
+        pool = _pool({"default": default, "proj/eu": eu})
+        pool._routes.update({"dev1": "default", "dev2": "proj/eu"})
+        pool._loaded = True
+
+        response = pool.get_devices_status(["dev1", "dev2"])
+
+        assert response["success"] is True
+        assert sorted(entry["id"] for entry in response["result"]) == ["dev1", "dev2"]
+        default.get_devices_status.assert_called_once_with(["dev1"], priority=1)
+        eu.get_devices_status.assert_called_once_with(["dev2"], priority=1)
+
+    def test_batch_discovers_unrouted_devices(self):
+        """Test that discovery results are included in the batch response."""
+        default, eu = _member(DENIED), _member(OK)
+        pool = _pool({"default": default, "proj/eu": eu})
+
+        response = pool.get_devices_status(["dev1"])
+
+        assert response["result"] == [{"id": "dev1", "status": OK["result"]}]
+        eu.get_devices_status.assert_not_called()
+
+    def test_routes_survive_restart(self, tmp_path):
+        """Test that routes written to the file are loaded by a new pool."""
+        path = str(tmp_path / "routes.json")
+        pool = _pool({"default": _member(DENIED), "proj/eu": _member(OK)}, path)
+        pool.get_device_status("dev1")
+
+        with open(path) as routes_file:
+            assert json.load(routes_file)["routes"] == {"dev1": "proj/eu"}
+
+        eu = _member(OK)
+        restarted = _pool({"default": _member(DENIED), "proj/eu": eu}, path)
+        restarted.get_device_status("dev1")
+
+        eu.get_device_status.assert_called_once()
+
+    @patch("services.tuya_pool.TuyaService")
+    def test_members_built_lazily_with_own_credentials(self, mock_service):
+        """Test that account members are created on first use with their credentials."""
+        from services.tuya_pool import TuyaServicePool
+
+        pool = TuyaServicePool(
+            default=_member(),
+            accounts={"proj/us": ("https://openapi.tuyaus.com", "id", "secret")},
+        )
+        mock_service.assert_not_called()
+
+        assert pool.member("proj/us") is pool.member("proj/us")
+        args, kwargs = mock_service.call_args
+        assert args == ("https://openapi.tuyaus.com", "id", "secret")
+        assert kwargs["store"] is None
+
+    @patch("services.tuya_pool.TuyaService")
+    def test_members_have_own_quota_accountants(self, mock_service):
+        """Test that each account member counts calls against its own allowance."""
+        from services.quota_service import quota_accountant
+        from services.tuya_pool import TuyaServicePool
+
+        pool = TuyaServicePool(
+            default=_member(),
+            accounts={
+                "a/us": ("https://openapi.tuyaus.com", "id1", "secret1"),
+                "b/eu": ("https://openapi.tuyaeu.com", "id2", "secret2"),
+            },
+        )
+        pool.member("a/us")
+        pool.member("b/eu")
+
+        accountants = [call[1]["accountant"] for call in mock_service.call_args_list]
+        assert accountants[0] is not accountants[1]
+        assert quota_accountant not in accountants
+
+    def test_discovery_probes_are_marked(self):
+        """Test that discovery reads the status as a probe."""
+        default, eu = _member(DENIED), _member(OK)
+        pool = _pool({"default": default, "proj/eu": eu})
+
+        pool.get_device_status("dev1")
+
+        default.get_device_status.assert_called_once_with("dev1", priority=1, probe=True)
+
+    def test_quota_error_keeps_route(self):
+        """Test that a quota 1106 on the owning member does not trigger rediscovery."""
+        default, eu = _member(DENIED), _member(OK)
+        pool = _pool({"default": default, "proj/eu": eu})
+        pool.get_device_status("dev1")
+
+        eu.get_device_status.return_value = QUOTA
+        assert pool.get_device_status("dev1") is QUOTA
+
+        assert pool._routes["dev1"] == "proj/eu"
+        assert default.get_device_status.call_count == 1
@@ -23,6 +23,18 @@ class TestTuyaServiceInit:
             TuyaConfig.API_ENDPOINT, TuyaConfig.ACCESS_ID, TuyaConfig.ACCESS_SECRET
         )
 
+    @patch("services.tuya_service.TuyaOpenAPI")
+    def test_tuya_service_init_with_explicit_credentials(self, mock_tuya_api, mock_env_vars):
+        """Test that explicit credentials replace the configured project."""
+        from services.tuya_service import TuyaService
+
+        service = TuyaService("https://openapi.tuyaus.com", "other_id", "other_secret")
+
+        mock_tuya_api.assert_called_once_with(
+            "https://openapi.tuyaus.com", "other_id", "other_secret"
+        )
+        assert service.token_manager.store is None
+
     @patch("services.tuya_service.TuyaOpenAPI")
     def test_tuya_service_init_calls_connect(self, mock_tuya_api, mock_env_vars):
         """Test that TuyaService calls connect() during initialization."""
@@ -249,6 +261,421 @@ class TestTuyaServiceGetDeviceStatus:
         assert result == expected_response
 
 
+class TestTuyaServiceQuotaAccounting:
+    """Test cases for quota accounting of TuyaService calls."""
+
+    @patch("services.tuya_service.quota_accountant")
+    @patch("services.tuya_service.TuyaOpenAPI")
+    def test_get_device_status_reports_to_accountant(
+        self, mock_tuya_api, mock_quota, mock_env_vars
+    ):
+        """Test that every status call is reported to the quota accountant."""
+        mock_instance = Mock()
+        mock_tuya_api.return_value = mock_instance
+        mock_instance.is_connect.return_value = True
+        response = {"success": True, "result": []}
+        mock_instance.get.return_value = response
+
+        from services.tuya_service import TuyaService
+
+        service = TuyaService()
+        service.get_device_status("test_device")
+
+        mock_quota.observe.assert_called_once_with(response)
+
+    @patch("services.tuya_service.TuyaOpenAPI")
+    def test_probe_does_not_mark_quota_exhausted(self, mock_tuya_api, mock_env_vars):
+        """Test that a discovery probe's 1106 is counted without exhausting the quota."""
+        from services.quota_service import QuotaAccountant
+        from services.tuya_service import TuyaService
+
+        mock_instance = Mock()
+        mock_tuya_api.return_value = mock_instance
+        mock_instance.get.return_value = {"success": False, "code": 1106, "msg": "permission deny"}
+        accountant = QuotaAccountant(allowance=100)
+        service = TuyaService("https://openapi.tuyaeu.com", "id", "secret", accountant=accountant)
+
+        service.get_device_status("other_project_device", probe=True)
+
+        assert accountant.used == 1
+        assert accountant.exhausted is False
+
+    @patch("services.tuya_service.TuyaOpenAPI")
+    def test_permission_deny_does_not_mark_quota_exhausted(self, mock_tuya_api, mock_env_vars):
+        """Test that a 1106 permission deny on a regular read leaves the quota alone."""
+        from services.quota_service import QuotaAccountant
+        from services.tuya_service import TuyaService
+
+        mock_instance = Mock()
+        mock_tuya_api.return_value = mock_instance
+        mock_instance.get.return_value = {"success": False, "code": 1106, "msg": "permission deny"}
+        accountant = QuotaAccountant(allowance=100)
+        service = TuyaService("https://openapi.tuyaeu.com", "id", "secret", accountant=accountant)
+
+        service.get_device_status("moved_device")
+
+        assert accountant.used == 1
+        assert accountant.exhausted is False
+
+        mock_instance.get.return_value = {
+            "success": False,
+            "code": 1106,
+            "msg": "No permissions. Your quota of Trial Edition is used up.",
+        }
+        service.get_device_status("owned_device")
+
+        assert accountant.exhausted is True
+
+
+class TestTuyaServiceTokenLifecycle:
+    """Test cases for token handling in TuyaService."""
+
+    @patch("services.tuya_service.TuyaOpenAPI")
+    def test_requests_use_token_manager(self, mock_tuya_api, mock_env_vars):
+        """Test that requests go through the token manager instead of is_connect()."""
+        mock_tuya_api.return_value = Mock()
+
+        from services.tuya_service import TuyaService
+
+        service = TuyaService()
+        service.token_manager = Mock()
+        service.token_manager.ensure_token.return_value = False
+        service.get_device_status("test_device")
+
+        service.token_manager.ensure_token.assert_called_once()
+
+    @patch("services.tuya_service.TuyaOpenAPI")
+    def test_invalid_token_response_invalidates_cache(self, mock_tuya_api, mock_env_vars):
+        """Test that a token-invalid error makes the manager re-validate the token."""
+        mock_instance = Mock()
+        mock_tuya_api.return_value = mock_instance
+        mock_instance.get.return_value = {"success": False, "code": 1010}
+
+        from services.tuya_service import TuyaService
+
+        service = TuyaService()
+        service.token_manager = Mock()
+        service.token_manager.ensure_token.return_value = False
+        service.get_device_status("test_device")
+
+        service.token_manager.invalidate.assert_called_once()
+
+
+class TestTuyaServiceSingleFlight:
+    """Test cases for coalescing of concurrent status reads."""
+
+    @patch("services.tuya_service.TuyaOpenAPI")
+    def test_concurrent_status_reads_share_one_call(self, mock_tuya_api, mock_env_vars):
+        """Test that simultaneous reads of one device make a single upstream call."""
+        import threading
+        import time
+
+        mock_instance = Mock()
+        mock_tuya_api.return_value = mock_instance
+        mock_instance.is_connect.return_value = True
+        response = {"success": True, "result": []}
+        mock_instance.get.side_effect = lambda *args: time.sleep(0.1) or response
+
+        from services.tuya_service import TuyaService
+
+        service = TuyaService()
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(service.get_device_status("dev_a")))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        mock_instance.get.assert_called_once_with("/v1.0/devices/dev_a/status")
+        assert results == [response] * 5
+
+    @patch("services.tuya_service.TuyaOpenAPI")
+    def test_alert_read_does_not_join_api_read(self, mock_tuya_api, mock_env_vars):
+        """Test that an alert poll never inherits a rate-limited REST read's response."""
+        import threading
+        import time
+        from services.rate_limiter import RateLimiter, PRIORITY_ALERT
+        from services.tuya_service import RATE_LIMITED_CODE
+
+        mock_instance = Mock()
+        mock_tuya_api.return_value = mock_instance
+        response = {"success": True, "result": []}
+        mock_instance.get.return_value = response
+
+        from services.tuya_service import TuyaService
+
+        service = TuyaService()
+        service.rate_limiter = RateLimiter({"default": (2, 1)}, max_wait=0.1)
+        service.rate_limiter.acquire("device_status", PRIORITY_ALERT)  # Empty the bucket
+
+        results = {}
+        api = threading.Thread(
+            target=lambda: results.update(api=service.get_device_status("dev_a"))
+        )
+        alert = threading.Thread(
+            target=lambda: results.update(
+                alert=service.get_device_status("dev_a", priority=PRIORITY_ALERT)
+            )
+        )
+        api.start()
+        time.sleep(0.02)
+        alert.start()
+        api.join()
+        alert.join()
+
+        assert results["api"]["code"] == RATE_LIMITED_CODE
+        assert results["alert"] is response
+
+    @patch("services.tuya_service.TuyaOpenAPI")
+    def test_commands_are_never_coalesced(self, mock_tuya_api, mock_env_vars):
+        """Test that send_command always reaches the device."""
+        mock_instance = Mock()
+        mock_tuya_api.return_value = mock_instance
+        mock_instance.is_connect.return_value = True
+        mock_instance.post.return_value = {"success": True}
+
+        from services.tuya_service import TuyaService
+
+        service = TuyaService()
+        service.send_command("dev_a", [{"code": "switch", "value": True}])
+        service.send_command("dev_a", [{"code": "switch", "value": True}])
+
+        assert mock_instance.post.call_count == 2
+
+
+class TestTuyaServiceCircuitBreaker:
+    """Test cases for fail-fast and retry behaviour around upstream calls."""
+
+    @patch("services.tuya_service.time.sleep")
+    @patch("services.tuya_service.TuyaOpenAPI")
+    def test_status_read_retried_after_error(self, mock_tuya_api, mock_sleep, mock_env_vars):
+        """Test that a failed status read is retried with backoff."""
+        import requests
+
+        mock_instance = Mock()
+        mock_tuya_api.return_value = mock_instance
+        mock_instance.is_connect.return_value = True
+        response = {"success": True, "result": []}
+        mock_instance.get.side_effect = [requests.ConnectionError("reset"), None, response]
+
+        from services.tuya_service import TuyaService
+
+        service = TuyaService()
+        result = service.get_device_status("dev_a")
+
+        assert result == response
+        assert mock_instance.get.call_count == 3
+        assert mock_sleep.call_count == 2
+
+    @patch("services.tuya_service.time.sleep")
+    @patch("services.tuya_service.TuyaOpenAPI")
+    def test_open_circuit_fails_fast(self, mock_tuya_api, mock_sleep, mock_env_vars):
+        """Test that repeated failures open the circuit and later calls skip upstream."""
+        import requests
+
+        mock_instance = Mock()
+        mock_tuya_api.return_value = mock_instance
+        mock_instance.is_connect.return_value = True
+        mock_instance.get.side_effect = requests.ConnectionError("down")
+
+        from services.tuya_service import TuyaService, CIRCUIT_OPEN_CODE
+        from services.circuit_breaker import CircuitBreakerRegistry
+
+        service = TuyaService()
+        service.breakers = CircuitBreakerRegistry(min_calls=3)
+        with pytest.raises(requests.ConnectionError):
+            service.get_device_status("dev_a")
+        calls_before = mock_instance.get.call_count
+
+        result = service.get_device_status("dev_a")
+
+        assert result["success"] is False
+        assert result["code"] == CIRCUIT_OPEN_CODE
+        assert mock_instance.get.call_count == calls_before
+        assert service.breakers.metrics()["device_status"]["state"] == "open"
+
+    @patch("services.tuya_service.time.sleep")
+    @patch("services.tuya_service.TuyaOpenAPI")
+    def test_hanging_upstream_trips_breaker(
+        self, mock_tuya_api, mock_sleep, mock_env_vars, monkeypatch
+    ):
+        """Test that a connection that never answers times out and opens the circuit."""
+        import socket
+        import requests
+        from config.Config import TuyaConfig
+
+        # Accepts connections (through the listen backlog) but never answers
+        server = socket.socket()
+        server.bind(("127.0.0.1", 0))
+        server.listen(16)
+        url = f"http://127.0.0.1:{server.getsockname()[1]}"
+        monkeypatch.setattr(TuyaConfig, "READ_TIMEOUT", 0.1)
+
+        mock_instance = Mock()
+        mock_instance.session = requests.Session()
+        mock_instance.get.side_effect = lambda path, *args: mock_instance.session.get(
+            url + path
+        ).json()
+        mock_tuya_api.return_value = mock_instance
+
+        from services.tuya_service import TuyaService, CIRCUIT_OPEN_CODE
+        from services.circuit_breaker import CircuitBreakerRegistry
+
+        service = TuyaService()
+        service.breakers = CircuitBreakerRegistry(min_calls=3)
+        try:
+            with pytest.raises(requests.Timeout):
+                service.get_device_status("dev_a")
+            result = service.get_device_status("dev_a")
+        finally:
+            mock_instance.session.close()
+            server.close()
+
+        assert result["code"] == CIRCUIT_OPEN_CODE
+        assert service.breakers.metrics()["device_status"]["state"] == "open"
+
+    @patch("services.tuya_service.TuyaOpenAPI")
+    def test_commands_are_not_retried(self, mock_tuya_api, mock_env_vars):
+        """Test that a failed command is not sent twice."""
+        mock_instance = Mock()
+        mock_tuya_api.return_value = mock_instance
+        mock_instance.is_connect.return_value = True
+        mock_instance.post.return_value = None
+
+        from services.tuya_service import TuyaService
+
+        service = TuyaService()
+        service.send_command("dev_a", [{"code": "switch", "value": True}])
+
+        mock_instance.post.assert_called_once()
+
+
+class TestTuyaServiceRateLimit:
+    """Test cases for the shared rate limiter."""
+
+    @patch("services.tuya_service.TuyaOpenAPI")
+    def test_rate_limited_call_is_not_sent(self, mock_tuya_api, mock_env_vars):
+        """Test that a call refused by the limiter returns 429 without an upstream request."""
+        mock_instance = Mock()
+        mock_tuya_api.return_value = mock_instance
+        mock_instance.is_connect.return_value = True
+
+        from services.tuya_service import TuyaService, RATE_LIMITED_CODE
+
+        service = TuyaService()
+        service.rate_limiter = Mock()
+        service.rate_limiter.acquire.return_value = False
+
+        result = service.send_command("dev_a", [{"code": "switch", "value": True}])
+
+        assert result["code"] == RATE_LIMITED_CODE
+        mock_instance.post.assert_not_called()
+
+    @patch("services.tuya_service.TuyaOpenAPI")
+    def test_priority_passed_to_limiter(self, mock_tuya_api, mock_env_vars):
+        """Test that the caller's priority class reaches the limiter."""
+        mock_instance = Mock()
+        mock_tuya_api.return_value = mock_instance
+        mock_instance.is_connect.return_value = True
+        mock_instance.get.return_value = {"success": True, "result": []}
+
+        from services.tuya_service import TuyaService
+        from services.rate_limiter import PRIORITY_ALERT
+
+        service = TuyaService()
+        service.rate_limiter = Mock()
+        service.rate_limiter.acquire.return_value = True
+
+        service.get_device_status("dev_a", priority=PRIORITY_ALERT)
+
+        service.rate_limiter.acquire.assert_called_once_with("device_status", PRIORITY_ALERT)
+
+
+class TestTuyaServiceCommandValidation:
+    """Test cases for local command validation against device specs."""
+
+    @patch("services.tuya_service.TuyaOpenAPI")
+    def test_invalid_command_rejected_locally(self, mock_tuya_api, mock_env_vars):
+        """Test that a command outside the device spec never goes upstream."""
+        mock_instance = Mock()
+        mock_tuya_api.return_value = mock_instance
+        mock_instance.is_connect.return_value = True
+        mock_instance.get.return_value = {
+            "success": True,
+            "result": {"functions": [{"code": "switch", "type": "Boolean", "values": "{}"}]},
+        }
+
+        from services.tuya_service import TuyaService, INVALID_COMMAND_CODE
+
+        service = TuyaService()
+        result = service.send_command("dev_a", [{"code": "switch", "value": "on"}])
+
+        assert result["code"] == INVALID_COMMAND_CODE
+        assert "switch: expected a boolean" in result["msg"]
+        mock_instance.get.assert_called_once_with("/v1.0/devices/dev_a/functions")
+        mock_instance.post.assert_not_called()
+
+    @patch("services.tuya_service.TuyaOpenAPI")
+    def test_valid_command_sent_normalized(self, mock_tuya_api, mock_env_vars):
+        """Test that valid commands are sent in normalized form."""
+        mock_instance = Mock()
+        mock_tuya_api.return_value = mock_instance
+        mock_instance.is_connect.return_value = True
+        mock_instance.get.return_value = {
+            "success": True,
+            "result": {"functions": [{"code": "switch", "type": "Boolean", "values": "{}"}]},
+        }
+        mock_instance.post.return_value = {"success": True}
+
+        from services.tuya_service import TuyaService
+
+        service = TuyaService()
+        service.send_command("dev_a", [{"code": "switch", "value": "true"}])
+
+        mock_instance.post.assert_called_once_with(
+            "/v1.0/devices/dev_a/commands", {"commands": [{"code": "switch", "value": True}]}
+        )
+
+
+class TestTuyaServiceGetDevicesStatus:
+    """Test cases for TuyaService.get_devices_status() method."""
+
+    @patch("services.tuya_service.TuyaOpenAPI")
+    def test_get_devices_status_makes_batch_api_call(self, mock_tuya_api, mock_env_vars):
+        """Test get_devices_status queries the batch endpoint with joined IDs."""
+        mock_instance = Mock()
+        mock_tuya_api.return_value = mock_instance
+        mock_instance.is_connect.return_value = True
+        mock_instance.get.return_value = {"success": True, "result": []}
+
+        from services.tuya_service import TuyaService
+
+        service = TuyaService()
+        service.get_devices_status(["dev_a", "dev_b"])
+
+        mock_instance.get.assert_called_once_with(
+            "/v1.0/iot-03/devices/status", {"device_ids": "dev_a,dev_b"}
+        )
+
+    @patch("services.tuya_service.TuyaOpenAPI")
+    def test_get_devices_status_returns_response(self, mock_tuya_api, mock_env_vars):
+        """Test get_devices_status returns API response."""
+        mock_instance = Mock()
+        mock_tuya_api.return_value = mock_instance
+        mock_instance.is_connect.return_value = True
+        expected_response = {"success": True, "result": [{"id": "dev_a", "status": []}]}
+        mock_instance.get.return_value = expected_response
+
+        from services.tuya_service import TuyaService
+
+        service = TuyaService()
+
+        assert service.get_devices_status(["dev_a"]) == expected_response
+
+
 class TestTuyaServiceSendCommand:
     """Test cases for TuyaService.send_command() method."""
 
@@ -4,15 +4,46 @@ Unit tests for services/whatsapp_service.py module.
 Tests WhatsApp notification service functionality.
 """
 
+import threading
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 import requests
 
 
+@pytest.fixture(autouse=True)
+def inline_alert_dispatch(monkeypatch):
+    """Deliver queued alerts inline so results can be asserted synchronously."""
+    from services.alert_dispatcher import alert_dispatcher
+
+    monkeypatch.setattr(alert_dispatcher, "workers", 0)
+
+
+@pytest.fixture(autouse=True)
+def fresh_alert_router(monkeypatch, mock_env_vars):
+    """Route alerts to the configured group without pacing left over from other tests."""
+    import services.whatsapp_service as whatsapp_service
+    from services.alert_router import AlertRouter
+    from config.Config import WhatsAppConfig
+
+    router = AlertRouter(default=[WhatsAppConfig.GROUP_ID], rate=0)
+    monkeypatch.setattr(whatsapp_service, "alert_router", router)
+    return router
+
+
+@pytest.fixture(autouse=True)
+def empty_flap_windows():
+    """Start every test without open coalescing windows."""
+    from services.flap_coalescer import flap_coalescer
+
+    flap_coalescer.clear()
+    yield
+    flap_coalescer.clear()
+
+
 class TestSendWhatsAppMessage:
     """Test cases for send_whatsapp_message function."""
 
-    @patch("services.whatsapp_service.requests.post")
+    @patch("services.whatsapp_service.whatsapp_client.post")
     def test_send_whatsapp_message_success(self, mock_post, mock_env_vars):
         """Test successful WhatsApp message sending."""
         mock_response = Mock()
@@ -26,7 +57,7 @@ class TestSendWhatsAppMessage:
         assert result is True
         mock_post.assert_called_once()
 
-    @patch("services.whatsapp_service.requests.post")
+    @patch("services.whatsapp_service.whatsapp_client.post")
     def test_send_whatsapp_message_calls_api_with_correct_url(self, mock_post, mock_env_vars):
         """Test that API is called with correct URL."""
         mock_response = Mock()
@@ -41,24 +72,23 @@ class TestSendWhatsAppMessage:
         call_args = mock_post.call_args
         assert call_args[0][0] == WhatsAppConfig.API_URL
 
-    @patch("services.whatsapp_service.requests.post")
+    @patch("services.whatsapp_service.whatsapp_client.post")
     def test_send_whatsapp_message_includes_auth(self, mock_post, mock_env_vars):
         """Test that request includes HTTP Basic authentication."""
         mock_response = Mock()
         mock_response.status_code = 200
         mock_post.return_value = mock_response
 
-        from services.whatsapp_service import send_whatsapp_message
+        from services.whatsapp_service import send_whatsapp_message, whatsapp_client
         from config.Config import WhatsAppConfig
 
         send_whatsapp_message("Test message")
 
-        call_args, call_kwargs = mock_post.call_args
-        auth = call_kwargs["auth"]
+        auth = whatsapp_client.session.auth
         assert auth.username == WhatsAppConfig.API_USER
         assert auth.password == WhatsAppConfig.API_PASSWORD
 
-    @patch("services.whatsapp_service.requests.post")
+    @patch("services.whatsapp_service.whatsapp_client.post")
     def test_send_whatsapp_message_includes_correct_headers(self, mock_post, mock_env_vars):
         """Test that request includes correct headers."""
         mock_response = Mock()
@@ -72,7 +102,18 @@ class TestSendWhatsAppMessage:
         call_kwargs = mock_post.call_args[1]
         assert call_kwargs["headers"]["Content-Type"] == "application/json"
 
-    @patch("services.whatsapp_service.requests.post")
+    @patch("services.whatsapp_service.whatsapp_client.post")
+    def test_send_whatsapp_message_includes_idempotency_key(self, mock_post, mock_env_vars):
+        """Test that an idempotency key is sent as a header."""
+        mock_post.return_value = Mock(status_code=200)
+
+        from services.whatsapp_service import send_whatsapp_message
+
+        send_whatsapp_message("Test message", idempotency_key="dev_a:opened:1")
+
+        assert mock_post.call_args[1]["headers"]["Idempotency-Key"] == "dev_a:opened:1"
+
+    @patch("services.whatsapp_service.whatsapp_client.post")
     def test_send_whatsapp_message_includes_correct_payload(self, mock_post, mock_env_vars):
         """Test that request includes correct payload."""
         mock_response = Mock()
@@ -93,7 +134,7 @@ class TestSendWhatsAppMessage:
         # is_forwarded and duration are conditional based on config
         # They should not be in payload with default test configuration
 
-    @patch("services.whatsapp_service.requests.post")
+    @patch("services.whatsapp_service.whatsapp_client.post")
     def test_send_whatsapp_message_includes_timeout(self, mock_post, mock_env_vars):
         """Test that request includes timeout parameter."""
         mock_response = Mock()
@@ -105,9 +146,9 @@ class TestSendWhatsAppMessage:
         send_whatsapp_message("Test message")
 
         call_kwargs = mock_post.call_args[1]
-        assert call_kwargs["timeout"] == 10
+        assert call_kwargs["timeout"] == (3.05, 10)
 
-    @patch("services.whatsapp_service.requests.post")
+    @patch("services.whatsapp_service.whatsapp_client.post")
     @patch("services.whatsapp_service.logging")
     def test_send_whatsapp_message_logs_info(self, mock_logging, mock_post, mock_env_vars):
         """Test that function logs message sending."""
@@ -123,7 +164,7 @@ class TestSendWhatsAppMessage:
         # Verify info log was called
         mock_logging.info.assert_called()
 
-    @patch("services.whatsapp_service.requests.post")
+    @patch("services.whatsapp_service.whatsapp_client.post")
     def test_send_whatsapp_message_request_exception(self, mock_post, mock_env_vars):
         """Test handling of request exception."""
         mock_post.side_effect = requests.exceptions.RequestException("Connection error")
@@ -134,7 +175,7 @@ class TestSendWhatsAppMessage:
 
         assert result is False
 
-    @patch("services.whatsapp_service.requests.post")
+    @patch("services.whatsapp_service.whatsapp_client.post")
     @patch("services.whatsapp_service.logging")
     def test_send_whatsapp_message_logs_error_on_exception(
         self, mock_logging, mock_post, mock_env_vars
@@ -148,7 +189,7 @@ class TestSendWhatsAppMessage:
 
         mock_logging.error.assert_called()
 
-    @patch("services.whatsapp_service.requests.post")
+    @patch("services.whatsapp_service.whatsapp_client.post")
     def test_send_whatsapp_message_http_error(self, mock_post, mock_env_vars):
         """Test handling of HTTP error response."""
         mock_response = Mock()
@@ -162,7 +203,7 @@ class TestSendWhatsAppMessage:
 
         assert result is False
 
-    @patch("services.whatsapp_service.requests.post")
+    @patch("services.whatsapp_service.whatsapp_client.post")
     @patch("services.whatsapp_service.logging")
     def test_send_whatsapp_message_logs_response_on_error(
         self, mock_logging, mock_post, mock_env_vars
@@ -182,7 +223,7 @@ class TestSendWhatsAppMessage:
         # Verify error logging was called
         assert mock_logging.error.call_count >= 1
 
-    @patch("services.whatsapp_service.requests.post")
+    @patch("services.whatsapp_service.whatsapp_client.post")
     def test_send_whatsapp_message_timeout_exception(self, mock_post, mock_env_vars):
         """Test handling of timeout exception."""
         mock_post.side_effect = requests.exceptions.Timeout("Request timeout")
@@ -193,7 +234,7 @@ class TestSendWhatsAppMessage:
 
         assert result is False
 
-    @patch("services.whatsapp_service.requests.post")
+    @patch("services.whatsapp_service.whatsapp_client.post")
     def test_send_whatsapp_message_connection_error(self, mock_post, mock_env_vars):
         """Test handling of connection error."""
         mock_post.side_effect = requests.exceptions.ConnectionError("Network error")
@@ -218,11 +259,12 @@ class TestSendDoorOpenedAlert:
 
         send_door_opened_alert()
 
-        mock_send.assert_called_once_with(WhatsAppConfig.MESSAGE_DOOR_OPENED)
+        mock_send.assert_called_once()
+        assert mock_send.call_args[0][0] == WhatsAppConfig.MESSAGE_DOOR_OPENED
 
     @patch("services.whatsapp_service.send_whatsapp_message")
     def test_send_door_opened_alert_returns_result(self, mock_send, mock_env_vars):
-        """Test that send_door_opened_alert returns result from send_whatsapp_message."""
+        """Test that inline delivery returns the send_whatsapp_message result."""
         mock_send.return_value = True
 
         from services.whatsapp_service import send_door_opened_alert
@@ -242,6 +284,17 @@ class TestSendDoorOpenedAlert:
 
         assert result is False
 
+    @patch("services.whatsapp_service.send_whatsapp_message")
+    def test_send_door_opened_alert_includes_device_id(self, mock_send, mock_env_vars):
+        """Test that a device ID is appended to the alert message."""
+        from services.whatsapp_service import send_door_opened_alert
+        from config.Config import WhatsAppConfig
+
+        send_door_opened_alert("dev_a")
+
+        mock_send.assert_called_once()
+        assert mock_send.call_args[0][0] == f"{WhatsAppConfig.MESSAGE_DOOR_OPENED} [dev_a]"
+
 
 class TestSendDoorClosedAlert:
     """Test cases for send_door_closed_alert function."""
@@ -256,11 +309,12 @@ class TestSendDoorClosedAlert:
 
         send_door_closed_alert()
 
-        mock_send.assert_called_once_with(WhatsAppConfig.MESSAGE_DOOR_CLOSED)
+        mock_send.assert_called_once()
+        assert mock_send.call_args[0][0] == WhatsAppConfig.MESSAGE_DOOR_CLOSED
 
     @patch("services.whatsapp_service.send_whatsapp_message")
     def test_send_door_closed_alert_returns_result(self, mock_send, mock_env_vars):
-        """Test that send_door_closed_alert returns result from send_whatsapp_message."""
+        """Test that inline delivery returns the send_whatsapp_message result."""
         mock_send.return_value = True
 
         from services.whatsapp_service import send_door_closed_alert
@@ -279,3 +333,166 @@ class TestSendDoorClosedAlert:
         result = send_door_closed_alert()
 
         assert result is False
+
+
+class TestWhatsAppClient:
+    """Test cases for the pooled WhatsAppClient session."""
+
+    def test_session_is_shared_and_pooled(self, mock_env_vars):
+        """Test that every request reuses one session with the configured pool size."""
+        from services.whatsapp_service import WhatsAppClient
+
+        client = WhatsAppClient(pool_size=4, connect_timeout=1, read_timeout=5)
+        session = client.session
+
+        assert client.session is session
+        assert session.get_adapter("https://gateway.example")._pool_maxsize == 4
+        assert client.timeout == (1, 5)
+
+    def test_post_uses_session(self, mock_env_vars):
+        """Test that post goes through the shared session."""
+        from services.whatsapp_service import WhatsAppClient
+
+        client = WhatsAppClient()
+        client._session = Mock()
+
+        client.post("https://gateway.example", json={"message": "hi"})
+
+        client._session.post.assert_called_once_with(
+            "https://gateway.example", json={"message": "hi"}
+        )
+
+    def test_close_discards_session(self, mock_env_vars):
+        """Test that close releases connections and a new session is created later."""
+        from services.whatsapp_service import WhatsAppClient
+
+        client = WhatsAppClient()
+        session = client.session
+        client.close()
+
+        assert client.session is not session
+
+
+class TestAlertOutbox:
+    """Test cases for queued alert delivery."""
+
+    @patch("services.whatsapp_service.send_whatsapp_message")
+    def test_alerts_are_queued_not_sent(self, mock_send, mock_env_vars, monkeypatch):
+        """Test that send_*_alert returns before the message is delivered."""
+        from services.alert_dispatcher import AlertDispatcher
+        import services.whatsapp_service as whatsapp_service
+
+        dispatcher = AlertDispatcher(workers=1, max_queue=10)
+        monkeypatch.setattr(whatsapp_service, "alert_dispatcher", dispatcher)
+        gate = threading.Event()
+        mock_send.side_effect = lambda *args, **kwargs: gate.wait(5)
+
+        assert whatsapp_service.send_door_opened_alert("dev_a") is True
+        assert mock_send.call_count <= 1
+        gate.set()
+        assert dispatcher.join(timeout=5)
+
+        mock_send.assert_called_once()
+        metrics = dispatcher.metrics()
+        assert metrics["delivered"] == 1
+        assert metrics["max_latency_ms"] >= metrics["max_wait_ms"]
+
+
+class TestFlapCoalescing:
+    """Test cases for folding rapid door transitions."""
+
+    @pytest.fixture(autouse=True)
+    def coalescing_window(self, monkeypatch):
+        """Enable coalescing, which is off by default."""
+        from services.flap_coalescer import flap_coalescer
+
+        monkeypatch.setattr(flap_coalescer, "window", 60)
+
+    @patch("services.whatsapp_service.send_whatsapp_message")
+    def test_transitions_sent_individually_by_default(self, mock_send, mock_env_vars, monkeypatch):
+        """Test that without a coalescing window every transition is sent at once."""
+        from services.whatsapp_service import send_door_opened_alert, send_door_closed_alert
+        from services.flap_coalescer import flap_coalescer
+
+        monkeypatch.setattr(flap_coalescer, "window", 0)
+        send_door_opened_alert("dev_a")
+        send_door_closed_alert("dev_a")
+
+        assert mock_send.call_count == 2
+
+    @patch("services.whatsapp_service.send_whatsapp_message")
+    def test_transitions_in_window_become_one_summary(self, mock_send, mock_env_vars):
+        """Test that the first transition is sent and the rest summarized."""
+        from services.whatsapp_service import send_door_opened_alert, send_door_closed_alert
+        from services.flap_coalescer import flap_coalescer
+        from config.Config import WhatsAppConfig
+
+        send_door_opened_alert("dev_a")
+        send_door_closed_alert("dev_a")
+        send_door_opened_alert("dev_a")
+        send_door_closed_alert("dev_a")
+        mock_send.assert_called_once()
+        assert mock_send.call_args[0][0] == f"{WhatsAppConfig.MESSAGE_DOOR_OPENED} [dev_a]"
+
+        flap_coalescer.flush()
+
+        summary = mock_send.call_args[0][0]
+        assert mock_send.call_count == 2
+        assert summary.startswith("DOOR FLAPPING - 4 changes from ")
+        assert summary.endswith("now CLOSED [dev_a]")
+
+    @patch("services.whatsapp_service.send_whatsapp_message")
+    def test_devices_have_separate_windows(self, mock_send, mock_env_vars):
+        """Test that another device's first transition is still sent at once."""
+        from services.whatsapp_service import send_door_opened_alert
+
+        send_door_opened_alert("dev_a")
+        send_door_opened_alert("dev_b")
+
+        assert mock_send.call_count == 2
+
+
+class TestRecipientFanOut:
+    """Test cases for delivering alerts to several recipients."""
+
+    @patch("services.whatsapp_service.send_whatsapp_message")
+    def test_alert_copied_to_routed_recipients(self, mock_send, mock_env_vars, monkeypatch):
+        """Test that an open alert reaches the device route and the escalation route."""
+        import services.whatsapp_service as whatsapp_service
+        from services.alert_router import AlertRouter, parse_routes
+
+        routes = parse_routes("dev_a=g1|g2,severity:alert=oncall")
+        monkeypatch.setattr(whatsapp_service, "alert_router", AlertRouter(routes, rate=0))
+
+        whatsapp_service.send_door_opened_alert("dev_a", key="dev_a:opened:1")
+        whatsapp_service.send_door_closed_alert("dev_b", key="dev_b:closed:1")
+
+        sent = [(c[1]["recipient"], c[1]["idempotency_key"]) for c in mock_send.call_args_list]
+        assert sent == [
+            ("g1", "dev_a:opened:1>g1"),
+            ("g2", "dev_a:opened:1>g2"),
+            ("oncall", "dev_a:opened:1>oncall"),
+        ]
+
+    @patch("services.whatsapp_service.send_whatsapp_message")
+    def test_burst_over_recipient_limit_is_fully_delivered(
+        self, mock_send, mock_env_vars, monkeypatch
+    ):
+        """Test that copies over a recipient's burst are delayed, not dropped."""
+        import time
+        import services.whatsapp_service as whatsapp_service
+        from services.alert_router import AlertRouter
+
+        router = AlertRouter(default=["g0"], rate=3000, burst=2)
+        monkeypatch.setattr(whatsapp_service, "alert_router", router)
+        mock_send.return_value = True
+
+        for index in range(10):
+            assert whatsapp_service.send_door_opened_alert(f"dev_{index}") is True
+
+        deadline = time.monotonic() + 5
+        while mock_send.call_count < 10 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert mock_send.call_count == 10
+        assert router.metrics()["g0"]["sent"] == 10
+        assert router.metrics()["g0"]["throttled"] > 0
@@ -9,7 +9,7 @@ successful and error responses.
 from flask import jsonify
 
 
-def success_response(data=None, message="Success", status_code=200):
+def success_response(data=None, message="Success", status_code=200, meta=None):
     """
     Create a standardized success response.
 
@@ -21,6 +21,7 @@ def success_response(data=None, message="Success", status_code=200):
         data: The data to include in the response (typically a dict or list)
         message (str): Success message describing the operation. Defaults to "Success"
         status_code (int): HTTP status code. Defaults to 200 (OK)
+        meta (dict, optional): Metadata about the result (e.g. its age), added as "meta"
 
     Returns:
         tuple: Flask Response object with JSON data and HTTP status code
@@ -30,6 +31,9 @@ def success_response(data=None, message="Success", status_code=200):
         ({"status": "success", "message": "Device found", "result": {"id": 123}}, 200)
     """
     response = {"status": "success", "message": message, "result": data}
+    # Include metadata if provided
+    if meta:
+        response["meta"] = meta
     return jsonify(response), status_code
 
 